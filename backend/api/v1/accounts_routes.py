@@ -5,6 +5,7 @@ from backend.models.models import JimengAccount
 from backend.utils.jimeng_account_login import login_and_get_cookie
 from backend.utils.jimeng_login_window import login_and_wait
 from backend.core.global_task_manager import global_task_manager
+from backend.core.account_lease import account_lease_service
 import asyncio
 
 # 创建蓝图
@@ -16,32 +17,13 @@ def get_accounts():
     try:
         accounts = JimengAccount.select()
         data = []
-        today = date.today()
+        
+        # 一条分组聚合查询得到所有账号的使用次数
+        usage_summary = account_lease_service.get_usage_summary()
+        daily_limits = account_lease_service.daily_limits
         
         for account in accounts:
-            # 使用JimengTaskRecord表统计今日使用次数
-            from backend.models.models import JimengTaskRecord
-
-            # 计算今日图片类别使用次数 (文生图 task_type=1 + 图生图 task_type=4)
-            image_usage = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type.in_([1, 4])) &  # 1=文生图, 4=图生图
-                (JimengTaskRecord.created_at >= today)
-            ).count()
-
-            # 计算今日视频类别使用次数 (图生视频 task_type=2 + 文生视频 task_type=5)
-            video_usage = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type.in_([2, 5])) &  # 2=图生视频, 5=文生视频
-                (JimengTaskRecord.created_at >= today)
-            ).count()
-
-            # 计算今日数字人使用次数 (task_type=3)
-            digital_human_usage = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type == 3) &
-                (JimengTaskRecord.created_at >= today)
-            ).count()
+            today_usage = usage_summary.get(account.id, account_lease_service.empty_usage())['today']
 
             data.append({
                 'id': account.id,
@@ -51,14 +33,14 @@ def get_accounts():
                 'created_at': account.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'updated_at': account.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'today_usage': {
-                    'image': image_usage,        # 图片类别：文生图+图生图 (10次/天)
-                    'video': video_usage,        # 视频类别：图生视频+文生视频 (2次/天)
-                    'digital_human': digital_human_usage  # 数字人类别 (1次/天)
+                    'image': today_usage['image'],        # 图片类别：文生图+图生图
+                    'video': today_usage['video'],        # 视频类别：图生视频+文生视频
+                    'digital_human': today_usage['digital_human']  # 数字人类别
                 },
                 'daily_limits': {
-                    'image': 10,       # 图片每日限额10次
-                    'video': 2,        # 视频每日限额2次
-                    'digital_human': 1  # 数字人每日限额1次
+                    'image': daily_limits['image'],
+                    'video': daily_limits['video'],
+                    'digital_human': daily_limits['digital_human']
                 }
             })
         
@@ -114,6 +96,7 @@ def add_accounts():
                         print("添加账号: {}".format(account))
         
         print("批量添加完成，成功添加 {} 个账号".format(added_count))
+        account_lease_service.invalidate()
         return jsonify({
             'success': True,
             'message': '成功添加 {} 个账号'.format(added_count),
@@ -135,6 +118,7 @@ def delete_account(account_id):
         account = JimengAccount.get(JimengAccount.id == account_id)
         deleted_account = account.account
         account.delete_instance()
+        account_lease_service.invalidate()
         
         print("成功删除账号: {}".format(deleted_account))
         return jsonify({
@@ -162,6 +146,7 @@ def clear_all_accounts():
     try:
         print("警告：开始清空所有即梦账号")
         deleted_count = JimengAccount.delete().execute()
+        account_lease_service.invalidate()
         print("已清空所有账号，共删除 {} 个".format(deleted_count))
         return jsonify({
             'success': True,
@@ -180,57 +165,26 @@ def clear_all_accounts():
 def get_account_usage_stats():
     """获取账号使用情况统计"""
     try:
-        from datetime import date
-
-        today = date.today()
         accounts = list(JimengAccount.select())
+        # 一条分组聚合查询得到所有账号的今日/累计使用次数，结果短时缓存
+        usage_summary = account_lease_service.get_usage_summary()
+        daily_limits = account_lease_service.daily_limits
 
         stats = []
         for account in accounts:
-            # 使用JimengTaskRecord表统计使用次数
-            from backend.models.models import JimengTaskRecord, JimengImg2ImgTask, JimengText2VideoTask
-
-            # 计算今日图片类别使用次数 (文生图 task_type=1 + 图生图 task_type=4)
-            image_usage = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type.in_([1, 4])) &  # 1=文生图, 4=图生图
-                (JimengTaskRecord.created_at >= today)
-            ).count()
-
-            # 计算今日视频类别使用次数 (图生视频 task_type=2 + 文生视频 task_type=5)
-            video_usage = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type.in_([2, 5])) &  # 2=图生视频, 5=文生视频
-                (JimengTaskRecord.created_at >= today)
-            ).count()
-
-            # 计算今日数字人使用次数 (task_type=3)
-            digital_human_usage = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type == 3) &
-                (JimengTaskRecord.created_at >= today)
-            ).count()
-
-            # 统计总使用次数
-            total_image = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type.in_([1, 4]))  # 1=文生图, 4=图生图
-            ).count()
-
-            total_video = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type.in_([2, 5]))  # 2=图生视频, 5=文生视频
-            ).count()
-
-            total_digital_human = JimengTaskRecord.select().where(
-                (JimengTaskRecord.account_id == account.id) &
-                (JimengTaskRecord.task_type == 3)
-            ).count()
-
-            # 设置每日限额
-            image_limit = 10
-            video_limit = 2
-            digital_human_limit = 1
+            usage = usage_summary.get(account.id, account_lease_service.empty_usage())
+            image_usage = usage['today']['image']
+            video_usage = usage['today']['video']
+            digital_human_usage = usage['today']['digital_human']
+
+            total_image = usage['total']['image']
+            total_video = usage['total']['video']
+            total_digital_human = usage['total']['digital_human']
+
+            # 每日限额
+            image_limit = daily_limits['image']
+            video_limit = daily_limits['video']
+            digital_human_limit = daily_limits['digital_human']
 
             # 判断账号状态 - 任何一种类型达到限制就视为已满
             is_available = (image_usage < image_limit) and (video_usage < video_limit) and (digital_human_usage < digital_human_limit)
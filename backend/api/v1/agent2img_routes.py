@@ -10,6 +10,7 @@ import asyncio
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengAgent2imgTask
+from backend.core.download_manager import download_manager
 import subprocess
 import platform
 import threading
@@ -445,25 +446,17 @@ def batch_download_images():
                         'filename': img_info['filename']
                     })
                 
-                # 使用带重试机制的批量下载
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    delay_between_downloads=1.0,
-                    timeout=30
-                )
-                
-                success_count = download_result['success_count']
-                error_count = download_result['failed_count']
-                
-                print(f"批量下载完成: 成功 {success_count} 张，失败 {error_count} 张")
-                print(f"文件保存位置: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='agent2img', max_retries=5, timeout=30,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
                 
             except Exception as e:
                 print(f"批量下载过程出错: {str(e)}")
         
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -472,6 +465,7 @@ def batch_download_images():
             'success': True,
             'message': f'开始下载 {len(all_images)} 张图片，请选择下载文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'total_images': len(all_images),
                 'tasks_count': len(tasks)
             }
@@ -617,8 +611,8 @@ def batch_download_images_v2():
                 os.makedirs(batch_folder, exist_ok=True)
                 print(f"创建批量下载文件夹: {batch_folder}")
 
-                total_success = 0
-                total_failed = 0
+                # 所有任务的图片合并为一个下载批次
+                all_file_infos = []
 
                 # 为每个任务创建单独文件夹
                 for task in tasks:
@@ -666,21 +660,10 @@ def batch_download_images_v2():
                                         'filename': filename
                                     })
 
-                            # 下载图片
+                            # 加入下载批次
                             if file_infos:
-                                from utils.download_util import batch_download_files
-                                download_result = batch_download_files(
-                                    file_infos=file_infos,
-                                    max_retries=3,
-                                    delay_between_downloads=0.5,
-                                    timeout=30
-                                )
-
-                                total_success += download_result['success_count']
-                                total_failed += download_result['failed_count']
-
-                                print(f"任务 {task.id} 下载完成: 成功 {download_result['success_count']} 张，失败 {download_result['failed_count']} 张")
-                                print(f"文件夹: {task_folder}")
+                                all_file_infos.extend(file_infos)
+                                print(f"任务 {task.id} 待下载 {len(file_infos)} 张，文件夹: {task_folder}")
                             else:
                                 print(f"任务 {task.id} 没有有效图片")
                         else:
@@ -688,15 +671,22 @@ def batch_download_images_v2():
 
                     except Exception as e:
                         print(f"处理任务 {task.id} 时出错: {str(e)}")
-                        total_failed += 1
 
-                print(f"批量下载v2完成: 总共成功 {total_success} 张图片，失败 {total_failed} 张")
-                print(f"文件保存位置: {download_dir}")
+                if not all_file_infos:
+                    print("没有可下载的图片")
+                    return
+
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(all_file_infos, source='agent2img', max_retries=3, timeout=30,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载v2 {len(all_file_infos)} 张图片，批次: {batch_id}，保存位置: {batch_folder}")
 
             except Exception as e:
                 print(f"批量下载v2过程出错: {str(e)}")
 
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -705,6 +695,7 @@ def batch_download_images_v2():
             'success': True,
             'message': f'开始批量下载 {len(tasks)} 个任务，将在选择的路径下创建时间文件夹，每个任务一个子文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'tasks_count': len(tasks)
             }
         })
@@ -13,73 +13,82 @@ from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 
 from backend.models.models import JimengDigitalHumanTask, JimengAccount
+from backend.core.download_manager import download_manager
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.task_ingest import bulk_create_tasks
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field
+from backend.core.blob_store import blob_store
+from backend.config.settings import BLOB_GC_MIN_GRACE
 
 # 创建蓝图
 jimeng_digital_human_bp = Blueprint('jimeng_digital_human', __name__, url_prefix='/api/jimeng/digital-human')
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+# account_info 先取账号ID，查询后统一替换为账号名
+DIGITAL_HUMAN_TASK_FIELDS = {
+    'id': task_field('id'),
+    'image_path': task_field('image_path'),
+    'audio_path': task_field('audio_path'),
+    'action_description': task_field('action_description'),  # 动作描述
+    'status': task_field('status'),
+    'account_id': task_field('account_id'),
+    'account_info': task_field('account_id'),
+    'create_at': task_field('create_at', getter=lambda task: task.create_at.isoformat() if task.create_at else None),
+    'start_time': task_field('start_time', getter=lambda task: task.start_time.isoformat() if task.start_time else None),
+    'video_url': task_field('video_url'),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+}
+
 @jimeng_digital_human_bp.route('/tasks', methods=['GET'])
 def get_tasks():
     """获取数字人任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 1000))
         status_filter = request.args.get('status', 'all')
+        status = int(status_filter) if status_filter.isdigit() else None
         
-        # 构建查询
-        query = JimengDigitalHumanTask.select()
-        
-        if status_filter != 'all':
-            try:
-                status_value = int(status_filter)
-                query = query.where(JimengDigitalHumanTask.status == status_value)
-            except ValueError:
-                pass
-        
-        # 获取总数
-        total = query.count()
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(JimengDigitalHumanTask, DIGITAL_HUMAN_TASK_FIELDS, request.args, status=status)
+            return jsonify({
+                'success': True,
+                'data': {'tasks': delta.items},
+                'sync': delta.to_dict()
+            })
         
-        # 分页查询
-        tasks = (query.order_by(JimengDigitalHumanTask.create_at.desc())
-                .paginate(page, per_page))
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(JimengDigitalHumanTask, DIGITAL_HUMAN_TASK_FIELDS, request.args,
+                            status=status, page_size_param='per_page')
         
-        # 转换为字典列表
-        task_list = []
-        for task in tasks:
-            # 获取账号信息
-            account_info = None
-            if task.account_id:
-                try:
-                    account = JimengAccount.get_by_id(task.account_id)
-                    account_info = account.account
-                except:
-                    account_info = f"账号ID:{task.account_id}"
-            
-            task_dict = {
-                'id': task.id,
-                'image_path': task.image_path,
-                'audio_path': task.audio_path,
-                'action_description': task.action_description,  # 动作描述
-                'status': task.status,
-                'account_id': task.account_id,
-                'account_info': account_info,
-                'create_at': task.create_at.isoformat() if task.create_at else None,
-                'start_time': task.start_time.isoformat() if task.start_time else None,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
+        # 获取账号信息（本页涉及的账号一次查询）
+        account_ids = {item['account_info'] for item in result.items if item.get('account_info')}
+        if account_ids:
+            accounts = {
+                account.id: account.account
+                for account in JimengAccount.select(JimengAccount.id, JimengAccount.account).where(JimengAccount.id.in_(account_ids))
             }
-            task_list.append(task_dict)
+            for item in result.items:
+                account_id = item.get('account_info')
+                if account_id:
+                    item['account_info'] = accounts.get(account_id, f"账号ID:{account_id}")
         
         return jsonify({
             'success': True,
+            'sync': {'watermark': result.watermark},
             'data': {
-                'tasks': task_list,
-                'total': total,
-                'page': page,
-                'per_page': per_page
+                'tasks': result.items,
+                'total': result.total,
+                'page': result.page,
+                'per_page': result.page_size,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"获取数字人任务列表失败: {str(e)}")
         return jsonify({
@@ -107,30 +116,10 @@ def create_task():
                 'message': '请选择有效的图片和音频文件'
             }), 400
         
-        # 创建tmp目录（在后端根目录下）
-        import os
-        from pathlib import Path
-        
-        # 获取后端根目录
-        backend_root = Path(__file__).parent.parent.parent  # 从api/v1/ 向上两级到backend/
-        tmp_dir = backend_root / 'tmp'
-        tmp_dir.mkdir(exist_ok=True)
-        
-        # 生成唯一文件名
-        image_ext = os.path.splitext(image_file.filename)[1]
-        audio_ext = os.path.splitext(audio_file.filename)[1]
-        
-        unique_id = str(uuid.uuid4())
-        image_filename = f"{unique_id}_image{image_ext}"
-        audio_filename = f"{unique_id}_audio{audio_ext}"
-        
-        # 保存文件到tmp目录
-        image_path = tmp_dir / image_filename
-        audio_path = tmp_dir / audio_filename
-        
-        image_file.save(str(image_path))
-        audio_file.save(str(audio_path))
-        
+        # 按内容存入上传文件存储（同一素材重复提交只保存一份）
+        image_path = blob_store.put_upload(image_file)
+        audio_path = blob_store.put_upload(audio_file)
+
         print(f"保存图片文件: {image_path}")
         print(f"保存音频文件: {audio_path}")
         
@@ -139,14 +128,14 @@ def create_task():
 
         # 创建任务记录
         task = JimengDigitalHumanTask.create(
-            image_path=str(image_path),
-            audio_path=str(audio_path),
+            image_path=image_path,
+            audio_path=audio_path,
             action_description=action_description if action_description else None,
             status=0,  # 排队中
             create_at=datetime.now()
         )
+        task_dispatcher.notify_task_enqueued(JimengDigitalHumanTask, task.id)
 
-          
         return jsonify({
             'success': True,
             'message': '数字人任务创建成功',
@@ -174,7 +163,7 @@ def delete_task(task_id):
             if task.image_path and os.path.exists(task.image_path):
                 # 确认删除的是tmp目录中的副本文件
                 if 'tmp' in task.image_path:
-                    os.remove(task.image_path)
+                    blob_store.remove_task_file(task.image_path)
                     deleted_files_count += 1
                     print(f"删除图片副本文件: {task.image_path}")
                 else:
@@ -182,7 +171,7 @@ def delete_task(task_id):
             if task.audio_path and os.path.exists(task.audio_path):
                 # 确认删除的是tmp目录中的副本文件
                 if 'tmp' in task.audio_path:
-                    os.remove(task.audio_path)
+                    blob_store.remove_task_file(task.audio_path)
                     deleted_files_count += 1
                     print(f"删除音频副本文件: {task.audio_path}")
                 else:
@@ -226,6 +215,7 @@ def retry_task(task_id):
         task.start_time = None
         task.video_url = None
         task.save()
+        task_dispatcher.notify_task_enqueued(JimengDigitalHumanTask, task.id)
         
         return jsonify({
             'success': True,
@@ -267,6 +257,9 @@ def batch_retry_tasks():
             task.save()
             retry_count += 1
         
+        if retry_count:
+            task_dispatcher.notify_task_enqueued(JimengDigitalHumanTask)
+        
         return jsonify({
             'success': True,
             'message': f'已重试 {retry_count} 个任务'
@@ -305,7 +298,7 @@ def batch_delete_tasks():
                 if task.image_path and os.path.exists(task.image_path):
                     # 确认删除的是tmp目录中的副本文件
                     if 'tmp' in task.image_path:
-                        os.remove(task.image_path)
+                        blob_store.remove_task_file(task.image_path)
                         deleted_files_count += 1
                         print(f"删除图片副本文件: {task.image_path}")
                     else:
@@ -313,7 +306,7 @@ def batch_delete_tasks():
                 if task.audio_path and os.path.exists(task.audio_path):
                     # 确认删除的是tmp目录中的副本文件
                     if 'tmp' in task.audio_path:
-                        os.remove(task.audio_path)
+                        blob_store.remove_task_file(task.audio_path)
                         deleted_files_count += 1
                         print(f"删除音频副本文件: {task.audio_path}")
                     else:
@@ -454,30 +447,27 @@ def batch_download_videos():
                     print("没有可下载的视频")
                     return
                 
-                # 使用带重试机制的批量下载（支持并行）
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=60,
-                    max_workers=5  # 并行下载数
-                )
-                
-                download_count = download_result['success_count']
-                
-                print(f"批量下载完成，成功下载 {download_count} 个视频")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='digital_human', max_retries=5, timeout=60,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {folder_path}")
                 
             except Exception as e:
                 print(f"批量下载处理失败: {str(e)}")
         
-        # 在后台线程中执行文件选择和下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         thread = threading.Thread(target=select_folder_and_download)
         thread.daemon = True
         thread.start()
         
         return jsonify({
             'success': True,
-            'message': '开始选择保存文件夹并下载，请在弹出的对话框中选择保存位置'
+            'message': '开始选择保存文件夹并下载，请在弹出的对话框中选择保存位置',
+            'data': {
+                'batch_id': batch_id  # 选择文件夹后以该批次ID提交下载
+            }
         })
         
     except Exception as e:
@@ -517,11 +507,11 @@ def delete_tasks_before_today():
         for task in before_today_tasks:
             try:
                 if task.image_path and os.path.exists(task.image_path):
-                    os.remove(task.image_path)
+                    blob_store.remove_task_file(task.image_path)
                     deleted_files_count += 1
                     print(f"删除图片文件: {task.image_path}")
                 if task.audio_path and os.path.exists(task.audio_path):
-                    os.remove(task.audio_path)
+                    blob_store.remove_task_file(task.audio_path)
                     deleted_files_count += 1
                     print(f"删除音频文件: {task.audio_path}")
             except Exception as file_error:
@@ -550,6 +540,20 @@ def delete_tasks_before_today():
             'message': f'删除今日前任务失败: {str(e)}'
         }), 500
 
+def _build_table_task(task_data):
+    """表格中的一行 -> 数字人任务字段"""
+    if not task_data.get('image_path'):
+        raise ValueError("缺少图片路径")
+    if not task_data.get('audio_path'):
+        raise ValueError("缺少音频路径")
+    # 动作描述（可选）
+    action_description = (task_data.get('action_description') or '').strip()
+    return {
+        'image_path': task_data['image_path'].strip(),
+        'audio_path': task_data['audio_path'].strip(),
+        'action_description': action_description or None
+    }
+
 @jimeng_digital_human_bp.route('/tasks/batch-create-from-table', methods=['POST'])
 def batch_create_tasks_from_table():
     """从表格批量创建数字人任务"""
@@ -568,66 +572,16 @@ def batch_create_tasks_from_table():
                 'message': '任务数据格式错误'
             }), 400
 
-        created_tasks = []
-        failed_tasks = []
-
-        for i, task_data in enumerate(tasks_data):
-            try:
-                # 验证必需字段
-                if 'image_path' not in task_data or not task_data['image_path']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少图片路径")
-                    continue
-                if 'audio_path' not in task_data or not task_data['audio_path']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少音频路径")
-                    continue
-
-                image_path = task_data['image_path'].strip()
-                audio_path = task_data['audio_path'].strip()
-
-                # 验证文件路径是否存在（如果是本地文件路径）
-                is_url = image_path.startswith(('http://', 'https://')) or audio_path.startswith(('http://', 'https://'))
-                
-                if not is_url:
-                    # 如果不是URL，则检查本地文件是否存在
-                    if not os.path.exists(image_path):
-                        failed_tasks.append(f"第 {i+1} 行: 图片文件不存在 - {image_path}")
-                        continue
-                    if not os.path.exists(audio_path):
-                        failed_tasks.append(f"第 {i+1} 行: 音频文件不存在 - {audio_path}")
-                        continue
-
-                # 获取动作描述（可选）
-                action_description = task_data.get('action_description', '').strip() if task_data.get('action_description') else None
-
-                # 创建任务
-                task = JimengDigitalHumanTask.create(
-                    image_path=image_path,
-                    audio_path=audio_path,
-                    action_description=action_description if action_description else None,
-                    status=0,  # 排队中
-                    create_at=datetime.now()
-                )
-                created_tasks.append(task.id)
-                print(f"从表格创建数字人任务: {task.id}, 图片: {image_path}, 音频: {audio_path}")
-
-            except Exception as e:
-                failed_tasks.append(f"第 {i+1} 行: {str(e)}")
-                print(f"处理第 {i+1} 行任务失败: {str(e)}")
-
-        # 返回结果
-        result_message = f"成功创建 {len(created_tasks)} 个任务"
-        if failed_tasks:
-            result_message += f"，{len(failed_tasks)} 个任务创建失败"
+        result = bulk_create_tasks(JimengDigitalHumanTask, tasks_data, _build_table_task,
+                                   file_fields={'image_path': '图片', 'audio_path': '音频'})
+        print(f"从表格批量创建数字人任务: {result.message}")
+        if result.created_ids:
+            task_dispatcher.notify_task_enqueued(JimengDigitalHumanTask)
 
         return jsonify({
             'success': True,
-            'message': result_message,
-            'data': {
-                'created_count': len(created_tasks),
-                'failed_count': len(failed_tasks),
-                'created_task_ids': created_tasks,
-                'failed_tasks': failed_tasks
-            }
+            'message': result.message,
+            'data': result.to_dict()
         })
 
     except Exception as e:
@@ -675,8 +629,8 @@ def single_download_video():
 
                 file_path = os.path.join(folder_path, filename)
                 
-                from utils.download_util import download_single_file
-                download_single_file(video_url, file_path)
+                from backend.utils.download_util import download_single_file
+                download_single_file(video_url, file_path, source='digital_human')
                 print(f"视频下载成功: {file_path}")
 
             except Exception as e:
@@ -699,13 +653,14 @@ def get_stats():
         today = date.today()
         
         # 获取统计数据
-        total = JimengDigitalHumanTask.select().count()
+        summary = task_status_counter.get_summary(JimengDigitalHumanTask)
+        total = summary['total']
         today_count = JimengDigitalHumanTask.select().where(
             JimengDigitalHumanTask.create_at >= today
         ).count()
-        in_progress = JimengDigitalHumanTask.select().where(JimengDigitalHumanTask.status == 1).count()
-        completed = JimengDigitalHumanTask.select().where(JimengDigitalHumanTask.status == 2).count()
-        failed = JimengDigitalHumanTask.select().where(JimengDigitalHumanTask.status == 3).count()
+        in_progress = summary['processing']
+        completed = summary['completed']
+        failed = summary['failed']
         
         return jsonify({
             'success': True,
@@ -729,51 +684,16 @@ def get_stats():
 def cleanup_orphaned_digital_human_files():
     """清理孤立的数字人文件（没有关联任务的图片和音频）"""
     try:
-        # 获取项目中所有存储的文件路径
-        all_tasks = JimengDigitalHumanTask.select()
-        used_file_paths = set()
-
-        for task in all_tasks:
-            if task.image_path:
-                used_file_paths.add(task.image_path)
-            if task.audio_path:
-                used_file_paths.add(task.audio_path)
+        # 上传文件的引用计数由任务表上的触发器维护，这里只回收引用已归零的文件（不再遍历目录逐个比对）；
+        # 各类任务共用上传文件存储，回收范围包括所有任务类型释放的文件
+        result = blob_store.collect(grace=BLOB_GC_MIN_GRACE)
 
-        # 获取项目根目录
-        from pathlib import Path
-        backend_root = Path(__file__).parent.parent.parent
-        tmp_dir = backend_root / 'tmp'
-
-        deleted_files_count = 0
-        error_count = 0
-
-        # 检查tmp目录
-        if tmp_dir.exists():
-            for filename in os.listdir(str(tmp_dir)):
-                file_path = tmp_dir / filename
-                if file_path.is_file():
-                    # 检查文件是否为图片或音频文件
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.mp3', '.wav', '.m4a', '.aac', '.ogg')):
-                        # 检查文件是否被任何任务使用
-                        if str(file_path) not in used_file_paths:
-                            try:
-                                os.remove(str(file_path))
-                                deleted_files_count += 1
-                                print(f"删除孤立文件: {file_path}")
-                            except Exception as e:
-                                error_count += 1
-                                print(f"删除孤立文件失败: {file_path}, 错误: {str(e)}")
-
-        print(f"清理数字人孤立文件完成: 删除 {deleted_files_count} 个文件，失败 {error_count} 个")
+        print(f"清理数字人孤立文件完成: 删除 {result['deleted_count']} 个文件，失败 {result['error_count']} 个")
 
         return jsonify({
             'success': True,
-            'message': f'清理完成，删除了 {deleted_files_count} 个孤立文件',
-            'data': {
-                'deleted_count': deleted_files_count,
-                'error_count': error_count,
-                'total_used_files': len(used_file_paths)
-            }
+            'message': f"清理完成，删除了 {result['deleted_count']} 个孤立文件",
+            'data': result
         })
 
     except Exception as e:
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+下载任务API路由 - 全局下载管理器的进度查询、取消与重试
+"""
+from flask import Blueprint, jsonify, request
+from backend.core.download_manager import download_manager
+from backend.models.models import DownloadJob
+
+# 创建蓝图
+downloads_bp = Blueprint('downloads', __name__, url_prefix='/api/downloads')
+
+@downloads_bp.route('', methods=['GET'])
+def get_downloads():
+    """获取下载任务列表"""
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', 100))
+        status = request.args.get('status', None)
+        source = request.args.get('source', None)
+        batch_id = request.args.get('batch_id', None)
+
+        query = DownloadJob.select()
+        if status is not None:
+            query = query.where(DownloadJob.status == status)
+        if source:
+            query = query.where(DownloadJob.source == source)
+        if batch_id:
+            query = query.where(DownloadJob.batch_id == batch_id)
+
+        total = query.count()
+        jobs = query.order_by(DownloadJob.create_at.desc(), DownloadJob.id.desc()).paginate(page, page_size)
+
+        return jsonify({
+            'success': True,
+            'data': [download_manager.job_to_dict(job) for job in jobs],
+            'summary': download_manager.get_summary(),
+            'pagination': {
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'total_pages': (total + page_size - 1) // page_size
+            }
+        })
+
+    except Exception as e:
+        print("获取下载任务列表失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取下载任务列表失败: {}'.format(str(e))
+        }), 500
+
+@downloads_bp.route('/<int:job_id>', methods=['GET'])
+def get_download(job_id):
+    """获取单个下载任务进度"""
+    try:
+        job = download_manager.get_job(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'message': '下载任务不存在'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': job
+        })
+
+    except Exception as e:
+        print("获取下载任务失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取下载任务失败: {}'.format(str(e))
+        }), 500
+
+@downloads_bp.route('/batches/<batch_id>', methods=['GET'])
+def get_download_batch(batch_id):
+    """获取下载批次进度"""
+    try:
+        batch = download_manager.get_batch(batch_id)
+        if not batch:
+            return jsonify({
+                'success': False,
+                'message': '下载批次不存在'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': batch
+        })
+
+    except Exception as e:
+        print("获取下载批次失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取下载批次失败: {}'.format(str(e))
+        }), 500
+
+@downloads_bp.route('/<int:job_id>/cancel', methods=['POST'])
+def cancel_download(job_id):
+    """取消下载任务（排队中或下载中）"""
+    try:
+        count = download_manager.cancel(job_id)
+        return jsonify({
+            'success': count > 0,
+            'message': '已取消下载' if count else '下载任务不存在或已结束',
+            'data': {'cancelled': count}
+        })
+
+    except Exception as e:
+        print("取消下载任务失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '取消下载任务失败: {}'.format(str(e))
+        }), 500
+
+@downloads_bp.route('/batches/<batch_id>/cancel', methods=['POST'])
+def cancel_download_batch(batch_id):
+    """取消整个批次中未结束的下载"""
+    try:
+        count = download_manager.cancel_batch(batch_id)
+        return jsonify({
+            'success': True,
+            'message': '已取消 {} 个下载'.format(count),
+            'data': {'cancelled': count}
+        })
+
+    except Exception as e:
+        print("取消下载批次失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '取消下载批次失败: {}'.format(str(e))
+        }), 500
+
+@downloads_bp.route('/<int:job_id>/retry', methods=['POST'])
+def retry_download(job_id):
+    """重试失败或已取消的下载任务"""
+    try:
+        count = download_manager.retry(job_id)
+        return jsonify({
+            'success': count > 0,
+            'message': '已重新加入下载队列' if count else '只能重试失败或已取消的下载',
+            'data': {'retried': count}
+        })
+
+    except Exception as e:
+        print("重试下载任务失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '重试下载任务失败: {}'.format(str(e))
+        }), 500
+
+@downloads_bp.route('/batches/<batch_id>/retry', methods=['POST'])
+def retry_download_batch(batch_id):
+    """重试批次中所有失败或已取消的下载"""
+    try:
+        count = download_manager.retry_batch(batch_id)
+        return jsonify({
+            'success': True,
+            'message': '已重新加入 {} 个下载'.format(count),
+            'data': {'retried': count}
+        })
+
+    except Exception as e:
+        print("重试下载批次失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '重试下载批次失败: {}'.format(str(e))
+        }), 500
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+事件流API路由 - 以 Server-Sent Events 推送任务状态变化、任务进度、槽位变化与下载进度
+
+事件类型：
+- task.created / task.status / task.updated：任务新建、单个任务状态变化（table, task_id, old_status, status）、其他字段变化
+- task.changed：批量更新/删除（table, action），订阅方按表刷新
+- task.progress：槽位上任务的进度
+- slot.acquired / slot.released：调度器槽位占用与归还（附带调度器统计）
+- download.status / download.progress：下载任务状态与字节进度
+- reset：客户端落后太多，需要重新全量加载
+"""
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from backend.config.settings import EVENT_HEARTBEAT_INTERVAL
+from backend.core.event_bus import event_bus
+
+# 创建蓝图
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+def _format_event(event) -> str:
+    data = json.dumps(event.to_dict(), ensure_ascii=False, default=str)
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+@events_bp.route('', methods=['GET'])
+def stream_events():
+    """
+    订阅事件流
+
+    断线重连时浏览器自动带上 Last-Event-ID 头，也可用 last_event_id 参数指定；
+    types=task.status,slot.released 只接收指定类型的事件
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    types = [name.strip() for name in request.args.get('types', '').split(',') if name.strip()]
+    subscription = event_bus.subscribe(last_event_id, types or None)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                events = subscription.get(timeout=EVENT_HEARTBEAT_INTERVAL)
+                if not events:
+                    # 心跳，保持连接并及时发现已断开的客户端
+                    yield ": keep-alive\n\n"
+                    continue
+                yield ''.join(_format_event(event) for event in events)
+        finally:
+            subscription.close()
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@events_bp.route('/stats', methods=['GET'])
+def get_event_stats():
+    """获取事件总线统计（最新事件ID、缓冲数量、订阅者数量）"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': event_bus.get_stats()
+        })
+
+    except Exception as e:
+        print("获取事件统计失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取事件统计失败: {}'.format(str(e))
+        }), 500
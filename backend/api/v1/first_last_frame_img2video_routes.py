@@ -11,6 +11,14 @@ import pandas as pd
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengFirstLastFrameImg2VideoTask
+from backend.core.download_manager import download_manager
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.task_ingest import bulk_create_tasks
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field, format_time
+from backend.core.blob_store import blob_store
+from backend.config.settings import BLOB_GC_MIN_GRACE
 import subprocess
 import platform
 import threading
@@ -79,8 +87,12 @@ def is_cache_directory_file(file_path):
         return False
 
 def safe_remove_image_file(image_path):
-    """安全删除图片文件，只删除缓存目录中的文件"""
-    if not image_path or not os.path.exists(image_path):
+    """安全删除图片文件，只删除缓存目录中的文件；上传文件存储中的文件在引用归零后由后台回收"""
+    if not image_path:
+        return False
+    if blob_store.owns(image_path):
+        return True
+    if not os.path.exists(image_path):
         return False
 
     try:
@@ -98,56 +110,62 @@ def safe_remove_image_file(image_path):
 # 创建蓝图
 jimeng_first_last_frame_img2video_bp = Blueprint('jimeng_first_last_frame_img2video', __name__, url_prefix='/api/jimeng/first-last-frame-img2video')
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+FIRST_LAST_FRAME_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'model': task_field('model'),
+    'second': task_field('second'),
+    'resolution': task_field('resolution'),
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'account_id': task_field('account_id'),
+    'first_frame_image_path': task_field('first_frame_image_path'),
+    'last_frame_image_path': task_field('last_frame_image_path'),
+    'video_url': task_field('video_url'),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+}
+
 @jimeng_first_last_frame_img2video_bp.route('/tasks', methods=['GET'])
 def get_first_last_frame_img2video_tasks():
     """获取首尾帧图生视频任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 1000))
         status = request.args.get('status', None)
-
-        print("获取首尾帧图生视频任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
-
-        # 构建查询
-        query = JimengFirstLastFrameImg2VideoTask.select()
-        if status is not None:
-            query = query.where(JimengFirstLastFrameImg2VideoTask.status == status)
-
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengFirstLastFrameImg2VideoTask.create_at.desc()).paginate(page, page_size)
-
-        data = []
-        for task in tasks:
-            data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'second': task.second,
-                'resolution': task.resolution,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'first_frame_image_path': task.first_frame_image_path,
-                'last_frame_image_path': task.last_frame_image_path,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,
-                'error_message': task.error_message,
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S') if task.create_at else None,
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S') if task.update_at else None
+        status = int(status) if status else None
+        
+        print("获取首尾帧图生视频任务列表，状态: {}, 游标: {}, 字段: {}".format(status, request.args.get('cursor'), request.args.get('fields')))
+        
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(JimengFirstLastFrameImg2VideoTask, FIRST_LAST_FRAME_TASK_FIELDS, request.args, status=status)
+            return jsonify({
+                'success': True,
+                'data': delta.items,
+                'sync': delta.to_dict()
             })
-
+        
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(JimengFirstLastFrameImg2VideoTask, FIRST_LAST_FRAME_TASK_FIELDS, request.args, status=status)
+        
         return jsonify({
             'success': True,
-            'data': data,
+            'sync': {'watermark': result.watermark},
+            'data': result.items,
             'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
+                'page': result.page,
+                'page_size': result.page_size,
+                'total': result.total,
+                'pages': result.total_pages,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
-
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"获取首尾帧图生视频任务列表失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -190,26 +208,14 @@ def create_first_last_frame_img2video_task():
                 'message': '不支持的文件格式，请上传图片文件'
             }), 400
 
-        # 创建临时目录保存上传的图片
-        import uuid
         from werkzeug.utils import secure_filename
 
-        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp', 'first_last_frame_upload')
-        os.makedirs(tmp_dir, exist_ok=True)
-
-        # 保存首帧图片
+        # 按内容存入上传文件存储（首尾帧相同时共用一份文件）
         first_filename = secure_filename(first_image.filename)
-        first_file_ext = first_filename.rsplit('.', 1)[1].lower()
-        first_unique_filename = f"{uuid.uuid4().hex}_first.{first_file_ext}"
-        first_file_path = os.path.join(tmp_dir, first_unique_filename)
-        first_image.save(first_file_path)
+        first_file_path = blob_store.put_upload(first_image, first_filename.rsplit('.', 1)[1].lower())
 
-        # 保存尾帧图片
         last_filename = secure_filename(last_image.filename)
-        last_file_ext = last_filename.rsplit('.', 1)[1].lower()
-        last_unique_filename = f"{uuid.uuid4().hex}_last.{last_file_ext}"
-        last_file_path = os.path.join(tmp_dir, last_unique_filename)
-        last_image.save(last_file_path)
+        last_file_path = blob_store.put_upload(last_image, last_filename.rsplit('.', 1)[1].lower())
 
         # 创建任务
         task = JimengFirstLastFrameImg2VideoTask.create(
@@ -221,6 +227,7 @@ def create_first_last_frame_img2video_task():
             last_frame_image_path=last_file_path,
             status=0
         )
+        task_dispatcher.notify_task_enqueued(JimengFirstLastFrameImg2VideoTask, task.id)
 
         print(f"创建首尾帧图生视频任务: {task.id}, 首帧: {first_filename}, 尾帧: {last_filename}")
 
@@ -275,6 +282,7 @@ def retry_first_last_frame_img2video_task(task_id):
     try:
         task = JimengFirstLastFrameImg2VideoTask.get_by_id(task_id)
         task.update_status(0)  # 重置为排队状态
+        task_dispatcher.notify_task_enqueued(JimengFirstLastFrameImg2VideoTask, task.id)
 
         print(f"重试首尾帧图生视频任务: {task_id}")
         return jsonify({'success': True, 'message': '任务已重新加入队列'})
@@ -312,6 +320,8 @@ def batch_retry_first_last_frame_img2video_tasks():
                 task.update_status(0)  # 重置为排队状态
                 retry_count += 1
 
+        if retry_count:
+            task_dispatcher.notify_task_enqueued(JimengFirstLastFrameImg2VideoTask)
         print(f"批量重试首尾帧图生视频任务: {retry_count}个")
         return jsonify({
             'success': True,
@@ -487,12 +497,13 @@ def download_single_first_last_frame_video():
                 file_path = os.path.join(download_dir, filename)
 
                 # 使用下载工具下载视频
-                from utils.download_util import download_single_file
+                from backend.utils.download_util import download_single_file
                 download_result = download_single_file(
                     url=video_url,
                     file_path=file_path,
                     max_retries=3,
-                    timeout=60
+                    timeout=60,
+                    source='first_last_frame'
                 )
 
                 if download_result['success']:
@@ -661,25 +672,17 @@ def batch_download_first_last_frame_videos():
                         'filename': video_info['filename']
                     })
 
-                # 使用带重试机制的批量下载（支持并行）
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=60,
-                    max_workers=5  # 并行下载数
-                )
-
-                success_count = download_result['success_count']
-                error_count = download_result['failed_count']
-
-                print(f"批量下载完成: 成功 {success_count} 个，失败 {error_count} 个")
-                print(f"文件保存位置: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='first_last_frame', max_retries=5, timeout=60,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
 
             except Exception as e:
                 print(f"批量下载过程出错: {str(e)}")
 
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -688,6 +691,7 @@ def batch_download_first_last_frame_videos():
             'success': True,
             'message': f'开始下载 {len(all_videos)} 个视频，请选择下载文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'total_videos': len(all_videos),
                 'tasks_count': len(tasks)
             }
@@ -704,12 +708,12 @@ def batch_download_first_last_frame_videos():
 def get_first_last_frame_img2video_stats():
     """获取首尾帧图生视频统计信息"""
     try:
-        base_query = JimengFirstLastFrameImg2VideoTask.select()
-        total_tasks = base_query.count()
-        pending_tasks = base_query.where(JimengFirstLastFrameImg2VideoTask.status == 0).count()
-        processing_tasks = base_query.where(JimengFirstLastFrameImg2VideoTask.status == 1).count()
-        completed_tasks = base_query.where(JimengFirstLastFrameImg2VideoTask.status == 2).count()
-        failed_tasks = base_query.where(JimengFirstLastFrameImg2VideoTask.status == 3).count()
+        summary = task_status_counter.get_summary(JimengFirstLastFrameImg2VideoTask)
+        total_tasks = summary['total']
+        pending_tasks = summary['pending']
+        processing_tasks = summary['processing']
+        completed_tasks = summary['completed']
+        failed_tasks = summary['failed']
 
         return jsonify({
             'success': True,
@@ -790,57 +794,16 @@ def delete_first_last_frame_tasks_before_today():
 def cleanup_orphaned_images():
     """清理孤立的首尾帧图片文件（没有关联任务的图片）"""
     try:
-        # 获取项目中所有存储的图片路径
-        all_tasks = JimengFirstLastFrameImg2VideoTask.select()
-        used_image_paths = set()
+        # 上传文件的引用计数由任务表上的触发器维护，这里只回收引用已归零的文件（不再遍历目录逐个比对）；
+        # 各类任务共用上传文件存储，回收范围包括所有任务类型释放的文件
+        result = blob_store.collect(grace=BLOB_GC_MIN_GRACE)
 
-        for task in all_tasks:
-            if task.first_frame_image_path:
-                used_image_paths.add(task.first_frame_image_path)
-            if task.last_frame_image_path:
-                used_image_paths.add(task.last_frame_image_path)
-
-        # 获取项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-
-        # 检查缓存目录
-        cache_directories = [
-            os.path.join(project_root, 'tmp', 'first_last_frame_upload'),
-            os.path.join(project_root, 'tmp', 'batch_upload'),
-        ]
-
-        deleted_files_count = 0
-        error_count = 0
-        skipped_files_count = 0
-
-        for cache_dir in cache_directories:
-            if os.path.exists(cache_dir):
-                for filename in os.listdir(cache_dir):
-                    file_path = os.path.join(cache_dir, filename)
-                    if os.path.isfile(file_path):
-                        # 检查文件是否被任何任务使用
-                        if file_path not in used_image_paths:
-                            try:
-                                os.remove(file_path)
-                                deleted_files_count += 1
-                                print(f"删除孤立缓存图片文件: {file_path}")
-                            except Exception as e:
-                                error_count += 1
-                                print(f"删除孤立缓存图片文件失败: {file_path}, 错误: {str(e)}")
-                        else:
-                            skipped_files_count += 1
-
-        print(f"清理孤立缓存图片完成: 删除 {deleted_files_count} 个文件，失败 {error_count} 个，跳过 {skipped_files_count} 个使用中的文件")
+        print(f"清理首尾帧孤立图片完成: 删除 {result['deleted_count']} 个文件，失败 {result['error_count']} 个")
 
         return jsonify({
             'success': True,
-            'message': f'清理完成，删除了 {deleted_files_count} 个孤立缓存图片文件',
-            'data': {
-                'deleted_count': deleted_files_count,
-                'error_count': error_count,
-                'skipped_count': skipped_files_count,
-                'total_used_files': len(used_image_paths)
-            }
+            'message': f"清理完成，删除了 {result['deleted_count']} 个孤立缓存图片文件",
+            'data': result
         })
 
     except Exception as e:
@@ -930,6 +893,21 @@ def get_local_file():
             'message': '服务器内部错误'
         }), 500
 
+def _build_table_task(task_data):
+    """表格中的一行 -> 首尾帧图生视频任务字段"""
+    if not task_data.get('first_image_path'):
+        raise ValueError("缺少首帧图片路径")
+    if not task_data.get('last_image_path'):
+        raise ValueError("缺少尾帧图片路径")
+    return {
+        'prompt': task_data.get('prompt', '').strip(),
+        'model': task_data.get('model', 'Video 3.0'),
+        'second': int(task_data.get('second', 5)),
+        'resolution': task_data.get('resolution', '1080p'),
+        'first_frame_image_path': clean_image_path(task_data['first_image_path']),
+        'last_frame_image_path': clean_image_path(task_data['last_image_path'])
+    }
+
 @jimeng_first_last_frame_img2video_bp.route('/tasks/batch-create-from-table', methods=['POST'])
 def batch_create_first_last_frame_tasks_from_table():
     """从表格批量创建首尾帧图生视频任务"""
@@ -948,80 +926,16 @@ def batch_create_first_last_frame_tasks_from_table():
                 'message': '任务数据格式错误'
             }), 400
 
-        created_tasks = []
-        failed_tasks = []
-
-        for i, task_data in enumerate(tasks_data):
-            try:
-                # 验证必需字段
-                if 'first_image_path' not in task_data or not task_data['first_image_path']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少首帧图片路径")
-                    continue
-
-                if 'last_image_path' not in task_data or not task_data['last_image_path']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少尾帧图片路径")
-                    continue
-
-                # 清理图片路径
-                original_first_path = task_data['first_image_path']
-                original_last_path = task_data['last_image_path']
-                first_image_path = clean_image_path(task_data['first_image_path'])
-                last_image_path = clean_image_path(task_data['last_image_path'])
-
-                # 调试日志
-                print(f"第 {i+1} 行路径处理:")
-                print(f"  原始首帧路径: {original_first_path}")
-                print(f"  清理后首帧路径: {first_image_path}")
-                print(f"  原始尾帧路径: {original_last_path}")
-                print(f"  清理后尾帧路径: {last_image_path}")
-                print(f"  首帧文件存在: {os.path.exists(first_image_path)}")
-                print(f"  尾帧文件存在: {os.path.exists(last_image_path)}")
-
-                prompt = task_data.get('prompt', '').strip()
-                model = task_data.get('model', 'Video 3.0')
-                second = int(task_data.get('second', 5))
-                resolution = task_data.get('resolution', '1080p')
-
-                # 验证图片路径是否存在
-                if not os.path.exists(first_image_path):
-                    failed_tasks.append(f"第 {i+1} 行: 首帧图片文件不存在 - {first_image_path}")
-                    continue
-
-                if not os.path.exists(last_image_path):
-                    failed_tasks.append(f"第 {i+1} 行: 尾帧图片文件不存在 - {last_image_path}")
-                    continue
-
-                # 创建任务
-                task = JimengFirstLastFrameImg2VideoTask.create(
-                    prompt=prompt,
-                    model=model,
-                    second=second,
-                    resolution=resolution,
-                    first_frame_image_path=first_image_path,
-                    last_frame_image_path=last_image_path,
-                    status=0
-                )
-                created_tasks.append(task.id)
-                print(f"从表格创建首尾帧图生视频任务: {task.id}, 首帧: {first_image_path}, 尾帧: {last_image_path}, 提示词: {prompt}, 模型: {model}, 时长: {second}s")
-
-            except Exception as e:
-                failed_tasks.append(f"第 {i+1} 行: {str(e)}")
-                print(f"处理第 {i+1} 行任务失败: {str(e)}")
-
-        # 返回结果
-        result_message = f"成功创建 {len(created_tasks)} 个任务"
-        if failed_tasks:
-            result_message += f"，{len(failed_tasks)} 个任务创建失败"
+        result = bulk_create_tasks(JimengFirstLastFrameImg2VideoTask, tasks_data, _build_table_task,
+                                   file_fields={'first_frame_image_path': '首帧图片', 'last_frame_image_path': '尾帧图片'})
+        print(f"从表格批量创建首尾帧图生视频任务: {result.message}")
+        if result.created_ids:
+            task_dispatcher.notify_task_enqueued(JimengFirstLastFrameImg2VideoTask)
 
         return jsonify({
             'success': True,
-            'message': result_message,
-            'data': {
-                'created_count': len(created_tasks),
-                'failed_count': len(failed_tasks),
-                'created_task_ids': created_tasks,
-                'failed_tasks': failed_tasks
-            }
+            'message': result.message,
+            'data': result.to_dict()
         })
 
     except Exception as e:
@@ -11,6 +11,15 @@ import pandas as pd
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengImg2ImgTask
+from backend.core.download_manager import download_manager
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.folder_import import folder_importer
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field, format_time
+from backend.config.settings import BLOB_GC_MIN_GRACE
+from backend.core.blob_store import blob_store
+
 import subprocess
 import platform
 import threading
@@ -26,59 +35,62 @@ def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+IMG2IMG_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'model': task_field('model'),
+    'ratio': task_field('ratio'),
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'account_id': task_field('account_id'),
+    'input_images': task_field(*[f'input_image{i}' for i in range(1, 7)], getter=lambda task: task.get_input_images()),
+    'output_images': task_field('image1', 'image2', 'image3', 'image4', getter=lambda task: task.get_images()),
+    'task_id': task_field('task_id'),
+    'retry_count': task_field('retry_count'),
+    'max_retry': task_field('max_retry'),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+}
+
 @jimeng_img2img_bp.route('/tasks', methods=['GET'])
 def get_img2img_tasks():
     """获取图生图任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 1000))
         status = request.args.get('status', None)
+        status = int(status) if status else None
         
-        print("获取图生图任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
-        
-        # 构建查询 - 过滤掉空任务
-        query = JimengImg2ImgTask.select()
-        if status is not None:
-            query = query.where(JimengImg2ImgTask.status == status)
+        print("获取图生图任务列表，状态: {}, 游标: {}, 字段: {}".format(status, request.args.get('cursor'), request.args.get('fields')))
         
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengImg2ImgTask.create_at.desc()).paginate(page, page_size)
-        
-        data = []
-        for task in tasks:
-            input_images = task.get_input_images()
-            output_images = task.get_images()
-            
-            data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'ratio': task.ratio,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'input_images': input_images,
-                'output_images': output_images,
-                'task_id': task.task_id,
-                'retry_count': task.retry_count,
-                'max_retry': task.max_retry,
-                'failure_reason': task.failure_reason,
-                'error_message': task.error_message,
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S')
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(JimengImg2ImgTask, IMG2IMG_TASK_FIELDS, request.args, status=status)
+            return jsonify({
+                'success': True,
+                'data': {'tasks': delta.items},
+                'sync': delta.to_dict()
             })
         
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(JimengImg2ImgTask, IMG2IMG_TASK_FIELDS, request.args, status=status)
+        
         return jsonify({
             'success': True,
+            'sync': {'watermark': result.watermark},
             'data': {
-                'tasks': data,
-                'total': total,
-                'page': page,
-                'page_size': page_size
+                'tasks': result.items,
+                'total': result.total,
+                'page': result.page,
+                'page_size': result.page_size,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print("获取任务列表失败: {}".format(str(e)))
         return jsonify({
@@ -91,11 +103,12 @@ def get_img2img_stats():
     """获取图生图任务统计"""
     try:
         # 统计各状态的任务数量
-        total = JimengImg2ImgTask.select().count()
-        queued = JimengImg2ImgTask.select().where(JimengImg2ImgTask.status == 0).count()
-        processing = JimengImg2ImgTask.select().where(JimengImg2ImgTask.status == 1).count()
-        completed = JimengImg2ImgTask.select().where(JimengImg2ImgTask.status == 2).count()
-        failed = JimengImg2ImgTask.select().where(JimengImg2ImgTask.status == 3).count()
+        summary = task_status_counter.get_summary(JimengImg2ImgTask)
+        total = summary['total']
+        queued = summary['pending']
+        processing = summary['processing']
+        completed = summary['completed']
+        failed = summary['failed']
         
         return jsonify({
             'success': True,
@@ -184,16 +197,12 @@ def create_img2img_task():
         
         # 保存上传的图片
         saved_images = []
-        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
-        os.makedirs(tmp_dir, exist_ok=True)
-        
         for file in files:
             if file.filename != '':
                 filename = secure_filename(file.filename)
                 file_ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-                file_path = os.path.join(tmp_dir, unique_filename)
-                file.save(file_path)
+                # 按内容存入上传文件存储，重复的任务共用同一份文件
+                file_path = blob_store.put_upload(file, file_ext)
                 saved_images.append(file_path)
         
         # 根据repeat_count创建多个任务
@@ -217,6 +226,9 @@ def create_img2img_task():
             created_task_ids.append(task.id)
             print("图生图任务创建成功，任务ID: {}".format(task.id))
         
+        if created_task_ids:
+            task_dispatcher.notify_task_enqueued(JimengImg2ImgTask)
+        
         return jsonify({
             'success': True,
             'data': {
@@ -249,7 +261,7 @@ def delete_img2img_task(task_id):
         for image_path in input_images:
             if image_path and os.path.exists(image_path):
                 try:
-                    os.remove(image_path)
+                    blob_store.remove_task_file(image_path)
                     deleted_input_count += 1
                     print(f"删除输入图片文件: {image_path}")
                 except Exception as e:
@@ -289,6 +301,7 @@ def retry_img2img_task(task_id):
         
         if task.can_retry():
             task.retry_task()
+            task_dispatcher.notify_task_enqueued(JimengImg2ImgTask, task.id)
             return jsonify({
                 'success': True,
                 'message': '任务已重新排队'
@@ -342,7 +355,7 @@ def batch_delete_img2img_tasks():
                 for image_path in input_images:
                     if image_path and os.path.exists(image_path):
                         try:
-                            os.remove(image_path)
+                            blob_store.remove_task_file(image_path)
                             deleted_input_count += 1
                             print(f"删除输入图片文件: {image_path}")
                         except Exception as e:
@@ -562,39 +575,33 @@ def batch_download_img2img_tasks():
                 
                 os.makedirs(batch_folder, exist_ok=True)
                 
-                # 使用并行下载文件
-                from utils.download_util import batch_download_files
-                
                 # 为每个file_info添加file_path
                 for file_info in file_infos:
                     file_info['file_path'] = os.path.join(batch_folder, file_info['filename'])
                 
-                # 使用并行批量下载
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=30,
-                    max_workers=5  # 并行下载数
-                )
-                
-                success_count = download_result['success_count']
-                print(f"批量下载完成，成功下载 {success_count} 个文件到: {batch_folder}")
-                
-                print(f"批量下载完成，成功下载 {success_count} 个文件到: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='img2img', max_retries=5, timeout=30,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
                 
             except Exception as e:
                 print(f"批量下载过程中出错: {e}")
                 import traceback
                 traceback.print_exc()
         
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         thread = threading.Thread(target=select_folder_and_download)
         thread.daemon = True
         thread.start()
         
         return jsonify({
             'success': True,
-            'message': '正在选择下载文件夹，请稍候...'
+            'message': '正在选择下载文件夹，请稍候...',
+            'data': {
+                'batch_id': batch_id  # 选择文件夹后以该批次ID提交下载
+            }
         })
         
     except Exception as e:
@@ -641,6 +648,9 @@ def batch_retry_img2img_tasks():
                 task.save()
                 success_count += 1
         
+        if success_count:
+            task_dispatcher.notify_task_enqueued(JimengImg2ImgTask)
+        
         return jsonify({
             'success': True,
             'data': {
@@ -658,7 +668,7 @@ def batch_retry_img2img_tasks():
 
 @jimeng_img2img_bp.route('/tasks/import-folder', methods=['POST'])
 def import_folder_img2img_tasks():
-    """从文件夹导入图片创建图生图任务"""
+    """从文件夹导入图片创建图生图任务，返回导入任务ID（进度见 /api/imports/<job_id>）"""
     try:
         # 获取请求数据
         data = request.get_json()
@@ -670,111 +680,26 @@ def import_folder_img2img_tasks():
 
         print(f"导入文件夹图生图任务，模型: {model}, 质量: {quality}, 比例: {aspect_ratio}, 使用提示词: {use_prompt}, 提示词: {prompt}")
 
-        def select_folder_and_import():
-            try:
-                # 调用原生文件夹选择对话框
-                folder_path = None
-                system = platform.system()
-
-                if system == "Darwin":  # macOS
-                    result = subprocess.run([
-                        'osascript', '-e',
-                        'tell application "Finder" to set folder_path to (choose folder with prompt "选择包含图片的文件夹") as string',
-                        '-e',
-                        'return POSIX path of folder_path'
-                    ], capture_output=True, text=True, timeout=60)
-
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-
-                elif system == "Windows":  # Windows
-                    result = subprocess.run([
-                        'powershell', '-Command',
-                        'Add-Type -AssemblyName System.Windows.Forms; $folder = New-Object System.Windows.Forms.FolderBrowserDialog; $folder.Description = "选择包含图片的文件夹"; $folder.ShowNewFolderButton = $true; if ($folder.ShowDialog() -eq "OK") { $folder.SelectedPath } else { "" }'
-                    ], capture_output=True, text=True, timeout=60)
-
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-
-                elif system == "Linux":  # Linux
-                    result = subprocess.run([
-                        'zenity', '--file-selection', '--directory',
-                        '--title=选择包含图片的文件夹'
-                    ], capture_output=True, text=True, timeout=60)
-
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-
-                if not folder_path:
-                    print("用户取消了文件夹选择")
-                    return
-
-                print(f"选择的文件夹: {folder_path}")
-
-                # 扫描文件夹中的图片文件
-                image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-                image_files = []
-
-                for filename in os.listdir(folder_path):
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext in image_extensions:
-                        image_files.append(os.path.join(folder_path, filename))
-
-                print(f"找到 {len(image_files)} 张图片")
-
-                # 创建任务
-                created_count = 0
-                for image_path in image_files:
-                    try:
-                        # 根据use_prompt参数决定是否使用提示词
-                        task_prompt = prompt if use_prompt else ''
-
-                        # 复制图片到后端tmp目录
-                        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
-                        os.makedirs(tmp_dir, exist_ok=True)
-
-                        # 生成唯一的文件名
-                        filename = os.path.basename(image_path)
-                        file_ext = os.path.splitext(filename)[1].lower()
-                        unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-                        dest_path = os.path.join(tmp_dir, unique_filename)
-
-                        # 复制文件
-                        import shutil
-                        shutil.copy2(image_path, dest_path)
-                        print(f"复制图片到后端: {image_path} -> {dest_path}")
-
-                        # 创建图生图任务
-                        task = JimengImg2ImgTask.create(
-                            prompt=task_prompt,  # 根据use_prompt参数决定提示词
-                            model=model,  # 使用传入的模型参数
-                            ratio=aspect_ratio if model != 'Nano Banana' else None,  # Nano Banana不设置比例
-                            quality=quality,  # 使用传入的质量参数
-                            status=0,  # 默认状态：0-排队中
-                            # 输出图片字段保持为空
-                            image1=None,
-                            image2=None,
-                            image3=None,
-                            image4=None
-                        )
-
-                        # 设置输入图片（使用复制后的路径）
-                        task.set_input_images([dest_path])
-                        created_count += 1
-                    except Exception as e:
-                        print(f"创建任务失败 {image_path}: {str(e)}")
-
-                print(f"成功创建 {created_count} 个图生图任务，模型: {model}, 质量: {quality}, 比例: {aspect_ratio}, 提示词: {task_prompt}")
-
-            except Exception as e:
-                print(f"文件夹导入失败: {str(e)}")
+        def build_row(image_path):
+            return {
+                'prompt': prompt if use_prompt else '',  # 根据use_prompt参数决定提示词
+                'model': model,
+                'ratio': aspect_ratio if model != 'Nano Banana' else None,  # Nano Banana不设置比例
+                'quality': quality,
+                'input_image1': image_path
+            }
 
-        # 在后台线程中执行文件夹选择和导入
-        import_thread = threading.Thread(target=select_folder_and_import)
-        import_thread.daemon = True
-        import_thread.start()
+        job = folder_importer.start(
+            'img2img', JimengImg2ImgTask, build_row,
+            folder_path=data.get('folder_path'),
+            on_created=lambda task_ids: task_dispatcher.notify_task_enqueued(JimengImg2ImgTask)
+        )
 
-        return jsonify({'success': True, 'message': '正在打开文件夹选择对话框，请选择包含图片的文件夹'})
+        return jsonify({
+            'success': True,
+            'message': '正在打开文件夹选择对话框，请选择包含图片的文件夹',
+            'data': {'job_id': job.id}
+        })
 
     except Exception as e:
         print(f"导入文件夹失败: {str(e)}")
@@ -784,54 +709,16 @@ def import_folder_img2img_tasks():
 def cleanup_orphaned_img2img_images():
     """清理孤立的图生图图片文件（没有关联任务的图片）"""
     try:
-        # 获取项目中所有存储的图片路径
-        all_tasks = JimengImg2ImgTask.select()
-        used_image_paths = set()
-
-        # 收集输入图片路径
-        for task in all_tasks:
-            input_images = task.get_input_images()
-            used_image_paths.update(input_images)
-
-        # 收集输出图片路径
-        for task in all_tasks:
-            output_images = task.get_images()
-            used_image_paths.update(output_images)
-
-        # 获取项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-
-        # 检查上传目录
-        tmp_dir = os.path.join(project_root, 'tmp')
-        deleted_files_count = 0
-        error_count = 0
+        # 上传文件的引用计数由任务表上的触发器维护，这里只回收引用已归零的文件（不再遍历目录逐个比对）；
+        # 各类任务共用上传文件存储，回收范围包括所有任务类型释放的文件
+        result = blob_store.collect(grace=BLOB_GC_MIN_GRACE)
 
-        if os.path.exists(tmp_dir):
-            for filename in os.listdir(tmp_dir):
-                file_path = os.path.join(tmp_dir, filename)
-                if os.path.isfile(file_path):
-                    # 检查文件是否为图片文件
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-                        # 检查文件是否被任何任务使用
-                        if file_path not in used_image_paths:
-                            try:
-                                os.remove(file_path)
-                                deleted_files_count += 1
-                                print(f"删除孤立图片文件: {file_path}")
-                            except Exception as e:
-                                error_count += 1
-                                print(f"删除孤立图片文件失败: {file_path}, 错误: {str(e)}")
-
-        print(f"清理图生图孤立图片完成: 删除 {deleted_files_count} 个文件，失败 {error_count} 个")
+        print(f"清理图生图孤立图片完成: 删除 {result['deleted_count']} 个文件，失败 {result['error_count']} 个")
 
         return jsonify({
             'success': True,
-            'message': f'清理完成，删除了 {deleted_files_count} 个孤立图片文件',
-            'data': {
-                'deleted_count': deleted_files_count,
-                'error_count': error_count,
-                'total_used_files': len(used_image_paths)
-            }
+            'message': f"清理完成，删除了 {result['deleted_count']} 个孤立图片文件",
+            'data': result
         })
 
     except Exception as e:
@@ -876,7 +763,7 @@ def delete_img2img_tasks_before_today():
                 input_images = task.get_input_images()
                 for image_path in input_images:
                     if image_path and os.path.exists(image_path):
-                        os.remove(image_path)
+                        blob_store.remove_task_file(image_path)
                         deleted_input_count += 1
                         print(f"删除输入图片: {image_path}")
 
@@ -11,6 +11,15 @@ import pandas as pd
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengImg2VideoTask
+from backend.core.download_manager import download_manager
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.task_ingest import bulk_create_tasks
+from backend.core.folder_import import folder_importer
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field, format_time
+from backend.core.blob_store import blob_store
+from backend.config.settings import BLOB_GC_MIN_GRACE
 import subprocess
 import platform
 import threading
@@ -50,8 +59,12 @@ def is_cache_directory_file(file_path):
         return False
 
 def safe_remove_image_file(image_path):
-    """安全删除图片文件，只删除缓存目录中的文件"""
-    if not image_path or not os.path.exists(image_path):
+    """安全删除图片文件，只删除缓存目录中的文件；上传文件存储中的文件在引用归零后由后台回收"""
+    if not image_path:
+        return False
+    if blob_store.owns(image_path):
+        return True
+    if not os.path.exists(image_path):
         return False
 
     try:
@@ -69,55 +82,61 @@ def safe_remove_image_file(image_path):
 # 创建蓝图
 jimeng_img2video_bp = Blueprint('jimeng_img2video', __name__, url_prefix='/api/jimeng/img2video')
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+IMG2VIDEO_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'model': task_field('model'),
+    'second': task_field('second'),
+    'resolution': task_field('resolution'),
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'account_id': task_field('account_id'),
+    'image_path': task_field('image_path'),
+    'video_url': task_field('video_url'),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+}
+
 @jimeng_img2video_bp.route('/tasks', methods=['GET'])
 def get_img2video_tasks():
     """获取图生视频任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 1000))
         status = request.args.get('status', None)
+        status = int(status) if status else None
         
-        print("获取图生视频任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
-        
-        # 构建查询 - 过滤掉空任务
-        query = JimengImg2VideoTask.select()
-        if status is not None:
-            query = query.where(JimengImg2VideoTask.status == status)
+        print("获取图生视频任务列表，状态: {}, 游标: {}, 字段: {}".format(status, request.args.get('cursor'), request.args.get('fields')))
         
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengImg2VideoTask.create_at.desc()).paginate(page, page_size)
-        
-        data = []
-        for task in tasks:
-            data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'second': task.second,
-                'resolution': task.resolution,  # 新增分辨率字段
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'image_path': task.image_path,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S') if task.create_at else None,
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S') if task.update_at else None
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(JimengImg2VideoTask, IMG2VIDEO_TASK_FIELDS, request.args, status=status)
+            return jsonify({
+                'success': True,
+                'data': delta.items,
+                'sync': delta.to_dict()
             })
         
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(JimengImg2VideoTask, IMG2VIDEO_TASK_FIELDS, request.args, status=status)
+        
         return jsonify({
             'success': True,
-            'data': data,
+            'sync': {'watermark': result.watermark},
+            'data': result.items,
             'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
+                'page': result.page,
+                'page_size': result.page_size,
+                'total': result.total,
+                'pages': result.total_pages,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"获取图生视频任务列表失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -136,9 +155,11 @@ def create_img2video_task():
                 second=data.get('second', 5),
                 resolution=data.get('resolution', '1080p'),  # 添加分辨率参数
                 image_path=data['image_path'],
+                priority=int(data.get('priority', 0)),
                 status=0
             )
             
+            task_dispatcher.notify_task_enqueued(JimengImg2VideoTask, task.id)
             print(f"创建图生视频任务: {task.id}")
             return jsonify({'success': True, 'data': {'task_id': task.id}})
         
@@ -154,10 +175,13 @@ def create_img2video_task():
                     second=task_data.get('second', 5),
                     resolution=task_data.get('resolution', '1080p'),  # 添加分辨率参数
                     image_path=task_data['image_path'],
+                    priority=int(task_data.get('priority', 0)),
                     status=0
                 )
                 created_tasks.append(task.id)
             
+            if created_tasks:
+                task_dispatcher.notify_task_enqueued(JimengImg2VideoTask)
             print(f"批量创建图生视频任务: {len(created_tasks)}个")
             return jsonify({'success': True, 'data': {'task_ids': created_tasks}})
         
@@ -206,6 +230,7 @@ def retry_img2video_task(task_id):
     try:
         task = JimengImg2VideoTask.get_by_id(task_id)
         task.update_status(0)  # 重置为排队状态
+        task_dispatcher.notify_task_enqueued(JimengImg2VideoTask, task.id)
         
         print(f"重试图生视频任务: {task_id}")
         return jsonify({'success': True, 'message': '任务已重新加入队列'})
@@ -243,6 +268,8 @@ def batch_retry_img2video_tasks():
                 task.update_status(0)  # 重置为排队状态
                 retry_count += 1
         
+        if retry_count:
+            task_dispatcher.notify_task_enqueued(JimengImg2VideoTask)
         print(f"批量重试图生视频任务: {retry_count}个")
         return jsonify({
             'success': True,
@@ -302,7 +329,7 @@ def batch_delete_img2video_tasks():
 
 @jimeng_img2video_bp.route('/tasks/import-folder', methods=['POST'])
 def import_folder_tasks():
-    """从文件夹导入图片任务"""
+    """从文件夹导入图片任务，返回导入任务ID（进度见 /api/imports/<job_id>）"""
     try:
         # 获取请求数据
         data = request.get_json()
@@ -314,88 +341,26 @@ def import_folder_tasks():
         
         print(f"导入文件夹任务，模型: {model}, 时长: {second}秒, 使用提示词: {use_prompt}, 提示词: {prompt}")
         
-        def select_folder_and_import():
-            try:
-                # 调用原生文件夹选择对话框
-                folder_path = None
-                system = platform.system()
-                
-                if system == "Darwin":  # macOS
-                    result = subprocess.run([
-                        'osascript', '-e',
-                        'tell application "Finder" to set folder_path to (choose folder with prompt "选择包含图片的文件夹") as string',
-                        '-e',
-                        'return POSIX path of folder_path'
-                    ], capture_output=True, text=True, timeout=60)
-                    
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-                        
-                elif system == "Windows":  # Windows
-                    result = subprocess.run([
-                        'powershell', '-Command',
-                        'Add-Type -AssemblyName System.Windows.Forms; $folder = New-Object System.Windows.Forms.FolderBrowserDialog; $folder.Description = "选择包含图片的文件夹"; $folder.ShowNewFolderButton = $true; if ($folder.ShowDialog() -eq "OK") { $folder.SelectedPath } else { "" }'
-                    ], capture_output=True, text=True, timeout=60)
-                    
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-                        
-                elif system == "Linux":  # Linux
-                    result = subprocess.run([
-                        'zenity', '--file-selection', '--directory',
-                        '--title=选择包含图片的文件夹'
-                    ], capture_output=True, text=True, timeout=60)
-                    
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-                
-                if not folder_path:
-                    print("用户取消了文件夹选择")
-                    return
-                
-                print(f"选择的文件夹: {folder_path}")
-                
-                # 扫描文件夹中的图片文件
-                image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-                image_files = []
-                
-                for filename in os.listdir(folder_path):
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext in image_extensions:
-                        image_files.append(os.path.join(folder_path, filename))
-                
-                print(f"找到 {len(image_files)} 张图片")
-                
-                # 创建任务
-                created_count = 0
-                for image_path in image_files:
-                    try:
-                        # 根据usePrompt参数决定是否使用提示词
-                        task_prompt = prompt if use_prompt else ''
-                        
-                        task = JimengImg2VideoTask.create(
-                            prompt=task_prompt,  # 根据usePrompt参数决定提示词
-                            model=model,  # 使用传入的模型参数
-                            second=second,  # 使用传入的时长参数
-                            resolution=resolution,  # 使用传入的分辨率参数
-                            image_path=image_path,
-                            status=0
-                        )
-                        created_count += 1
-                    except Exception as e:
-                        print(f"创建任务失败 {image_path}: {str(e)}")
-                
-                print(f"成功创建 {created_count} 个图生视频任务，模型: {model}, 时长: {second}秒, 提示词: {task_prompt}")
-                
-            except Exception as e:
-                print(f"文件夹导入失败: {str(e)}")
+        def build_row(image_path):
+            return {
+                'prompt': prompt if use_prompt else '',  # 根据usePrompt参数决定提示词
+                'model': model,
+                'second': second,
+                'resolution': resolution,
+                'image_path': image_path
+            }
         
-        # 在后台线程中执行文件夹选择和导入
-        import_thread = threading.Thread(target=select_folder_and_import)
-        import_thread.daemon = True
-        import_thread.start()
+        job = folder_importer.start(
+            'img2video', JimengImg2VideoTask, build_row,
+            folder_path=data.get('folder_path'),
+            on_created=lambda task_ids: task_dispatcher.notify_task_enqueued(JimengImg2VideoTask)
+        )
         
-        return jsonify({'success': True, 'message': '正在打开文件夹选择对话框，请选择包含图片的文件夹'})
+        return jsonify({
+            'success': True,
+            'message': '正在打开文件夹选择对话框，请选择包含图片的文件夹',
+            'data': {'job_id': job.id}
+        })
         
     except Exception as e:
         print(f"导入文件夹失败: {str(e)}")
@@ -429,12 +394,7 @@ def batch_add_tasks():
         def allowed_file(filename):
             return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-        # 创建临时目录保存上传的图片
-        import uuid
         from werkzeug.utils import secure_filename
-        
-        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp', 'batch_upload')
-        os.makedirs(tmp_dir, exist_ok=True)
 
         created_tasks = []
         failed_files = []
@@ -448,12 +408,10 @@ def batch_add_tasks():
                     failed_files.append(f"{file.filename}: 不支持的文件格式")
                     continue
 
-                # 保存上传的图片
+                # 保存上传的图片（按内容存入上传文件存储）
                 filename = secure_filename(file.filename)
                 file_ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-                file_path = os.path.join(tmp_dir, unique_filename)
-                file.save(file_path)
+                file_path = blob_store.put_upload(file, file_ext)
 
                 # 获取对应的提示词
                 prompt = request.form.get(f'prompts[{i}]', '')
@@ -477,6 +435,9 @@ def batch_add_tasks():
                 failed_files.append(f"{file.filename}: {str(e)}")
                 print(f"处理文件 {file.filename} 失败: {str(e)}")
 
+        if created_tasks:
+            task_dispatcher.notify_task_enqueued(JimengImg2VideoTask)
+
         # 构建响应消息
         message_parts = []
         if created_tasks:
@@ -616,12 +577,13 @@ def download_single_video():
                 file_path = os.path.join(download_dir, filename)
 
                 # 使用下载工具下载视频
-                from utils.download_util import download_single_file
+                from backend.utils.download_util import download_single_file
                 download_result = download_single_file(
                     url=video_url,
                     file_path=file_path,
                     max_retries=3,
-                    timeout=60
+                    timeout=60,
+                    source='img2video'
                 )
 
                 if download_result['success']:
@@ -817,25 +779,17 @@ def batch_download_videos():
                         'filename': video_info['filename']
                     })
                 
-                # 使用带重试机制的批量下载（支持并行）
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=60,
-                    max_workers=5  # 并行下载数
-                )
-                
-                success_count = download_result['success_count']
-                error_count = download_result['failed_count']
-                
-                print(f"批量下载完成: 成功 {success_count} 个，失败 {error_count} 个")
-                print(f"文件保存位置: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='img2video', max_retries=5, timeout=60,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
                 
             except Exception as e:
                 print(f"批量下载过程出错: {str(e)}")
         
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -844,6 +798,7 @@ def batch_download_videos():
             'success': True,
             'message': f'开始下载 {len(all_videos)} 个视频，请选择下载文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'total_videos': len(all_videos),
                 'tasks_count': len(tasks)
             }
@@ -860,13 +815,12 @@ def batch_download_videos():
 def get_img2video_stats():
     """获取图生视频统计信息"""
     try:
-        # 统计时过滤掉空任务
-        base_query = JimengImg2VideoTask.select()
-        total_tasks = base_query.count()
-        pending_tasks = base_query.where(JimengImg2VideoTask.status == 0).count()
-        processing_tasks = base_query.where(JimengImg2VideoTask.status == 1).count()
-        completed_tasks = base_query.where(JimengImg2VideoTask.status == 2).count()
-        failed_tasks = base_query.where(JimengImg2VideoTask.status == 3).count()
+        summary = task_status_counter.get_summary(JimengImg2VideoTask)
+        total_tasks = summary['total']
+        pending_tasks = summary['pending']
+        processing_tasks = summary['processing']
+        completed_tasks = summary['completed']
+        failed_tasks = summary['failed']
         
         return jsonify({
             'success': True,
@@ -940,6 +894,18 @@ def delete_tasks_before_today():
             'message': f'删除今日前任务失败: {str(e)}'
         }), 500 
 
+def _build_table_task(task_data):
+    """表格中的一行 -> 图生视频任务字段"""
+    if not task_data.get('image_path'):
+        raise ValueError("缺少图片路径")
+    return {
+        'prompt': task_data.get('prompt', '').strip(),
+        'model': task_data.get('model', 'Video 3.0'),
+        'second': int(task_data.get('second', 5)),
+        'resolution': task_data.get('resolution', '1080p'),  # 默认分辨率为1080p
+        'image_path': task_data['image_path'].strip()
+    }
+
 @jimeng_img2video_bp.route('/tasks/batch-create-from-table', methods=['POST'])
 def batch_create_tasks_from_table():
     """从表格批量创建图生视频任务"""
@@ -958,57 +924,16 @@ def batch_create_tasks_from_table():
                 'message': '任务数据格式错误'
             }), 400
 
-        created_tasks = []
-        failed_tasks = []
-
-        for i, task_data in enumerate(tasks_data):
-            try:
-                # 验证必需字段
-                if 'image_path' not in task_data or not task_data['image_path']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少图片路径")
-                    continue
-
-                image_path = task_data['image_path'].strip()
-                prompt = task_data.get('prompt', '').strip()
-                model = task_data.get('model', 'Video 3.0')
-                second = int(task_data.get('second', 5))
-                resolution = task_data.get('resolution', '1080p')  # 默认分辨率为1080p
-
-                # 验证图片路径是否存在
-                if not os.path.exists(image_path):
-                    failed_tasks.append(f"第 {i+1} 行: 图片文件不存在 - {image_path}")
-                    continue
-
-                # 创建任务
-                task = JimengImg2VideoTask.create(
-                    prompt=prompt,
-                    model=model,
-                    second=second,
-                    resolution=resolution,  # 添加分辨率参数
-                    image_path=image_path,
-                    status=0
-                )
-                created_tasks.append(task.id)
-                print(f"从表格创建图生视频任务: {task.id}, 图片: {image_path}, 提示词: {prompt}, 模型: {model}, 时长: {second}s")
-
-            except Exception as e:
-                failed_tasks.append(f"第 {i+1} 行: {str(e)}")
-                print(f"处理第 {i+1} 行任务失败: {str(e)}")
-
-        # 返回结果
-        result_message = f"成功创建 {len(created_tasks)} 个任务"
-        if failed_tasks:
-            result_message += f"，{len(failed_tasks)} 个任务创建失败"
+        result = bulk_create_tasks(JimengImg2VideoTask, tasks_data, _build_table_task,
+                                   file_fields={'image_path': '图片'})
+        print(f"从表格批量创建图生视频任务: {result.message}")
+        if result.created_ids:
+            task_dispatcher.notify_task_enqueued(JimengImg2VideoTask)
 
         return jsonify({
             'success': True,
-            'message': result_message,
-            'data': {
-                'created_count': len(created_tasks),
-                'failed_count': len(failed_tasks),
-                'created_task_ids': created_tasks,
-                'failed_tasks': failed_tasks
-            }
+            'message': result.message,
+            'data': result.to_dict()
         })
 
     except Exception as e:
@@ -1022,67 +947,16 @@ def batch_create_tasks_from_table():
 def cleanup_orphaned_img2video_images():
     """清理孤立的图生视频图片文件（没有关联任务的图片）"""
     try:
-        # 获取项目中所有存储的图片路径
-        all_tasks = JimengImg2VideoTask.select()
-        used_image_paths = set()
-
-        for task in all_tasks:
-            if task.image_path:
-                used_image_paths.add(task.image_path)
+        # 上传文件的引用计数由任务表上的触发器维护，这里只回收引用已归零的文件（不再遍历目录逐个比对）；
+        # 各类任务共用上传文件存储，回收范围包括所有任务类型释放的文件
+        result = blob_store.collect(grace=BLOB_GC_MIN_GRACE)
 
-        # 获取项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-
-        # 检查上传目录
-        tmp_dir = os.path.join(project_root, 'tmp')
-        batch_upload_dir = os.path.join(tmp_dir, 'batch_upload')
-        deleted_files_count = 0
-        error_count = 0
-
-        # 检查tmp目录
-        if os.path.exists(tmp_dir):
-            for filename in os.listdir(tmp_dir):
-                file_path = os.path.join(tmp_dir, filename)
-                if os.path.isfile(file_path):
-                    # 检查文件是否为图片文件
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-                        # 检查文件是否被任何任务使用
-                        if file_path not in used_image_paths:
-                            try:
-                                os.remove(file_path)
-                                deleted_files_count += 1
-                                print(f"删除孤立图片文件: {file_path}")
-                            except Exception as e:
-                                error_count += 1
-                                print(f"删除孤立图片文件失败: {file_path}, 错误: {str(e)}")
-
-        # 检查batch_upload目录
-        if os.path.exists(batch_upload_dir):
-            for filename in os.listdir(batch_upload_dir):
-                file_path = os.path.join(batch_upload_dir, filename)
-                if os.path.isfile(file_path):
-                    # 检查文件是否为图片文件
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-                        # 检查文件是否被任何任务使用
-                        if file_path not in used_image_paths:
-                            try:
-                                os.remove(file_path)
-                                deleted_files_count += 1
-                                print(f"删除孤立图片文件: {file_path}")
-                            except Exception as e:
-                                error_count += 1
-                                print(f"删除孤立图片文件失败: {file_path}, 错误: {str(e)}")
-
-        print(f"清理图生视频孤立图片完成: 删除 {deleted_files_count} 个文件，失败 {error_count} 个")
+        print(f"清理图生视频孤立图片完成: 删除 {result['deleted_count']} 个文件，失败 {result['error_count']} 个")
 
         return jsonify({
             'success': True,
-            'message': f'清理完成，删除了 {deleted_files_count} 个孤立图片文件',
-            'data': {
-                'deleted_count': deleted_files_count,
-                'error_count': error_count,
-                'total_used_files': len(used_image_paths)
-            }
+            'message': f"清理完成，删除了 {result['deleted_count']} 个孤立图片文件",
+            'data': result
         })
 
     except Exception as e:
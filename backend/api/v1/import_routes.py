@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+文件夹导入API路由 - 按 job_id 查询导入进度
+"""
+from flask import Blueprint, jsonify
+from backend.core.folder_import import folder_importer
+
+# 创建蓝图
+imports_bp = Blueprint('imports', __name__, url_prefix='/api/imports')
+
+@imports_bp.route('', methods=['GET'])
+def get_import_jobs():
+    """获取最近的文件夹导入任务"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': [job.to_dict() for job in folder_importer.list_jobs()]
+        })
+
+    except Exception as e:
+        print("获取导入任务列表失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取导入任务列表失败: {}'.format(str(e))
+        }), 500
+
+@imports_bp.route('/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """获取文件夹导入进度"""
+    try:
+        job = folder_importer.get(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'message': '导入任务不存在'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'data': job.to_dict()
+        })
+
+    except Exception as e:
+        print("获取导入任务失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取导入任务失败: {}'.format(str(e))
+        }), 500
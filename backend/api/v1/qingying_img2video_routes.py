@@ -15,7 +15,13 @@ from werkzeug.utils import secure_filename
 import uuid
 
 from backend.models.models import QingyingImage2VideoTask, QingyingAccount
+from backend.core.download_manager import download_manager
 from backend.core.global_task_manager import global_task_manager
+from backend.core.folder_import import folder_importer
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field, format_time
+from backend.core.blob_store import blob_store
 
 # 创建蓝图
 qingying_img2video_bp = Blueprint('qingying_img2video', __name__, url_prefix='/api/v1/qingying/img2video')
@@ -25,65 +31,72 @@ def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+# account_nickname 先取账号ID，查询后统一替换为账号昵称
+QINGYING_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'generation_mode': task_field('generation_mode'),
+    'frame_rate': task_field('frame_rate'),
+    'resolution': task_field('resolution'),
+    'duration': task_field('duration'),
+    'ai_audio': task_field('ai_audio'),
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'image_path': task_field('image_path'),
+    'video_url': task_field('video_url'),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+    'account_nickname': task_field('account_id'),
+    'account_id': task_field('account_id'),
+}
+
 @qingying_img2video_bp.route('/tasks', methods=['GET'])
 def get_tasks():
     """获取图生视频任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 1000))
-        
-        # 计算偏移量
-        offset = (page - 1) * page_size
-        
-        # 查询任务列表（按创建时间倒序）
-        tasks_query = QingyingImage2VideoTask.select().order_by(QingyingImage2VideoTask.create_at.desc())
-        total_count = tasks_query.count()
-        
-        tasks = list(tasks_query.offset(offset).limit(page_size))
-        
-        # 构建返回数据
-        task_list = []
-        for task in tasks:
-            # 获取关联的账号信息
-            account = None
-            if task.account_id:
-                try:
-                    account = QingyingAccount.get_by_id(task.account_id)
-                except QingyingAccount.DoesNotExist:
-                    account = None
-            
-            task_data = {
-                'id': task.id,
-                'prompt': task.prompt,
-                'generation_mode': task.generation_mode,
-                'frame_rate': task.frame_rate,
-                'resolution': task.resolution,
-                'duration': task.duration,
-                'ai_audio': task.ai_audio,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'image_path': task.image_path,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'account_nickname': account.nickname if account else None,
-                'account_id': task.account_id
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(QingyingImage2VideoTask, QINGYING_TASK_FIELDS, request.args)
+            return jsonify({
+                'success': True,
+                'data': delta.items,
+                'sync': delta.to_dict()
+            })
+        
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(QingyingImage2VideoTask, QINGYING_TASK_FIELDS, request.args)
+        
+        # 获取关联的账号信息（本页涉及的账号一次查询）
+        account_ids = {item['account_nickname'] for item in result.items if item.get('account_nickname')}
+        accounts = {}
+        if account_ids:
+            accounts = {
+                account.id: account.nickname
+                for account in QingyingAccount.select(QingyingAccount.id, QingyingAccount.nickname).where(QingyingAccount.id.in_(account_ids))
             }
-            task_list.append(task_data)
+        for item in result.items:
+            if 'account_nickname' in item:
+                item['account_nickname'] = accounts.get(item['account_nickname'])
         
         return jsonify({
             'success': True,
-            'data': task_list,
+            'sync': {'watermark': result.watermark},
+            'data': result.items,
             'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total_count,
-                'pages': (total_count + page_size - 1) // page_size
+                'page': result.page,
+                'page_size': result.page_size,
+                'total': result.total,
+                'pages': result.total_pages,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"获取清影图生视频任务列表失败: {str(e)}")
         return jsonify({
@@ -96,11 +109,12 @@ def get_stats():
     """获取任务统计信息"""
     try:
         # 统计所有任务（与即梦保持一致）
-        total_tasks = QingyingImage2VideoTask.select().count()
-        pending_tasks = QingyingImage2VideoTask.select().where(QingyingImage2VideoTask.status == 0).count()
-        processing_tasks = QingyingImage2VideoTask.select().where(QingyingImage2VideoTask.status == 1).count()
-        completed_tasks = QingyingImage2VideoTask.select().where(QingyingImage2VideoTask.status == 2).count()
-        failed_tasks = QingyingImage2VideoTask.select().where(QingyingImage2VideoTask.status == 3).count()
+        summary = task_status_counter.get_summary(QingyingImage2VideoTask)
+        total_tasks = summary['total']
+        pending_tasks = summary['pending']
+        processing_tasks = summary['processing']
+        completed_tasks = summary['completed']
+        failed_tasks = summary['failed']
         
         # 获取今日任务统计
         today = datetime.now().date()
@@ -166,17 +180,10 @@ def create_task():
                 'message': '请输入提示词'
             }), 400
         
-        # 保存上传的图片
+        # 保存上传的图片（按内容存入上传文件存储）
         filename = secure_filename(file.filename)
         file_ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-        
-        # 确保tmp目录存在
-        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
-        os.makedirs(tmp_dir, exist_ok=True)
-        
-        file_path = os.path.join(tmp_dir, unique_filename)
-        file.save(file_path)
+        file_path = blob_store.put_upload(file, file_ext)
         
         # 创建任务记录
         task = QingyingImage2VideoTask.create(
@@ -222,7 +229,7 @@ def delete_task(task_id):
         # 删除关联的图片文件
         if task.image_path and os.path.exists(task.image_path):
             try:
-                os.remove(task.image_path)
+                blob_store.remove_task_file(task.image_path)
             except Exception as e:
                 current_app.logger.warning(f"删除图片文件失败: {str(e)}")
         
@@ -262,7 +269,7 @@ def delete_tasks_before_today():
             # 删除关联的图片文件
             if task.image_path and os.path.exists(task.image_path):
                 try:
-                    os.remove(task.image_path)
+                    blob_store.remove_task_file(task.image_path)
                 except Exception as e:
                     current_app.logger.warning(f"删除图片文件失败: {str(e)}")
             
@@ -364,7 +371,7 @@ def batch_retry_tasks():
 
 @qingying_img2video_bp.route('/tasks/import-folder', methods=['POST'])
 def import_folder_tasks():
-    """从文件夹导入图片任务"""
+    """从文件夹导入图片任务，返回导入任务ID（进度见 /api/imports/<job_id>）"""
     try:
         # 获取请求数据
         data = request.get_json()
@@ -376,113 +383,38 @@ def import_folder_tasks():
         
         print(f"清影导入文件夹任务，参数: {generation_mode}, {frame_rate}, {resolution}, {duration}, {ai_audio}")
         
-        def select_folder_and_import():
-            try:
-                # 调用原生文件夹选择对话框
-                folder_path = None
-                system = platform.system()
-                
-                if system == "Darwin":  # macOS
-                    result = subprocess.run([
-                        'osascript', '-e',
-                        'tell application "Finder" to set folder_path to (choose folder with prompt "选择包含图片的文件夹") as string',
-                        '-e',
-                        'return POSIX path of folder_path'
-                    ], capture_output=True, text=True, timeout=60)
-                    
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-                        
-                elif system == "Windows":  # Windows
-                    result = subprocess.run([
-                        'powershell', '-Command',
-                        'Add-Type -AssemblyName System.Windows.Forms; $folder = New-Object System.Windows.Forms.FolderBrowserDialog; $folder.Description = "选择包含图片的文件夹"; $folder.ShowNewFolderButton = $true; if ($folder.ShowDialog() -eq "OK") { $folder.SelectedPath } else { "" }'
-                    ], capture_output=True, text=True, timeout=60)
-                    
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-                        
-                elif system == "Linux":  # Linux
-                    result = subprocess.run([
-                        'zenity', '--file-selection', '--directory',
-                        '--title=选择包含图片的文件夹'
-                    ], capture_output=True, text=True, timeout=60)
-                    
-                    if result.returncode == 0 and result.stdout.strip():
-                        folder_path = result.stdout.strip()
-                
-                if not folder_path:
-                    print("用户取消了文件夹选择")
-                    return
-                
-                print(f"选择的文件夹: {folder_path}")
-                
-                if not os.path.exists(folder_path):
-                    print(f"文件夹不存在: {folder_path}")
-                    return
-                
-                # 支持的图片格式
-                supported_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
-                
-                created_count = 0
-                import shutil
-                for filename in os.listdir(folder_path):
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext in supported_extensions:
-                        source_path = os.path.join(folder_path, filename)
-                        
-                        # 复制文件到tmp目录
-                        file_ext = filename.rsplit('.', 1)[1].lower()
-                        unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-                        
-                        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
-                        os.makedirs(tmp_dir, exist_ok=True)
-                        
-                        dest_path = os.path.join(tmp_dir, unique_filename)
-                        
-                        shutil.copy2(source_path, dest_path)
-                        
-                        # 创建任务
-                        task = QingyingImage2VideoTask.create(
-                            prompt="",
-                            generation_mode=generation_mode,
-                            frame_rate=frame_rate,
-                            resolution=resolution,
-                            duration=duration,
-                            ai_audio=ai_audio,
-                            image_path=dest_path,
-                            status=0,
-                            create_at=datetime.now(),
-                            update_at=datetime.now()
-                        )
-                        
-                        # 提交任务到全局任务管理器
-                        if hasattr(global_task_manager, 'qingying_img2video_manager'):
-                            global_task_manager.qingying_img2video_manager.submit_task(task.id)
-                        
-                        created_count += 1
-                
-                print(f"成功导入 {created_count} 个图片任务")
-                
-            except Exception as e:
-                print(f"处理文件夹失败: {str(e)}")
+        def build_row(image_path):
+            return {
+                'prompt': "",
+                'generation_mode': generation_mode,
+                'frame_rate': frame_rate,
+                'resolution': resolution,
+                'duration': duration,
+                'ai_audio': ai_audio,
+                'image_path': image_path
+            }
         
-        # 在后台线程中执行文件选择和导入
-        thread = threading.Thread(target=select_folder_and_import)
-        thread.daemon = True
-        thread.start()
+        def submit_tasks(task_ids):
+            # 提交任务到全局任务管理器
+            if hasattr(global_task_manager, 'qingying_img2video_manager'):
+                for task_id in task_ids:
+                    global_task_manager.qingying_img2video_manager.submit_task(task_id)
+        
+        job = folder_importer.start(
+            'qingying_img2video', QingyingImage2VideoTask, build_row,
+            folder_path=data.get('folder_path'),
+            on_created=submit_tasks
+        )
         
         return jsonify({
             'success': True,
-            'message': '开始选择文件夹并导入，请在弹出的对话框中选择包含图片的文件夹'
+            'message': '开始选择文件夹并导入，请在弹出的对话框中选择包含图片的文件夹',
+            'data': {'job_id': job.id}
         })
         
     except Exception as e:
-        current_app.logger.error(f"导入文件夹任务失败: {str(e)}")
-        return jsonify({
-            'success': False,
-            'message': f'导入失败: {str(e)}'
-        }), 500
+        print(f"导入文件夹失败: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
 
 @qingying_img2video_bp.route('/tasks/batch-add', methods=['POST'])
 def batch_add_tasks():
@@ -509,10 +441,6 @@ def batch_add_tasks():
         duration = request.form.get('duration', '5s')
         ai_audio = request.form.get('ai_audio', 'false').lower() == 'true'
 
-        # 创建临时目录保存上传的图片
-        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp', 'qingying_batch_upload')
-        os.makedirs(tmp_dir, exist_ok=True)
-
         created_tasks = []
         failed_files = []
 
@@ -525,12 +453,10 @@ def batch_add_tasks():
                     failed_files.append(f"{file.filename}: 不支持的文件格式")
                     continue
 
-                # 保存上传的图片
+                # 保存上传的图片（按内容存入上传文件存储）
                 filename = secure_filename(file.filename)
                 file_ext = filename.rsplit('.', 1)[1].lower()
-                unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-                file_path = os.path.join(tmp_dir, unique_filename)
-                file.save(file_path)
+                file_path = blob_store.put_upload(file, file_ext)
 
                 # 获取对应的提示词
                 prompt = request.form.get(f'prompts[{i}]', '')
@@ -604,7 +530,7 @@ def batch_delete_tasks():
                     # 删除图片文件
                     if task.image_path and os.path.exists(task.image_path):
                         try:
-                            os.remove(task.image_path)
+                            blob_store.remove_task_file(task.image_path)
                         except Exception as e:
                             print(f"删除图片文件失败: {e}")
                     
@@ -750,25 +676,17 @@ def batch_download_videos():
                         'filename': video_info['filename']
                     })
                 
-                # 使用带重试机制的批量下载（支持并行）
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=60,
-                    max_workers=5  # 并行下载数
-                )
-                
-                success_count = download_result['success_count']
-                error_count = download_result['failed_count']
-                
-                print(f"批量下载完成: 成功 {success_count} 个，失败 {error_count} 个")
-                print(f"文件保存位置: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='qingying_img2video', max_retries=5, timeout=60,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
                 
             except Exception as e:
                 print(f"批量下载过程出错: {str(e)}")
         
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -777,6 +695,7 @@ def batch_download_videos():
             'success': True,
             'message': f'开始下载 {len(all_videos)} 个视频，请选择下载文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'total_videos': len(all_videos),
                 'tasks_count': len(tasks)
             }
@@ -148,6 +148,47 @@ def resume_task_manager():
             'message': '恢复任务管理器失败: {}'.format(str(e))
         }), 500
 
+@task_manager_bp.route('/tasks/<platform>/<int:task_id>/priority', methods=['PUT'])
+def set_task_priority(platform, task_id):
+    """设置任务调度优先级（数值越大越优先，对尚未进入就绪队列的排队任务生效）"""
+    try:
+        model = global_task_manager.get_task_model(platform)
+        if model is None:
+            return jsonify({
+                'success': False,
+                'message': '未知平台: {}'.format(platform)
+            }), 404
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            priority = int(data.get('priority', 0))
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'message': 'priority 必须为整数'
+            }), 400
+        
+        updated = model.update(priority=priority).where(model.id == task_id).execute()
+        if not updated:
+            return jsonify({
+                'success': False,
+                'message': '任务不存在'
+            }), 404
+        
+        print("设置任务优先级: {} {} -> {}".format(platform, task_id, priority))
+        return jsonify({
+            'success': True,
+            'data': {'task_id': task_id, 'priority': priority},
+            'message': '设置任务优先级成功'
+        })
+        
+    except Exception as e:
+        print("设置任务优先级失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '设置任务优先级失败: {}'.format(str(e))
+        }), 500
+
 @task_manager_bp.route('/summary', methods=['GET'])
 def get_task_summary():
     """获取任务汇总信息"""
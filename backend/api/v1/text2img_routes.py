@@ -10,8 +10,14 @@ import asyncio
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
-import uuid
 from backend.models.models import JimengText2ImgTask
+from backend.core.download_manager import download_manager
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field, format_time
+from backend.core.blob_store import blob_store
+from backend.config.settings import BLOB_GC_MIN_GRACE
 import subprocess
 import platform
 import threading
@@ -20,61 +26,60 @@ from urllib.parse import urlparse
 # 创建蓝图
 jimeng_text2img_bp = Blueprint('jimeng_text2img', __name__, url_prefix='/api/jimeng/text2img')
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+TEXT2IMG_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'account_id': task_field('account_id'),
+    'images': task_field('images_json', 'image1', 'image2', 'image3', 'image4', getter=lambda task: task.get_images()),  # 图片路径列表
+    'image_count': task_field('images_json', 'image1', 'image2', 'image3', 'image4', getter=lambda task: len(task.get_images())),
+    'videos': task_field('videos_json', getter=lambda task: task.get_videos()),
+    'video_count': task_field('videos_json', getter=lambda task: len(task.get_videos())),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+}
+
 @jimeng_text2img_bp.route('/tasks', methods=['GET'])
 def get_text2img_tasks():
     """获取文生图任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 1000))
         status = request.args.get('status', None)
+        status = int(status) if status else None
         
-        print("获取文生图任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
-        
-        # 构建查询 - 过滤掉空任务
-        query = JimengText2ImgTask.select()
-        if status is not None:
-            query = query.where(JimengText2ImgTask.status == status)
-        
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengText2ImgTask.create_at.desc()).paginate(page, page_size)
+        print("获取文生图任务列表，状态: {}, 游标: {}, 字段: {}".format(status, request.args.get('cursor'), request.args.get('fields')))
         
-        data = []
-        for task in tasks:
-            images = task.get_images()  # 获取所有图片路径
-            videos = []
-            try:
-                videos = task.get_videos()
-            except Exception:
-                videos = []
-            data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'images': images,  # 图片路径列表
-                'image_count': len(images),  # 图片数量
-                'videos': videos,
-                'video_count': len(videos),
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S')
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(JimengText2ImgTask, TEXT2IMG_TASK_FIELDS, request.args, status=status)
+            return jsonify({
+                'success': True,
+                'data': delta.items,
+                'sync': delta.to_dict()
             })
         
-        print("成功获取任务列表，总数: {}, 当前页任务数: {}".format(total, len(data)))
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(JimengText2ImgTask, TEXT2IMG_TASK_FIELDS, request.args, status=status)
+        
         return jsonify({
             'success': True,
-            'data': data,
+            'sync': {'watermark': result.watermark},
+            'data': result.items,
             'pagination': {
-                'total': total,
-                'page': page,
-                'page_size': page_size,
-                'total_pages': (total + page_size - 1) // page_size
+                'total': result.total,
+                'page': result.page,
+                'page_size': result.page_size,
+                'total_pages': result.total_pages,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print("获取任务列表失败: {}".format(str(e)))
         return jsonify({
@@ -102,7 +107,26 @@ def create_text2img_task():
         aspect_ratio = "1:1"  # 固定比例
         quality = "1K"  # 固定质量
         
-        # 创建任务（不包含图片路径，这些在任务完成后才填入）
+        # 如果上传了参考图片，先存入上传文件存储，路径记录在任务上供执行阶段直接读取（多张时使用最后一张）
+        input_image = None
+        try:
+            files = request.files.getlist('images') if 'images' in request.files else []
+            print(f"接收到上传文件数量: {len(files)}")
+            for f in files:
+                if f and f.filename:
+                    filename = secure_filename(f.filename)
+                    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'jpg'
+                    try:
+                        input_image = blob_store.put_upload(f, ext)
+                        print(f"参考图片已保存: {f.filename} -> {input_image}")
+                    except Exception as se:
+                        print(f"保存上传图片失败: {se}")
+                else:
+                    print("文件对象为空或没有文件名")
+        except Exception as e:
+            print(f"处理上传图片异常（忽略继续）: {e}")
+
+        # 创建任务（生成图片路径在任务完成后才填入）
         task = JimengText2ImgTask.create(
             prompt=prompt,
             model=model,
@@ -110,6 +134,8 @@ def create_text2img_task():
             quality=quality,  # 使用固定的质量参数
             account_id=data.get('account_id') or request.form.get('account_id'),
             status=0,  # 默认状态：0-排队中
+            priority=int(data.get('priority') or request.form.get('priority') or 0),
+            input_image=input_image,
             # 图片路径字段保持为空，由任务处理器填入
             image1=None,
             image2=None,
@@ -117,46 +143,8 @@ def create_text2img_task():
             image4=None
         )
         
-        # 如果上传了图片，保存到临时目录（带task_id前缀）供执行阶段读取
-        try:
-            files = request.files.getlist('images') if 'images' in request.files else []
-            print(f"接收到上传文件数量: {len(files)}")
-            if files:
-                tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
-                print(f"临时目录路径: {tmp_dir}")
-                os.makedirs(tmp_dir, exist_ok=True)
-                saved = 0
-                for f in files:
-                    print(f"处理文件对象: {f}")
-                    if f and f.filename:
-                        filename = secure_filename(f.filename)
-                        print(f"原始文件名: {f.filename}, 安全文件名: {filename}")
-                        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'jpg'
-                        unique_name = f"text2img_{task.id}_{uuid.uuid4().hex}.{ext}"
-                        path = os.path.join(tmp_dir, unique_name)
-                        print(f"保存文件: {filename} -> {path}")
-                        try:
-                            f.save(path)
-                            saved += 1
-                            print(f"文件保存成功: {path}")
-                            # 验证文件是否真的保存成功
-                            if os.path.exists(path):
-                                file_size = os.path.getsize(path)
-                                print(f"文件大小: {file_size} 字节")
-                            else:
-                                print(f"警告: 文件似乎没有保存成功: {path}")
-                        except Exception as se:
-                            print(f"保存上传图片失败: {se}")
-                    else:
-                        print("文件对象为空或没有文件名")
-                if saved:
-                    print(f"文生图任务{task.id}已保存输入图片 {saved} 张")
-                else:
-                    print(f"文生图任务{task.id}没有成功保存任何图片")
-            else:
-                print("没有接收到上传的文件")
-        except Exception as e:
-            print(f"处理上传图片异常（忽略继续）: {e}")
+        # 通知任务管理器立即分发
+        task_dispatcher.notify_task_enqueued(JimengText2ImgTask, task.id)
         
         print("任务创建成功，任务ID: {}".format(task.id))
         return jsonify({
@@ -228,6 +216,7 @@ def retry_text2img_task(task_id):
         task = JimengText2ImgTask.get_by_id(task_id)
         task.status = 0  # 重置为排队状态
         task.save()
+        task_dispatcher.notify_task_enqueued(JimengText2ImgTask, task.id)
         
         print("重试文生图任务: {}".format(task_id))
         return jsonify({
@@ -266,6 +255,9 @@ def batch_retry_text2img_tasks():
                 JimengText2ImgTask.status == 3  # 只重试失败的任务
             ).execute()
         
+        if retry_count:
+            task_dispatcher.notify_task_enqueued(JimengText2ImgTask)
+        
         print(f"批量重试文生图任务: {retry_count}个")
         return jsonify({
             'success': True,
@@ -286,16 +278,12 @@ def batch_retry_text2img_tasks():
 def get_text2img_stats():
     """获取文生图任务统计信息"""
     try:
-        # 统计时过滤掉空任务
-        base_query = JimengText2ImgTask.select()
-        total_tasks = base_query.count()
-        queued_tasks = base_query.where(JimengText2ImgTask.status == 0).count()  # 排队中
-        processing_tasks = base_query.where(JimengText2ImgTask.status == 1).count()  # 生成中
-        completed_tasks = base_query.where(JimengText2ImgTask.status == 2).count()  # 已完成
-        failed_tasks = base_query.where(JimengText2ImgTask.status == 3).count()  # 失败
-        
-        print("获取任务统计 - 总数:{}, 排队:{}, 处理中:{}, 已完成:{}, 失败:{}".format(
-            total_tasks, queued_tasks, processing_tasks, completed_tasks, failed_tasks))
+        summary = task_status_counter.get_summary(JimengText2ImgTask)
+        total_tasks = summary['total']
+        queued_tasks = summary['pending']  # 排队中
+        processing_tasks = summary['processing']  # 生成中
+        completed_tasks = summary['completed']  # 已完成
+        failed_tasks = summary['failed']  # 失败
         
         return jsonify({
             'success': True,
@@ -539,25 +527,17 @@ def batch_download_images():
                         'filename': img_info['filename']
                     })
                 
-                # 使用带重试机制的批量下载（支持并行）
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=30,
-                    max_workers=5  # 并行下载数
-                )
-                
-                success_count = download_result['success_count']
-                error_count = download_result['failed_count']
-                
-                print(f"批量下载完成: 成功 {success_count} 张，失败 {error_count} 张")
-                print(f"文件保存位置: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='text2img', max_retries=5, timeout=30,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
                 
             except Exception as e:
                 print(f"批量下载过程出错: {str(e)}")
         
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -566,6 +546,7 @@ def batch_download_images():
             'success': True,
             'message': f'开始下载 {len(all_images)} 张图片，请选择下载文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'total_images': len(all_images),
                 'tasks_count': len(tasks)
             }
@@ -643,49 +624,15 @@ def delete_tasks_before_today():
 def cleanup_orphaned_text2img_images():
     """清理孤立的文生图图片文件（没有关联任务的图片）"""
     try:
-        # 获取项目中所有存储的图片路径
-        all_tasks = JimengText2ImgTask.select()
-        used_image_paths = set()
-
-        for task in all_tasks:
-            images = task.get_images()
-            used_image_paths.update(images)
+        # 参考图片的引用计数由任务表上的触发器维护，这里只回收引用已归零的文件（不再遍历 tmp 目录逐个比对）
+        result = blob_store.collect(grace=BLOB_GC_MIN_GRACE)
 
-        # 获取项目根目录
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-
-        # 检查上传目录 (文生图通常不需要上传目录，但可能有一些临时文件)
-        tmp_dir = os.path.join(project_root, 'tmp')
-        deleted_files_count = 0
-        error_count = 0
-
-        # 检查tmp目录
-        if os.path.exists(tmp_dir):
-            for filename in os.listdir(tmp_dir):
-                file_path = os.path.join(tmp_dir, filename)
-                if os.path.isfile(file_path):
-                    # 检查文件是否为图片文件
-                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')):
-                        # 检查文件是否被任何任务使用
-                        if file_path not in used_image_paths:
-                            try:
-                                os.remove(file_path)
-                                deleted_files_count += 1
-                                print(f"删除孤立图片文件: {file_path}")
-                            except Exception as e:
-                                error_count += 1
-                                print(f"删除孤立图片文件失败: {file_path}, 错误: {str(e)}")
-
-        print(f"清理文生图孤立图片完成: 删除 {deleted_files_count} 个文件，失败 {error_count} 个")
+        print(f"清理文生图孤立图片完成: 删除 {result['deleted_count']} 个文件，失败 {result['error_count']} 个")
 
         return jsonify({
             'success': True,
-            'message': f'清理完成，删除了 {deleted_files_count} 个孤立图片文件',
-            'data': {
-                'deleted_count': deleted_files_count,
-                'error_count': error_count,
-                'total_used_files': len(used_image_paths)
-            }
+            'message': f"清理完成，删除了 {result['deleted_count']} 个孤立图片文件",
+            'data': result
         })
 
     except Exception as e:
@@ -10,6 +10,12 @@ import asyncio
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengText2VideoTask
+from backend.core.download_manager import download_manager
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.task_ingest import bulk_create_tasks
+from backend.core.task_stats import task_status_counter
+from backend.core.task_sync import sync_tasks
+from backend.core.task_pagination import list_tasks, task_field, format_time
 import subprocess
 import platform
 import threading
@@ -18,55 +24,61 @@ from urllib.parse import urlparse
 # 创建蓝图
 jimeng_text2video_bp = Blueprint('jimeng_text2video', __name__, url_prefix='/api/jimeng/text2video')
 
+# 任务列表字段：输出字段 -> (依赖的列, 取值函数)，fields 参数只查询/计算所需字段
+TEXT2VIDEO_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'model': task_field('model'),
+    'second': task_field('second'),
+    'resolution': task_field('resolution'),
+    'ratio': task_field('ratio'),  # 视频比例
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'account_id': task_field('account_id'),
+    'video_url': task_field('video_url'),
+    'failure_reason': task_field('failure_reason'),  # 失败原因类型
+    'error_message': task_field('error_message'),  # 详细错误信息
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+}
+
 @jimeng_text2video_bp.route('/tasks', methods=['GET'])
 def get_text2video_tasks():
     """获取文生视频任务列表"""
     try:
-        page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 1000))
         status = request.args.get('status', None)
+        status = int(status) if status else None
         
-        print("获取文生视频任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
-        
-        # 构建查询
-        query = JimengText2VideoTask.select()
-        if status is not None:
-            query = query.where(JimengText2VideoTask.status == status)
-        
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengText2VideoTask.create_at.desc()).paginate(page, page_size)
+        print("获取文生视频任务列表，状态: {}, 游标: {}, 字段: {}".format(status, request.args.get('cursor'), request.args.get('fields')))
         
-        data = []
-        for task in tasks:
-            data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'second': task.second,
-                'resolution': task.resolution,  # 分辨率字段
-                'ratio': task.ratio,  # 视频比例
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S') if task.create_at else None,
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S') if task.update_at else None
+        # 带 updated_since 时只返回之后新建/变更的任务和被删除的任务ID
+        if request.args.get('updated_since'):
+            delta = sync_tasks(JimengText2VideoTask, TEXT2VIDEO_TASK_FIELDS, request.args, status=status)
+            return jsonify({
+                'success': True,
+                'data': delta.items,
+                'sync': delta.to_dict()
             })
         
+        # 带 cursor 参数时按 (create_at, id) 游标分页，否则按页码分页；fields 参数指定返回字段
+        result = list_tasks(JimengText2VideoTask, TEXT2VIDEO_TASK_FIELDS, request.args, status=status)
+        
         return jsonify({
             'success': True,
-            'data': data,
+            'sync': {'watermark': result.watermark},
+            'data': result.items,
             'pagination': {
-                'page': page,
-                'page_size': page_size,
-                'total': total,
-                'pages': (total + page_size - 1) // page_size
+                'page': result.page,
+                'page_size': result.page_size,
+                'total': result.total,
+                'pages': result.total_pages,
+                'next_cursor': result.next_cursor,
+                'has_more': result.has_more
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"获取文生视频任务列表失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -85,9 +97,11 @@ def create_text2video_task():
                 second=data.get('second', 5),
                 resolution=data.get('resolution', '720p'),  # 分辨率参数
                 ratio=data.get('ratio', '1:1'),  # 视频比例参数
+                priority=int(data.get('priority', 0)),
                 status=0
             )
             
+            task_dispatcher.notify_task_enqueued(JimengText2VideoTask, task.id)
             print(f"创建文生视频任务: {task.id}")
             return jsonify({'success': True, 'data': {'task_id': task.id}})
         
@@ -103,10 +117,13 @@ def create_text2video_task():
                     second=task_data.get('second', 5),
                     resolution=task_data.get('resolution', '720p'),  # 分辨率参数
                     ratio=task_data.get('ratio', '1:1'),  # 视频比例参数
+                    priority=int(task_data.get('priority', 0)),
                     status=0
                 )
                 created_tasks.append(task.id)
             
+            if created_tasks:
+                task_dispatcher.notify_task_enqueued(JimengText2VideoTask)
             print(f"批量创建文生视频任务: {len(created_tasks)}个")
             return jsonify({'success': True, 'data': {'task_ids': created_tasks}})
         
@@ -139,6 +156,7 @@ def retry_text2video_task(task_id):
     try:
         task = JimengText2VideoTask.get_by_id(task_id)
         task.update_status(0)  # 重置为排队状态
+        task_dispatcher.notify_task_enqueued(JimengText2VideoTask, task.id)
         
         print(f"重试文生视频任务: {task_id}")
         return jsonify({'success': True, 'message': '任务已重新加入队列'})
@@ -176,6 +194,8 @@ def batch_retry_text2video_tasks():
                 task.update_status(0)  # 重置为排队状态
                 retry_count += 1
         
+        if retry_count:
+            task_dispatcher.notify_task_enqueued(JimengText2VideoTask)
         print(f"批量重试文生视频任务: {retry_count}个")
         return jsonify({
             'success': True,
@@ -248,6 +268,9 @@ def batch_add_tasks():
                 failed_tasks.append(f"提示词 {i+1}: {str(e)}")
                 print(f"处理提示词 {prompt} 失败: {str(e)}")
 
+        if created_tasks:
+            task_dispatcher.notify_task_enqueued(JimengText2VideoTask)
+
         # 构建响应消息
         message_parts = []
         if created_tasks:
@@ -435,25 +458,17 @@ def batch_download_videos():
                         'filename': video_info['filename']
                     })
                 
-                # 使用带重试机制的批量下载（支持并行）
-                from utils.download_util import batch_download_files
-                download_result = batch_download_files(
-                    file_infos=file_infos,
-                    max_retries=5,
-                    timeout=60,
-                    max_workers=5  # 并行下载数
-                )
-                
-                success_count = download_result['success_count']
-                error_count = download_result['failed_count']
-                
-                print(f"批量下载完成: 成功 {success_count} 个，失败 {error_count} 个")
-                print(f"文件保存位置: {batch_folder}")
+                # 提交到全局下载管理器后立即返回，进度、取消与重试通过 /api/downloads/batches/<batch_id>
+                download_manager.submit_batch(file_infos, source='text2video', max_retries=5, timeout=60,
+                                              batch_id=batch_id)
+                print(f"已提交批量下载 {len(file_infos)} 个文件，批次: {batch_id}，保存位置: {batch_folder}")
                 
             except Exception as e:
                 print(f"批量下载过程出错: {str(e)}")
         
-        # 在后台线程中执行下载
+        # 只有文件夹选择对话框在后台线程中等待用户操作，选择后提交下载批次即结束，不等待下载完成；
+        # 批次ID先返回给前端，通过 /api/downloads/batches/<batch_id> 查看进度、取消与重试
+        batch_id = download_manager.new_batch_id()
         download_thread = threading.Thread(target=download_in_background)
         download_thread.daemon = True
         download_thread.start()
@@ -462,6 +477,7 @@ def batch_download_videos():
             'success': True,
             'message': f'开始下载 {len(all_videos)} 个视频，请选择下载文件夹',
             'data': {
+                'batch_id': batch_id,  # 选择文件夹后以该批次ID提交下载
                 'total_videos': len(all_videos),
                 'tasks_count': len(tasks)
             }
@@ -478,13 +494,12 @@ def batch_download_videos():
 def get_text2video_stats():
     """获取文生视频统计信息"""
     try:
-        # 统计时过滤掉空任务
-        base_query = JimengText2VideoTask.select()
-        total_tasks = base_query.count()
-        pending_tasks = base_query.where(JimengText2VideoTask.status == 0).count()
-        processing_tasks = base_query.where(JimengText2VideoTask.status == 1).count()
-        completed_tasks = base_query.where(JimengText2VideoTask.status == 2).count()
-        failed_tasks = base_query.where(JimengText2VideoTask.status == 3).count()
+        summary = task_status_counter.get_summary(JimengText2VideoTask)
+        total_tasks = summary['total']
+        pending_tasks = summary['pending']
+        processing_tasks = summary['processing']
+        completed_tasks = summary['completed']
+        failed_tasks = summary['failed']
         
         return jsonify({
             'success': True,
@@ -546,6 +561,18 @@ def delete_tasks_before_today():
             'message': f'删除今日前任务失败: {str(e)}'
         }), 500 
 
+def _build_table_task(task_data):
+    """表格中的一行 -> 文生视频任务字段"""
+    if not task_data.get('prompt'):
+        raise ValueError("缺少提示词")
+    return {
+        'prompt': task_data['prompt'].strip(),
+        'model': task_data.get('model', 'Video 3.0'),
+        'second': int(task_data.get('second', 5)),
+        'resolution': task_data.get('resolution', '720p'),  # 默认分辨率为720p
+        'ratio': task_data.get('ratio', '1:1')  # 视频比例
+    }
+
 @jimeng_text2video_bp.route('/tasks/batch-create-from-table', methods=['POST'])
 def batch_create_tasks_from_table():
     """从表格批量创建文生视频任务"""
@@ -564,52 +591,15 @@ def batch_create_tasks_from_table():
                 'message': '任务数据格式错误'
             }), 400
 
-        created_tasks = []
-        failed_tasks = []
-
-        for i, task_data in enumerate(tasks_data):
-            try:
-                # 验证必需字段
-                if 'prompt' not in task_data or not task_data['prompt']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少提示词")
-                    continue
-
-                prompt = task_data['prompt'].strip()
-                model = task_data.get('model', 'Video 3.0')
-                second = int(task_data.get('second', 5))
-                resolution = task_data.get('resolution', '720p')  # 默认分辨率为720p
-                ratio = task_data.get('ratio', '1:1')  # 视频比例
-
-                # 创建任务
-                task = JimengText2VideoTask.create(
-                    prompt=prompt,
-                    model=model,
-                    second=second,
-                    resolution=resolution,  # 添加分辨率参数
-                    ratio=ratio,  # 添加比例参数
-                    status=0
-                )
-                created_tasks.append(task.id)
-                print(f"从表格创建文生视频任务: {task.id}, 提示词: {prompt}, 模型: {model}, 时长: {second}s, 分辨率: {resolution}, 比例: {ratio}")
-
-            except Exception as e:
-                failed_tasks.append(f"第 {i+1} 行: {str(e)}")
-                print(f"处理第 {i+1} 行任务失败: {str(e)}")
-
-        # 返回结果
-        result_message = f"成功创建 {len(created_tasks)} 个任务"
-        if failed_tasks:
-            result_message += f"，{len(failed_tasks)} 个任务创建失败"
+        result = bulk_create_tasks(JimengText2VideoTask, tasks_data, _build_table_task)
+        print(f"从表格批量创建文生视频任务: {result.message}")
+        if result.created_ids:
+            task_dispatcher.notify_task_enqueued(JimengText2VideoTask)
 
         return jsonify({
             'success': True,
-            'message': result_message,
-            'data': {
-                'created_count': len(created_tasks),
-                'failed_count': len(failed_tasks),
-                'created_task_ids': created_tasks,
-                'failed_tasks': failed_tasks
-            }
+            'message': result.message,
+            'data': result.to_dict()
         })
 
     except Exception as e:
@@ -14,9 +14,12 @@ from datetime import datetime
 
 # 导入核心模块
 from backend.core.database import init_database
+from backend.core.migrations import run_migrations
 from backend.core.middleware import before_request, after_request
 from backend.core.global_task_manager import global_task_manager
-from backend.models.models import JimengAccount, JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengFirstLastFrameImg2VideoTask, JimengDigitalHumanTask, QingyingImage2VideoTask, JimengText2VideoTask
+from backend.core.download_manager import download_manager
+from backend.core.blob_store import blob_store
+from backend.core.task_lease import task_lease
 from backend.utils.config_util import ConfigUtil
 # from backend.utils.retry_util import start_auto_retry_scheduler  # 暂时注释掉
 
@@ -35,6 +38,9 @@ from backend.api.v1.task_manager_routes import task_manager_bp
 from backend.api.v1.prompt_routes import prompt_bp
 from backend.api.v1.text2video_routes import jimeng_text2video_bp
 from backend.api.v1.static_routes import static_bp
+from backend.api.v1.download_routes import downloads_bp
+from backend.api.v1.event_routes import events_bp
+from backend.api.v1.import_routes import imports_bp
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -50,167 +56,23 @@ init_database()
 # 等待数据库初始化完全完成
 time.sleep(0.5)
 
-# 执行数据库迁移 - 添加图生图任务表的输入图片字段
-def migrate_img2img_task_table():
-    """迁移图生图任务表，添加新的输入图片字段"""
-    try:
-        from backend.models.models import db
-        from peewee import OperationalError
-        # 为JimengImg2ImgTask表添加缺失的字段
-        cursor = db.execute_sql("PRAGMA table_info(jimeng_image2image_tasks);")
-        existing_columns = [column[1] for column in cursor.fetchall()]
-        
-        # 检查并添加缺失的输入图片字段
-        if 'input_image4' not in existing_columns:
-            try:
-                db.execute_sql("ALTER TABLE jimeng_image2image_tasks ADD COLUMN input_image4 VARCHAR(500);")
-                print("成功添加 input_image4 字段")
-            except OperationalError:
-                print("input_image4 字段已存在或添加失败")
-        
-        if 'input_image5' not in existing_columns:
-            try:
-                db.execute_sql("ALTER TABLE jimeng_image2image_tasks ADD COLUMN input_image5 VARCHAR(500);")
-                print("成功添加 input_image5 字段")
-            except OperationalError:
-                print("input_image5 字段已存在或添加失败")
-        
-        if 'input_image6' not in existing_columns:
-            try:
-                db.execute_sql("ALTER TABLE jimeng_image2image_tasks ADD COLUMN input_image6 VARCHAR(500);")
-                print("成功添加 input_image6 字段")
-            except OperationalError:
-                print("input_image6 字段已存在或添加失败")
-                
-    except Exception as e:
-        print(f"迁移表结构失败: {str(e)}")
-
-# 执行迁移
-migrate_img2img_task_table()
-
-# 文生图任务表迁移：添加 videos_json 字段（存储视频URL）
-def migrate_text2img_task_table():
-    try:
-        from backend.models.models import db
-        from peewee import OperationalError
-        cursor = db.execute_sql("PRAGMA table_info(jimeng_text2img_tasks);")
-        existing_columns = [column[1] for column in cursor.fetchall()]
-        if 'videos_json' not in existing_columns:
-            try:
-                db.execute_sql("ALTER TABLE jimeng_text2img_tasks ADD COLUMN videos_json TEXT;")
-                print("成功添加 jimeng_text2img_tasks.videos_json 字段")
-            except OperationalError:
-                print("videos_json 字段已存在或添加失败")
-    except Exception as e:
-        print(f"迁移文生图表结构失败: {str(e)}")
-
-migrate_text2img_task_table()
-
-def migrate_qingying_img2video_task_table():
-    try:
-        from backend.models.models import db
-        from peewee import OperationalError
-        cursor = db.execute_sql("PRAGMA table_info(qingying_image2video_tasks);")
-        existing_columns = [column[1] for column in cursor.fetchall()]
-        if 'videos_json' not in existing_columns:
-            try:
-                db.execute_sql("ALTER TABLE qingying_image2video_tasks ADD COLUMN videos_json TEXT;")
-                print("成功添加 qingying_image2video_tasks.videos_json 字段")
-            except OperationalError:
-                print("qingying_image2video_tasks.videos_json 字段已存在或添加失败")
-    except Exception as e:
-        print(f"迁移清影图生视频表结构失败: {str(e)}")
-
-migrate_qingying_img2video_task_table()
+# 执行数据库迁移（仅执行尚未执行过的版本）
+run_migrations()
 
 # 初始化默认配置
 ConfigUtil.init_default_configs()
 
 def reset_processing_tasks():
-    """重置所有生成中的任务为排队状态"""
+    """接管上次运行留下的生成中任务（租约已过期或没有租约），每个任务表一条 UPDATE"""
     max_retries = 3
     retry_delay = 1
     
     for attempt in range(max_retries):
         try:
-            print("检查并重置生成中的任务...")
-            
-            # 重置文生图任务
-            text2img_reset_count = 0
-            processing_text2img_tasks = JimengText2ImgTask.select().where(
-                JimengText2ImgTask.status == 1  # 生成中
-            )
-            
-            for task in processing_text2img_tasks:
-                task.update_status(0)  # 重置为排队状态
-                text2img_reset_count += 1
-            
-            # 重置图生图任务
-            img2img_reset_count = 0
-            processing_img2img_tasks = JimengImg2ImgTask.select().where(
-                JimengImg2ImgTask.status == 1  # 生成中
-            )
-            
-            for task in processing_img2img_tasks:
-                task.update_status(0)  # 重置为排队状态
-                img2img_reset_count += 1
-            
-            # 重置图生视频任务
-            img2video_reset_count = 0
-            processing_img2video_tasks = JimengImg2VideoTask.select().where(
-                JimengImg2VideoTask.status == 1  # 生成中
-            )
-
-            for task in processing_img2video_tasks:
-                task.update_status(0)  # 重置为排队状态
-                img2video_reset_count += 1
-
-            # 重置首尾帧图生视频任务
-            first_last_frame_img2video_reset_count = 0
-            processing_first_last_frame_tasks = JimengFirstLastFrameImg2VideoTask.select().where(
-                JimengFirstLastFrameImg2VideoTask.status == 1  # 生成中
-            )
-
-            for task in processing_first_last_frame_tasks:
-                task.update_status(0)  # 重置为排队状态
-                first_last_frame_img2video_reset_count += 1
-
-            # 重置文生视频任务
-            text2video_reset_count = 0
-            processing_text2video_tasks = JimengText2VideoTask.select().where(
-                JimengText2VideoTask.status == 1  # 生成中
-            )
-            
-            for task in processing_text2video_tasks:
-                task.update_status(0)  # 重置为排队状态
-                text2video_reset_count += 1
-            
-            # 重置数字人任务
-            digital_human_reset_count = 0
-            processing_digital_human_tasks = JimengDigitalHumanTask.select().where(
-                JimengDigitalHumanTask.status == 1  # 生成中
-            )
-            
-            for task in processing_digital_human_tasks:
-                task.update_status(0)  # 重置为排队状态
-                digital_human_reset_count += 1
-            
-            # 重置清影图生视频任务
-            qingying_img2video_reset_count = 0
-            processing_qingying_img2video_tasks = QingyingImage2VideoTask.select().where(
-                QingyingImage2VideoTask.status == 1  # 生成中
-            )
-            
-            for task in processing_qingying_img2video_tasks:
-                task.update_status(0)  # 重置为排队状态
-                qingying_img2video_reset_count += 1
-            
-            total_reset = text2img_reset_count + img2img_reset_count + img2video_reset_count + first_last_frame_img2video_reset_count + text2video_reset_count + digital_human_reset_count + qingying_img2video_reset_count
-            if total_reset > 0:
-                print(f"重置了 {text2img_reset_count} 个文生图任务, {img2img_reset_count} 个图生图任务, {img2video_reset_count} 个图生视频任务, {first_last_frame_img2video_reset_count} 个首尾帧图生视频任务, {text2video_reset_count} 个文生视频任务, {digital_human_reset_count} 个数字人任务和 {qingying_img2video_reset_count} 个清影图生视频任务为排队状态")
-            else:
-                print("没有需要重置的生成中任务")
-            
+            print("检查租约过期的生成中任务...")
+            recovered = task_lease.recover()
+            if not recovered:
+                print("没有需要接管的生成中任务")
             return  # 成功完成，退出重试循环
                 
         except Exception as e:
@@ -251,6 +113,9 @@ app.register_blueprint(config_bp)
 app.register_blueprint(task_manager_bp)
 app.register_blueprint(prompt_bp)
 app.register_blueprint(static_bp)
+app.register_blueprint(downloads_bp)
+app.register_blueprint(events_bp)
+app.register_blueprint(imports_bp)
 
 # 等待路由注册完成
 time.sleep(0.5)
@@ -259,6 +124,15 @@ time.sleep(0.5)
 global_task_manager.start()
 print("全局任务管理器已启动")
 
+# 启动任务租约续约（崩溃前的任务在租约过期后由恢复扫描接管）
+task_lease.start()
+
+# 启动全局下载管理器（恢复上次未完成的下载）
+download_manager.start()
+
+# 启动上传文件回收（回收引用归零的上传文件）
+blob_store.start()
+
 # 启动自动重试调度器
     # start_auto_retry_scheduler()  # 暂时注释掉
 print("自动重试调度器已启动")
@@ -9,12 +9,75 @@ import os
 DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
 DATABASE_PATH = os.path.join(DATABASE_DIR, 'shueke_v2.db')
 
+# 提示词库目录
+PROMPT_DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompt_database')
+
+# 提示词图片缩略图目录（按内容哈希命名）
+THUMBNAIL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp', 'thumbnails')
+
+# /static/images 查找的本地资源目录（按优先级）
+ASSET_DIRS = [
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp'),
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images'),
+]
+
+# 远程生成结果（图片/视频）的本地缓存
+MEDIA_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp', 'media_cache')
+MEDIA_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存总大小上限，超出后按最近最少使用淘汰
+MEDIA_CACHE_MAX_AGE = 86400  # 浏览器缓存时间（秒）
+
+# 文件夹导入：图片存入上传文件存储（BLOB_STORE_DIR），相同图片只保存一份
+IMPORT_WORKERS = 8  # 并行计算哈希/复制图片的线程数
+IMPORT_JOB_HISTORY = 50  # 内存中保留的导入任务数（用于进度查询）
+
+# 上传文件内容寻址存储：按 SHA-256 分目录保存（blobs/<前两位>/<sha256><扩展名>），
+# blobs 表记录被任务引用的次数（由任务表上的触发器维护），引用归零的文件由后台回收
+BLOB_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp', 'blobs')
+BLOB_GC_INTERVAL = 600  # 后台回收间隔（秒）
+BLOB_GC_GRACE = 3600  # 引用归零后保留的时间（秒），期间重新上传/撤销删除可直接复用
+BLOB_GC_MIN_GRACE = 300  # 手动清理或超出容量上限时的最短保留时间（秒），覆盖文件已存入、任务尚未写入的窗口
+BLOB_GC_BATCH = 500  # 每批回收的文件数
+BLOB_STORE_MAX_BYTES = 10 * 1024 * 1024 * 1024  # 存储总大小超过该值时按最短保留时间回收未引用文件
+
+# 全局下载管理器（批量导出等下载任务共用一个工作线程池）
+DOWNLOAD_MAX_WORKERS = 8  # 同时进行的下载数
+DOWNLOAD_PER_HOST_LIMIT = 4  # 单个主机的最大并发下载数
+DOWNLOAD_SEGMENT_THRESHOLD = 64 * 1024 * 1024  # 超过该大小且服务端支持 Range 的文件分段并行下载
+DOWNLOAD_SEGMENTS = 4  # 分段下载的分段数（即单个文件的并发连接数）
+
 # Cookies目录
 COOKIES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cookies')
 
 # 任务处理配置
-TASK_PROCESSOR_INTERVAL = 20  # 任务检查间隔（秒）
+TASK_RECONCILE_INTERVAL = 120  # 兜底对账扫描间隔（秒），正常情况由任务分发总线事件唤醒
 TASK_PROCESSOR_ERROR_WAIT = 10  # 错误后等待时间（秒）
+TASK_STATUS_RECONCILE_INTERVAL = 60  # 任务状态计数缓存的对账间隔（秒），期间由状态变化增量更新
+TASK_SYNC_OVERLAP = 2  # 任务列表增量同步向前多取的秒数，覆盖查询时尚未提交的写入
+TASK_TOMBSTONE_RETENTION_DAYS = 7  # 已删除任务记录的保留天数，更早的 updated_since 需要全量加载
+BULK_INSERT_CHUNK_SIZE = 1000  # 批量建任务时每个事务写入的行数
+BULK_STAT_WORKERS = 16  # 批量建任务时并行检查本地文件是否存在的线程数
+TASK_LEASE_TTL = 120  # 生成中任务的租约时长（秒），执行进程崩溃后租约过期的任务由恢复扫描接管
+TASK_LEASE_HEARTBEAT_INTERVAL = 30  # 续约与恢复扫描的间隔（秒），需明显小于 TASK_LEASE_TTL
+
+# 事件流配置（/api/events）
+EVENT_BUFFER_SIZE = 1000  # 保留最近的事件数，断线重连时按 Last-Event-ID 补发
+EVENT_CLIENT_QUEUE_SIZE = 256  # 单个客户端的待发送事件上限，超过后改为从缓冲补发
+EVENT_HEARTBEAT_INTERVAL = 15  # 无事件时发送心跳的间隔（秒）
+EVENT_PROGRESS_INTERVAL = 0.5  # 同一下载任务进度事件的最小间隔（秒）
 
 # Playwright配置
-PLAYWRIGHT_HEADLESS = True  # 是否无头模式运行
\ No newline at end of file
+PLAYWRIGHT_HEADLESS = True  # 是否无头模式运行
+# 浏览器池配置
+BROWSER_POOL_ENABLED = True  # 是否复用常驻浏览器与账号上下文
+BROWSER_POOL_MAX_CONTEXT_USES = 50  # 单个账号上下文最多复用次数，超过后回收重建
+BROWSER_POOL_MAX_BROWSER_USES = 500  # 单个Chromium最多承载的任务数，超过后空闲时重启
+BROWSER_POOL_IDLE_TIMEOUT = 600  # 空闲上下文淘汰时间（秒）
+BROWSER_POOL_HEALTH_CHECK_TIMEOUT = 5  # 租用前健康检查超时（秒）
+
+# 即梦账号每日使用上限（按任务类别，文生图/图生图共用图片额度，图生视频/文生视频共用视频额度）
+JIMENG_DAILY_LIMITS = {
+    'image': 10,
+    'video': 2,
+    'digital_human': 1
+}
+ACCOUNT_USAGE_CACHE_TTL = 5  # 账号使用统计接口的缓存时间（秒）
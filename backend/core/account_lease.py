@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+即梦账号租用服务 - 内存中的账号每日用量计数与原子选号
+
+- 启动时（以及跨天时）用一条 GROUP BY 查询统计今日各账号、各任务类型的使用次数
+- 按任务类别（图片/视频/数字人）维护已用次数与在途预留次数，选号时二者之和不得超过每日上限
+- 每个类别一个小顶堆（惰性失效），O(log n) 取出使用次数最少的账号，同次数的账号随机先后
+- reserve/commit/release 在同一把锁内修改计数，并发任务不会同时选中已到上限的账号
+- 账号增删改只标记重新加载已用次数，在途预留只在跨天时清空
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from peewee import Case, fn
+
+from backend.config.settings import JIMENG_DAILY_LIMITS, ACCOUNT_USAGE_CACHE_TTL
+from backend.models.models import JimengAccount, JimengTaskRecord
+
+# 任务类别 -> 计入该类别额度的 JimengTaskRecord.task_type
+CATEGORY_TASK_TYPES = {
+    'image': (1, 4),          # 1=文生图, 4=图生图
+    'video': (2, 5),          # 2=图生视频, 5=文生视频
+    'digital_human': (3,)     # 3=数字人
+}
+TASK_TYPE_CATEGORY = {t: c for c, types in CATEGORY_TASK_TYPES.items() for t in types}
+
+# 管理器使用的任务类型名称 -> 任务类别
+TASK_NAME_CATEGORY = {
+    'text2img': 'image',
+    'img2img': 'image',
+    'img2video': 'video',
+    'text2video': 'video',
+    'digital_human': 'digital_human'
+}
+
+
+def category_of(task_type) -> str:
+    """将任务类型（名称或 task_type 编号）转换为额度类别"""
+    if isinstance(task_type, int):
+        return TASK_TYPE_CATEGORY.get(task_type, 'image')
+    if task_type in CATEGORY_TASK_TYPES:
+        return task_type
+    return TASK_NAME_CATEGORY.get(task_type, 'image')
+
+
+class AccountLease:
+    """一次账号预留，任务结束时必须 commit 或 release"""
+
+    __slots__ = ('account', 'category', 'day', 'committed', 'released')
+
+    def __init__(self, account, category: str, day: date):
+        self.account = account
+        self.category = category
+        self.day = day
+        self.committed = False
+        self.released = False
+
+    @property
+    def account_id(self) -> int:
+        return self.account.id
+
+
+class AccountLeaseService:
+    """即梦账号租用服务"""
+
+    def __init__(self, daily_limits: Optional[Dict[str, int]] = None):
+        self.daily_limits = dict(daily_limits or JIMENG_DAILY_LIMITS)
+        self._lock = threading.RLock()
+        self._day: Optional[date] = None           # 已用次数加载的日期
+        self._reserved_day: Optional[date] = None  # 在途预留所属的日期
+        self._stale = False                        # 账号变化后待重新加载
+        self._account_ids: Set[int] = set()
+        self._used: Dict[Tuple[str, int], int] = {}      # (类别, 账号ID) -> 今日已用次数
+        self._reserved: Dict[Tuple[str, int], int] = {}  # (类别, 账号ID) -> 在途预留次数
+        self._version: Dict[Tuple[str, int], int] = {}   # 堆条目版本号，用于惰性失效
+        self._heaps: Dict[str, List] = {}                # 类别 -> [(占用次数, 随机数, 版本, 账号ID)]
+        self._counter = itertools.count(1)  # 0 留给重建堆时的初始条目
+        self._usage_cache = None  # (过期时间, 日期, 汇总结果)
+        self.stats = {
+            'reserved': 0,
+            'committed': 0,
+            'released': 0,
+            'exhausted': 0,
+            'reloads': 0
+        }
+
+    # ---------- 计数加载 ----------
+
+    def reload(self):
+        """从数据库重新加载账号列表与今日用量（一条分组查询）"""
+        today = date.today()
+        account_ids = {a.id for a in JimengAccount.select(JimengAccount.id)}
+        used: Dict[Tuple[str, int], int] = {}
+        query = (JimengTaskRecord
+                 .select(JimengTaskRecord.account_id, JimengTaskRecord.task_type,
+                         fn.COUNT(JimengTaskRecord.id).alias('usage'))
+                 .where(JimengTaskRecord.created_at >= today)
+                 .group_by(JimengTaskRecord.account_id, JimengTaskRecord.task_type)
+                 .tuples())
+        for account_id, task_type, usage in query:
+            category = TASK_TYPE_CATEGORY.get(task_type)
+            if category is None or account_id is None:
+                continue
+            key = (category, account_id)
+            used[key] = used.get(key, 0) + usage
+        with self._lock:
+            if self._reserved_day != today:
+                # 跨天后旧的预留不再占用新一天的额度；同一天内重新加载时保留在途预留，
+                # 它们对应的任务尚未写入使用记录，不在查询结果中
+                self._reserved.clear()
+                self._reserved_day = today
+            self._day = today
+            self._stale = False
+            self._account_ids = account_ids
+            self._used = used
+            self._rebuild_heaps()
+            self.stats['reloads'] += 1
+        print(f"账号租用服务: 已加载 {len(account_ids)} 个即梦账号的今日用量")
+
+    def invalidate(self):
+        """账号增删改后调用，下次选号时重新加载（不影响在途预留）"""
+        with self._lock:
+            self._stale = True
+            self._usage_cache = None
+
+    def _ensure_loaded(self):
+        if self._stale or self._day != date.today():
+            self.reload()
+
+    def _rebuild_heaps(self):
+        self._heaps = {}
+        self._version = {}
+        for category in CATEGORY_TASK_TYPES:
+            heap = []
+            for account_id in self._account_ids:
+                key = (category, account_id)
+                heap.append((self._occupancy(key), random.random(), 0, account_id))
+                self._version[key] = 0
+            heapq.heapify(heap)
+            self._heaps[category] = heap
+
+    def _occupancy(self, key: Tuple[str, int]) -> int:
+        return self._used.get(key, 0) + self._reserved.get(key, 0)
+
+    def _touch(self, key: Tuple[str, int]):
+        """计数变化后压入新的堆条目，旧条目出堆时按版本号丢弃"""
+        category, account_id = key
+        if account_id not in self._account_ids or category not in self._heaps:
+            return
+        version = next(self._counter)
+        self._version[key] = version
+        heapq.heappush(self._heaps[category], (self._occupancy(key), random.random(), version, account_id))
+
+    def _pop_least_used(self, category: str, exclude=()) -> Optional[int]:
+        """取出占用次数最少且未达上限的账号（不修改计数）"""
+        heap = self._heaps.get(category, [])
+        limit = self.daily_limits.get(category, 1)
+        skipped = []
+        selected = None
+        while heap:
+            occupancy, _, version, account_id = heap[0]
+            key = (category, account_id)
+            if self._version.get(key) != version or occupancy != self._occupancy(key):
+                heapq.heappop(heap)
+                continue
+            if occupancy >= limit:
+                break
+            if account_id in exclude:
+                skipped.append(heapq.heappop(heap))
+                continue
+            selected = account_id
+            break
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        return selected
+
+    # ---------- 选号与计数 ----------
+
+    def reserve(self, task_type, exclude=()) -> Optional[AccountLease]:
+        """为任务预留一个使用次数最少且未达上限的账号，没有可用账号时返回None"""
+        category = category_of(task_type)
+        with self._lock:
+            self._ensure_loaded()
+            exclude = set(exclude)
+            while True:
+                account_id = self._pop_least_used(category, exclude)
+                if account_id is None:
+                    self.stats['exhausted'] += 1
+                    print(f"所有即梦账号今日{category}额度已用完")
+                    return None
+                account = JimengAccount.get_or_none(JimengAccount.id == account_id)
+                if account is None:
+                    # 账号已被删除，重新加载后继续选择
+                    self._account_ids.discard(account_id)
+                    self._rebuild_heaps()
+                    continue
+                key = (category, account_id)
+                self._reserved[key] = self._reserved.get(key, 0) + 1
+                self._touch(key)
+                self.stats['reserved'] += 1
+                print(f"账号租用服务: 预留账号 {account.account} "
+                      f"(今日{category}已用 {self._used.get(key, 0)}/{self.daily_limits.get(category, 1)}, "
+                      f"在途 {self._reserved[key]})")
+                return AccountLease(account, category, self._reserved_day)
+
+    def pick(self, task_type) -> Optional[JimengAccount]:
+        """仅查询当前使用次数最少且未达上限的账号，不做预留"""
+        category = category_of(task_type)
+        with self._lock:
+            self._ensure_loaded()
+            account_id = self._pop_least_used(category)
+        if account_id is None:
+            return None
+        return JimengAccount.get_or_none(JimengAccount.id == account_id)
+
+    def commit(self, lease: AccountLease, task_type: int) -> Optional[int]:
+        """任务消耗了账号额度：写入使用记录，并将预留转为已用"""
+        if lease is None or lease.committed or lease.released:
+            return None
+        record_id = self._create_record(lease.account_id, task_type)
+        with self._lock:
+            lease.committed = True
+            self._drop_reservation(lease)
+            self._add_usage(lease.account_id, task_type)
+            self.stats['committed'] += 1
+        return record_id
+
+    def release(self, lease: AccountLease):
+        """任务结束，归还未提交的预留（已提交或已归还时忽略）"""
+        if lease is None or lease.released:
+            return
+        with self._lock:
+            lease.released = True
+            if not lease.committed:
+                self._drop_reservation(lease)
+                self.stats['released'] += 1
+
+    def record_usage(self, account_id: int, task_type: int) -> Optional[int]:
+        """记录一次不经过预留的账号使用（写入使用记录并更新计数）"""
+        record_id = self._create_record(account_id, task_type)
+        with self._lock:
+            self._add_usage(account_id, task_type)
+        return record_id
+
+    def _drop_reservation(self, lease: AccountLease):
+        if lease.day != self._reserved_day:
+            return
+        key = (lease.category, lease.account_id)
+        remaining = self._reserved.get(key, 0) - 1
+        if remaining > 0:
+            self._reserved[key] = remaining
+        else:
+            self._reserved.pop(key, None)
+        self._touch(key)
+
+    def _add_usage(self, account_id: int, task_type: int):
+        self._usage_cache = None
+        if self._day != date.today():
+            return  # 计数将在下次选号时按新的一天重新加载
+        category = TASK_TYPE_CATEGORY.get(task_type)
+        if category is None:
+            return
+        key = (category, account_id)
+        self._used[key] = self._used.get(key, 0) + 1
+        self._touch(key)
+
+    @staticmethod
+    def _create_record(account_id: int, task_type: int) -> Optional[int]:
+        try:
+            record = JimengTaskRecord.create(
+                account_id=account_id,
+                task_type=task_type,
+                created_at=datetime.now(),
+                updated_at=datetime.now()
+            )
+            print(f"添加即梦账号使用记录成功，记录ID: {record.id}, 账号ID: {account_id}, 任务类型: {task_type}")
+            return record.id
+        except Exception as e:
+            print(f"添加即梦账号使用记录失败: {str(e)}")
+            return None
+
+    # ---------- 查询 ----------
+
+    def get_usage_summary(self) -> Dict[int, Dict[str, Dict[str, int]]]:
+        """
+        各账号今日与累计使用次数（按类别），一条分组聚合查询，结果短时缓存
+
+        返回值:
+            Dict: {账号ID: {'today': {类别: 次数}, 'total': {类别: 次数}}}，没有记录的账号不在结果中
+        """
+        today = date.today()
+        now = time.time()
+        with self._lock:
+            cached = self._usage_cache
+            if cached and cached[0] > now and cached[1] == today:
+                return cached[2]
+        is_today = Case(None, [(JimengTaskRecord.created_at >= today, 1)], 0)
+        query = (JimengTaskRecord
+                 .select(JimengTaskRecord.account_id, JimengTaskRecord.task_type,
+                         fn.COUNT(JimengTaskRecord.id), fn.SUM(is_today))
+                 .where(JimengTaskRecord.account_id.is_null(False))
+                 .group_by(JimengTaskRecord.account_id, JimengTaskRecord.task_type)
+                 .tuples())
+        summary: Dict[int, Dict[str, Dict[str, int]]] = {}
+        for account_id, task_type, total, today_count in query:
+            category = TASK_TYPE_CATEGORY.get(task_type)
+            if category is None:
+                continue
+            usage = summary.setdefault(account_id, self.empty_usage())
+            usage['total'][category] += total
+            usage['today'][category] += today_count or 0
+        with self._lock:
+            self._usage_cache = (now + ACCOUNT_USAGE_CACHE_TTL, today, summary)
+        return summary
+
+    @staticmethod
+    def empty_usage() -> Dict[str, Dict[str, int]]:
+        return {
+            'today': {category: 0 for category in CATEGORY_TASK_TYPES},
+            'total': {category: 0 for category in CATEGORY_TASK_TYPES}
+        }
+
+    def get_usage(self, account_id: int) -> Dict[str, int]:
+        """获取账号今日各类别已用次数"""
+        with self._lock:
+            self._ensure_loaded()
+            return {category: self._used.get((category, account_id), 0) for category in CATEGORY_TASK_TYPES}
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'day': self._day.isoformat() if self._day else None,
+                'accounts': len(self._account_ids),
+                'daily_limits': dict(self.daily_limits),
+                'in_flight': sum(self._reserved.values())
+            }
+
+
+# 全局账号租用服务实例
+account_lease_service = AccountLeaseService()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+本地图片资源索引 - /static/images 的 O(1) 查找
+
+启动后首次访问时扫描一次资源目录，建立 文件名 / 去扩展名的主文件名 / 即梦图片UUID -> 本地路径 的映射；
+上传接口写入文件后调用 register 同步更新。未登记的写入（例如执行器下载的文件）由目录修改时间兜底：
+查找未命中时，仅当目录的 mtime 发生变化才重新扫描该目录，不再每个请求都遍历 tmp 目录。
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from backend.config.settings import ASSET_DIRS
+
+# 即梦平台生成的图片URL通常以32位十六进制UUID开头
+_UUID_PATTERN = re.compile(r'[a-fA-F0-9]{32}')
+
+
+def _aliases(filename: str) -> List[str]:
+    """文件的别名：UUID、'~' 之前的主文件名、去掉扩展名的文件名"""
+    aliases = [match.lower() for match in _UUID_PATTERN.findall(filename)]
+    aliases.append(filename.split('~')[0])
+    aliases.append(filename.split('.')[0])
+    aliases.append(os.path.splitext(filename)[0])
+    return aliases
+
+
+def lookup_keys(filename: str) -> List[str]:
+    """按优先级排列的查找键（与 _aliases 的索引方式对应）"""
+    keys = []
+    match = _UUID_PATTERN.match(filename)
+    if match:
+        keys.append(match.group(0).lower())
+    keys.append(filename.split('~')[0])
+    keys.append(filename.split('.')[0])
+    return keys
+
+
+class _DirectoryIndex:
+    """单个目录（不含子目录）的文件索引"""
+
+    __slots__ = ('directory', 'mtime_ns', 'names', 'aliases')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.mtime_ns = None
+        self.names: Dict[str, str] = {}
+        self.aliases: Dict[str, str] = {}
+
+    def add(self, filename: str):
+        path = os.path.join(self.directory, filename)
+        self.names[filename] = path
+        for alias in _aliases(filename):
+            self.aliases.setdefault(alias, path)
+
+    def remove(self, filename: str):
+        path = self.names.pop(filename, None)
+        if path is None:
+            return
+        for alias in _aliases(filename):
+            if self.aliases.get(alias) == path:
+                del self.aliases[alias]
+
+    def find_alias(self, filename: str) -> Optional[str]:
+        for key in lookup_keys(filename):
+            path = self.aliases.get(key)
+            if path:
+                return path
+        return None
+
+
+class AssetRegistry:
+    """按目录优先级查找本地图片文件"""
+
+    def __init__(self, directories: List[str] = ASSET_DIRS):
+        self._lock = threading.RLock()
+        self._indexes = [_DirectoryIndex(os.path.abspath(d)) for d in directories]
+        self._loaded = False
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'rescans': 0
+        }
+
+    @staticmethod
+    def _dir_mtime(directory: str) -> Optional[int]:
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self, index: _DirectoryIndex):
+        """重新扫描一个目录，用新索引整体替换旧索引"""
+        fresh = _DirectoryIndex(index.directory)
+        fresh.mtime_ns = self._dir_mtime(index.directory)
+        if fresh.mtime_ns is not None:
+            with os.scandir(index.directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        fresh.add(entry.name)
+        index.mtime_ns = fresh.mtime_ns
+        index.names = fresh.names
+        index.aliases = fresh.aliases
+        self.stats['rescans'] += 1
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                for index in self._indexes:
+                    self._scan(index)
+                self._loaded = True
+
+    def _refresh_changed(self) -> bool:
+        """重新扫描 mtime 发生变化的目录，返回是否有目录被重新扫描"""
+        changed = False
+        with self._lock:
+            for index in self._indexes:
+                if self._dir_mtime(index.directory) != index.mtime_ns:
+                    self._scan(index)
+                    changed = True
+        return changed
+
+    def _find(self, filename: str) -> Optional[str]:
+        # 先按完整文件名在各目录中查找，再按别名查找
+        with self._lock:
+            for index in self._indexes:
+                path = index.names.get(filename)
+                if path:
+                    return path
+            for index in self._indexes:
+                path = index.find_alias(filename)
+                if path:
+                    return path
+        return None
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """查找文件名对应的本地文件路径，找不到时返回 None"""
+        self._ensure_loaded()
+        path = self._find(filename)
+        if path and os.path.isfile(path):
+            self.stats['hits'] += 1
+            return path
+        # 未命中或文件已被删除：目录有变化时重新扫描后再查一次
+        if self._refresh_changed():
+            path = self._find(filename)
+            if path and os.path.isfile(path):
+                self.stats['hits'] += 1
+                return path
+        self.stats['misses'] += 1
+        return None
+
+    def _index_of(self, path: str) -> Optional[_DirectoryIndex]:
+        directory = os.path.dirname(os.path.abspath(path))
+        for index in self._indexes:
+            if index.directory == directory:
+                return index
+        return None
+
+    def register(self, path: str):
+        """登记新写入的资源文件（不在资源目录中的文件忽略）"""
+        if not self._loaded:
+            return
+        with self._lock:
+            index = self._index_of(path)
+            if index is not None:
+                index.add(os.path.basename(path))
+
+    def unregister(self, path: str):
+        """移除已删除的资源文件"""
+        if not self._loaded:
+            return
+        with self._lock:
+            index = self._index_of(path)
+            if index is not None:
+                index.remove(os.path.basename(path))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'files': sum(len(index.names) for index in self._indexes)
+            }
+
+
+# 全局资源索引实例
+asset_registry = AssetRegistry()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+异步执行引擎 - 常驻事件循环线程并发运行任务协程
+
+任务协程通过 run_coroutine_threadsafe 提交到常驻事件循环，多个浏览器任务在同一个循环中并发执行，
+不再为每个任务占用一个线程池线程、新建/销毁事件循环或重新启动 playwright 驱动。
+每个事件循环拥有自己的浏览器池。
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.utils.browser_pool import register_browser_pool, unregister_browser_pool
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在线程池中执行同步调用（数据库读写等）并等待结果
+
+    常驻事件循环上并发运行着多个任务协程，同步的数据库调用直接在协程中执行会阻塞整个循环，
+    协程中的同步数据库调用统一经由此函数放到线程池执行
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+class _LoopWorker:
+    """一个常驻事件循环线程"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.loop = asyncio.new_event_loop()
+        self.pool = register_browser_pool(self.loop)
+        self.pending: Dict[Future, None] = {}  # 正在该循环上运行的协程
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"AsyncEngine-{index}", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+        self._ready.wait()
+
+    def submit(self, coro) -> Future:
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        self.pending[future] = None
+        future.add_done_callback(lambda f: self.pending.pop(f, None))
+        return future
+
+    def stop(self, timeout: Optional[float] = None):
+        """等待在途协程结束，关闭浏览器池后停止事件循环"""
+        pending = list(self.pending)
+        if pending:
+            wait(pending, timeout=timeout)
+        try:
+            asyncio.run_coroutine_threadsafe(self.pool.close(), self.loop).result(timeout=30)
+        except Exception as e:
+            print(f"关闭事件循环 {self.index} 的浏览器池出错: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+        unregister_browser_pool(self.loop)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+
+class AsyncEngine:
+    """常驻事件循环组，按在途协程数把新协程分配给最空闲的循环"""
+
+    def __init__(self):
+        self._workers: List[_LoopWorker] = []
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self, loop_count: int = 1):
+        """启动指定数量的事件循环线程（已启动时忽略）"""
+        with self._lock:
+            if self._workers:
+                return
+            for index in range(max(int(loop_count), 1)):
+                worker = _LoopWorker(index + 1)
+                worker.start()
+                self._workers.append(worker)
+        print(f"异步执行引擎已启动，事件循环数: {len(self._workers)}")
+
+    def submit(self, coro) -> Future:
+        """将协程提交到最空闲的事件循环，返回 concurrent.futures.Future"""
+        with self._lock:
+            if not self._workers:
+                coro.close()
+                raise RuntimeError("异步执行引擎未启动")
+            worker = min(self._workers, key=lambda w: len(w.pending))
+            return worker.submit(coro)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在引擎中运行协程并阻塞等待结果（供同步代码调用）"""
+        return self.submit(coro).result(timeout=timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止所有事件循环，默认等待在途协程全部结束"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop(timeout)
+        if workers:
+            print("异步执行引擎已停止")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            workers = list(self._workers)
+        return {
+            'loops': len(workers),
+            'running_coroutines': sum(len(w.pending) for w in workers),
+            'per_loop': [len(w.pending) for w in workers]
+        }
+
+
+# 全局异步执行引擎实例
+async_engine = AsyncEngine()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+上传文件存储 - 按内容寻址保存任务的输入文件，按引用计数回收
+
+- 文件按 SHA-256 分目录保存：BLOB_STORE_DIR/<前两位>/<sha256><扩展名>，相同内容只保存一份
+- blobs 表记录每个文件被任务引用的次数，由任务表上的触发器在任务新建/修改/删除时维护
+  （见 migrations._blob_store），删除任务时不再直接删除文件
+- 引用归零的文件记录归零时间，后台线程按 (refcount, unref_at) 索引取出超过保留时间的文件分批回收，
+  清理开销只与待回收的文件数有关，不再遍历上传目录、逐个与任务表比对
+- 存储总大小超过 BLOB_STORE_MAX_BYTES 时立即唤醒回收，并只保留最短保留时间
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from peewee import Case, fn
+
+from backend.config.settings import (BLOB_GC_BATCH, BLOB_GC_GRACE, BLOB_GC_INTERVAL, BLOB_GC_MIN_GRACE,
+                                     BLOB_STORE_DIR, BLOB_STORE_MAX_BYTES)
+from backend.core.asset_registry import asset_registry
+from backend.models.models import Blob
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Linux ioctl FICLONE：在支持写时复制的文件系统（btrfs/xfs）上共享数据块
+FICLONE = 0x40049409
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# /static 路由按文件名查找存储中的文件：<sha256><扩展名>
+_BLOB_NAME = re.compile(r'^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$')
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source: str, dest: str) -> bool:
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
+
+
+def link_or_copy(source: str, dest: str) -> str:
+    """把 source 放到 dest（先写临时文件再原子替换），返回使用的方式：hardlink / reflink / copy"""
+    part_path = f"{dest}.{uuid.uuid4().hex}.part"
+    try:
+        os.link(source, part_path)
+        method = 'hardlink'
+    except OSError:
+        if _reflink(source, part_path):
+            method = 'reflink'
+        else:
+            shutil.copy2(source, part_path)
+            method = 'copy'
+    os.replace(part_path, dest)
+    return method
+
+
+class BlobStore:
+    """内容寻址的上传文件存储与引用计数回收"""
+
+    def __init__(self, root: str = BLOB_STORE_DIR, batch_size: int = BLOB_GC_BATCH,
+                 max_bytes: int = BLOB_STORE_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        # 按路径分段加锁：同一文件的存入与回收互斥
+        self._locks = [threading.Lock() for _ in range(64)]
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._total_bytes: Optional[int] = None
+        self.stats = {
+            'stored': 0,
+            'deduplicated': 0,
+            'collected': 0,
+            'collected_bytes': 0,
+            'errors': 0,
+            'runs': 0
+        }
+
+    def _lock_for(self, path: str) -> threading.Lock:
+        return self._locks[zlib.crc32(path.encode('utf-8')) % len(self._locks)]
+
+    def path_for(self, digest: str, ext: str = '') -> str:
+        return os.path.join(self.root, digest[:2], digest + ext.lower())
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """按文件名（<sha256><扩展名>）查找存储中的文件，不存在时返回 None"""
+        match = _BLOB_NAME.match(filename)
+        if not match:
+            return None
+        path = self.path_for(match.group(1), match.group(2) or '')
+        return path if os.path.isfile(path) else None
+
+    # ---------- 存入 ----------
+
+    def _register(self, path: str, digest: Optional[str]):
+        """登记文件；已登记且引用已归零时刷新归零时间，保证调用方写入任务前不会被回收"""
+        now = datetime.now()
+        Blob.insert(path=path, sha256=digest, size=os.path.getsize(path), refcount=0,
+                    create_at=now, unref_at=now).on_conflict(
+            conflict_target=[Blob.path],
+            update={Blob.unref_at: Case(None, ((Blob.refcount <= 0, now),), Blob.unref_at)}
+        ).execute()
+
+    def _store(self, digest: str, ext: str, place: Callable[[str], str]) -> Tuple[str, str]:
+        dest = self.path_for(digest, ext)
+        with self._lock_for(dest):
+            if os.path.exists(dest):
+                method = 'existing'
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                method = place(dest)
+            self._register(dest, digest)
+
+        if method == 'existing':
+            self.stats['deduplicated'] += 1
+        else:
+            self.stats['stored'] += 1
+            self._add_bytes(os.path.getsize(dest))
+        return dest, method
+
+    def put_file(self, source: str) -> Dict:
+        """存入本地文件（优先硬链接/reflink），返回 {'source', 'path', 'sha256', 'method'}，
+        method 为 existing 时表示已有相同内容的文件"""
+        digest = file_sha256(source)
+        path, method = self._store(digest, os.path.splitext(source)[1],
+                                   lambda dest: link_or_copy(source, dest))
+        return {'source': source, 'path': path, 'sha256': digest, 'method': method}
+
+    def put_upload(self, file_storage, ext: Optional[str] = None) -> str:
+        """存入上传的文件（边写边计算哈希），返回存储中的路径"""
+        if ext is None:
+            ext = os.path.splitext(file_storage.filename or '')[1]
+        elif ext and not ext.startswith('.'):
+            ext = f".{ext}"
+
+        os.makedirs(self.root, exist_ok=True)
+        part_path = os.path.join(self.root, f"upload-{uuid.uuid4().hex}.part")
+        try:
+            digest = hashlib.sha256()
+            with open(part_path, 'wb') as f:
+                for chunk in iter(lambda: file_storage.stream.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            def place(dest):
+                os.replace(part_path, dest)
+                return 'upload'
+
+            path, _ = self._store(digest.hexdigest(), ext, place)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        return path
+
+    # ---------- 删除 ----------
+
+    def owns(self, path: str) -> bool:
+        """文件是否由存储管理（按引用计数回收）"""
+        return bool(path) and Blob.select().where(Blob.path == path).exists()
+
+    def remove_task_file(self, path: str) -> bool:
+        """
+        删除任务时释放它的输入文件：存储管理的文件由触发器减少引用、后台回收，这里不删除；
+        其他文件（存储启用前的任务等）照旧直接删除。返回文件是否已释放/删除
+        """
+        if not path:
+            return False
+        if self.owns(path):
+            return True
+        if os.path.exists(path):
+            os.remove(path)
+            asset_registry.unregister(path)
+            return True
+        return False
+
+    # ---------- 回收 ----------
+
+    def _add_bytes(self, size: int):
+        if self._total_bytes is None:
+            return
+        self._total_bytes += size
+        if self._total_bytes > self.max_bytes:
+            self._wake.set()
+
+    def total_bytes(self) -> int:
+        """已登记文件的总大小"""
+        total = Blob.select(fn.COALESCE(fn.SUM(Blob.size), 0)).scalar()
+        self._total_bytes = total
+        return total
+
+    def collect(self, grace: Optional[float] = None) -> Dict:
+        """
+        回收引用归零且超过保留时间的文件
+
+        Args:
+            grace: 保留时间（秒），为空时使用 BLOB_GC_GRACE
+        """
+        grace = BLOB_GC_GRACE if grace is None else grace
+        cutoff = datetime.now() - timedelta(seconds=grace)
+        collectable = (Blob.refcount <= 0) & (Blob.unref_at < cutoff)
+        deleted = freed = errors = 0
+
+        while True:
+            batch = list(Blob.select(Blob.id, Blob.path, Blob.size)
+                         .where(collectable)
+                         .order_by(Blob.unref_at)
+                         .limit(self.batch_size))
+            batch_deleted = 0
+            for blob in batch:
+                with self._lock_for(blob.path):
+                    # 条件删除：选出之后被重新引用或重新存入的文件不回收
+                    if not Blob.delete().where((Blob.id == blob.id) & collectable).execute():
+                        continue
+                    try:
+                        os.remove(blob.path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        # 文件被占用等：重新登记，下次回收时再试
+                        errors += 1
+                        print(f"回收上传文件失败: {blob.path}, 错误: {str(e)}")
+                        self._register(blob.path, None)
+                        continue
+                asset_registry.unregister(blob.path)
+                batch_deleted += 1
+                freed += blob.size or 0
+            deleted += batch_deleted
+            if len(batch) < self.batch_size or not batch_deleted:
+                break
+
+        self._sweep_parts(cutoff)
+        if self._total_bytes is not None:
+            self._total_bytes = max(0, self._total_bytes - freed)
+        self.stats['runs'] += 1
+        self.stats['collected'] += deleted
+        self.stats['collected_bytes'] += freed
+        self.stats['errors'] += errors
+        if deleted or errors:
+            print(f"回收上传文件: 删除 {deleted} 个（{freed} 字节），失败 {errors} 个")
+        return {'deleted_count': deleted, 'freed_bytes': freed, 'error_count': errors}
+
+    def _sweep_parts(self, cutoff: datetime):
+        """删除上传中断留下的临时文件（只在存储根目录，不遍历分片目录）"""
+        if not os.path.isdir(self.root):
+            return
+        deadline = cutoff.timestamp()
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.part'):
+                    try:
+                        if entry.stat().st_mtime < deadline:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+
+    def _gc_loop(self):
+        while True:
+            self._wake.wait(BLOB_GC_INTERVAL)
+            self._wake.clear()
+            try:
+                self.collect()
+                if self.total_bytes() > self.max_bytes:
+                    print(f"上传文件存储超过上限 {self.max_bytes} 字节，按最短保留时间回收")
+                    self.collect(grace=BLOB_GC_MIN_GRACE)
+            except Exception as e:
+                print(f"上传文件回收出错: {str(e)}")
+                time.sleep(BLOB_GC_MIN_GRACE)
+
+    def start(self):
+        """启动后台回收线程"""
+        if self._thread is not None:
+            return
+        try:
+            self.total_bytes()
+        except Exception as e:
+            print(f"统计上传文件存储大小失败: {str(e)}")
+        self._thread = threading.Thread(target=self._gc_loop, name="blob-gc", daemon=True)
+        self._thread.start()
+        self._wake.set()  # 启动后先回收一次
+        print(f"上传文件回收已启动，间隔: {BLOB_GC_INTERVAL} 秒，保留时间: {BLOB_GC_GRACE} 秒")
+
+    def get_stats(self) -> Dict:
+        garbage = Blob.select().where(Blob.refcount <= 0)
+        return {
+            **self.stats,
+            'files': Blob.select().count(),
+            'unreferenced': garbage.count(),
+            'total_bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes
+        }
+
+
+# 全局上传文件存储实例
+blob_store = BlobStore()
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+全局下载管理器 - 持久化的下载任务队列
+
+各功能的批量导出不再各自创建线程池，而是把文件写入 download_jobs 表并交给同一个工作线程池：
+- 全局并发数由 DOWNLOAD_MAX_WORKERS 限制，单个主机的并发连接数由 DOWNLOAD_PER_HOST_LIMIT 限制
+- 所有下载复用同一个带连接池的会话（见 download_util.get_shared_session）
+- 下载中的进度保存在内存中，完成/失败/取消时写回数据库
+- 服务重启后，排队中和下载中的任务重新入队
+- 提交批次时发布 download.batch 事件，状态变化发布 download.status 事件，下载进度按 EVENT_PROGRESS_INTERVAL 节流发布 download.progress 事件
+"""
+
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from peewee import fn
+
+from backend.config.settings import DOWNLOAD_MAX_WORKERS, DOWNLOAD_PER_HOST_LIMIT, EVENT_PROGRESS_INTERVAL
+from backend.core.event_bus import event_bus
+from backend.models.models import DownloadJob
+from backend.utils.download_util import download_file_with_retry
+
+# 状态码
+STATUS_QUEUED = 0
+STATUS_DOWNLOADING = 1
+STATUS_COMPLETED = 2
+STATUS_FAILED = 3
+STATUS_CANCELLED = 4
+
+STATUS_KEYS = {
+    STATUS_QUEUED: 'queued',
+    STATUS_DOWNLOADING: 'downloading',
+    STATUS_COMPLETED: 'completed',
+    STATUS_FAILED: 'failed',
+    STATUS_CANCELLED: 'cancelled',
+}
+
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_DOWNLOADING)
+
+
+class DownloadManager:
+    """持久化队列 + 全局工作线程池 + 按主机限流"""
+
+    def __init__(self, max_workers: int = DOWNLOAD_MAX_WORKERS, per_host_limit: int = DOWNLOAD_PER_HOST_LIMIT):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self._queue: 'queue.Queue[int]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._progress: Dict[int, tuple] = {}  # 下载中任务的 (bytes_done, bytes_total)
+        self._cancelled = set()
+        self._workers: List[threading.Thread] = []
+        self._started = False
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """启动工作线程，并恢复上次未完成的下载"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        # 上次退出时正在下载的任务重新排队（已下载的 .part 文件会续传）
+        DownloadJob.update(status=STATUS_QUEUED, update_at=datetime.now()).where(
+            DownloadJob.status == STATUS_DOWNLOADING
+        ).execute()
+        pending = DownloadJob.select(DownloadJob.id).where(
+            DownloadJob.status == STATUS_QUEUED
+        ).order_by(DownloadJob.create_at, DownloadJob.id)
+        for job in pending:
+            self._queue.put(job.id)
+        if pending.count():
+            print(f"恢复 {pending.count()} 个未完成的下载任务")
+
+        for index in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"download-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f"下载管理器已启动，工作线程: {self.max_workers}，单主机并发: {self.per_host_limit}")
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    @staticmethod
+    def _publish_status(job_ids: List[int], status: int, batch_id: Optional[str] = None, **extra):
+        for job_id in job_ids:
+            event_bus.publish('download.status', dict(
+                job_id=job_id, batch_id=batch_id, status=status, status_key=STATUS_KEYS[status], **extra
+            ))
+
+    # ---------- 执行 ----------
+
+    def _worker_loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                print(f"下载任务 {job_id} 执行出错: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job_id: int):
+        job = DownloadJob.get_or_none(DownloadJob.id == job_id)
+        if job is None or job.status != STATUS_QUEUED:
+            return
+
+        with self._host_slot(job.url):
+            # 等待主机名额期间可能已被取消
+            claimed = DownloadJob.update(
+                status=STATUS_DOWNLOADING,
+                attempts=DownloadJob.attempts + 1,
+                update_at=datetime.now()
+            ).where(
+                (DownloadJob.id == job_id) & (DownloadJob.status == STATUS_QUEUED)
+            ).execute()
+            if not claimed:
+                return
+            with self._lock:
+                self._progress[job_id] = (0, None)
+            self._publish_status([job_id], STATUS_DOWNLOADING, job.batch_id)
+            last_event = [0.0]
+
+            def on_progress(bytes_done, bytes_total):
+                with self._lock:
+                    self._progress[job_id] = (bytes_done, bytes_total)
+                    keep_going = job_id not in self._cancelled
+                now = time.time()
+                if now - last_event[0] >= EVENT_PROGRESS_INTERVAL:
+                    last_event[0] = now
+                    event_bus.publish('download.progress', {
+                        'job_id': job_id, 'batch_id': job.batch_id,
+                        'bytes_done': bytes_done, 'bytes_total': bytes_total
+                    })
+                return keep_going
+
+            result = download_file_with_retry(
+                url=job.url,
+                file_path=job.file_path,
+                max_retries=job.max_retries,
+                delay_between_downloads=0,
+                timeout=job.timeout,
+                filename=job.filename or None,
+                progress_callback=on_progress
+            )
+
+        with self._lock:
+            bytes_done, bytes_total = self._progress.pop(job_id, (0, None))
+            was_cancelled = job_id in self._cancelled
+            self._cancelled.discard(job_id)
+
+        if result['success']:
+            status, error = STATUS_COMPLETED, None
+            bytes_done = result.get('bytes', bytes_done)
+            bytes_total = bytes_total or bytes_done
+        elif result.get('cancelled') or was_cancelled:
+            status, error = STATUS_CANCELLED, result.get('error')
+        else:
+            status, error = STATUS_FAILED, result.get('error')
+
+        DownloadJob.update(
+            status=status,
+            bytes_done=bytes_done,
+            bytes_total=bytes_total,
+            error_message=error,
+            update_at=datetime.now()
+        ).where(DownloadJob.id == job_id).execute()
+        self._publish_status([job_id], status, job.batch_id, bytes_done=bytes_done, bytes_total=bytes_total,
+                             error=error)
+        self._notify()
+
+    # ---------- 提交与等待 ----------
+
+    @staticmethod
+    def new_batch_id() -> str:
+        """生成批次ID（接口可先把批次ID返回给前端，用户选择保存文件夹后再提交）"""
+        return uuid.uuid4().hex
+
+    def submit_batch(self, file_infos: List[Dict], source: str = '',
+                     max_retries: int = 5, timeout: int = 60, batch_id: Optional[str] = None) -> str:
+        """
+        提交一批下载任务，不等待下载完成
+
+        Args:
+            file_infos: 文件信息列表，每个元素包含 url, file_path, filename
+            source: 来源标识（用于下载列表筛选）
+            batch_id: 批次ID，为空时自动生成
+
+        Returns:
+            str: 批次ID（/api/downloads/batches/<batch_id> 查询进度、取消、重试）
+        """
+        self.start()
+        batch_id = batch_id or self.new_batch_id()
+        now = datetime.now()
+        job_ids = []
+        with DownloadJob._meta.database.atomic():
+            for file_info in file_infos:
+                job = DownloadJob.create(
+                    batch_id=batch_id,
+                    source=source,
+                    url=file_info['url'],
+                    file_path=file_info['file_path'],
+                    filename=file_info.get('filename') or '',
+                    max_retries=max_retries,
+                    timeout=timeout,
+                    create_at=now,
+                    update_at=now
+                )
+                job_ids.append(job.id)
+        for job_id in job_ids:
+            self._queue.put(job_id)
+        event_bus.publish('download.batch', {'batch_id': batch_id, 'source': source, 'total': len(job_ids)})
+        self._publish_status(job_ids, STATUS_QUEUED, batch_id)
+        print(f"已提交下载批次 {batch_id}，共 {len(job_ids)} 个文件")
+        return batch_id
+
+    def wait_batch(self, batch_id: str, timeout: Optional[float] = None) -> bool:
+        """等待批次中所有任务结束（完成/失败/取消），超时返回 False"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = DownloadJob.select().where(
+                (DownloadJob.batch_id == batch_id) & (DownloadJob.status.in_(ACTIVE_STATUSES))
+            ).count()
+            if remaining == 0:
+                return True
+            wait = 1.0
+            if deadline is not None:
+                wait = min(wait, deadline - time.time())
+                if wait <= 0:
+                    return False
+            with self._changed:
+                self._changed.wait(wait)
+
+    # ---------- 查询 ----------
+
+    def job_to_dict(self, job: DownloadJob) -> Dict:
+        """任务详情，下载中的任务使用内存中的实时进度"""
+        data = job.to_dict()
+        with self._lock:
+            progress = self._progress.get(job.id)
+        if progress is not None:
+            data['bytes_done'], data['bytes_total'] = progress
+        data['progress'] = (
+            round(data['bytes_done'] * 100 / data['bytes_total'], 1) if data['bytes_total'] else None
+        )
+        return data
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        job = DownloadJob.get_or_none(DownloadJob.id == job_id)
+        return self.job_to_dict(job) if job else None
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """批次进度：各状态数量、字节进度与任务列表"""
+        jobs = [self.job_to_dict(job) for job in DownloadJob.select().where(
+            DownloadJob.batch_id == batch_id
+        ).order_by(DownloadJob.id)]
+        if not jobs:
+            return None
+        summary = {key: 0 for key in STATUS_KEYS.values()}
+        for job in jobs:
+            summary[STATUS_KEYS.get(job['status'], 'queued')] += 1
+        summary['total'] = len(jobs)
+        return {
+            'batch_id': batch_id,
+            'source': jobs[0]['source'],
+            'summary': summary,
+            'bytes_done': sum(job['bytes_done'] or 0 for job in jobs),
+            'bytes_total': sum(job['bytes_total'] or 0 for job in jobs),
+            'finished': summary['queued'] == 0 and summary['downloading'] == 0,
+            'jobs': jobs
+        }
+
+    def get_summary(self) -> Dict:
+        """所有下载任务的状态汇总"""
+        summary = {key: 0 for key in STATUS_KEYS.values()}
+        rows = DownloadJob.select(DownloadJob.status, fn.COUNT(DownloadJob.id).alias('count')).group_by(
+            DownloadJob.status
+        ).tuples()
+        for status, count in rows:
+            summary[STATUS_KEYS.get(status, 'queued')] += count
+        summary['total'] = sum(summary.values())
+        summary['workers'] = self.max_workers
+        summary['per_host_limit'] = self.per_host_limit
+        return summary
+
+    # ---------- 取消与重试 ----------
+
+    def _cancel_where(self, condition) -> int:
+        """取消匹配的排队中/下载中任务，返回取消数量"""
+        active = condition & DownloadJob.status.in_(ACTIVE_STATUSES)
+        downloading = [job.id for job in DownloadJob.select(DownloadJob.id).where(
+            active & (DownloadJob.status == STATUS_DOWNLOADING)
+        )]
+        with self._lock:
+            # 下载中的任务在下一个数据块时中止，由工作线程写回取消状态
+            self._cancelled.update(downloading)
+        # 排队中的任务直接标记为取消，工作线程取到时会跳过
+        queued_ids = [job.id for job in DownloadJob.select(DownloadJob.id).where(
+            condition & (DownloadJob.status == STATUS_QUEUED)
+        )]
+        queued = 0
+        if queued_ids:
+            queued = DownloadJob.update(
+                status=STATUS_CANCELLED, error_message='下载已取消', update_at=datetime.now()
+            ).where(DownloadJob.id.in_(queued_ids) & (DownloadJob.status == STATUS_QUEUED)).execute()
+            self._publish_status(queued_ids, STATUS_CANCELLED)
+        self._notify()
+        return queued + len(downloading)
+
+    def cancel(self, job_id: int) -> int:
+        return self._cancel_where(DownloadJob.id == job_id)
+
+    def cancel_batch(self, batch_id: str) -> int:
+        return self._cancel_where(DownloadJob.batch_id == batch_id)
+
+    def _retry_where(self, condition) -> int:
+        """重新排队匹配的失败/已取消任务，返回重试数量"""
+        job_ids = [job.id for job in DownloadJob.select(DownloadJob.id).where(
+            condition & DownloadJob.status.in_((STATUS_FAILED, STATUS_CANCELLED))
+        ).order_by(DownloadJob.id)]
+        if not job_ids:
+            return 0
+        DownloadJob.update(
+            status=STATUS_QUEUED, bytes_done=0, error_message=None, update_at=datetime.now()
+        ).where(DownloadJob.id.in_(job_ids)).execute()
+        self.start()
+        for job_id in job_ids:
+            self._queue.put(job_id)
+        self._publish_status(job_ids, STATUS_QUEUED)
+        return len(job_ids)
+
+    def retry(self, job_id: int) -> int:
+        return self._retry_where(DownloadJob.id == job_id)
+
+    def retry_batch(self, batch_id: str) -> int:
+        return self._retry_where(DownloadJob.batch_id == batch_id)
+
+
+# 全局下载管理器实例
+download_manager = DownloadManager()
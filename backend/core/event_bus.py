@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+进程内事件总线 - 任务状态变化、进度与槽位变化的发布/订阅
+
+- 发布方（任务模型保存/批量更新、全局任务管理器、下载管理器）调用 publish，不阻塞、不做 IO
+- 事件ID为 "<启动时间戳>-<序号>"，最近 EVENT_BUFFER_SIZE 条事件保存在环形缓冲中，
+  客户端断线重连时带上最后收到的ID即可补发之后的事件；ID 已被淘汰或来自上一次启动时收到 reset 事件，
+  客户端应重新全量加载
+- 每个订阅者有独立的有界队列（EVENT_CLIENT_QUEUE_SIZE），慢客户端队列满时不再入队也不阻塞发布方，
+  等它下次读取时从环形缓冲中按最后送达的ID补齐，补不齐则收到 reset
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+from backend.config.settings import EVENT_BUFFER_SIZE, EVENT_CLIENT_QUEUE_SIZE
+
+# 订阅者落后太多、需要重新全量加载时收到的事件类型
+RESET_EVENT = 'reset'
+
+
+class Event:
+    """一条事件"""
+
+    __slots__ = ('seq', 'id', 'type', 'data', 'time')
+
+    def __init__(self, seq: int, event_id: str, event_type: str, data: Dict):
+        self.seq = seq
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.time = time.time()
+
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'type': self.type, 'time': self.time, 'data': self.data}
+
+
+class Subscription:
+    """一个订阅者的有界队列"""
+
+    def __init__(self, bus: 'EventBus', types: Optional[Iterable[str]], max_queue: int):
+        self._bus = bus
+        self.types = set(types) if types else None
+        self.max_queue = max_queue
+        self.last_seq = 0
+        self._pending: deque = deque()
+        self._overflowed = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def wants(self, event: Event) -> bool:
+        return self.types is None or event.type == RESET_EVENT or event.type in self.types
+
+    def _offer(self, event: Event):
+        """由 EventBus.publish 在总线锁内调用，不阻塞"""
+        with self._cond:
+            if self._closed or self._overflowed:
+                return
+            if len(self._pending) >= self.max_queue:
+                # 队列满：丢弃已排队的事件，下次读取时从环形缓冲补齐
+                self._overflowed = True
+                self._pending.clear()
+            else:
+                self._pending.append(event)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> List[Event]:
+        """取出待发送的事件，超时返回空列表"""
+        with self._cond:
+            if not self._pending and not self._overflowed and not self._closed:
+                self._cond.wait(timeout)
+            if self._closed:
+                return []
+            overflowed = self._overflowed
+            events = list(self._pending)
+            self._pending.clear()
+            self._overflowed = False
+
+        if overflowed:
+            events = self._bus._catch_up(self)
+        events = [event for event in events if event.seq > self.last_seq or event.type == RESET_EVENT]
+        if events:
+            self.last_seq = max(self.last_seq, max(event.seq for event in events))
+        return events
+
+    def close(self):
+        self._bus.unsubscribe(self)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class EventBus:
+    """进程内发布/订阅，带环形缓冲用于断线续传"""
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, client_queue_size: int = EVENT_CLIENT_QUEUE_SIZE):
+        self.boot_id = str(int(time.time()))
+        self.client_queue_size = client_queue_size
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: List[Subscription] = []
+
+    def publish(self, event_type: str, data: Optional[Dict] = None) -> str:
+        """发布事件，返回事件ID"""
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, f"{self.boot_id}-{self._seq}", event_type, data or {})
+            self._buffer.append(event)
+            for subscription in self._subscribers:
+                if subscription.wants(event):
+                    subscription._offer(event)
+        return event.id
+
+    def _parse_id(self, event_id: Optional[str]) -> Optional[int]:
+        """解析事件ID中的序号，来自上一次启动或格式错误时返回 None"""
+        try:
+            boot_id, seq = event_id.rsplit('-', 1)
+            return int(seq) if boot_id == self.boot_id else None
+        except (AttributeError, ValueError):
+            return None
+
+    def _replay(self, subscription: Subscription, after_seq: int) -> List[Event]:
+        """环形缓冲中 after_seq 之后的事件，已被淘汰时返回 reset 事件（需持有总线锁）"""
+        oldest = self._buffer[0].seq if self._buffer else self._seq + 1
+        if after_seq > self._seq or after_seq < oldest - 1:
+            reset = Event(self._seq, f"{self.boot_id}-{self._seq}", RESET_EVENT, {'reason': 'events_dropped'})
+            subscription.last_seq = self._seq
+            return [reset]
+        return [event for event in self._buffer if event.seq > after_seq and subscription.wants(event)]
+
+    def _catch_up(self, subscription: Subscription) -> List[Event]:
+        """队列溢出后按最后送达的ID补齐"""
+        with self._lock:
+            return self._replay(subscription, subscription.last_seq)
+
+    def subscribe(self, last_event_id: Optional[str] = None,
+                  types: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        订阅事件
+
+        Args:
+            last_event_id: 客户端最后收到的事件ID，传入时先补发之后的事件
+            types: 只接收这些类型的事件，为空时接收全部
+        """
+        subscription = Subscription(self, types, self.client_queue_size)
+        with self._lock:
+            if last_event_id:
+                after_seq = self._parse_id(last_event_id)
+                if after_seq is None:
+                    after_seq = -1
+                else:
+                    subscription.last_seq = after_seq
+                subscription._pending.extend(self._replay(subscription, after_seq))
+            else:
+                subscription.last_seq = self._seq
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'last_event_id': f"{self.boot_id}-{self._seq}",
+                'buffered': len(self._buffer),
+                'subscribers': len(self._subscribers)
+            }
+
+
+# 全局事件总线实例
+event_bus = EventBus()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+文件夹导入 - 图生图 / 图生视频等以图片驱动的任务从本地文件夹批量导入
+
+- 每次导入分配一个 job_id，进度可通过 /api/imports/<job_id> 查询，同时发布 import.progress 事件
+- 有界线程池（IMPORT_WORKERS）并行计算图片的 SHA-256，存入上传文件存储（blob_store，按内容寻址），
+  同一张图片无论导入多少次只保存一份
+- 存储中不存在时优先硬链接（同一文件系统，不占额外空间），其次 reflink（Linux 写时复制），最后才复制
+- 全部图片入库后用 bulk_create_tasks 批量写入任务
+"""
+
+import os
+import platform
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from backend.config.settings import EVENT_PROGRESS_INTERVAL, IMPORT_JOB_HISTORY, IMPORT_WORKERS
+from backend.core.blob_store import blob_store
+from backend.core.event_bus import event_bus
+from backend.core.task_ingest import bulk_create_tasks
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
+
+MAX_JOB_ERRORS = 50
+
+
+def choose_folder(prompt: str = "选择包含图片的文件夹") -> Optional[str]:
+    """调用系统原生文件夹选择对话框，取消时返回 None"""
+    system = platform.system()
+    if system == "Darwin":  # macOS
+        command = [
+            'osascript', '-e',
+            f'tell application "Finder" to set folder_path to (choose folder with prompt "{prompt}") as string',
+            '-e',
+            'return POSIX path of folder_path'
+        ]
+    elif system == "Windows":  # Windows
+        command = [
+            'powershell', '-Command',
+            'Add-Type -AssemblyName System.Windows.Forms; $folder = New-Object System.Windows.Forms.FolderBrowserDialog; '
+            f'$folder.Description = "{prompt}"; $folder.ShowNewFolderButton = $true; '
+            'if ($folder.ShowDialog() -eq "OK") { $folder.SelectedPath } else { "" }'
+        ]
+    elif system == "Linux":  # Linux
+        command = ['zenity', '--file-selection', '--directory', f'--title={prompt}']
+    else:
+        return None
+
+    result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+    if result.returncode == 0 and result.stdout.strip():
+        return result.stdout.strip()
+    return None
+
+
+def scan_images(folder_path: str) -> List[str]:
+    """文件夹（不含子目录）中的图片文件，按文件名排序"""
+    with os.scandir(folder_path) as entries:
+        images = [entry.path for entry in entries
+                  if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS]
+    return sorted(images)
+
+
+class ImportJob:
+    """一次文件夹导入"""
+
+    def __init__(self, source: str):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.status = 'selecting'  # selecting / importing / completed / failed / cancelled
+        self.folder = None
+        self.total = 0
+        self.processed = 0
+        self.stored = 0  # 新存入的图片
+        self.deduplicated = 0  # 与已有图片内容相同、直接复用的图片
+        self.created = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.task_ids: List[int] = []
+        self.message = '等待选择文件夹'
+        self.create_at = datetime.now()
+        self.finish_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def add_error(self, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append(error)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'source': self.source,
+            'status': self.status,
+            'finished': self.finished,
+            'folder': self.folder,
+            'total': self.total,
+            'processed': self.processed,
+            'stored': self.stored,
+            'deduplicated': self.deduplicated,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'task_ids': self.task_ids,
+            'message': self.message,
+            'create_at': self.create_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'finish_at': self.finish_at.strftime('%Y-%m-%d %H:%M:%S') if self.finish_at else None
+        }
+
+
+class FolderImporter:
+    """文件夹导入任务的执行与进度查询"""
+
+    def __init__(self, max_workers: int = IMPORT_WORKERS, history: int = IMPORT_JOB_HISTORY):
+        self.max_workers = max_workers
+        self.history = history
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, ImportJob]' = OrderedDict()
+
+    def start(self, source: str, model, build_row: Callable[[str], Dict],
+              folder_path: Optional[str] = None,
+              on_created: Optional[Callable[[List[int]], None]] = None) -> ImportJob:
+        """
+        开始一次导入
+
+        Args:
+            source: 来源标识（img2img / img2video / qingying_img2video）
+            model: 任务模型
+            build_row: 入库后的图片路径 -> 任务字段
+            folder_path: 文件夹路径，为空时弹出系统文件夹选择对话框
+            on_created: 任务写入后的回调（通知分发总线等）
+        """
+        job = ImportJob(source)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        thread = threading.Thread(target=self._run, args=(job, model, build_row, folder_path, on_created),
+                                  name=f"folder-import-{job.id[:8]}", daemon=True)
+        thread.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[ImportJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _publish(self, job: ImportJob):
+        event_bus.publish('import.progress', job.to_dict())
+
+    def _run(self, job: ImportJob, model, build_row, folder_path, on_created):
+        try:
+            folder_path = folder_path or choose_folder()
+            if not folder_path:
+                job.status, job.message = 'cancelled', '已取消文件夹选择'
+                return
+            if not os.path.isdir(folder_path):
+                job.status, job.message = 'failed', f'文件夹不存在: {folder_path}'
+                return
+
+            job.folder = folder_path
+            images = scan_images(folder_path)
+            job.total = len(images)
+            job.status, job.message = 'importing', f'找到 {len(images)} 张图片'
+            print(f"文件夹导入 {job.id}: {folder_path}，找到 {len(images)} 张图片")
+            self._publish(job)
+
+            stored = self._store_all(job, images)
+            result = bulk_create_tasks(model, stored, lambda item: build_row(item['path']))
+            job.task_ids = result.created_ids
+            job.created = len(job.task_ids)
+            for error in result.failed:
+                job.add_error(error)
+            if job.task_ids and on_created:
+                on_created(job.task_ids)
+
+            job.status = 'completed'
+            job.message = f"成功创建 {job.created} 个任务，新存入 {job.stored} 张图片，重复图片 {job.deduplicated} 张"
+            if job.failed:
+                job.message += f"，失败 {job.failed} 张"
+            print(f"文件夹导入 {job.id} 完成: {job.message}")
+        except Exception as e:
+            job.status, job.message = 'failed', f'文件夹导入失败: {str(e)}'
+            print(f"文件夹导入 {job.id} 失败: {str(e)}")
+        finally:
+            job.finish_at = datetime.now()
+            self._publish(job)
+
+    def _store_all(self, job: ImportJob, images: List[str]) -> List[Dict]:
+        """并行入库，返回成功入库的图片（保持原顺序）"""
+        results: List[Optional[Dict]] = [None] * len(images)
+        last_event = time.time()
+
+        def store(index_path):
+            index, path = index_path
+            try:
+                return index, blob_store.put_file(path), None
+            except OSError as e:
+                return index, None, f"{os.path.basename(path)}: {str(e)}"
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for index, item, error in executor.map(store, enumerate(images)):
+                job.processed += 1
+                if error:
+                    job.add_error(error)
+                else:
+                    results[index] = item
+                    if item['method'] == 'existing':
+                        job.deduplicated += 1
+                    else:
+                        job.stored += 1
+                if time.time() - last_event >= EVENT_PROGRESS_INTERVAL:
+                    last_event = time.time()
+                    self._publish(job)
+        return [item for item in results if item]
+
+
+# 全局文件夹导入实例
+folder_importer = FolderImporter()
@@ -3,6 +3,8 @@
 全局任务管理器 - 汇总所有平台的任务状态和个数
 """
 
+import asyncio
+import inspect
 import threading
 import time
 from datetime import datetime
@@ -17,7 +19,17 @@ from backend.managers.jimeng_first_last_frame_img2video_task_manager import jime
 from backend.managers.jimeng_text2video_task_manager import jimeng_text2video_task_manager
 from backend.managers.jimeng_digital_human_task_manager import jimeng_digital_human_task_manager
 from backend.managers.qingying_img2video_task_manager import QingyingImg2VideoTaskManager
-from backend.utils.config_util import get_automation_max_threads
+from backend.core.task_scheduler import TaskScheduler
+from backend.core.async_engine import async_engine, run_blocking
+from backend.core.event_bus import event_bus
+from backend.core.account_lease import account_lease_service
+from backend.core.task_stats import task_status_counter
+from backend.models.models import (JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask,
+                                   JimengFirstLastFrameImg2VideoTask, JimengText2VideoTask,
+                                   JimengDigitalHumanTask, QingyingImage2VideoTask, TASK_MODELS)
+from backend.utils.config_util import (get_automation_max_threads, get_scheduler_platform_policies,
+                                       get_async_engine_loops)
+from backend.utils.browser_pool import get_browser_pool_stats
 
 class GlobalTaskManagerStatus(Enum):
     """全局任务管理器状态枚举"""
@@ -26,6 +38,17 @@ class GlobalTaskManagerStatus(Enum):
     PAUSED = "paused"
     ERROR = "error"
 
+# 平台名称 -> 任务表模型
+PLATFORM_TASK_MODELS = {
+    'jimeng': JimengText2ImgTask,
+    'jimeng_img2img': JimengImg2ImgTask,
+    'jimeng_img2video': JimengImg2VideoTask,
+    'jimeng_first_last_frame_img2video': JimengFirstLastFrameImg2VideoTask,
+    'jimeng_text2video': JimengText2VideoTask,
+    'jimeng_digital_human': JimengDigitalHumanTask,
+    'qingying_img2video': QingyingImage2VideoTask,
+}
+
 class GlobalTaskManager:
     """全局任务管理器 - 汇总所有平台任务状态"""
     
@@ -43,6 +66,7 @@ class GlobalTaskManager:
         self.max_threads = 0
         self.active_tasks = {}  # 存储正在执行的任务信息 {thread_id: task_info}
         self._task_id_counter = 0  # 用于分配线程ID
+        self.scheduler = None  # 统一优先级调度器（所有平台共用一个就绪队列）
         
         # 初始化所有平台任务管理器
         self._init_platform_managers()
@@ -88,11 +112,24 @@ class GlobalTaskManager:
         self.status = GlobalTaskManagerStatus.RUNNING
         self.stats['start_time'] = datetime.now()
         
-        # 创建全局线程池
+        # 创建全局线程池（仅用于同步任务函数，线程按需创建）
         self.max_threads = get_automation_max_threads()
         self.global_executor = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="GlobalWorker")
         print(f"创建全局线程池，最大线程数: {self.max_threads}")
         
+        # 启动异步执行引擎，协程任务在常驻事件循环中并发运行，不占用线程池线程
+        async_engine.start(get_async_engine_loops())
+        
+        # 加载即梦账号今日用量，之后的选号都在内存中完成
+        try:
+            account_lease_service.reload()
+        except Exception as e:
+            print(f"加载账号用量失败，将在首次选号时重试: {e}")
+        
+        # 创建统一调度器，并发槽位数即最大并发任务数
+        self.scheduler = TaskScheduler(self.max_threads, self._launch_entry)
+        self._apply_platform_policies()
+        
         # 等待一段时间确保数据库操作完全完成
         time.sleep(2.0)
         print("开始启动平台任务管理器...")
@@ -147,12 +184,21 @@ class GlobalTaskManager:
             except Exception as e:
                 print(f"{platform_name}平台停止异常: {str(e)}")
         
+        # 清空就绪队列中尚未执行的任务
+        if self.scheduler:
+            dropped = self.scheduler.drain()
+            if dropped:
+                print(f"已移除就绪队列中 {len(dropped)} 个未执行的任务")
+        
         # 关闭全局线程池
         if self.global_executor:
             self.global_executor.shutdown(wait=True)
             self.global_executor = None
             print("全局线程池已关闭")
         
+        # 等待在途协程结束，关闭常驻浏览器并停止事件循环
+        async_engine.stop()
+        
         self.active_tasks.clear()
         self.stats['running_platforms'] = 0
         print(f"全局任务管理器已停止，成功停止 {success_count} 个平台")
@@ -162,6 +208,8 @@ class GlobalTaskManager:
         """暂停全局任务管理器"""
         if self.status == GlobalTaskManagerStatus.RUNNING:
             self.status = GlobalTaskManagerStatus.PAUSED
+            if self.scheduler:
+                self.scheduler.pause()
             
             # 暂停所有平台任务管理器
             success_count = 0
@@ -180,6 +228,8 @@ class GlobalTaskManager:
         """恢复全局任务管理器"""
         if self.status == GlobalTaskManagerStatus.PAUSED:
             self.status = GlobalTaskManagerStatus.RUNNING
+            if self.scheduler:
+                self.scheduler.resume()
             
             # 恢复所有平台任务管理器
             success_count = 0
@@ -204,6 +254,12 @@ class GlobalTaskManager:
         
         platform_summaries = {}
         
+        # 过期的任务表合并为一条 UNION ALL 查询加载，之后各平台汇总均读取内存计数
+        try:
+            task_status_counter.refresh(TASK_MODELS)
+        except Exception as e:
+            print(f"加载任务状态计数失败: {str(e)}")
+        
         for platform_name, manager in self.platform_managers.items():
             try:
                 platform_summary = manager.get_summary()
@@ -249,6 +305,10 @@ class GlobalTaskManager:
             except:
                 pass
         
+        scheduler_stats = self.scheduler.get_stats() if self.scheduler else {}
+        if scheduler_stats:
+            active_threads = scheduler_stats['running']
+        
         return {
             'status': self.status.value,
             'uptime': (datetime.now() - self.stats['start_time']).total_seconds() 
@@ -256,13 +316,22 @@ class GlobalTaskManager:
             'platform_count': self.stats['total_platforms'],
             'running_platforms': self.stats['running_platforms'],
             'max_threads': max_threads,
-            'active_threads': active_threads
+            'active_threads': active_threads,
+            'queued_tasks': scheduler_stats.get('queued', 0),
+            'scheduler': scheduler_stats,
+            'async_engine': async_engine.get_stats(),
+            'browser_pools': get_browser_pool_stats(),
+            'account_leases': account_lease_service.get_stats()
         }
     
     def get_platform_manager(self, platform_name: str):
         """获取指定平台的任务管理器"""
         return self.platform_managers.get(platform_name)
     
+    def get_task_model(self, platform_name: str):
+        """获取指定平台的任务表模型"""
+        return PLATFORM_TASK_MODELS.get(platform_name)
+    
     def get_platform_list(self) -> List[str]:
         """获取所有平台名称列表"""
         return list(self.platform_managers.keys())
@@ -307,54 +376,207 @@ class GlobalTaskManager:
         
         return threads
     
-    def submit_task(self, platform_name: str, task_callable, *args, **kwargs):
-        """提交任务到全局线程池"""
+    def _apply_platform_policies(self):
+        """从配置加载各平台的调度权重与并发配额"""
+        policies = get_scheduler_platform_policies()
+        for platform_key, policy in policies.items():
+            manager = self.platform_managers.get(platform_key)
+            platform_name = getattr(manager, 'platform_name', platform_key) if manager else platform_key
+            try:
+                self.scheduler.set_platform_policy(
+                    platform_name,
+                    weight=policy.get('weight', 1),
+                    quota=policy.get('quota', 0)
+                )
+                print(f"平台调度策略: {platform_name} 权重={policy.get('weight', 1)} 配额={policy.get('quota', 0)}")
+            except (TypeError, ValueError, AttributeError) as e:
+                print(f"平台调度策略配置无效: {platform_key}, 错误: {str(e)}")
+    
+    @staticmethod
+    def _build_precheck(task_obj):
+        """为数据库任务对象构建出队前检查：任务仍存在且仍处于排队状态才执行"""
+        model = type(task_obj)
+        meta = getattr(model, '_meta', None)
+        if meta is None or 'status' not in meta.fields:
+            return None
+        pk = task_obj.id
+        return lambda: model.select().where((model.id == pk) & (model.status == 0)).exists()
+    
+    def submit_task(self, platform_name: str, task_callable, *args, priority=None, **kwargs):
+        """提交任务到统一调度器的就绪队列，槽位空闲时按优先级出队执行"""
         print(f"全局任务管理器收到任务提交请求: platform={platform_name}, task_id={kwargs.get('task_id')}")
         
-        if not self.global_executor:
+        if not self.global_executor or not self.scheduler:
             print("全局线程池未启动")
             raise RuntimeError("全局线程池未启动")
         
-        # 分配线程ID
-        thread_id = None
-        for i in range(1, self.max_threads + 1):
-            if i not in self.active_tasks:
-                thread_id = i
-                break
-        
-        if thread_id is None:
-            print(f"没有可用的线程，当前活跃任务: {len(self.active_tasks)}")
-            raise RuntimeError("没有可用的线程")
-        
         # 创建任务信息，从参数中提取任务ID
         task_id_value = kwargs.get('task_id')
-        if task_id_value is None and len(args) > 0:
-            # 如果第一个参数是数字，可能是任务ID
-            if isinstance(args[0], (int, str)):
+        precheck = None
+        if len(args) > 0:
+            if task_id_value is None and isinstance(args[0], (int, str)):
+                # 如果第一个参数是数字，可能是任务ID
                 task_id_value = args[0]
-            # 如果第一个参数是任务对象，尝试获取其id属性
             elif hasattr(args[0], 'id'):
-                task_id_value = args[0].id
+                # 如果第一个参数是任务对象，获取其id与优先级
+                if task_id_value is None:
+                    task_id_value = args[0].id
+                if priority is None:
+                    priority = getattr(args[0], 'priority', 0)
+                precheck = self._build_precheck(args[0])
         
         task_info = {
             'task_id': task_id_value or f'task_{self._task_id_counter}',
             'platform': platform_name,
             'task_type': kwargs.get('task_type', '未知'),
             'prompt': kwargs.get('prompt', None),
+            'priority': priority or 0,
             'progress': 0,
-            'start_time': datetime.now()
+            'start_time': None
         }
-        
         self._task_id_counter += 1
-        self.active_tasks[thread_id] = task_info
         
-        print(f"任务已分配到线程 {thread_id}: {task_info}")
-        
-        # 提交任务
-        future = self.global_executor.submit(self._execute_task_wrapper, thread_id, task_callable, *args, **kwargs)
-        print(f"任务已提交到全局线程池，Future: {future}")
+        future = self.scheduler.submit(platform_name, priority or 0, task_callable, args, kwargs,
+                                       task_info, precheck=precheck)
+        print(f"任务已进入就绪队列: {task_info}")
         return future
     
+    def _launch_entry(self, thread_id: int, entry):
+        """调度器回调：在分配到的槽位上启动任务"""
+        entry.task_info['start_time'] = datetime.now()
+        self.active_tasks[thread_id] = entry.task_info
+        print(f"任务已分配到线程 {thread_id}: {entry.task_info}")
+        event_bus.publish('slot.acquired', self._slot_event_data(thread_id, entry))
+        try:
+            if asyncio.iscoroutinefunction(entry.task_callable):
+                # 协程任务提交到异步执行引擎的常驻事件循环
+                async_engine.submit(self._run_entry_async(thread_id, entry))
+            else:
+                self.global_executor.submit(self._run_entry, thread_id, entry)
+        except RuntimeError as e:
+            # 线程池或异步执行引擎已关闭
+            print(f"提交任务到全局线程池失败: {str(e)}")
+            self.active_tasks.pop(thread_id, None)
+            entry.future.cancel()
+            self._release_slot(thread_id, entry)
+    
+    @staticmethod
+    def _slot_event_data(thread_id: int, entry) -> Dict:
+        return {
+            'slot': thread_id,
+            'platform': entry.platform,
+            'task_id': entry.task_info.get('task_id'),
+            'task_type': entry.task_info.get('task_type')
+        }
+    
+    def _release_slot(self, thread_id: int, entry):
+        """归还槽位并发布 slot.released 事件（附带调度器统计）"""
+        self.scheduler.release(thread_id, entry)
+        data = self._slot_event_data(thread_id, entry)
+        data['scheduler'] = self.scheduler.get_stats()
+        event_bus.publish('slot.released', data)
+    
+    def _set_progress(self, thread_id: int, progress: int):
+        """更新槽位上任务的进度并发布 task.progress 事件"""
+        task_info = self.active_tasks.get(thread_id)
+        if task_info is None:
+            return
+        task_info['progress'] = progress
+        event_bus.publish('task.progress', {
+            'slot': thread_id,
+            'platform': task_info.get('platform'),
+            'task_id': task_info.get('task_id'),
+            'progress': progress
+        })
+    
+    def _run_entry(self, thread_id: int, entry):
+        """在线程池中执行已出队的任务，并在结束时归还槽位"""
+        future = entry.future
+        if not future.set_running_or_notify_cancel():
+            self.active_tasks.pop(thread_id, None)
+            self._release_slot(thread_id, entry)
+            return
+        
+        result = None
+        error = None
+        try:
+            if entry.precheck and not entry.precheck():
+                print(f"任务在排队期间已被删除或状态已变更，跳过执行: {entry.task_info.get('task_id')}")
+                self.active_tasks.pop(thread_id, None)
+            else:
+                result = self._execute_task_wrapper(thread_id, entry.task_callable, *entry.args, **entry.kwargs)
+        except BaseException as e:
+            error = e
+        finally:
+            # 先归还槽位再通知完成，保证完成回调中看到的是最新的空闲槽位
+            self._release_slot(thread_id, entry)
+        
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    async def _run_entry_async(self, thread_id: int, entry):
+        """在异步执行引擎中执行已出队的协程任务，并在结束时归还槽位"""
+        future = entry.future
+        if not future.set_running_or_notify_cancel():
+            self.active_tasks.pop(thread_id, None)
+            self._release_slot(thread_id, entry)
+            return
+        
+        result = None
+        error = None
+        try:
+            # 预检查是同步的数据库查询，放到线程池执行，不阻塞事件循环上的其他任务
+            if entry.precheck and not await run_blocking(entry.precheck):
+                print(f"任务在排队期间已被删除或状态已变更，跳过执行: {entry.task_info.get('task_id')}")
+                self.active_tasks.pop(thread_id, None)
+            else:
+                result = await self._execute_task_wrapper_async(thread_id, entry.task_callable,
+                                                                *entry.args, **entry.kwargs)
+        except BaseException as e:
+            error = e
+        finally:
+            self._release_slot(thread_id, entry)
+        
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    async def _execute_task_wrapper_async(self, thread_id: int, task_callable, *args, **kwargs):
+        """协程任务执行包装器，用于清理槽位状态"""
+        task_info = self.active_tasks.get(thread_id, {})
+        print(f"开始执行协程任务: 槽位{thread_id}, 任务ID={task_info.get('task_id')}, 平台={task_info.get('platform')}")
+        try:
+            self._set_progress(thread_id, 50)
+            func_args, func_kwargs = self._bind_task_arguments(task_callable, args, kwargs)
+            result = await task_callable(*func_args, **func_kwargs)
+            self._set_progress(thread_id, 100)
+            return result
+        except Exception as e:
+            print(f"任务执行异常: 槽位{thread_id}, 错误: {str(e)}")
+            raise
+        finally:
+            self.active_tasks.pop(thread_id, None)
+    
+    @staticmethod
+    def _bind_task_arguments(task_callable, args, kwargs):
+        """按任务函数签名挑选参数：同名关键字参数优先，其余按位置取自args"""
+        func_args = []
+        func_kwargs = {}
+        positional = iter(args)
+        for param_name in inspect.signature(task_callable).parameters:
+            if param_name == 'self':
+                continue
+            if param_name in kwargs:
+                func_kwargs[param_name] = kwargs[param_name]
+            else:
+                value = next(positional, inspect.Parameter.empty)
+                if value is not inspect.Parameter.empty:
+                    func_args.append(value)
+        return func_args, func_kwargs
+    
     def _execute_task_wrapper(self, thread_id: int, task_callable, *args, **kwargs):
         """任务执行包装器，用于清理线程状态"""
         task_info = self.active_tasks.get(thread_id, {})
@@ -363,7 +585,7 @@ class GlobalTaskManager:
         try:
             # 更新进度为处理中
             if thread_id in self.active_tasks:
-                self.active_tasks[thread_id]['progress'] = 50
+                self._set_progress(thread_id, 50)
                 print(f"任务进度更新为50%: 线程{thread_id}")
             
             # 执行实际任务
@@ -412,7 +634,7 @@ class GlobalTaskManager:
             
             # 更新进度为完成
             if thread_id in self.active_tasks:
-                self.active_tasks[thread_id]['progress'] = 100
+                self._set_progress(thread_id, 100)
                 print(f"任务进度更新为100%: 线程{thread_id}")
             
             return result
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+远程媒体缓存 - 生成结果图片/视频的本地磁盘缓存
+
+- 复用同一个带连接池的 requests.Session，不再每次请求新建连接
+- 缓存键为去掉签名参数后的URL（CDN签名会过期变化，但资源本身不变）
+- 磁盘总大小受 MEDIA_CACHE_MAX_BYTES 限制，超出时按最近最少使用淘汰
+- 同一个未缓存的URL并发请求时只向上游发起一次下载，其余请求等待该下载完成
+- 返回本地文件路径，由 send_file 处理 Range（视频拖动）与 ETag/Last-Modified 协商
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from backend.config.settings import MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES
+
+# CDN 签名/过期相关的查询参数，不参与缓存键
+SIGNATURE_PARAMS = {
+    'lk3s', 'expires', 'signature', 'policy', 'key-pair-id', 'auth_key', 'token', 'sign', 't'
+}
+
+DOWNLOAD_TIMEOUT = (10, 60)  # (连接超时, 读取超时) 秒
+CHUNK_SIZE = 64 * 1024
+
+
+def cache_key_of(url: str) -> str:
+    """去掉签名参数后的URL哈希"""
+    parts = urlsplit(url)
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in SIGNATURE_PARAMS and not name.lower().startswith('x-')
+    )
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET"]
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
+    })
+    return session
+
+
+class MediaCacheEntry:
+    """一个已缓存的远程文件"""
+
+    __slots__ = ('key', 'path', 'size', 'content_type')
+
+    def __init__(self, key: str, path: str, size: int, content_type: str):
+        self.key = key
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+
+
+class MediaCache:
+    """按URL缓存远程媒体文件的 LRU 磁盘缓存"""
+
+    def __init__(self, cache_dir: str = MEDIA_CACHE_DIR, max_bytes: int = MEDIA_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, MediaCacheEntry]' = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, threading.Event] = {}
+        self._loaded = False
+        self._session = None
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            self._session = _create_session()
+        return self._session
+
+    def _paths_of(self, key: str):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base, base + '.json'
+
+    def _ensure_loaded(self):
+        """启动后首次使用时扫描缓存目录，按修改时间恢复 LRU 顺序"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            found = []
+            if os.path.isdir(self.cache_dir):
+                for root, _, files in os.walk(self.cache_dir):
+                    for name in files:
+                        if not name.endswith('.json'):
+                            continue
+                        meta_path = os.path.join(root, name)
+                        data_path = meta_path[:-len('.json')]
+                        try:
+                            with open(meta_path, 'r', encoding='utf-8') as f:
+                                meta = json.load(f)
+                            stat = os.stat(data_path)
+                        except (OSError, ValueError):
+                            continue
+                        key = os.path.basename(data_path)
+                        found.append((stat.st_mtime, MediaCacheEntry(
+                            key, data_path, stat.st_size, meta.get('content_type') or 'application/octet-stream'
+                        )))
+            for _, entry in sorted(found, key=lambda item: item[0]):
+                self._entries[entry.key] = entry
+                self._total_bytes += entry.size
+            self._loaded = True
+        self._evict()
+
+    def _get_cached(self, key: str) -> Optional[MediaCacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.isfile(entry.path):
+                self._drop(entry)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _drop(self, entry: MediaCacheEntry):
+        """从索引中移除（调用方持有锁）"""
+        if self._entries.pop(entry.key, None) is not None:
+            self._total_bytes -= entry.size
+
+    def _evict(self):
+        """超出容量时淘汰最久未使用的文件"""
+        victims = []
+        with self._lock:
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, entry = self._entries.popitem(last=False)
+                self._total_bytes -= entry.size
+                victims.append(entry)
+                self.stats['evictions'] += 1
+        for entry in victims:
+            for path in self._paths_of(entry.key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _download(self, url: str, key: str) -> MediaCacheEntry:
+        data_path, meta_path = self._paths_of(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        tmp_path = f"{data_path}.{threading.get_ident()}.part"
+        try:
+            with self.session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('content-type', 'application/octet-stream')
+                size = 0
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            size += len(chunk)
+            os.replace(tmp_path, data_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'url': url.split('?')[0], 'content_type': content_type}, f)
+
+        entry = MediaCacheEntry(key, data_path, size, content_type)
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                self._drop(old)
+            self._entries[key] = entry
+            self._total_bytes += size
+        self._evict()
+        return entry
+
+    def fetch(self, url: str) -> MediaCacheEntry:
+        """
+        获取远程文件的本地缓存，未缓存时下载（并发请求合并为一次下载）
+
+        异常:
+            requests.RequestException: 上游下载失败
+        """
+        self._ensure_loaded()
+        key = cache_key_of(url)
+        while True:
+            entry = self._get_cached(key)
+            if entry is not None:
+                self.stats['hits'] += 1
+                return entry
+
+            with self._lock:
+                event = self._inflight.get(key)
+                leader = event is None
+                if leader:
+                    event = threading.Event()
+                    self._inflight[key] = event
+
+            if not leader:
+                # 已有请求在下载同一URL，等待其完成后重新检查缓存；
+                # 领头请求失败时缓存仍未命中，当前请求会在下一轮自己发起下载
+                self.stats['coalesced'] += 1
+                event.wait(DOWNLOAD_TIMEOUT[0] + DOWNLOAD_TIMEOUT[1])
+                continue
+
+            self.stats['misses'] += 1
+            try:
+                return self._download(url, key)
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+# 全局远程媒体缓存实例
+media_cache = MediaCache()
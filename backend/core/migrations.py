@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+数据库版本化迁移
+
+每个迁移有一个递增的版本号，已执行的版本记录在 schema_migrations 表中，
+启动时只执行尚未执行过的迁移；新增表结构变更时在 MIGRATIONS 末尾追加即可。
+迁移函数本身保持幂等（先检查列/索引是否存在），以兼容由旧版迁移函数升级过的数据库。
+"""
+
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from backend.config.settings import BLOB_STORE_DIR
+from backend.models.models import db
+
+# 所有任务表
+TASK_TABLES = [
+    'jimeng_text2img_tasks',
+    'jimeng_image2image_tasks',
+    'jimeng_img2video_tasks',
+    'jimeng_first_last_frame_img2video_tasks',
+    'jimeng_text2video_tasks',
+    'jimeng_digital_human_tasks',
+    'qingying_image2video_tasks',
+]
+
+# 引用上传文件存储（blobs 表）的任务表字段，触发器按这些字段维护引用计数（文生图参考图片见 _text2img_input_image）
+BLOB_REFERENCE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'jimeng_image2image_tasks': tuple(f'input_image{i}' for i in range(1, 7)),
+    'jimeng_img2video_tasks': ('image_path',),
+    'jimeng_first_last_frame_img2video_tasks': ('first_frame_image_path', 'last_frame_image_path'),
+    'jimeng_digital_human_tasks': ('image_path', 'audio_path'),
+    'qingying_image2video_tasks': ('image_path',),
+}
+
+# 时间格式与 peewee 写入的 datetime 一致（本地时间，可按字符串比较）
+_NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+
+def _table_exists(table_name: str) -> bool:
+    return db.table_exists(table_name)
+
+
+def _existing_columns(table_name: str) -> List[str]:
+    cursor = db.execute_sql(f"PRAGMA table_info({table_name});")
+    return [column[1] for column in cursor.fetchall()]
+
+
+def add_column(table_name: str, column: str, definition: str):
+    """为表添加字段（表不存在或字段已存在时跳过）"""
+    if not _table_exists(table_name) or column in _existing_columns(table_name):
+        return
+    db.execute_sql(f"ALTER TABLE {table_name} ADD COLUMN {column} {definition};")
+    print(f"成功添加 {table_name}.{column} 字段")
+
+
+def add_index(table_name: str, columns: Tuple[str, ...], unique: bool = False):
+    """创建索引，命名与 peewee 模型 Meta.indexes 一致（表不存在时跳过），列可带排序方向如 'priority DESC'"""
+    if not _table_exists(table_name):
+        return
+    index_name = f"{table_name}_{'_'.join(column.split()[0] for column in columns)}"
+    db.execute_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS \"{index_name}\" "
+        f"ON \"{table_name}\" ({', '.join(columns)});"
+    )
+    print(f"索引已就绪: {index_name}")
+
+
+# ---------- 迁移定义 ----------
+
+def _img2img_input_images():
+    """图生图任务表添加第4-6张输入图片字段"""
+    for column in ('input_image4', 'input_image5', 'input_image6'):
+        add_column('jimeng_image2image_tasks', column, 'VARCHAR(500)')
+
+
+def _text2img_videos_json():
+    """文生图任务表添加 videos_json 字段（存储视频URL）"""
+    add_column('jimeng_text2img_tasks', 'videos_json', 'TEXT')
+
+
+def _qingying_videos_json():
+    add_column('qingying_image2video_tasks', 'videos_json', 'TEXT')
+
+
+def _task_priority():
+    """任务表添加 priority 字段（统一调度器按优先级出队）"""
+    for table_name in TASK_TABLES:
+        add_column(table_name, 'priority', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def _task_indexes():
+    """任务表按状态扫描、按创建时间排序的索引，以及账号用量统计索引"""
+    for table_name in TASK_TABLES:
+        add_index(table_name, ('status', 'create_at'))
+        add_index(table_name, ('create_at',))
+    add_index('jimeng_task_records', ('account_id', 'task_type', 'created_at'))
+
+
+def _task_sync():
+    """任务列表增量同步：update_at 索引，以及记录删除任务的墓碑表与删除触发器"""
+    add_column('jimeng_digital_human_tasks', 'update_at', 'DATETIME')
+    if _table_exists('jimeng_digital_human_tasks'):
+        db.execute_sql("UPDATE jimeng_digital_human_tasks SET update_at = create_at WHERE update_at IS NULL;")
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS task_tombstones ("
+        "id INTEGER NOT NULL PRIMARY KEY, task_table VARCHAR(100) NOT NULL, "
+        "task_id INTEGER NOT NULL, deleted_at DATETIME NOT NULL);"
+    )
+    add_index('task_tombstones', ('task_table', 'deleted_at'))
+    for table_name in TASK_TABLES:
+        add_index(table_name, ('update_at',))
+        if not _table_exists(table_name):
+            continue
+        db.execute_sql(
+            f"CREATE TRIGGER IF NOT EXISTS \"{table_name}_tombstone\" AFTER DELETE ON \"{table_name}\" "
+            f"BEGIN INSERT INTO task_tombstones (task_table, task_id, deleted_at) "
+            f"VALUES ('{table_name}', OLD.id, {_NOW_SQL}); END;"
+        )
+
+
+def create_blob_ref_triggers(table_name: str, columns: Tuple[str, ...]):
+    """
+    任务表上维护 blobs.refcount 的触发器：新建任务时引用的文件 +1，删除时 -1，修改路径字段时先减旧值再加新值；
+    同一行多个字段引用同一文件只计一次。引用归零时记录 unref_at，供后台回收
+    """
+    def refs(prefix):
+        return ', '.join(f'{prefix}.{column}' for column in columns)
+
+    increment = f"UPDATE blobs SET refcount = refcount + 1, unref_at = NULL WHERE path IN ({refs('NEW')});"
+    decrement = (
+        f"UPDATE blobs SET refcount = refcount - 1, "
+        f"unref_at = CASE WHEN refcount <= 1 THEN {_NOW_SQL} ELSE unref_at END "
+        f"WHERE path IN ({refs('OLD')});"
+    )
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns)
+    db.execute_sql(
+        f"CREATE TRIGGER IF NOT EXISTS \"{table_name}_blob_ref_insert\" AFTER INSERT ON \"{table_name}\" "
+        f"BEGIN {increment} END;"
+    )
+    db.execute_sql(
+        f"CREATE TRIGGER IF NOT EXISTS \"{table_name}_blob_ref_delete\" AFTER DELETE ON \"{table_name}\" "
+        f"BEGIN {decrement} END;"
+    )
+    db.execute_sql(
+        f"CREATE TRIGGER IF NOT EXISTS \"{table_name}_blob_ref_update\" "
+        f"AFTER UPDATE OF {', '.join(columns)} ON \"{table_name}\" WHEN {changed} "
+        f"BEGIN {decrement} {increment} END;"
+    )
+
+
+# 存储启用前的上传文件：专用上传目录中的全部文件，以及 tmp 根目录中按上传规则命名的文件
+# （uuid.hex、文件夹导入的 sha256、数字人的 <uuid>_image / <uuid>_audio）
+_LEGACY_UPLOAD_DIRS = ('batch_upload', 'first_last_frame_upload', 'qingying_batch_upload')
+_LEGACY_UPLOAD_NAME = re.compile(r'^([0-9a-f]{32}|[0-9a-f]{64}|[0-9a-f-]{36}_(image|audio))\.[A-Za-z0-9]+$')
+
+
+def _legacy_upload_files(tmp_dir: str) -> List[str]:
+    files = []
+    if os.path.isdir(tmp_dir):
+        with os.scandir(tmp_dir) as entries:
+            files.extend(entry.path for entry in entries
+                         if entry.is_file() and _LEGACY_UPLOAD_NAME.match(entry.name))
+    for name in _LEGACY_UPLOAD_DIRS:
+        directory = os.path.join(tmp_dir, name)
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                files.extend(entry.path for entry in entries if entry.is_file())
+    return files
+
+
+def _blob_store():
+    """
+    上传文件存储：blobs 表、引用计数触发器，并把已有的上传文件原地登记
+    （被任务引用的按引用行数计数，未被引用的立即进入回收队列）；tmp 目录之外的文件（用户原始文件）不登记
+    """
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS blobs ("
+        "id INTEGER NOT NULL PRIMARY KEY, path VARCHAR(500) NOT NULL, sha256 VARCHAR(64), "
+        "size INTEGER NOT NULL, refcount INTEGER NOT NULL, create_at DATETIME NOT NULL, unref_at DATETIME);"
+    )
+    add_index('blobs', ('path',), unique=True)
+    add_index('blobs', ('refcount', 'unref_at'))
+
+    tmp_dir = os.path.dirname(os.path.abspath(BLOB_STORE_DIR))
+    refcounts = Counter()
+    for table_name, columns in BLOB_REFERENCE_COLUMNS.items():
+        if not _table_exists(table_name):
+            continue
+        cursor = db.execute_sql(f"SELECT {', '.join(columns)} FROM \"{table_name}\";")
+        for row in cursor.fetchall():
+            refcounts.update({path for path in row if path})
+        create_blob_ref_triggers(table_name, columns)
+
+    def in_tmp(path):
+        return os.path.abspath(path).startswith(tmp_dir + os.sep) and os.path.isfile(path)
+
+    now = datetime.now()
+    rows = [(path, os.path.getsize(path), count, now, None)
+            for path, count in refcounts.items() if in_tmp(path)]
+    known = {os.path.abspath(path) for path in refcounts}
+    rows.extend((path, os.path.getsize(path), 0, now, now)
+                for path in _legacy_upload_files(tmp_dir) if os.path.abspath(path) not in known)
+    db.cursor().executemany(
+        "INSERT OR IGNORE INTO blobs (path, sha256, size, refcount, create_at, unref_at) "
+        "VALUES (?, NULL, ?, ?, ?, ?);",
+        rows
+    )
+    print(f"已登记 {len(rows)} 个已有上传文件")
+
+
+_TEXT2IMG_INPUT_NAME = re.compile(r'^text2img_(\d+)_')
+
+
+def _text2img_input_image():
+    """
+    文生图任务表添加 input_image 字段（参考图片路径），执行时不再扫描 tmp 目录按文件名前缀查找；
+    已有的 text2img_<任务ID>_* 文件原地登记到上传文件存储，尚未完成的任务关联其最新上传的图片
+    """
+    table_name = 'jimeng_text2img_tasks'
+    if not _table_exists(table_name):
+        return
+    add_column(table_name, 'input_image', 'VARCHAR(500)')
+    create_blob_ref_triggers(table_name, ('input_image',))
+
+    tmp_dir = os.path.dirname(os.path.abspath(BLOB_STORE_DIR))
+    uploads = {}  # 任务ID -> [(修改时间, 路径)]
+    if os.path.isdir(tmp_dir):
+        with os.scandir(tmp_dir) as entries:
+            for entry in entries:
+                match = _TEXT2IMG_INPUT_NAME.match(entry.name)
+                if match and entry.is_file():
+                    uploads.setdefault(int(match.group(1)), []).append((entry.stat().st_mtime, entry.path))
+    if not uploads:
+        return
+
+    # 先登记为未引用，关联到任务时由触发器增加引用
+    now = datetime.now()
+    db.cursor().executemany(
+        "INSERT OR IGNORE INTO blobs (path, sha256, size, refcount, create_at, unref_at) "
+        "VALUES (?, NULL, ?, 0, ?, ?);",
+        [(path, os.path.getsize(path), now, now) for files in uploads.values() for _, path in files]
+    )
+    cursor = db.execute_sql(f"SELECT id FROM {table_name} WHERE status IN (0, 1) AND input_image IS NULL;")
+    pending = [(max(uploads[task_id])[1], task_id) for (task_id,) in cursor.fetchall() if task_id in uploads]
+    db.cursor().executemany(f"UPDATE {table_name} SET input_image = ? WHERE id = ?;", pending)
+    print(f"已登记 {sum(len(files) for files in uploads.values())} 个文生图输入图片，关联 {len(pending)} 个未完成任务")
+
+
+def _task_lease():
+    """任务表添加租约字段（执行进程、到期时间、最近续约时间），崩溃恢复按租约到期时间接管生成中任务"""
+    for table_name in TASK_TABLES:
+        add_column(table_name, 'leased_by', 'VARCHAR(100)')
+        add_column(table_name, 'lease_expires_at', 'DATETIME')
+        add_column(table_name, 'heartbeat_at', 'DATETIME')
+
+
+def _task_pending_index():
+    """任务表待处理扫描索引：按状态过滤、按优先级降序与创建时间排序，出队不再对排队任务做临时排序"""
+    for table_name in TASK_TABLES:
+        add_index(table_name, ('status', 'priority DESC', 'create_at'))
+
+
+# (版本号, 名称, 迁移函数)，版本号只能追加不能修改
+MIGRATIONS: List[Tuple[int, str, Callable[[], None]]] = [
+    (1, 'img2img_input_images', _img2img_input_images),
+    (2, 'text2img_videos_json', _text2img_videos_json),
+    (3, 'qingying_videos_json', _qingying_videos_json),
+    (4, 'task_priority', _task_priority),
+    (5, 'task_indexes', _task_indexes),
+    (6, 'task_sync', _task_sync),
+    (7, 'blob_store', _blob_store),
+    (8, 'text2img_input_image', _text2img_input_image),
+    (9, 'task_lease', _task_lease),
+    (10, 'task_pending_index', _task_pending_index),
+]
+
+
+def _ensure_version_table():
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at DATETIME NOT NULL);"
+    )
+
+
+def get_schema_version() -> int:
+    """当前数据库已执行到的迁移版本"""
+    _ensure_version_table()
+    row = db.execute_sql("SELECT MAX(version) FROM schema_migrations;").fetchone()
+    return row[0] or 0
+
+
+def run_migrations():
+    """执行所有未执行过的迁移，每个迁移在独立事务中执行并记录版本"""
+    try:
+        current = get_schema_version()
+        pending = [m for m in MIGRATIONS if m[0] > current]
+        if not pending:
+            print(f"数据库结构已是最新版本: {current}")
+            return
+        for version, name, migrate in pending:
+            print(f"执行数据库迁移 {version}: {name}")
+            with db.atomic():
+                migrate()
+                db.execute_sql(
+                    "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?);",
+                    (version, name, datetime.now())
+                )
+        print(f"数据库迁移完成，当前版本: {pending[-1][0]}")
+    except Exception as e:
+        print(f"数据库迁移失败: {str(e)}")
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+提示词库缓存
+
+每个平台的 prompt.xlsx 只解析一次（图片提取、读取行数据共用同一个工作簿），
+嵌入图片保存为磁盘缩略图（见 thumbnail_store），提示词中只携带缩略图URL；
+结果按 文件路径 + 修改时间 + 大小 缓存在内存中。请求时仅 stat 一次文件：
+- 未变化：直接返回内存中的数据
+- 已变化且已有旧数据：继续返回旧数据，同时在后台线程重新解析
+- 尚无数据：同步解析
+解析完成后同步更新全文索引（见 prompt_search）。
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from backend.config.settings import PROMPT_DATABASE_DIR
+from backend.core.prompt_search import prompt_search_index
+from backend.core.thumbnail_store import thumbnail_store
+
+PROMPT_FILE_NAME = 'prompt.xlsx'
+PROMPT_COLUMNS = ['name', 'image', 'prompt']
+
+
+def extract_images_from_sheet(ws):
+    """从工作表中提取图片，返回 {行号: 缩略图URL} 字典"""
+    images = {}
+    
+    try:
+        print(f"开始从Excel提取图片，工作表名: {ws.title}")
+        
+        # 检查是否有图片
+        if not hasattr(ws, '_images') or not ws._images:
+            print("工作表中没有找到图片对象")
+            return images
+        
+        print(f"发现 {len(ws._images)} 个图片对象")
+        
+        # 遍历工作表中的所有图片
+        for idx, image in enumerate(ws._images):
+            try:
+                print(f"处理图片 {idx + 1}")
+                
+                # 尝试多种方式获取图片数据
+                img_bytes = None
+                row_idx = None
+                
+                # 方法1: 尝试_data方法
+                if hasattr(image, '_data') and callable(image._data):
+                    try:
+                        img_bytes = image._data()
+                        print(f"图片 {idx + 1}: 使用_data()方法获取数据，大小: {len(img_bytes) if img_bytes else 0}")
+                    except Exception as e:
+                        print(f"图片 {idx + 1}: _data()方法失败: {str(e)}")
+                
+                # 方法2: 尝试ref属性
+                if not img_bytes and hasattr(image, 'ref'):
+                    try:
+                        img_bytes = image.ref
+                        print(f"图片 {idx + 1}: 使用ref属性获取数据，大小: {len(img_bytes) if img_bytes else 0}")
+                    except Exception as e:
+                        print(f"图片 {idx + 1}: ref属性失败: {str(e)}")
+                
+                # 方法3: 尝试image属性
+                if not img_bytes and hasattr(image, 'image'):
+                    try:
+                        img_bytes = image.image
+                        print(f"图片 {idx + 1}: 使用image属性获取数据，大小: {len(img_bytes) if img_bytes else 0}")
+                    except Exception as e:
+                        print(f"图片 {idx + 1}: image属性失败: {str(e)}")
+                
+                # 获取位置信息
+                if hasattr(image, 'anchor') and image.anchor:
+                    try:
+                        if hasattr(image.anchor, '_from') and hasattr(image.anchor._from, 'row'):
+                            row_idx = image.anchor._from.row
+                            print(f"图片 {idx + 1}: 位置行号 {row_idx}")
+                        elif hasattr(image.anchor, 'row'):
+                            row_idx = image.anchor.row
+                            print(f"图片 {idx + 1}: 位置行号 {row_idx}")
+                    except Exception as e:
+                        print(f"图片 {idx + 1}: 获取位置失败: {str(e)}")
+                
+                # 如果没有位置信息，使用索引
+                if row_idx is None:
+                    row_idx = idx + 2  # 假设从第2行开始（考虑表头）
+                    print(f"图片 {idx + 1}: 使用默认行号 {row_idx}")
+                
+                # 处理图片数据
+                if img_bytes:
+                    try:
+                        # 确保img_bytes是字节类型
+                        if isinstance(img_bytes, str):
+                            img_bytes = img_bytes.encode('utf-8')
+                        
+                        # 生成（或复用）磁盘缩略图，使用行号作为键存储其URL
+                        key = thumbnail_store.put(img_bytes)
+                        images[row_idx] = thumbnail_store.url_of(key)
+                        print(f"成功提取图片 {idx + 1} - 行号: {row_idx}, 缩略图: {key}")
+                        
+                    except Exception as e:
+                        print(f"处理图片 {idx + 1} 失败: {str(e)}")
+                        continue
+                else:
+                    print(f"图片 {idx + 1}: 无法获取图片数据")
+                    
+            except Exception as e:
+                print(f"提取图片 {idx + 1} 总体失败: {str(e)}")
+                continue
+        
+        print(f"总共提取到 {len(images)} 张图片")
+        return images
+        
+    except Exception as e:
+        print(f"从Excel提取图片失败: {str(e)}")
+        return {}
+
+def get_image_url(image_filename, platform='jimeng'):
+    """获取文件系统中图片的缩略图URL"""
+    if not image_filename:
+        return None
+    
+    try:
+        # 图片文件路径 - 在prompt_database/{platform}/images/目录下
+        image_path = Path(PROMPT_DATABASE_DIR) / platform / 'images' / image_filename
+        key = thumbnail_store.put_file(str(image_path))
+        return thumbnail_store.url_of(key) if key else None
+    except Exception as e:
+        print(f"读取图片失败 {image_filename}: {str(e)}")
+        return None
+
+
+def _is_formula_image(image_value: str) -> bool:
+    """WPS 嵌入图片在单元格中是 DISPIMG 公式，不是文件名"""
+    return image_value.startswith('=') or 'DISPIMG' in image_value
+
+
+def _cell_text(value) -> str:
+    return str(value).strip() if value is not None else ''
+
+
+def parse_prompt_workbook(excel_file, platform='jimeng') -> List[Dict]:
+    """解析提示词Excel，返回提示词列表；格式错误时抛出 ValueError"""
+    # 只读取值，不执行公式；图片与行数据共用同一次加载
+    wb = load_workbook(excel_file, data_only=True)
+    try:
+        ws = wb.active
+        excel_images = extract_images_from_sheet(ws)
+
+        rows = ws.iter_rows(values_only=True)
+        header = [_cell_text(value) for value in next(rows, ())]
+        if not all(col in header for col in PROMPT_COLUMNS):
+            raise ValueError(f'Excel文件格式错误，需要包含列: {PROMPT_COLUMNS}')
+        name_col, image_col, prompt_col = (header.index(col) for col in PROMPT_COLUMNS)
+
+        prompts = []
+        # 数据从Excel第2行开始（第1行是表头）
+        for excel_row, row in enumerate(rows, start=2):
+            row = tuple(row) + (None,) * (len(header) - len(row))
+            name = _cell_text(row[name_col])
+            # 跳过空行
+            if not name:
+                continue
+
+            image_value = _cell_text(row[image_col])
+            image_url = None
+            # 优先使用Excel中嵌入的图片，没有时尝试从文件系统读取
+            if excel_row in excel_images:
+                image_url = excel_images[excel_row]
+            elif image_value and not _is_formula_image(image_value):
+                image_url = get_image_url(image_value, platform)
+
+            prompts.append({
+                'name': name,
+                'image_filename': image_value if not _is_formula_image(image_value) else '',
+                'image_url': image_url,
+                'prompt': _cell_text(row[prompt_col])
+            })
+        return prompts
+    finally:
+        wb.close()
+
+
+class PromptLibrary:
+    """一个平台解析后的提示词库"""
+
+    __slots__ = ('platform', 'signature', 'prompts', 'search_names', 'by_name', 'loaded_at')
+
+    def __init__(self, platform: str, signature: Tuple[int, int], prompts: List[Dict]):
+        self.platform = platform
+        self.signature = signature
+        self.prompts = prompts
+        # 预先转为小写，搜索时只做子串匹配
+        self.search_names = [prompt['name'].lower() for prompt in prompts]
+        self.by_name = {}
+        for prompt in prompts:
+            self.by_name.setdefault(prompt['name'], prompt)
+        self.loaded_at = time.time()
+
+    def search(self, query: str) -> List[Dict]:
+        """按名称模糊搜索（不区分大小写），全文索引不可用时使用"""
+        if not query:
+            return self.prompts
+        query_lower = query.lower()
+        return [prompt for prompt, name in zip(self.prompts, self.search_names) if query_lower in name]
+
+
+class PromptLibraryCache:
+    """按平台缓存提示词库，文件变化时后台重新解析"""
+
+    def __init__(self, base_dir=PROMPT_DATABASE_DIR):
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+        self._libraries: Dict[str, PromptLibrary] = {}
+        self._refreshing = set()
+        self.stats = {
+            'hits': 0,
+            'loads': 0,
+            'background_refreshes': 0,
+            'last_load_seconds': None
+        }
+
+    def file_of(self, platform: str) -> Path:
+        return self.base_dir / platform / PROMPT_FILE_NAME
+
+    def list_platforms(self) -> List[str]:
+        """存在 prompt.xlsx 的平台目录"""
+        if not self.base_dir.exists():
+            return []
+        return sorted(item.name for item in self.base_dir.iterdir()
+                      if item.is_dir() and (item / PROMPT_FILE_NAME).exists())
+
+    @staticmethod
+    def _signature(excel_file: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(excel_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, platform: str, excel_file: Path, signature: Tuple[int, int]) -> PromptLibrary:
+        started = time.time()
+        library = PromptLibrary(platform, signature, parse_prompt_workbook(excel_file, platform))
+        with self._lock:
+            current = self._libraries.get(platform)
+            # 并发加载时只保留较新的文件版本
+            replaced = current is None or current.signature != signature
+            if replaced:
+                self._libraries[platform] = library
+            self.stats['loads'] += 1
+            self.stats['last_load_seconds'] = round(time.time() - started, 3)
+        if replaced:
+            prompt_search_index.replace(platform, library.prompts)
+        print(f"提示词库 {platform} 已加载 {len(library.prompts)} 条，耗时 {time.time() - started:.2f}秒")
+        return library
+
+    def _refresh_in_background(self, platform: str, excel_file: Path, signature: Tuple[int, int]):
+        with self._lock:
+            if platform in self._refreshing:
+                return
+            self._refreshing.add(platform)
+            self.stats['background_refreshes'] += 1
+
+        def worker():
+            try:
+                self._load(platform, excel_file, signature)
+            except Exception as e:
+                print(f"后台刷新提示词库 {platform} 失败: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(platform)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def get(self, platform: str) -> PromptLibrary:
+        """
+        获取平台的提示词库
+
+        异常:
+            FileNotFoundError: 提示词文件不存在
+            ValueError: Excel格式错误
+        """
+        excel_file = self.file_of(platform)
+        signature = self._signature(excel_file)
+        if signature is None:
+            raise FileNotFoundError(f'提示词文件不存在: {excel_file}')
+
+        with self._lock:
+            library = self._libraries.get(platform)
+            if library is not None:
+                self.stats['hits'] += 1
+        if library is None:
+            return self._load(platform, excel_file, signature)
+        if library.signature != signature:
+            self._refresh_in_background(platform, excel_file, signature)
+        return library
+
+    def invalidate(self, platform: Optional[str] = None):
+        """丢弃缓存（默认全部），下次访问时同步重新解析"""
+        with self._lock:
+            if platform is None:
+                self._libraries.clear()
+            else:
+                self._libraries.pop(platform, None)
+
+
+# 全局提示词库缓存实例
+prompt_library_cache = PromptLibraryCache()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+提示词全文索引 - 基于内存 SQLite FTS5
+
+提示词库每次解析后整体替换该平台的索引行，检索按 bm25 排序（名称权重高于提示词正文），
+并直接在 SQL 中 LIMIT/OFFSET 分页。
+
+FTS5 自带分词器不切分中文，这里先在 Python 中把文本转成词序列再交给 unicode61：
+- 英文/数字按单词、小写
+- 连续的中日韩字符切成重叠的二元组（"提示词" -> "提示 示词 词"），末尾补一个单字，
+  使任意单字都能以前缀方式命中，任意两个及以上字符的子串都能以短语方式命中
+"""
+
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# 中日韩统一表意文字、假名、韩文音节
+_CJK = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+_SEGMENT_PATTERN = re.compile(f'([{_CJK}]+)|([^\\W_{_CJK}]+)')
+
+# bm25 列权重：name, prompt
+NAME_WEIGHT = 10.0
+PROMPT_WEIGHT = 1.0
+
+
+def _cjk_tokens(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize(text: str) -> str:
+    """将文本转为空格分隔的索引词序列"""
+    tokens = []
+    for cjk_run, word in _SEGMENT_PATTERN.findall((text or '').lower()):
+        if cjk_run:
+            tokens.extend(_cjk_tokens(cjk_run))
+        elif word:
+            tokens.append(word)
+    return ' '.join(tokens)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    将用户输入转换为 FTS5 MATCH 表达式，各片段之间为 AND
+
+    - 单个中文字符、英文单词：前缀匹配
+    - 两个及以上中文字符：二元组短语匹配（等价于子串匹配）
+    """
+    terms = []
+    for cjk_run, word in _SEGMENT_PATTERN.findall((query or '').lower()):
+        if cjk_run:
+            if len(cjk_run) == 1:
+                terms.append(f'"{cjk_run}" *')
+            else:
+                bigrams = [cjk_run[i:i + 2] for i in range(len(cjk_run) - 1)]
+                terms.append('"' + ' '.join(bigrams) + '"')
+        elif word:
+            terms.append(f'"{word}" *')
+    return ' AND '.join(terms) if terms else None
+
+
+class PromptSearchIndex:
+    """所有平台提示词的全文索引"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._rows: Dict[int, Dict] = {}
+        self._platform_rowids: Dict[str, List[int]] = {}
+        self._next_rowid = 1
+        self.available = self._create_table()
+
+    def _create_table(self) -> bool:
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE prompt_fts USING fts5("
+                "name, prompt, platform UNINDEXED, tokenize='unicode61')"
+            )
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"SQLite 不支持 FTS5，提示词搜索回退为线性扫描: {str(e)}")
+            return False
+
+    def replace(self, platform: str, prompts: List[Dict]):
+        """用新解析的提示词整体替换该平台的索引"""
+        if not self.available:
+            return
+        tokens = [(tokenize(prompt['name']), tokenize(prompt['prompt'])) for prompt in prompts]
+        with self._lock:
+            rowids = list(range(self._next_rowid, self._next_rowid + len(prompts)))
+            self._next_rowid += len(prompts)
+            rows = [(rowid, name, body, platform) for rowid, (name, body) in zip(rowids, tokens)]
+            with self._conn:
+                self._conn.execute("DELETE FROM prompt_fts WHERE platform = ?", (platform,))
+                self._conn.executemany(
+                    "INSERT INTO prompt_fts (rowid, name, prompt, platform) VALUES (?, ?, ?, ?)", rows
+                )
+            for rowid in self._platform_rowids.pop(platform, []):
+                self._rows.pop(rowid, None)
+            self._rows.update(zip(rowids, prompts))
+            self._platform_rowids[platform] = rowids
+
+    def search(self, query: str, platform: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Optional[Tuple[int, List[Dict]]]:
+        """
+        检索提示词
+
+        返回值:
+            (total, prompts)，按相关度排序；索引不可用或查询中没有可检索的字符时返回 None
+        """
+        match = build_match_query(query) if self.available else None
+        if match is None:
+            return None
+        where = "prompt_fts MATCH ?"
+        params = [match]
+        if platform:
+            where += " AND platform = ?"
+            params.append(platform)
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM prompt_fts WHERE {where}", params
+            ).fetchone()[0]
+            rowids = self._conn.execute(
+                f"SELECT rowid FROM prompt_fts WHERE {where} "
+                f"ORDER BY bm25(prompt_fts, {NAME_WEIGHT}, {PROMPT_WEIGHT}) LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+            return total, [self._rows[rowid] for (rowid,) in rowids if rowid in self._rows]
+
+
+# 全局提示词全文索引实例
+prompt_search_index = PromptSearchIndex()
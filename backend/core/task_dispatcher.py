@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+任务分发总线 - 进程内的"任务入队"事件通知
+
+路由创建/重试任务后发布事件，对应平台的任务管理器立即被唤醒去扫描排队任务，
+不再依赖固定间隔轮询数据库。轮询仅作为低频的兜底对账扫描保留。
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class TaskDispatcher:
+    """进程内任务分发总线，按任务表名区分主题"""
+
+    def __init__(self):
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'published': 0,
+            'last_publish_time': None
+        }
+
+    @staticmethod
+    def _topic_of(model_or_topic) -> str:
+        """将模型类或表名统一为主题名称"""
+        if isinstance(model_or_topic, str):
+            return model_or_topic
+        meta = getattr(model_or_topic, '_meta', None)
+        if meta is not None:
+            return meta.table_name
+        return str(model_or_topic)
+
+    def _get_event(self, topic: str) -> threading.Event:
+        with self._lock:
+            event = self._events.get(topic)
+            if event is None:
+                event = threading.Event()
+                self._events[topic] = event
+            return event
+
+    def notify_task_enqueued(self, model_or_topic, task_id: Optional[int] = None):
+        """发布"任务入队"事件，唤醒对应平台的任务管理器"""
+        topic = self._topic_of(model_or_topic)
+        self._get_event(topic).set()
+        self.stats['published'] += 1
+        self.stats['last_publish_time'] = datetime.now()
+        if task_id is not None:
+            print(f"任务分发总线: {topic} 任务 {task_id} 已入队")
+
+    def wake(self, model_or_topic):
+        """仅唤醒等待者而不计入发布统计（用于停止管理器等场景）"""
+        self._get_event(self._topic_of(model_or_topic)).set()
+
+    def notify_all(self):
+        """唤醒所有任务管理器（例如全局线程池释放了槽位）"""
+        with self._lock:
+            events = list(self._events.values())
+        for event in events:
+            event.set()
+
+    def wait_for_tasks(self, model_or_topic, timeout: float) -> bool:
+        """
+        等待任务入队事件
+
+        返回值:
+            bool: True表示被事件唤醒，False表示等待超时（应执行兜底对账扫描）
+        """
+        event = self._get_event(self._topic_of(model_or_topic))
+        triggered = event.wait(timeout)
+        event.clear()
+        return triggered
+
+
+# 全局任务分发总线实例
+task_dispatcher = TaskDispatcher()
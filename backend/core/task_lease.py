@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+任务租约 - 生成中任务的归属与崩溃恢复
+
+- 任务开始执行时由 acquire 把状态置为生成中并写入租约：leased_by（执行进程标识）、lease_expires_at、heartbeat_at
+- 后台线程每 TASK_LEASE_HEARTBEAT_INTERVAL 秒为本进程持有的任务续约，每个任务表一条 UPDATE
+- 恢复扫描每个任务表先查询一次，有租约已过期（或升级前没有租约）的生成中任务时才在写事务中接管：
+  已拿到平台任务ID（task_id）的任务已经在平台提交过，重新提交会重复消耗额度，
+  标记为等待确认结果（失败原因 RESULT_PENDING，错误信息中附平台任务ID），不自动重试；其余任务重新排队
+- 执行器拿到平台任务ID时由 record_task_id 立即写入任务记录（管理器通过 executor.on_task_id 接入）
+- 启动时执行一次恢复扫描，之后随续约周期执行：上一次运行崩溃留下的任务在租约过期后被接管
+"""
+
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from backend.config.settings import TASK_LEASE_HEARTBEAT_INTERVAL, TASK_LEASE_TTL
+from backend.core.event_bus import event_bus
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.task_stats import task_status_counter
+from backend.models.models import TASK_MODELS
+
+# 恢复时已在平台提交、未自动重新提交的任务的失败原因
+RESULT_PENDING = 'RESULT_PENDING'
+
+
+class TaskLeaseService:
+    """生成中任务的租约：获取、续约与过期接管"""
+
+    def __init__(self, ttl: float = TASK_LEASE_TTL, heartbeat_interval: float = TASK_LEASE_HEARTBEAT_INTERVAL):
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._held: Dict[Tuple[type, int], object] = {}  # (任务模型, 任务ID) -> 执行中的任务对象
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            'acquired': 0,
+            'renewals': 0,
+            'recovered': 0
+        }
+
+    def acquire(self, task):
+        """把任务置为生成中并写入租约，状态与租约在同一次保存中写入，恢复扫描不会看到没有租约的生成中任务"""
+        now = datetime.now()
+        task.status = 1
+        task.leased_by = self.worker_id
+        task.heartbeat_at = now
+        task.lease_expires_at = now + timedelta(seconds=self.ttl)
+        task.save()
+        with self._lock:
+            self._held[(type(task), task.id)] = task
+            self.stats['acquired'] += 1
+
+    def record_task_id(self, task, platform_task_id):
+        """执行器拿到平台任务ID时立即写入任务记录，服务中断后恢复扫描据此判断任务已在平台提交"""
+        platform_task_id = str(platform_task_id)
+        task.task_id = platform_task_id
+        try:
+            # 直接执行 SQL：只补记平台任务ID，不刷新 update_at、不发布任务事件
+            type(task)._meta.database.execute_sql(
+                f'UPDATE "{type(task)._meta.table_name}" SET task_id = ? WHERE id = ? AND status = 1',
+                [platform_task_id, task.id]
+            )
+        except Exception as e:
+            print(f"记录平台任务ID失败: {task.id}, 错误: {str(e)}")
+
+    def renew(self):
+        """为本进程持有的生成中任务续约，已结束（不再是生成中）的任务不再续约"""
+        with self._lock:
+            held = dict(self._held)
+        if not held:
+            return
+
+        by_model: Dict[type, Dict[int, object]] = {}
+        for (model, task_id), task in held.items():
+            by_model.setdefault(model, {})[task_id] = task
+
+        now = datetime.now()
+        expires = now + timedelta(seconds=self.ttl)
+        for model, tasks in by_model.items():
+            table = model._meta.table_name
+            database = model._meta.database
+            ids = list(tasks)
+            placeholders = ', '.join('?' for _ in ids)
+            owned = f"leased_by = ? AND status = 1 AND id IN ({placeholders})"
+            # 直接执行 SQL：续约不是任务内容的变化，不刷新 update_at、不发布任务事件
+            database.execute_sql(
+                f'UPDATE "{table}" SET heartbeat_at = ?, lease_expires_at = ? WHERE {owned}',
+                [now, expires, self.worker_id, *ids]
+            )
+            cursor = database.execute_sql(f'SELECT id FROM "{table}" WHERE {owned}', [self.worker_id, *ids])
+            alive = {row[0] for row in cursor.fetchall()}
+
+            with self._lock:
+                for task_id, task in tasks.items():
+                    if task_id in alive:
+                        # 同步到内存中的任务对象，之后整行保存时不会把租约写回旧值
+                        task.heartbeat_at = now
+                        task.lease_expires_at = expires
+                    elif self._held.get((model, task_id)) is task:
+                        del self._held[(model, task_id)]
+            self.stats['renewals'] += 1
+
+    def recover(self) -> Dict[str, int]:
+        """
+        接管租约已过期的生成中任务，返回 {表名: 接管数量}
+
+        每个任务表先用一条不加锁的查询检查，没有过期任务时（绝大多数恢复周期）不写库、
+        不使状态计数失效、不发布事件；有过期任务时在写事务中重新选出并更新，
+        再为每个接管的任务发布 task.status 事件
+        """
+        now = datetime.now()
+        recovered = {}
+        for model in TASK_MODELS:
+            table = model._meta.table_name
+            database = model._meta.database
+            with_task_id = 'task_id' in model._meta.fields
+            platform_id = 'task_id' if with_task_id else 'NULL'
+            select = (f'SELECT id, {platform_id} FROM "{table}" '
+                      f'WHERE status = 1 AND (lease_expires_at IS NULL OR lease_expires_at < ?)')
+            if database.execute_sql(f'{select} LIMIT 1', [now]).fetchone() is None:
+                continue
+
+            reset = 'status = ?, leased_by = NULL, lease_expires_at = NULL, heartbeat_at = NULL, update_at = ?'
+            requeued, pending = [], []
+            with database.atomic('IMMEDIATE'):
+                for task_id, submitted_id in database.execute_sql(select, [now]).fetchall():
+                    if submitted_id:
+                        # 已在平台提交：不重新提交，标记为等待确认结果
+                        message = (f"任务在服务中断前已提交到平台（平台任务ID: {submitted_id}），"
+                                   f"为避免重复消耗额度未自动重新提交，请确认平台上的生成结果")
+                        database.execute_sql(
+                            f'UPDATE "{table}" SET {reset}, failure_reason = ?, error_message = ? WHERE id = ?',
+                            [3, now, RESULT_PENDING, message, task_id]
+                        )
+                        pending.append(task_id)
+                    else:
+                        requeued.append(task_id)
+                if requeued:
+                    placeholders = ', '.join('?' for _ in requeued)
+                    database.execute_sql(f'UPDATE "{table}" SET {reset} WHERE id IN ({placeholders})',
+                                         [0, now, *requeued])
+            if not requeued and not pending:
+                continue
+
+            recovered[table] = len(requeued) + len(pending)
+            task_status_counter.invalidate(model)
+            for task_ids, status in ((requeued, 0), (pending, 3)):
+                for task_id in task_ids:
+                    event_bus.publish('task.status', {
+                        'table': table, 'task_id': task_id, 'old_status': 1, 'status': status
+                    })
+            if requeued:
+                task_dispatcher.notify_task_enqueued(model)
+
+        if recovered:
+            self.stats['recovered'] += sum(recovered.values())
+            print(f"接管租约过期的生成中任务: {recovered}")
+        return recovered
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                self.renew()
+                self.recover()
+            except Exception as e:
+                print(f"任务租约续约/恢复出错: {str(e)}")
+
+    def start(self):
+        """启动续约与恢复扫描线程"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name="task-lease", daemon=True)
+        self._thread.start()
+        print(f"任务租约已启动，执行进程: {self.worker_id}，租约时长: {self.ttl} 秒")
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread = None
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                'worker_id': self.worker_id,
+                'held': len(self._held)
+            }
+
+
+# 全局任务租约实例
+task_lease = TaskLeaseService()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+任务列表分页 - 游标分页与字段投影
+
+- 游标分页：按 (create_at, id) 倒序，下一页条件为 (create_at, id) < 上一页最后一行，
+  走 create_at 索引（SQLite 索引末尾隐含 rowid），第 1 页和第 500 页的代价相同；
+  请求带 cursor 参数（首页传空字符串）时启用，不带时仍按 page/page_size 的 OFFSET 分页，兼容旧前端
+- 字段投影：fields=id,prompt,status 只查询这些字段依赖的列、只计算这些字段，
+  不再为每行读取 images_json/error_message 等大字段并解码 JSON
+- 总数：任务表使用任务状态计数缓存（见 task_stats），不再每次请求执行 COUNT(*)
+- 每页结果带 watermark（查询开始时间），前端之后可用 updated_since 增量同步（见 task_sync）
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from backend.core.task_stats import task_status_counter
+
+DEFAULT_CURSOR_LIMIT = 50
+MAX_PAGE_SIZE = 1000
+
+# 输出字段 -> (依赖的列, 取值函数)
+FieldSpec = Dict[str, Tuple[Sequence[str], Callable]]
+
+
+def task_field(*columns: str, getter: Optional[Callable] = None) -> Tuple[Sequence[str], Callable]:
+    """定义一个输出字段；不传 getter 时直接取同名列"""
+    if getter is None:
+        column = columns[0]
+        getter = lambda task: getattr(task, column)
+    return columns, getter
+
+
+def format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+def encode_cursor(task) -> str:
+    raw = f"{task.create_at.isoformat()}|{task.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        create_at, task_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(create_at), int(task_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+
+
+def parse_fields(value: Optional[str], spec: FieldSpec) -> List[str]:
+    """解析 fields 参数，忽略未知字段；为空时返回全部字段"""
+    if not value:
+        return list(spec)
+    wanted = {name.strip() for name in value.split(',')}
+    return [name for name in spec if name in wanted] or list(spec)
+
+
+class TaskListPage:
+    """一页任务列表"""
+
+    def __init__(self, items: List[Dict], total: int, page: int, page_size: int,
+                 next_cursor: Optional[str] = None, has_more: bool = False, watermark: Optional[str] = None):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.has_more = has_more
+        self.watermark = watermark  # 查询开始时间，下次可作为增量同步的 updated_since
+
+    @property
+    def total_pages(self) -> int:
+        return (self.total + self.page_size - 1) // self.page_size if self.page_size else 0
+
+
+def projected_select(model, spec: FieldSpec, fields: List[str], extra_columns: Sequence[str] = ()):
+    """只查询输出字段依赖的列（以及 id/create_at 和额外指定的列）"""
+    columns = {'id', 'create_at', *extra_columns}
+    for name in fields:
+        columns.update(spec[name][0])
+    return model.select(*[getattr(model, column) for column in sorted(columns)])
+
+
+def build_items(spec: FieldSpec, fields: List[str], rows) -> List[Dict]:
+    return [{name: spec[name][1](task) for name in fields} for task in rows]
+
+
+def _count(model, status: Optional[int], extra_where) -> int:
+    if extra_where is None and hasattr(model, 'status'):
+        counts = task_status_counter.get_counts(model)
+        return counts.get(status, 0) if status is not None else sum(counts.values())
+    query = model.select()
+    if status is not None:
+        query = query.where(model.status == status)
+    if extra_where is not None:
+        query = query.where(extra_where)
+    return query.count()
+
+
+def list_tasks(model, spec: FieldSpec, args: Mapping, status: Optional[int] = None,
+               where=None, default_page_size: int = MAX_PAGE_SIZE,
+               page_size_param: str = 'page_size') -> TaskListPage:
+    """
+    按创建时间倒序查询任务列表
+
+    Args:
+        model: 任务模型
+        spec: 输出字段定义
+        args: 请求参数（cursor、limit、page、page_size、fields）
+        status: 状态过滤
+        where: 其他过滤条件（有其他条件时总数改为实时 COUNT）
+    """
+    watermark = datetime.now()
+    fields = parse_fields(args.get('fields'), spec)
+    query = projected_select(model, spec, fields)
+    if status is not None:
+        query = query.where(model.status == status)
+    if where is not None:
+        query = query.where(where)
+
+    cursor = args.get('cursor')
+    if cursor is not None:
+        page = 1
+        page_size = min(max(int(args.get('limit') or args.get(page_size_param) or DEFAULT_CURSOR_LIMIT), 1), MAX_PAGE_SIZE)
+        if cursor:
+            create_at, task_id = decode_cursor(cursor)
+            query = query.where(
+                (model.create_at < create_at) | ((model.create_at == create_at) & (model.id < task_id))
+            )
+        rows = list(query.order_by(model.create_at.desc(), model.id.desc()).limit(page_size + 1))
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1]) if has_more and rows[-1].create_at else None
+    else:
+        page = max(int(args.get('page', 1)), 1)
+        page_size = min(max(int(args.get(page_size_param, default_page_size)), 1), MAX_PAGE_SIZE)
+        rows = list(query.order_by(model.create_at.desc(), model.id.desc()).paginate(page, page_size))
+        has_more = len(rows) == page_size
+        next_cursor = encode_cursor(rows[-1]) if has_more and rows[-1].create_at else None
+
+    items = build_items(spec, fields, rows)
+    return TaskListPage(items, _count(model, status, where), page, page_size, next_cursor, has_more,
+                        watermark.isoformat())
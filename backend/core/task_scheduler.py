@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+统一任务调度器 - 所有平台共用一个就绪队列
+
+调度规则：
+- 全局并发严格等于 automation_max_threads，槽位不足时任务进入就绪队列等待，不再拒绝提交
+- 优先级高（priority 数值大）的任务先执行，同一优先级内按提交顺序先进先出
+- 同一优先级下各平台按权重轮转（stride 调度），可为平台设置并发配额
+"""
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+class ScheduledEntry:
+    """就绪队列中的一个待执行任务"""
+
+    __slots__ = ('seq', 'platform', 'priority', 'task_callable', 'args', 'kwargs',
+                 'task_info', 'future', 'precheck', 'enqueue_time')
+
+    def __init__(self, seq, platform, priority, task_callable, args, kwargs, task_info, precheck=None):
+        self.seq = seq
+        self.platform = platform
+        self.priority = priority
+        self.task_callable = task_callable
+        self.args = args
+        self.kwargs = kwargs
+        self.task_info = task_info
+        self.future = Future()
+        self.precheck = precheck
+        self.enqueue_time = datetime.now()
+
+
+class TaskScheduler:
+    """统一优先级调度器"""
+
+    def __init__(self, max_slots: int, launcher: Callable[[int, ScheduledEntry], None]):
+        """
+        参数:
+            max_slots: 全局最大并发槽位数
+            launcher: 启动任务的回调 launcher(slot_id, entry)，由调用方在槽位上执行任务，
+                      执行结束后必须调用 release(slot_id, entry)
+        """
+        self.max_slots = max_slots
+        self._launcher = launcher
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+        self._ready: Dict[str, List] = {}  # 平台 -> 堆 [(-priority, seq, entry)]
+        self._running_by_platform: Dict[str, int] = {}
+        self._free_slots = list(range(1, max_slots + 1))
+        heapq.heapify(self._free_slots)
+        self._pass: Dict[str, float] = {}  # stride 调度的平台通行值
+        self._virtual_time = 0.0
+        self._weights: Dict[str, float] = {}
+        self._quotas: Dict[str, int] = {}
+        self._paused = False
+
+    def set_platform_policy(self, platform: str, weight: float = 1.0, quota: int = 0):
+        """设置平台权重与并发配额（quota 为 0 表示不限制）"""
+        with self._lock:
+            self._weights[platform] = max(float(weight), 0.01)
+            self._quotas[platform] = max(int(quota), 0)
+
+    def submit(self, platform: str, priority: int, task_callable, args, kwargs,
+               task_info: Dict, precheck: Optional[Callable[[], bool]] = None) -> Future:
+        """将任务放入就绪队列，返回在任务执行完毕时完成的 Future"""
+        with self._lock:
+            entry = ScheduledEntry(next(self._seq), platform, int(priority or 0),
+                                   task_callable, args, kwargs, task_info, precheck)
+            heap = self._ready.setdefault(platform, [])
+            if not heap:
+                # 平台从空闲变为就绪，通行值追平虚拟时间，避免积累"信用"后长期霸占槽位
+                self._pass[platform] = max(self._pass.get(platform, 0.0), self._virtual_time)
+            heapq.heappush(heap, (-entry.priority, entry.seq, entry))
+        self._dispatch()
+        return entry.future
+
+    def release(self, slot_id: int, entry: ScheduledEntry):
+        """任务执行结束，归还槽位并继续调度"""
+        with self._lock:
+            self._running_by_platform[entry.platform] = max(
+                self._running_by_platform.get(entry.platform, 1) - 1, 0)
+            heapq.heappush(self._free_slots, slot_id)
+        self._dispatch()
+
+    def pause(self):
+        with self._lock:
+            self._paused = True
+
+    def resume(self):
+        with self._lock:
+            self._paused = False
+        self._dispatch()
+
+    def drain(self) -> List[ScheduledEntry]:
+        """清空就绪队列并返回被移除的任务（停止时使用）"""
+        with self._lock:
+            entries = [item[2] for heap in self._ready.values() for item in heap]
+            self._ready.clear()
+        for entry in entries:
+            if not entry.future.done():
+                entry.future.cancel()
+        return entries
+
+    def _pick_platform(self) -> Optional[str]:
+        """选择下一个出队的平台：先比较最高优先级，再比较 stride 通行值"""
+        best = None
+        best_key = None
+        for platform, heap in self._ready.items():
+            if not heap:
+                continue
+            quota = self._quotas.get(platform, 0)
+            if quota and self._running_by_platform.get(platform, 0) >= quota:
+                continue
+            top_priority = -heap[0][0]
+            key = (-top_priority, self._pass.get(platform, 0.0), heap[0][1])
+            if best_key is None or key < best_key:
+                best, best_key = platform, key
+        return best
+
+    def _dispatch(self):
+        """在有空闲槽位时从就绪队列取出任务启动"""
+        to_launch = []
+        with self._lock:
+            while self._free_slots and not self._paused:
+                platform = self._pick_platform()
+                if platform is None:
+                    break
+                _, _, entry = heapq.heappop(self._ready[platform])
+                if entry.future.cancelled():
+                    continue
+                slot_id = heapq.heappop(self._free_slots)
+                self._running_by_platform[platform] = self._running_by_platform.get(platform, 0) + 1
+                stride = 1.0 / self._weights.get(platform, 1.0)
+                self._pass[platform] = self._pass.get(platform, 0.0) + stride
+                self._virtual_time = max(self._virtual_time, self._pass[platform] - stride)
+                to_launch.append((slot_id, entry))
+        for slot_id, entry in to_launch:
+            self._launcher(slot_id, entry)
+
+    def get_stats(self) -> Dict:
+        """获取调度器统计"""
+        with self._lock:
+            queued_by_platform = {p: len(h) for p, h in self._ready.items() if h}
+            return {
+                'max_slots': self.max_slots,
+                'free_slots': len(self._free_slots),
+                'running': self.max_slots - len(self._free_slots),
+                'queued': sum(queued_by_platform.values()),
+                'queued_by_platform': queued_by_platform,
+                'running_by_platform': {p: c for p, c in self._running_by_platform.items() if c},
+                'paused': self._paused,
+                'policies': {
+                    p: {'weight': self._weights.get(p, 1.0), 'quota': self._quotas.get(p, 0)}
+                    for p in set(self._weights) | set(self._quotas)
+                }
+            }
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+任务状态计数缓存
+
+各任务表按状态的数量保存在内存中：首次读取时用一条 GROUP BY（多表时 UNION ALL）
+查询加载，之后由任务模型在保存/删除时按状态变化增量更新，汇总接口读取为 O(1)。
+批量 update/delete 无法得知具体的状态变化，只标记该表失效，下次读取时重新加载；
+另外每隔 TASK_STATUS_RECONCILE_INTERVAL 秒重新加载一次，修正并发写入可能带来的偏差。
+重新加载的查询在锁外执行，期间有状态变化或失效标记的表丢弃查询结果，保持失效，下次读取时再加载。
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from backend.config.settings import TASK_STATUS_RECONCILE_INTERVAL
+
+# 状态码 -> 汇总字段名
+STATUS_KEYS = {
+    0: 'pending',     # 排队中
+    1: 'processing',  # 生成中
+    2: 'completed',   # 已完成
+    3: 'failed',      # 失败
+}
+
+
+def _table_of(model) -> str:
+    return model._meta.table_name
+
+
+class TaskStatusCounter:
+    """按任务表缓存各状态的任务数量"""
+
+    def __init__(self, reconcile_interval: float = TASK_STATUS_RECONCILE_INTERVAL):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.RLock()
+        self._models = {}
+        self._counts: Dict[str, Dict[int, int]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        # 每次状态变化/失效标记递增，重新加载时据此判断查询期间是否有写入
+        self._generation: Dict[str, int] = {}
+        self._epoch = 0  # invalidate() 标记全部表失效时递增
+        self.stats = {
+            'reloads': 0,
+            'transitions': 0
+        }
+
+    def _is_stale(self, table: str, now: float) -> bool:
+        loaded_at = self._loaded_at.get(table)
+        return loaded_at is None or now - loaded_at >= self.reconcile_interval
+
+    def _reload(self, models):
+        """一条查询重新加载多个任务表的状态计数"""
+        if not models:
+            return
+        sql = ' UNION ALL '.join(
+            f"SELECT '{_table_of(model)}', status, COUNT(*) FROM \"{_table_of(model)}\" GROUP BY status"
+            for model in models
+        )
+        database = models[0]._meta.database
+        counts = {_table_of(model): {} for model in models}
+        with self._lock:
+            epoch = self._epoch
+            generations = {table: self._generation.get(table, 0) for table in counts}
+        for table, status, count in database.execute_sql(sql).fetchall():
+            counts[table][status] = count
+        now = time.time()
+        with self._lock:
+            for table, table_counts in counts.items():
+                if self._epoch != epoch or self._generation.get(table, 0) != generations[table]:
+                    # 查询期间有状态变化，结果可能已过时：不覆盖已有计数，也不标记为已加载
+                    self._counts.setdefault(table, table_counts)
+                    continue
+                self._counts[table] = table_counts
+                self._loaded_at[table] = now
+            self.stats['reloads'] += 1
+
+    def refresh(self, models: Iterable):
+        """确保给定任务表的计数已加载且未过期，过期的表合并为一条查询重新加载"""
+        now = time.time()
+        stale = []
+        with self._lock:
+            for model in models:
+                table = _table_of(model)
+                self._models[table] = model
+                if self._is_stale(table, now):
+                    stale.append(model)
+        self._reload(stale)
+
+    def get_counts(self, model) -> Dict[int, int]:
+        """获取任务表各状态的数量 {status: count}"""
+        self.refresh([model])
+        with self._lock:
+            return dict(self._counts.get(_table_of(model), {}))
+
+    def get_summary(self, model) -> Dict[str, int]:
+        """获取任务表的状态汇总（pending/processing/completed/failed/total）"""
+        counts = self.get_counts(model)
+        summary = {key: counts.get(status, 0) for status, key in STATUS_KEYS.items()}
+        summary['total'] = sum(counts.values())
+        return summary
+
+    def transition(self, model, old_status: Optional[int], new_status: Optional[int]):
+        """
+        记录一次状态变化（old_status 为 None 表示新建，new_status 为 None 表示删除）
+
+        尚未加载的表不做处理，首次读取时会整体加载
+        """
+        if old_status == new_status:
+            return
+        table = _table_of(model)
+        with self._lock:
+            self._generation[table] = self._generation.get(table, 0) + 1
+            counts = self._counts.get(table)
+            if counts is None:
+                return
+            if old_status is not None:
+                counts[old_status] = max(counts.get(old_status, 0) - 1, 0)
+            if new_status is not None:
+                counts[new_status] = counts.get(new_status, 0) + 1
+            self.stats['transitions'] += 1
+
+    def invalidate(self, model=None):
+        """标记任务表（默认全部）的计数失效，下次读取时重新加载"""
+        with self._lock:
+            if model is None:
+                self._epoch += 1
+                self._loaded_at.clear()
+            else:
+                table = _table_of(model)
+                self._generation[table] = self._generation.get(table, 0) + 1
+                self._loaded_at.pop(table, None)
+
+
+# 全局任务状态计数实例
+task_status_counter = TaskStatusCounter()
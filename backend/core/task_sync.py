@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+任务列表增量同步
+
+前端轮询时带上上次响应中的 watermark 作为 updated_since，只返回之后新建/变更的任务和被删除任务的ID：
+- 变更：任务模型保存或批量更新时都会刷新 update_at（见 BaseTaskModel），按 update_at 索引查询
+- 删除：任务表上的 AFTER DELETE 触发器把被删除的ID写入 task_tombstones（见迁移 6），
+  单个删除与批量删除都会记录
+- 查询条件向前多取 TASK_SYNC_OVERLAP 秒，避免提交晚于查询的写入被漏掉；重复返回的行由前端按ID覆盖
+- 墓碑保留 TASK_TOMBSTONE_RETENTION_DAYS 天，updated_since 早于保留期时返回 reset，前端应重新全量加载
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Mapping, Optional
+
+from backend.config.settings import TASK_SYNC_OVERLAP, TASK_TOMBSTONE_RETENTION_DAYS
+from backend.core.task_pagination import FieldSpec, build_items, parse_fields, projected_select
+from backend.models.models import TaskTombstone
+
+# 增量结果最多返回的变更行数，超过时返回 reset 让前端全量加载
+MAX_DELTA_ROWS = 1000
+PURGE_INTERVAL = 3600
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def parse_watermark(value: str) -> datetime:
+    """解析 updated_since，格式错误时抛出 ValueError"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"无效的 updated_since: {value}") from e
+
+
+def _purge_tombstones(now: datetime):
+    """每小时清理一次过期的墓碑"""
+    global _last_purge
+    with _purge_lock:
+        if time.time() - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = time.time()
+    TaskTombstone.delete().where(
+        TaskTombstone.deleted_at < now - timedelta(days=TASK_TOMBSTONE_RETENTION_DAYS)
+    ).execute()
+
+
+class TaskDelta:
+    """一次增量同步的结果"""
+
+    def __init__(self, items: List[Dict], deleted: List[int], watermark: str, reset: bool = False):
+        self.items = items
+        self.deleted = deleted
+        self.watermark = watermark
+        self.reset = reset
+
+    def to_dict(self) -> Dict:
+        return {
+            'watermark': self.watermark,
+            'deleted': self.deleted,
+            'reset': self.reset
+        }
+
+
+def sync_tasks(model, spec: FieldSpec, args: Mapping, status: Optional[int] = None) -> TaskDelta:
+    """
+    查询 updated_since 之后变更的任务
+
+    有状态过滤时，状态变化后不再属于该过滤条件的任务也放入 deleted，前端从当前列表中移除即可
+    """
+    now = datetime.now()
+    watermark = now.isoformat()
+    since = parse_watermark(args.get('updated_since'))
+    _purge_tombstones(now)
+
+    if since < now - timedelta(days=TASK_TOMBSTONE_RETENTION_DAYS):
+        return TaskDelta([], [], watermark, reset=True)
+
+    after = since - timedelta(seconds=TASK_SYNC_OVERLAP)
+    fields = parse_fields(args.get('fields'), spec)
+    query = projected_select(model, spec, fields, extra_columns=('status',)).where(model.update_at >= after)
+    rows = list(query.order_by(model.create_at.desc(), model.id.desc()).limit(MAX_DELTA_ROWS + 1))
+    if len(rows) > MAX_DELTA_ROWS:
+        return TaskDelta([], [], watermark, reset=True)
+
+    deleted = [row.task_id for row in TaskTombstone.select(TaskTombstone.task_id).where(
+        (TaskTombstone.task_table == model._meta.table_name) & (TaskTombstone.deleted_at >= after)
+    )]
+    if status is not None:
+        deleted.extend(row.id for row in rows if row.status != status)
+        rows = [row for row in rows if row.status == status]
+
+    return TaskDelta(build_items(spec, fields, rows), sorted(set(deleted)), watermark)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图存储 - 按内容哈希保存在磁盘上的 JPEG 缩略图
+
+缩略图文件名为 原图字节 + 缩略图参数 的哈希，同一张图片只解码、缩放一次；
+内容不变则 URL 不变，因此可以作为 ETag 并设置长期缓存。
+"""
+
+import hashlib
+import io
+import os
+import re
+import threading
+from typing import Optional
+
+from PIL import Image
+
+from backend.config.settings import THUMBNAIL_DIR
+
+THUMBNAIL_MAX_SIZE = (400, 300)
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_URL_PREFIX = '/api/prompt/thumbnails'
+
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ThumbnailStore:
+    """内容寻址的缩略图目录"""
+
+    def __init__(self, base_dir: str = THUMBNAIL_DIR, max_size=THUMBNAIL_MAX_SIZE, quality: int = THUMBNAIL_QUALITY):
+        self.base_dir = base_dir
+        self.max_size = tuple(max_size)
+        self.quality = quality
+        self._lock = threading.Lock()
+        self.stats = {
+            'generated': 0,
+            'reused': 0
+        }
+
+    @staticmethod
+    def is_valid_key(key: str) -> bool:
+        return bool(key) and bool(_KEY_PATTERN.match(key))
+
+    def key_of(self, image_bytes: bytes) -> str:
+        """缩略图键：原图内容与缩略图参数共同决定"""
+        digest = hashlib.sha256()
+        digest.update(f"{self.max_size[0]}x{self.max_size[1]}q{self.quality}:".encode('ascii'))
+        digest.update(image_bytes)
+        return digest.hexdigest()[:32]
+
+    def path_of(self, key: str) -> str:
+        return os.path.join(self.base_dir, key[:2], f"{key}.jpg")
+
+    @staticmethod
+    def url_of(key: str) -> str:
+        return f"{THUMBNAIL_URL_PREFIX}/{key}.jpg"
+
+    def _render(self, image_bytes: bytes) -> bytes:
+        pil_image = Image.open(io.BytesIO(image_bytes))
+        # 转换为RGB格式（JPEG不支持透明通道）
+        if pil_image.mode != 'RGB':
+            pil_image = pil_image.convert('RGB')
+        pil_image.thumbnail(self.max_size, Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        pil_image.save(buffer, format='JPEG', quality=self.quality)
+        return buffer.getvalue()
+
+    def put(self, image_bytes: bytes) -> str:
+        """保存图片的缩略图并返回键，已存在时直接复用"""
+        key = self.key_of(image_bytes)
+        path = self.path_of(key)
+        if os.path.exists(path):
+            with self._lock:
+                self.stats['reused'] += 1
+            return key
+
+        data = self._render(image_bytes)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换，避免并发请求读到半个文件
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stats['generated'] += 1
+        return key
+
+    def put_file(self, file_path: str) -> Optional[str]:
+        """为磁盘上的图片文件生成缩略图，文件不存在时返回 None"""
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, 'rb') as f:
+            return self.put(f.read())
+
+    def get_path(self, key: str) -> Optional[str]:
+        """缩略图文件路径，键非法或文件不存在时返回 None"""
+        if not self.is_valid_key(key):
+            return None
+        path = self.path_of(key)
+        return path if os.path.isfile(path) else None
+
+
+# 全局缩略图存储实例
+thumbnail_store = ThumbnailStore()
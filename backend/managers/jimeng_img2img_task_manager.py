@@ -15,40 +15,12 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.models.models import JimengImg2ImgTask, JimengAccount
 from backend.utils.jimeng_img2img import JimengImg2ImgExecutor
 from backend.utils.config_util import get_automation_max_threads, get_hide_window
-from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
-
-def run_async_safe(coro):
-    """安全地运行异步协程，处理事件循环冲突"""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果事件循环正在运行，在新线程中创建新的事件循环
-            import threading
-            result = None
-            exception = None
-
-            def run_in_thread():
-                nonlocal result, exception
-                try:
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    result = new_loop.run_until_complete(coro)
-                    new_loop.close()
-                except Exception as e:
-                    exception = e
-
-            thread = threading.Thread(target=run_in_thread)
-            thread.start()
-            thread.join()
-
-            if exception:
-                raise exception
-            return result
-        else:
-            return asyncio.run(coro)
-    except RuntimeError:
-        # 如果没有事件循环，直接使用 asyncio.run
-        return asyncio.run(coro)
+from backend.config.settings import TASK_RECONCILE_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.async_engine import run_blocking
+from backend.core.task_lease import task_lease
+from backend.core.account_lease import account_lease_service
+from backend.core.task_stats import task_status_counter
 
 class TaskManagerStatus(Enum):
     """任务管理器状态枚举"""
@@ -119,6 +91,7 @@ class JimengImg2ImgTaskManager:
         print(f"正在停止{self.platform_name}任务管理器...")
         self.status = TaskManagerStatus.STOPPED
         self.stop_event.set()
+        task_dispatcher.wake(JimengImg2ImgTask)
 
         # 不再关闭线程池，因为使用的是全局线程池
 
@@ -146,6 +119,7 @@ class JimengImg2ImgTaskManager:
         """恢复即梦图生图任务管理器"""
         if self.status == TaskManagerStatus.PAUSED:
             self.status = TaskManagerStatus.RUNNING
+            task_dispatcher.wake(JimengImg2ImgTask)
             print(f"任务管理器已恢复")
             return True
         return False
@@ -153,33 +127,9 @@ class JimengImg2ImgTaskManager:
     def get_summary(self) -> Dict:
         """获取即梦图生图平台任务汇总"""
         try:
-            # 统计时过滤掉空任务
-            base_query = JimengImg2ImgTask.select()
-
-            pending_count = base_query.where(
-                JimengImg2ImgTask.status == 0  # 排队中
-            ).count()
-
-            processing_count = base_query.where(
-                JimengImg2ImgTask.status == 1  # 生成中
-            ).count()
-
-            completed_count = base_query.where(
-                JimengImg2ImgTask.status == 2  # 已完成
-            ).count()
-
-            failed_count = base_query.where(
-                JimengImg2ImgTask.status == 3  # 失败
-            ).count()
-
-            return {
-                'platform': self.platform_name,
-                'pending': pending_count,
-                'processing': processing_count,
-                'completed': completed_count,
-                'failed': failed_count,
-                'total': pending_count + processing_count + completed_count + failed_count
-            }
+            # 读取内存中的状态计数缓存，由任务状态变化增量维护
+            summary = task_status_counter.get_summary(JimengImg2ImgTask)
+            return {'platform': self.platform_name, **summary}
         except Exception as e:
             print(f"获取{self.platform_name}汇总失败: {str(e)}")
             return {
@@ -222,7 +172,7 @@ class JimengImg2ImgTaskManager:
 
                 # 如果是暂停状态，跳过扫描
                 if self.status == TaskManagerStatus.PAUSED:
-                    time.sleep(TASK_PROCESSOR_INTERVAL)
+                    task_dispatcher.wait_for_tasks(JimengImg2ImgTask, TASK_RECONCILE_INTERVAL)
                     continue
 
                 # 扫描待处理任务
@@ -231,8 +181,8 @@ class JimengImg2ImgTaskManager:
                 # 清理已完成的任务记录
                 self._cleanup_finished_tasks()
 
-                # 等待下次扫描
-                time.sleep(TASK_PROCESSOR_INTERVAL)
+                # 等待任务入队事件，超时则执行一次兜底对账扫描
+                task_dispatcher.wait_for_tasks(JimengImg2ImgTask, TASK_RECONCILE_INTERVAL)
 
             except Exception as e:
                 print(f"{self.platform_name}任务扫描异常: {str(e)}")
@@ -249,23 +199,13 @@ class JimengImg2ImgTaskManager:
             if not self.global_executor or self.global_executor._shutdown:
                 return
 
-            # 获取配置的最大线程数
-            max_threads = get_automation_max_threads()
-
-            # 获取当前活跃的任务数量
-            with self._lock:
-                active_count = len([f for f in self.active_futures.values() if not f.done()])
-
-            if active_count >= max_threads:
-                return
-
-            # 计算可以启动的新任务数量
-            available_slots = max_threads - active_count
-
+            # 并发由全局统一调度器控制，这里只需把本平台优先级最高的排队任务送入就绪队列
+            lookahead = get_automation_max_threads()
+            
             # 查找排队中的任务 - 只扫描非空任务
             pending_tasks = JimengImg2ImgTask.select().where(
                 JimengImg2ImgTask.status == 0
-            ).order_by(JimengImg2ImgTask.create_at).limit(available_slots)
+            ).order_by(JimengImg2ImgTask.priority.desc(), JimengImg2ImgTask.create_at).limit(lookahead)
 
             for task in pending_tasks:
                 # 检查是否已经在处理中
@@ -326,6 +266,9 @@ class JimengImg2ImgTaskManager:
                 if task_id in self.active_futures:
                     del self.active_futures[task_id]
 
+            # 全局线程池释放了槽位，唤醒各平台管理器继续分发排队任务
+            task_dispatcher.notify_all()
+
             print(f"{self.platform_name}任务执行完成，任务ID: {task_id}")
 
         except Exception as e:
@@ -353,7 +296,7 @@ class JimengImg2ImgTaskManager:
                 if task_id in self.active_futures:
                     del self.active_futures[task_id]
 
-    def _process_single_task(self, task):
+    async def _process_single_task(self, task):
         """处理单个任务"""
         try:
             # 更新处理状态
@@ -363,13 +306,12 @@ class JimengImg2ImgTaskManager:
 
             print(f"开始处理{self.platform_name}任务，ID: {task.id}")
 
-            # 更新任务状态为处理中
-            task.status = 1
+            # 更新任务状态为处理中（与租约在同一次保存中写入）
             task.update_at = datetime.now()
-            task.save()
+            await run_blocking(task_lease.acquire, task)
 
             # 执行具体的任务处理逻辑
-            result = run_async_safe(self._execute_img2img_task(task))
+            result = await self._execute_img2img_task(task)
 
             if result['success']:
                 # 任务成功
@@ -381,21 +323,11 @@ class JimengImg2ImgTaskManager:
 
                     # 更新账号cookies
                     if 'cookies' in result and result['cookies']:
-                        try:
-                            from backend.core.database import db
-                            with db.atomic():
-                                account = JimengAccount.get_by_id(result['account_id'])
-                                old_cookies = account.cookies
-                                account.cookies = result['cookies']
-                                account.updated_at = datetime.now()
-                                account.save()
-                                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(result['cookies'])}")
-                        except Exception as e:
-                            print(f"更新账号cookies失败: {str(e)}")
+                        await run_blocking(self._save_account_cookies, result['account_id'], result['cookies'])
 
                 task.status = 2  # 已完成
                 task.update_at = datetime.now()
-                task.save()
+                await run_blocking(task.save)
 
                 print(f"{self.platform_name}任务完成，ID: {task.id}")
                 with self._lock:
@@ -405,28 +337,18 @@ class JimengImg2ImgTaskManager:
                 if 'account_id' in result:
                     # 更新账号cookies（即使失败也要更新）
                     if 'cookies' in result and result['cookies']:
-                        try:
-                            from backend.core.database import db
-                            with db.atomic():
-                                account = JimengAccount.get_by_id(result['account_id'])
-                                old_cookies = account.cookies
-                                account.cookies = result['cookies']
-                                account.updated_at = datetime.now()
-                                account.save()
-                                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(result['cookies'])}")
-                        except Exception as e:
-                            print(f"更新账号cookies失败: {str(e)}")
+                        await run_blocking(self._save_account_cookies, result['account_id'], result['cookies'])
 
                 # 检查是否需要重试（600/900错误码）
                 error_code = result.get('code', 0)
                 if error_code in [600, 900]:
                     # 设置失败状态和原因
-                    task.set_failure(error_code, result.get('error', '未知错误'))
+                    await run_blocking(task.set_failure, error_code, result.get('error', '未知错误'))
 
                     # 检查是否可以重试
                     if task.can_retry():
                         # 重试任务，重新进入排队状态
-                        if task.retry_task():
+                        if await run_blocking(task.retry_task):
                             print(f"{self.platform_name}任务重试，ID: {task.id}，重试次数: {task.retry_count}/{task.max_retry}")
                             # 不增加失败计数，因为任务重新排队了
                         else:
@@ -439,7 +361,7 @@ class JimengImg2ImgTaskManager:
                             self.stats['failed'] += 1
                 elif error_code == 800:
                     # 800错误码：生成失败
-                    task.set_failure(error_code, result.get('error', '未知错误'))
+                    await run_blocking(task.set_failure, error_code, result.get('error', '未知错误'))
                     print(f"{self.platform_name}任务生成失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
                     with self._lock:
                         self.stats['failed'] += 1
@@ -447,7 +369,7 @@ class JimengImg2ImgTaskManager:
                     # 非600/900/800错误，直接设置失败
                     task.status = 3  # 失败
                     task.update_at = datetime.now()
-                    task.save()
+                    await run_blocking(task.save)
 
                     print(f"{self.platform_name}任务失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
                     with self._lock:
@@ -461,15 +383,15 @@ class JimengImg2ImgTaskManager:
             try:
                 # 异常情况下也更新账号使用情况（如果有账号信息）
                 try:
-                    available_account = self._get_available_account()
+                    available_account = await run_blocking(self._get_available_account)
                     if available_account:
-                        self._update_account_usage(available_account.id)
+                        await run_blocking(self._update_account_usage, available_account.id)
                 except:
                     pass
 
                 task.status = 3
                 task.update_at = datetime.now()
-                task.save()
+                await run_blocking(task.save)
                 with self._lock:
                     self.stats['failed'] += 1
                     self.stats['total_processed'] += 1
@@ -491,11 +413,13 @@ class JimengImg2ImgTaskManager:
         print(f"任务参数: prompt='{task.prompt}', model='{task.model}', ratio='{task.ratio}', quality='{task.quality}'")
 
         client = None
+        lease = None
         try:
             # 获取可用账号
-            available_account = self._get_available_account()
-            if not available_account:
+            lease = await run_blocking(account_lease_service.reserve, 'img2img')
+            if not lease:
                 return {'success': False, 'error': '没有可用的即梦账号或账号使用次数已达上限', 'account_id': None}
+            available_account = lease.account
 
             print(f"使用账号: {available_account.account}")
 
@@ -504,6 +428,8 @@ class JimengImg2ImgTaskManager:
 
             # 使用新的执行器
             executor = JimengImg2ImgExecutor(headless=headless)
+            # 拿到平台任务ID后立即写入任务记录，服务中断后不会重新提交
+            executor.on_task_id = lambda platform_task_id: task_lease.record_task_id(task, platform_task_id)
 
             # 准备任务参数
             input_images = task.get_input_images()
@@ -535,7 +461,7 @@ class JimengImg2ImgTaskManager:
 
             if result.code == 200 and result.data and len(result.data) > 0:
                 # 更新账号使用次数
-                await self.add_task_record(available_account.id, 4)  # 4=图生图
+                await run_blocking(account_lease_service.commit, lease, 4)  # 4=图生图
 
                 return {
                     'success': True,
@@ -550,7 +476,7 @@ class JimengImg2ImgTaskManager:
                 # 如果是700（任务ID等待超时）或800（生成失败），需要更新账号使用记录
                 if error_code in [700, 800]:
                     print(f"错误码 {error_code}，更新账号使用情况")
-                    await self.add_task_record(available_account.id, 4)  # 4=图生图
+                    await run_blocking(account_lease_service.commit, lease, 4)  # 4=图生图
 
                 return {
                     'success': False,
@@ -565,6 +491,8 @@ class JimengImg2ImgTaskManager:
             print(f"即梦图生图任务执行异常: {str(e)}")
             return {'success': False, 'error': f'任务执行异常: {str(e)}'}
         finally:
+            # 未提交的账号预留归还给租用服务
+            await run_blocking(account_lease_service.release, lease)
             # 确保浏览器关闭
             if client:
                 try:
@@ -575,93 +503,25 @@ class JimengImg2ImgTaskManager:
 
     def _get_available_account(self, task_type='img2img'):
         """
-        获取可用的即梦账号
-
-        参数:
-            task_type: 任务类型 ('img2img')
-
-        规则：
-        - 图片生成：每个账号每天可生成50次
-        - 优先选择使用次数最少的账号
+        获取当前使用次数最少且未达每日上限的即梦账号（仅查询，不预留额度）
+        
+        执行任务时使用 account_lease_service.reserve()，由账号租用服务保证并发选号不会超出每日上限
         """
-        try:
-            from datetime import date
-            today = date.today()
-
-            # 查询所有账号
-            accounts = list(JimengAccount.select())
-            if not accounts:
-                print("没有配置的即梦账号")
-                return None
-
-            # 根据任务类型设置每日限制
-            daily_limits = {
-                'img2img': 10      # 图生图每天10次
-            }
-
-            daily_limit = daily_limits.get(task_type, 10)
-
-            # 查找今日使用次数最少且未达上限的账号，在相同使用次数中随机选择
-            available_accounts = []
-            min_usage = float('inf')
-
-            for account in accounts:
-                # 统计今日该账号的指定类型任务使用次数（查询账号记录表）
-                from backend.models.models import JimengTaskRecord
-
-                # 任务类型映射
-                task_type_map = {
-                    'img2img': 4       # 图生图
-                }
-
-                task_type_id = task_type_map.get(task_type, 4)
-
-                # 查询今日该账号的图片类别任务记录数量（文生图+图生图）
-                if task_type == 'img2img':
-                    # 图生图任务：统计图片类别总使用次数
-                    today_usage = JimengTaskRecord.select().where(
-                        (JimengTaskRecord.account_id == account.id) &
-                        (JimengTaskRecord.task_type.in_([1, 4])) &  # 1=文生图, 4=图生图
-                        (JimengTaskRecord.created_at >= today)
-                    ).count()
-                    print(f"账号 {account.account} 今日图片生成已使用: {today_usage}/{daily_limit} 次")
-                else:
-                    # 其他任务类型：统计单个任务类型
-                    today_usage = JimengTaskRecord.select().where(
-                        (JimengTaskRecord.account_id == account.id) &
-                        (JimengTaskRecord.task_type == task_type_id) &
-                        (JimengTaskRecord.created_at >= today)
-                    ).count()
-                    print(f"账号 {account.account} 今日{task_type}已使用: {today_usage}/{daily_limit} 次")
-
-                # 检查是否还有可用次数
-                if today_usage < daily_limit:
-                    if today_usage < min_usage:
-                        # 发现更少使用次数的账号，重置列表
-                        min_usage = today_usage
-                        available_accounts = [account]
-                    elif today_usage == min_usage:
-                        # 使用次数相同，加入候选列表
-                        available_accounts.append(account)
-
-            if available_accounts:
-                # 在使用次数最少的账号中随机选择
-                selected_account = random.choice(available_accounts)
-                if task_type == 'img2img':
-                    print(f"随机选择账号: {selected_account.account} (今日图片生成已使用: {min_usage}/{daily_limit})")
-                else:
-                    print(f"随机选择账号: {selected_account.account} (今日{task_type}已使用: {min_usage}/{daily_limit})")
-                return selected_account
-            else:
-                if task_type == 'img2img':
-                    print("所有账号今日图片生成次数已达上限")
-                else:
-                    print(f"所有账号今日{task_type}使用次数已达上限")
-                return None
+        return account_lease_service.pick(task_type)
 
+    def _save_account_cookies(self, account_id: int, cookies: str):
+        """更新账号的cookies（同步数据库写入，协程中经 run_blocking 调用）"""
+        try:
+            from backend.core.database import db
+            with db.atomic():
+                account = JimengAccount.get_by_id(account_id)
+                old_cookies = account.cookies
+                account.cookies = cookies
+                account.updated_at = datetime.now()
+                account.save()
+                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(cookies)}")
         except Exception as e:
-            print(f"获取可用账号失败: {str(e)}")
-            return None
+            print(f"更新账号cookies失败: {str(e)}")
 
     def _update_account_usage(self, account_id: int, task_type: str):
         """
@@ -674,22 +534,14 @@ class JimengImg2ImgTaskManager:
         try:
             print(f"更新账号 {account_id} 的 {task_type} 使用记录")
 
-            # 添加即梦账号使用记录到数据库
-            from backend.models.models import JimengTaskRecord
             task_type_map = {
                 'img2img': 4       # 图生图
             }
 
             task_type_id = task_type_map.get(task_type, 4)
 
-            record = JimengTaskRecord.create(
-                account_id=account_id,
-                task_type=task_type_id,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-
-            print(f"添加即梦账号使用记录成功，记录ID: {record.id}, 账号ID: {account_id}, 任务类型: {task_type}")
+            # 写入使用记录并同步账号租用服务的用量计数
+            account_lease_service.record_usage(account_id, task_type_id)
 
         except Exception as e:
             print(f"更新账号使用记录失败: {str(e)}")
@@ -697,21 +549,7 @@ class JimengImg2ImgTaskManager:
     async def add_task_record(self, account_id: int, task_type: int = 4,
                             task_id: Optional[str] = None) -> Optional[int]:
         """添加任务记录到数据库 (task_type: 4=图生图)"""
-        try:
-            from backend.models.models import JimengTaskRecord
-            record = JimengTaskRecord.create(
-                account_id=account_id,
-                task_type=task_type,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-
-            print(f"添加任务记录成功，记录ID: {record.id}")
-            return record.id
-
-        except Exception as e:
-            print(f"添加任务记录失败: {str(e)}")
-            return None
+        return await run_blocking(account_lease_service.record_usage, account_id, task_type)
 
     def get_thread_details(self) -> List[Dict]:
         """获取线程详细信息，用于前端显示"""
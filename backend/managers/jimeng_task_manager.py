@@ -16,40 +16,29 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.models.models import JimengText2ImgTask, JimengAccount
 from backend.utils.jimeng_text2img import JimengText2ImageExecutor
 from backend.utils.config_util import get_automation_max_threads, get_hide_window
-from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.config.settings import TASK_RECONCILE_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.async_engine import run_blocking
+from backend.core.task_lease import task_lease
+from backend.core.account_lease import account_lease_service
+from backend.core.task_stats import task_status_counter
+from backend.core.task_pagination import list_tasks, task_field, format_time
 
-def run_async_safe(coro):
-    """安全地运行异步协程，处理事件循环冲突"""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果事件循环正在运行，在新线程中创建新的事件循环
-            import threading
-            result = None
-            exception = None
-            
-            def run_in_thread():
-                nonlocal result, exception
-                try:
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    result = new_loop.run_until_complete(coro)
-                    new_loop.close()
-                except Exception as e:
-                    exception = e
-            
-            thread = threading.Thread(target=run_in_thread)
-            thread.start()
-            thread.join()
-            
-            if exception:
-                raise exception
-            return result
-        else:
-            return asyncio.run(coro)
-    except RuntimeError:
-        # 如果没有事件循环，直接使用 asyncio.run
-        return asyncio.run(coro)
+# 详细任务列表字段：输出字段 -> (依赖的列, 取值函数)
+DETAILED_TASK_FIELDS = {
+    'id': task_field('id'),
+    'prompt': task_field('prompt'),
+    'model': task_field('model'),
+    'ratio': task_field('ratio'),
+    'quality': task_field('quality'),
+    'status': task_field('status'),
+    'status_text': task_field('status', getter=lambda task: task.get_status_text()),
+    'account_id': task_field('account_id'),
+    'images': task_field('images_json', 'image1', 'image2', 'image3', 'image4', getter=lambda task: task.get_images()),
+    'image_count': task_field('images_json', 'image1', 'image2', 'image3', 'image4', getter=lambda task: len(task.get_images())),
+    'create_at': task_field('create_at', getter=lambda task: format_time(task.create_at)),
+    'update_at': task_field('update_at', getter=lambda task: format_time(task.update_at)),
+}
 
 class JimengTaskManagerStatus(Enum):
     """即梦任务管理器状态枚举"""
@@ -116,6 +105,7 @@ class JimengTaskManager:
         print(f"正在停止{self.platform_name}任务管理器...")
         self.status = JimengTaskManagerStatus.STOPPED
         self.stop_event.set()
+        task_dispatcher.wake(JimengText2ImgTask)
         
         # 不再关闭线程池，因为使用的是全局线程池
             
@@ -143,6 +133,7 @@ class JimengTaskManager:
         """恢复即梦任务管理器"""
         if self.status == JimengTaskManagerStatus.PAUSED:
             self.status = JimengTaskManagerStatus.RUNNING
+            task_dispatcher.wake(JimengText2ImgTask)
             print(f"任务管理器已恢复")
             return True
         return False
@@ -150,33 +141,9 @@ class JimengTaskManager:
     def get_summary(self) -> Dict:
         """获取即梦平台任务汇总"""
         try:
-            # 统计时过滤掉空任务
-            base_query = JimengText2ImgTask.select()
-            
-            pending_count = base_query.where(
-                JimengText2ImgTask.status == 0  # 排队中
-            ).count()
-            
-            processing_count = base_query.where(
-                JimengText2ImgTask.status == 1  # 生成中
-            ).count()
-            
-            completed_count = base_query.where(
-                JimengText2ImgTask.status == 2  # 已完成
-            ).count()
-            
-            failed_count = base_query.where(
-                JimengText2ImgTask.status == 3  # 失败
-            ).count()
-            
-            return {
-                'platform': self.platform_name,
-                'pending': pending_count,
-                'processing': processing_count,
-                'completed': completed_count,
-                'failed': failed_count,
-                'total': pending_count + processing_count + completed_count + failed_count
-            }
+            # 读取内存中的状态计数缓存，由任务状态变化增量维护
+            summary = task_status_counter.get_summary(JimengText2ImgTask)
+            return {'platform': self.platform_name, **summary}
         except Exception as e:
             print(f"获取{self.platform_name}汇总失败: {str(e)}")
             return {
@@ -203,42 +170,23 @@ class JimengTaskManager:
                 'thread_pool_alive': self.global_executor is not None and not self.global_executor._shutdown
             }
     
-    def get_detailed_tasks(self, status: Optional[int] = None, page: int = 1, page_size: int = 1000) -> Dict:
-        """获取详细任务列表"""
+    def get_detailed_tasks(self, status: Optional[int] = None, page: int = 1, page_size: int = 1000,
+                           cursor: Optional[str] = None, fields: Optional[str] = None) -> Dict:
+        """获取详细任务列表（传入 cursor 时按游标分页，首页传空字符串；fields 为逗号分隔的返回字段）"""
         try:
-            query = JimengText2ImgTask.select()
-            if status is not None:
-                query = query.where(JimengText2ImgTask.status == status)
-            
-            total = query.count()
-            tasks = query.order_by(JimengText2ImgTask.create_at.desc()).paginate(page, page_size)
-            
-            task_list = []
-            for task in tasks:
-                images = task.get_images()
-                task_list.append({
-                    'id': task.id,
-                    'prompt': task.prompt,
-                    'model': task.model,
-                    'ratio': task.ratio,
-                    'quality': task.quality,
-                    'status': task.status,
-                    'status_text': task.get_status_text(),
-                    'account_id': task.account_id,
-                    'images': images,
-                    'image_count': len(images),
-                    'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S')
-                })
+            args = {'page': page, 'page_size': page_size, 'cursor': cursor, 'fields': fields}
+            result = list_tasks(JimengText2ImgTask, DETAILED_TASK_FIELDS, args, status=status)
             
             return {
                 'platform': self.platform_name,
-                'tasks': task_list,
+                'tasks': result.items,
                 'pagination': {
-                    'total': total,
-                    'page': page,
-                    'page_size': page_size,
-                    'total_pages': (total + page_size - 1) // page_size
+                    'total': result.total,
+                    'page': result.page,
+                    'page_size': result.page_size,
+                    'total_pages': result.total_pages,
+                    'next_cursor': result.next_cursor,
+                    'has_more': result.has_more
                 }
             }
         except Exception as e:
@@ -261,7 +209,7 @@ class JimengTaskManager:
                 
                 # 如果是暂停状态，跳过扫描
                 if self.status == JimengTaskManagerStatus.PAUSED:
-                    time.sleep(TASK_PROCESSOR_INTERVAL)
+                    task_dispatcher.wait_for_tasks(JimengText2ImgTask, TASK_RECONCILE_INTERVAL)
                     continue
                 
                 # 扫描待处理任务
@@ -270,8 +218,8 @@ class JimengTaskManager:
                 # 清理已完成的任务记录
                 self._cleanup_finished_tasks()
                 
-                # 等待下次扫描
-                time.sleep(TASK_PROCESSOR_INTERVAL)
+                # 等待任务入队事件，超时则执行一次兜底对账扫描
+                task_dispatcher.wait_for_tasks(JimengText2ImgTask, TASK_RECONCILE_INTERVAL)
                 
             except Exception as e:
                 print(f"{self.platform_name}任务扫描异常: {str(e)}")
@@ -288,23 +236,13 @@ class JimengTaskManager:
             if not self.global_executor or self.global_executor._shutdown:
                 return
                 
-            # 获取配置的最大线程数
-            max_threads = get_automation_max_threads()
-            
-            # 获取当前活跃的任务数量
-            with self._lock:
-                active_count = len([f for f in self.active_futures.values() if not f.done()])
-            
-            if active_count >= max_threads:
-                return
-            
-            # 计算可以启动的新任务数量
-            available_slots = max_threads - active_count
+            # 并发由全局统一调度器控制，这里只需把本平台优先级最高的排队任务送入就绪队列
+            lookahead = get_automation_max_threads()
             
             # 查找排队中的任务 - 只扫描非空任务
             pending_tasks = JimengText2ImgTask.select().where(
                 JimengText2ImgTask.status == 0
-            ).order_by(JimengText2ImgTask.create_at).limit(available_slots)
+            ).order_by(JimengText2ImgTask.priority.desc(), JimengText2ImgTask.create_at).limit(lookahead)
             
             for task in pending_tasks:
                 # 检查是否已经在处理中
@@ -364,13 +302,16 @@ class JimengTaskManager:
                 # 从活跃futures中移除
                 if task_id in self.active_futures:
                     del self.active_futures[task_id]
-                    
+
+            # 全局线程池释放了槽位，唤醒各平台管理器继续分发排队任务
+            task_dispatcher.notify_all()
+
             print(f"{self.platform_name}任务执行完成，任务ID: {task_id}")
             
         except Exception as e:
             print(f"处理{self.platform_name}任务完成回调失败: {str(e)}")
     
-    def _process_single_task(self, task):
+    async def _process_single_task(self, task):
         """处理单个任务"""
         try:
             # 更新处理状态
@@ -380,13 +321,12 @@ class JimengTaskManager:
             
             print(f"开始处理{self.platform_name}任务，ID: {task.id}")
             
-            # 更新任务状态为处理中
-            task.status = 1
+            # 更新任务状态为处理中（与租约在同一次保存中写入）
             task.update_at = datetime.now()
-            task.save()
+            await run_blocking(task_lease.acquire, task)
             
             # 执行具体的任务处理逻辑 - 这里需要用户自己实现
-            result = run_async_safe(self._execute_text2img_task(task))
+            result = await self._execute_text2img_task(task)
             
             if result and result.get('success'):
                 # 任务成功 - 账号使用记录已在_execute_text2img_task中处理
@@ -403,37 +343,13 @@ class JimengTaskManager:
                     
                     # 更新账号cookies
                     if result.get('cookies'):
-                        try:
-                            from backend.core.database import db
-                            with db.atomic():
-                                account = JimengAccount.get_by_id(result['account_id'])
-                                old_cookies = account.cookies
-                                account.cookies = result['cookies']
-                                account.updated_at = datetime.now()
-                                account.save()
-                                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(result['cookies'])}")
-                        except Exception as e:
-                            print(f"更新账号cookies失败: {str(e)}")
+                        await run_blocking(self._save_account_cookies, result['account_id'], result['cookies'])
                 
                 task.status = 2  # 已完成
                 task.update_at = datetime.now()
-                task.save()
-                
-                # 清理该任务的输入图片文件，避免历史图片干扰
-                try:
-                    base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp')
-                    if os.path.isdir(base_dir):
-                        for name in os.listdir(base_dir):
-                            if name.startswith(f"text2img_{task.id}_"):
-                                file_path = os.path.join(base_dir, name)
-                                try:
-                                    if os.path.isfile(file_path):
-                                        os.remove(file_path)
-                                        print(f"已清理任务 {task.id} 的输入图片: {name}")
-                                except Exception as e:
-                                    print(f"删除输入图片失败: {e}")
-                except Exception as e:
-                    print(f"清理输入图片失败: {e}")
+                # 释放该任务的参考图片，避免重试时再次使用；引用归零后由上传文件回收删除
+                task.input_image = None
+                await run_blocking(task.save)
                 
                 print(f"{self.platform_name}任务完成，ID: {task.id}")
                 with self._lock:
@@ -443,29 +359,19 @@ class JimengTaskManager:
                 if result and result.get('account_id'):
                     # 更新账号cookies（即使失败也要更新）
                     if result.get('cookies'):
-                        try:
-                            from backend.core.database import db
-                            with db.atomic():
-                                account = JimengAccount.get_by_id(result['account_id'])
-                                old_cookies = account.cookies
-                                account.cookies = result['cookies']
-                                account.updated_at = datetime.now()
-                                account.save()
-                                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(result['cookies'])}")
-                        except Exception as e:
-                            print(f"更新账号cookies失败: {str(e)}")
+                        await run_blocking(self._save_account_cookies, result['account_id'], result['cookies'])
                 
                 # 检查是否需要重试（600/900错误码）
                 error_code = result.get('code', 0) if result else 0
                 if error_code in [600, 900]:
                     # 设置失败状态和原因
                     error_msg = result.get('error', '未知错误') if result else '未知错误'
-                    task.set_failure(error_code, error_msg)
+                    await run_blocking(task.set_failure, error_code, error_msg)
                     
                     # 检查是否可以重试
                     if task.can_retry():
                         # 重试任务，重新进入排队状态
-                        if task.retry_task():
+                        if await run_blocking(task.retry_task):
                             print(f"{self.platform_name}任务重试，ID: {task.id}，重试次数: {task.retry_count}/{task.max_retry}")
                             # 不增加失败计数，因为任务重新排队了
                         else:
@@ -479,7 +385,7 @@ class JimengTaskManager:
                 elif error_code == 800:
                     # 800错误码：生成失败，账号使用记录已在执行方法中处理
                     error_msg = result.get('error', '未知错误') if result else '未知错误'
-                    task.set_failure(error_code, error_msg)
+                    await run_blocking(task.set_failure, error_code, error_msg)
                     print(f"{self.platform_name}任务生成失败，ID: {task.id}，原因: {error_msg}")
                     with self._lock:
                         self.stats['failed'] += 1
@@ -487,7 +393,7 @@ class JimengTaskManager:
                     # 非600/900/800错误，直接设置失败
                     task.status = 3  # 失败
                     task.update_at = datetime.now()
-                    task.save()
+                    await run_blocking(task.save)
                     
                     error_msg = result.get('error', '未知错误') if result else '未知错误'
                     print(f"{self.platform_name}任务失败，ID: {task.id}，原因: {error_msg}")
@@ -502,15 +408,15 @@ class JimengTaskManager:
             try:
                 # 异常情况下也更新账号使用情况（如果有账号信息）
                 try:
-                    available_account = self._get_available_account('text2img')
+                    available_account = await run_blocking(self._get_available_account, 'text2img')
                     if available_account:
-                        self._update_account_usage(available_account.id, 'text2img')
+                        await run_blocking(self._update_account_usage, available_account.id, 'text2img')
                 except:
                     pass
                 
                 task.status = 3
                 task.update_at = datetime.now()
-                task.save()
+                await run_blocking(task.save)
                 with self._lock:
                     self.stats['failed'] += 1
                     self.stats['total_processed'] += 1
@@ -532,11 +438,13 @@ class JimengTaskManager:
         print(f"任务参数: prompt='{task.prompt}', model='{task.model}', ratio='{task.ratio}', quality='{task.quality}'")
         
         client = None
+        lease = None
         try:
             # 获取可用账号
-            available_account = self._get_available_account('text2img')
-            if not available_account:
+            lease = await run_blocking(account_lease_service.reserve, 'text2img')
+            if not lease:
                 return {'success': False, 'error': '没有可用的即梦账号或账号使用次数已达上限', 'account_id': None}
+            available_account = lease.account
             
             print(f"使用账号: {available_account.account}")
             
@@ -545,54 +453,16 @@ class JimengTaskManager:
             
             # 使用新的执行器
             executor = JimengText2ImageExecutor(headless=headless)
-            image_path = None
-            
-            
-            
-            # 然后再检查是否有新上传的图片
-            image_path = None  # 初始化image_path变量
-            try:
-                base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp')
-                print(f"检查图片目录: {base_dir}")
-                if os.path.isdir(base_dir):
-                    fresh_candidates = []
-                    try:
-                        import time as _t
-                        now_ts = _t.time()
-                        try:
-                            task_ts = int((getattr(task, 'update_at', None) or getattr(task, 'create_at')).timestamp())
-                        except Exception:
-                            task_ts = int(now_ts)
-                        for name in os.listdir(base_dir):
-                            print(f"检查文件: {name}")
-                            if name.startswith(f"text2img_{task.id}_"):
-                                full = os.path.join(base_dir, name)
-                                try:
-                                    if os.path.isfile(full):
-                                        mtime = os.path.getmtime(full)
-                                        is_fresh_after_task = mtime >= (task_ts - 60)
-                                        is_recent_by_now = (now_ts - mtime) <= 600
-                                        if is_fresh_after_task and is_recent_by_now:
-                                            fresh_candidates.append((mtime, full))
-                                            print(f"录用输入图片: {full}")
-                                        else:
-                                            print(f"忽略旧输入图片: {full}")
-                                    else:
-                                        print(f"路径不是文件: {full}")
-                                except Exception as e:
-                                    print(f"获取文件修改时间失败: {full}, 错误: {e}")
-                    except Exception as e:
-                        print(f"筛选输入图片失败: {e}")
-                    if fresh_candidates:
-                        fresh_candidates.sort(key=lambda x: x[0], reverse=True)
-                        image_path = fresh_candidates[0][1]
-                        print(f"检测到文生图任务新上传图片: {image_path}")
-                    else:
-                        print(f"任务 {task.id}: 本次未检测到新上传图片，按仅提示词执行")
-                else:
-                    print(f"图片目录不存在: {base_dir}")
-            except Exception as e:
-                print(f"查找输入图片失败（忽略）: {e}")
+            # 拿到平台任务ID后立即写入任务记录，服务中断后不会重新提交
+            executor.on_task_id = lambda platform_task_id: task_lease.record_task_id(task, platform_task_id)
+
+            # 上传的参考图片记录在任务上
+            image_path = task.input_image
+            if image_path and not os.path.isfile(image_path):
+                print(f"任务 {task.id}: 参考图片不存在，按仅提示词执行: {image_path}")
+                image_path = None
+            elif image_path:
+                print(f"文生图任务使用参考图片: {image_path}")
             result = await executor.run(
                 prompt=task.prompt,
                 username=available_account.account,
@@ -614,7 +484,7 @@ class JimengTaskManager:
                         images = result.data.get('posters') or []
                     videos = result.data.get('videos') or []
                     if (images and len(images) > 0) or (videos and len(videos) > 0):
-                        await self.add_task_record(available_account.id, 1)
+                        await run_blocking(account_lease_service.commit, lease, 1)
                         return {
                             'success': True,
                             'images': images,
@@ -623,7 +493,7 @@ class JimengTaskManager:
                             'cookies': result.cookies
                         }
                 elif isinstance(result.data, list) and len(result.data) > 0:
-                    await self.add_task_record(available_account.id, 1)
+                    await run_blocking(account_lease_service.commit, lease, 1)
                     return {
                         'success': True, 
                         'images': result.data,
@@ -638,7 +508,7 @@ class JimengTaskManager:
             # 如果是700（任务ID等待超时）或800（生成失败），需要更新账号使用记录
             if error_code in [700, 800]:
                 print(f"错误码 {error_code}，更新账号使用情况")
-                await self.add_task_record(available_account.id, 1)  # 1=文生图
+                await run_blocking(account_lease_service.commit, lease, 1)  # 1=文生图
             
             return {
                 'success': False, 
@@ -653,108 +523,33 @@ class JimengTaskManager:
             print(f"即梦任务执行异常: {str(e)}")
             return {'success': False, 'error': f'任务执行异常: {str(e)}'}
         finally:
-            # 确保浏览器关闭
-            # client 未被使用，删除相关代码
-            pass
+            # 未提交的账号预留归还给租用服务
+            await run_blocking(account_lease_service.release, lease)
     
     def _get_available_account(self, task_type='text2img'):
         """
-        获取可用的即梦账号
+        获取当前使用次数最少且未达每日上限的即梦账号（仅查询，不预留额度）
         
-        参数:
-            task_type: 任务类型 ('text2img', 'img2video', 'digital_human')
-        
-        规则：
-        - 图片生成：每个账号每天可生成50次
-        - 视频生成：每个账号每天可生成1次
-        - 数字人生成：每个账号每天可生成1次
-        - 优先选择使用次数最少的账号
+        执行任务时使用 account_lease_service.reserve()，由账号租用服务保证并发选号不会超出每日上限
         """
-        try:
-            from datetime import date
-            today = date.today()
-            
-            # 查询所有账号
-            accounts = list(JimengAccount.select())
-            if not accounts:
-                print("没有配置的即梦账号")
-                return None
-            
-            # 根据任务类型设置每日限制
-            daily_limits = {
-                'text2img': 10,      # 图片生成每天10次
-                'img2video': 2,      # 视频生成每天1次
-                'digital_human': 1   # 数字人生成每天1次
-            }
-            
-            daily_limit = daily_limits.get(task_type, 10)
-            
-            # 查找今日使用次数最少且未达上限的账号，在相同使用次数中随机选择
-            available_accounts = []
-            min_usage = float('inf')
-            
-            for account in accounts:
-                # 统计今日该账号的指定类型任务使用次数（查询账号记录表）
-                from backend.models.models import JimengTaskRecord
-                
-                # 任务类型映射
-                task_type_map = {
-                    'text2img': 1,      # 文生图
-                    'img2video': 2,     # 图生视频
-                    'digital_human': 3  # 数字人
-                }
-                
-                task_type_id = task_type_map.get(task_type, 1)
-                
-                # 查询今日该账号的图片类别任务记录数量（文生图+图生图）
-                if task_type == 'text2img':
-                    # 文生图任务：统计图片类别总使用次数
-                    today_usage = JimengTaskRecord.select().where(
-                        (JimengTaskRecord.account_id == account.id) &
-                        (JimengTaskRecord.task_type.in_([1, 4])) &  # 1=文生图, 4=图生图
-                        (JimengTaskRecord.created_at >= today)
-                    ).count()
-                    print(f"账号 {account.account} 今日图片生成已使用: {today_usage}/{daily_limit} 次")
-                else:
-                    # 其他任务类型：统计单个任务类型
-                    today_usage = JimengTaskRecord.select().where(
-                        (JimengTaskRecord.account_id == account.id) &
-                        (JimengTaskRecord.task_type == task_type_id) &
-                        (JimengTaskRecord.created_at >= today)
-                    ).count()
-                    print(f"账号 {account.account} 今日{task_type}已使用: {today_usage}/{daily_limit} 次")
-                
-                # 检查是否还有可用次数
-                if today_usage < daily_limit:
-                    if today_usage < min_usage:
-                        # 发现更少使用次数的账号，重置列表
-                        min_usage = today_usage
-                        available_accounts = [account]
-                    elif today_usage == min_usage:
-                        # 使用次数相同，加入候选列表
-                        available_accounts.append(account)
-            
-            if available_accounts:
-                # 在使用次数最少的账号中随机选择
-                selected_account = random.choice(available_accounts)
-                if task_type == 'text2img':
-                    print(f"随机选择账号: {selected_account.account} (今日图片生成已使用: {min_usage}/{daily_limit})")
-                else:
-                    print(f"随机选择账号: {selected_account.account} (今日{task_type}已使用: {min_usage}/{daily_limit})")
-                return selected_account
-            else:
-                if task_type == 'text2img':
-                    print("所有账号今日图片生成次数已达上限")
-                else:
-                    print(f"所有账号今日{task_type}使用次数已达上限")
-                return None
-                
-        except Exception as e:
-            print(f"获取可用账号失败: {str(e)}")
-            return None
+        return account_lease_service.pick(task_type)
     
 
     
+    def _save_account_cookies(self, account_id: int, cookies: str):
+        """更新账号的cookies（同步数据库写入，协程中经 run_blocking 调用）"""
+        try:
+            from backend.core.database import db
+            with db.atomic():
+                account = JimengAccount.get_by_id(account_id)
+                old_cookies = account.cookies
+                account.cookies = cookies
+                account.updated_at = datetime.now()
+                account.save()
+                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(cookies)}")
+        except Exception as e:
+            print(f"更新账号cookies失败: {str(e)}")
+    
     def _update_account_usage(self, account_id: int, task_type: str):
         """
         更新账号使用记录
@@ -766,8 +561,6 @@ class JimengTaskManager:
         try:
             print(f"更新账号 {account_id} 的 {task_type} 使用记录")
             
-            # 添加即梦账号使用记录到数据库
-            from backend.models.models import JimengTaskRecord
             task_type_map = {
                 'text2img': 1,      # 文生图
                 'img2video': 2,     # 图生视频
@@ -775,15 +568,9 @@ class JimengTaskManager:
             }
             
             task_type_id = task_type_map.get(task_type, 1)
-            
-            record = JimengTaskRecord.create(
-                account_id=account_id,
-                task_type=task_type_id,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            
-            print(f"添加即梦账号使用记录成功，记录ID: {record.id}, 账号ID: {account_id}, 任务类型: {task_type}")
+
+            # 写入使用记录并同步账号租用服务的用量计数
+            account_lease_service.record_usage(account_id, task_type_id)
             
         except Exception as e:
             print(f"更新账号使用记录失败: {str(e)}")
@@ -791,21 +578,7 @@ class JimengTaskManager:
     async def add_task_record(self, account_id: int, task_type: int = 1, 
                             task_id: Optional[str] = None) -> Optional[int]:
         """添加任务记录到数据库 (task_type: 1=文生图)"""
-        try:
-            from backend.models.models import JimengTaskRecord
-            record = JimengTaskRecord.create(
-                account_id=account_id,
-                task_type=task_type,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            
-            print(f"添加任务记录成功，记录ID: {record.id}")
-            return record.id
-            
-        except Exception as e:
-            print(f"添加任务记录失败: {str(e)}")
-            return None
+        return await run_blocking(account_lease_service.record_usage, account_id, task_type)
     
 # 已删除_login_and_generate方法，现在直接使用text2image函数
 
@@ -19,45 +19,17 @@ from backend.models.models import JimengAccount, JimengTaskRecord, JimengText2Vi
 from backend.utils.base_task_executor import ErrorCode
 from backend.core.database import db as database
 from backend.utils.config_util import get_automation_max_threads, get_hide_window
-from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.config.settings import TASK_RECONCILE_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.async_engine import run_blocking
+from backend.core.task_lease import task_lease
+from backend.core.account_lease import account_lease_service
+from backend.core.task_stats import task_status_counter
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_async_safe(coro):
-    """安全地运行异步协程，处理事件循环冲突"""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果事件循环正在运行，在新线程中创建新的事件循环
-            import threading
-            result = None
-            exception = None
-            
-            def run_in_thread():
-                nonlocal result, exception
-                try:
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    result = new_loop.run_until_complete(coro)
-                    new_loop.close()
-                except Exception as e:
-                    exception = e
-            
-            thread = threading.Thread(target=run_in_thread)
-            thread.start()
-            thread.join()
-            
-            if exception:
-                raise exception
-            return result
-        else:
-            return asyncio.run(coro)
-    except RuntimeError:
-        # 如果没有事件循环，直接使用 asyncio.run
-        return asyncio.run(coro)
-
 class JimengText2VideoTaskManagerStatus(Enum):
     """即梦文生视频任务管理器状态枚举"""
     STOPPED = "stopped"
@@ -122,6 +94,7 @@ class JimengText2VideoTaskManager:
         logger.info(f"正在停止{self.platform_name}任务管理器...")
         self.status = JimengText2VideoTaskManagerStatus.STOPPED
         self.stop_event.set()
+        task_dispatcher.wake(JimengText2VideoTask)
         
         # 清空活跃任务
         with self._lock:
@@ -147,6 +120,7 @@ class JimengText2VideoTaskManager:
         """恢复文生视频任务管理器"""
         if self.status == JimengText2VideoTaskManagerStatus.PAUSED:
             self.status = JimengText2VideoTaskManagerStatus.RUNNING
+            task_dispatcher.wake(JimengText2VideoTask)
             logger.info(f"文生视频任务管理器已恢复")
             return True
         return False
@@ -167,7 +141,7 @@ class JimengText2VideoTaskManager:
                 
                 # 如果是暂停状态，跳过扫描
                 if self.status == JimengText2VideoTaskManagerStatus.PAUSED:
-                    time.sleep(TASK_PROCESSOR_INTERVAL)
+                    task_dispatcher.wait_for_tasks(JimengText2VideoTask, TASK_RECONCILE_INTERVAL)
                     continue
                 
                 # 扫描待处理任务
@@ -176,8 +150,8 @@ class JimengText2VideoTaskManager:
                 # 清理已完成的任务记录
                 self._cleanup_finished_tasks()
                 
-                # 等待下次扫描
-                time.sleep(TASK_PROCESSOR_INTERVAL)
+                # 等待任务入队事件，超时则执行一次兜底对账扫描
+                task_dispatcher.wait_for_tasks(JimengText2VideoTask, TASK_RECONCILE_INTERVAL)
                 
             except Exception as e:
                 logger.error(f"{self.platform_name}任务扫描异常: {str(e)}")
@@ -194,23 +168,13 @@ class JimengText2VideoTaskManager:
             if not self.global_executor or self.global_executor._shutdown:
                 return
                 
-            # 获取配置的最大线程数
-            max_threads = get_automation_max_threads()
-            
-            # 获取当前活跃的任务数量
-            with self._lock:
-                active_count = len([f for f in self.active_futures.values() if not f.done()])
-            
-            if active_count >= max_threads:
-                return
-            
-            # 计算可以启动的新任务数量
-            available_slots = max_threads - active_count
+            # 并发由全局统一调度器控制，这里只需把本平台优先级最高的排队任务送入就绪队列
+            lookahead = get_automation_max_threads()
             
             # 查找排队中的文生视频任务
             pending_tasks = JimengText2VideoTask.select().where(
                 JimengText2VideoTask.status == 0
-            ).order_by(JimengText2VideoTask.create_at).limit(available_slots)
+            ).order_by(JimengText2VideoTask.priority.desc(), JimengText2VideoTask.create_at).limit(lookahead)
             
             for task in pending_tasks:
                 # 检查是否已经在处理中
@@ -270,13 +234,16 @@ class JimengText2VideoTaskManager:
                 # 从活跃futures中移除
                 if task_id in self.active_futures:
                     del self.active_futures[task_id]
-                    
+
+            # 全局线程池释放了槽位，唤醒各平台管理器继续分发排队任务
+            task_dispatcher.notify_all()
+
             logger.info(f"{self.platform_name}任务执行完成，任务ID: {task_id}")
             
         except Exception as e:
             logger.error(f"处理{self.platform_name}任务完成回调失败: {str(e)}")
     
-    def _process_single_task(self, task):
+    async def _process_single_task(self, task):
         """处理单个文生视频任务"""
         try:
             # 更新处理状态
@@ -286,13 +253,12 @@ class JimengText2VideoTaskManager:
             
             logger.info(f"开始处理{self.platform_name}任务，ID: {task.id}")
             
-            # 更新任务状态为处理中
-            task.status = 1
+            # 更新任务状态为处理中（与租约在同一次保存中写入）
             task.update_at = datetime.now()
-            task.save()
+            await run_blocking(task_lease.acquire, task)
             
             # 执行具体的任务处理逻辑
-            result = run_async_safe(self._execute_text2video_task(task))
+            result = await self._execute_text2video_task(task)
             
             if result['success']:
                 # 任务成功
@@ -304,11 +270,11 @@ class JimengText2VideoTaskManager:
                     
                     # 更新账号cookies
                     if 'cookies' in result and result['cookies']:
-                        run_async_safe(self.update_account_cookies(result['account_id'], result['cookies']))
+                        await self.update_account_cookies(result['account_id'], result['cookies'])
                 
                 task.status = 2  # 已完成
                 task.update_at = datetime.now()
-                task.save()
+                await run_blocking(task.save)
                 
                 logger.info(f"{self.platform_name}任务完成，ID: {task.id}")
                 with self._lock:
@@ -318,18 +284,18 @@ class JimengText2VideoTaskManager:
                 if 'account_id' in result:
                     # 更新账号cookies（即使失败也要更新）
                     if 'cookies' in result and result['cookies']:
-                        run_async_safe(self.update_account_cookies(result['account_id'], result['cookies']))
+                        await self.update_account_cookies(result['account_id'], result['cookies'])
                 
                 # 检查是否需要重试（600/900错误码）
                 error_code = result.get('code', 'OTHER_ERROR')
                 if error_code in [600, 900]:
                     # 设置失败状态和原因
-                    task.set_failure(error_code, result.get('error', '未知错误'))
+                    await run_blocking(task.set_failure, error_code, result.get('error', '未知错误'))
                     
                     # 检查是否可以重试
                     if task.can_retry():
                         # 重试任务，重新进入排队状态
-                        if task.retry_task():
+                        if await run_blocking(task.retry_task):
                             logger.info(f"{self.platform_name}任务重试，ID: {task.id}，重试次数: {task.retry_count}/{task.max_retry}")
                             # 不增加失败计数，因为任务重新排队了
                         else:
@@ -342,13 +308,13 @@ class JimengText2VideoTaskManager:
                             self.stats['failed'] += 1
                 elif error_code == 800:
                     # 800错误码：生成失败，账号使用记录已在执行方法中处理
-                    task.set_failure(error_code, result.get('error', '未知错误'))
+                    await run_blocking(task.set_failure, error_code, result.get('error', '未知错误'))
                     logger.error(f"{self.platform_name}任务生成失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
                     with self._lock:
                         self.stats['failed'] += 1
                 else:
                     # 非600/900/800错误，直接设置失败
-                    task.set_failure(error_code, result.get('error', '未知错误'))
+                    await run_blocking(task.set_failure, error_code, result.get('error', '未知错误'))
                     
                     logger.error(f"{self.platform_name}任务失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
                     with self._lock:
@@ -360,7 +326,7 @@ class JimengText2VideoTaskManager:
         except Exception as e:
             logger.error(f"处理{self.platform_name}任务异常，ID: {task.id}，错误: {str(e)}")
             try:
-                task.set_failure('OTHER_ERROR', str(e))
+                await run_blocking(task.set_failure, 'OTHER_ERROR', str(e))
                 with self._lock:
                     self.stats['failed'] += 1
                     self.stats['total_processed'] += 1
@@ -403,11 +369,13 @@ class JimengText2VideoTaskManager:
         logger.info(f"开始执行文生视频任务，任务ID: {task.id}")
         logger.info(f"任务参数: prompt='{task.prompt}', second={task.second}, resolution='{task.resolution}', ratio='{task.ratio}'")
         
+        lease = None
         try:
             # 获取可用账号
-            available_account = self._get_available_account('text2video')
-            if not available_account:
+            lease = await run_blocking(account_lease_service.reserve, 'text2video')
+            if not lease:
                 return {'success': False, 'error': '没有可用的即梦账号或账号使用次数已达上限', 'account_id': None}
+            available_account = lease.account
             
             logger.info(f"使用账号: {available_account.account}")
             
@@ -416,6 +384,8 @@ class JimengText2VideoTaskManager:
             
             # 使用文生视频执行器
             executor = JimengText2VideoExecutor(headless=headless)
+            # 拿到平台任务ID后立即写入任务记录，服务中断后不会重新提交
+            executor.on_task_id = lambda platform_task_id: task_lease.record_task_id(task, platform_task_id)
             result = await executor.run(
                 prompt=task.prompt,
                 second=task.second,
@@ -428,7 +398,7 @@ class JimengText2VideoTaskManager:
             
             if result.code == 200 and result.data:
                 # 更新账号使用次数
-                await self.add_task_record(available_account.id, 5)  # 5=文生视频
+                await run_blocking(account_lease_service.commit, lease, 5)  # 5=文生视频
                 
                 return {
                     'success': True, 
@@ -443,7 +413,7 @@ class JimengText2VideoTaskManager:
                 # 如果是700（任务ID等待超时）或800（生成失败），需要更新账号使用记录
                 if error_code in [700, 800]:
                     logger.info(f"错误码 {error_code}，更新账号使用情况")
-                    await self.add_task_record(available_account.id, 5)  # 5=文生视频
+                    await run_blocking(account_lease_service.commit, lease, 5)  # 5=文生视频
                 
                 return {
                     'success': False, 
@@ -457,27 +427,21 @@ class JimengText2VideoTaskManager:
         except Exception as e:
             logger.error(f"即梦文生视频任务执行异常: {str(e)}")
             return {'success': False, 'error': f'任务执行异常: {str(e)}'}
+        finally:
+            # 未提交的账号预留归还给租用服务
+            await run_blocking(account_lease_service.release, lease)
     
     async def add_task_record(self, account_id: int, task_type: int = 5,
                             task_id: Optional[str] = None) -> Optional[int]:
         """添加任务记录到数据库 (task_type: 5=文生视频)"""
-        try:
-            record = JimengTaskRecord.create(
-                account_id=account_id,
-                task_type=task_type,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            
-            logger.info(f"添加任务记录成功，记录ID: {record.id}")
-            return record.id
-            
-        except Exception as e:
-            logger.error(f"添加任务记录失败: {str(e)}")
-            return None
+        return await run_blocking(account_lease_service.record_usage, account_id, task_type)
     
     async def update_account_cookies(self, account_id: int, cookies: str):
         """更新账号的cookies"""
+        await run_blocking(self._save_account_cookies, account_id, cookies)
+    
+    def _save_account_cookies(self, account_id: int, cookies: str):
+        """更新账号的cookies（同步数据库写入，协程中经 run_blocking 调用）"""
         try:
             # 确保在数据库事务中执行
             with database.atomic():
@@ -498,6 +462,10 @@ class JimengText2VideoTaskManager:
     
     async def get_account_by_id(self, account_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取账号信息"""
+        return await run_blocking(self._load_account, account_id)
+    
+    def _load_account(self, account_id: int) -> Optional[Dict[str, Any]]:
+        """根据ID读取账号信息（同步数据库查询，协程中经 run_blocking 调用）"""
         try:
             account = JimengAccount.get_by_id(account_id)
             return {
@@ -518,116 +486,18 @@ class JimengText2VideoTaskManager:
     
     def _get_available_account(self, task_type='text2video'):
         """
-        获取可用的即梦账号
+        获取当前使用次数最少且未达每日上限的即梦账号（仅查询，不预留额度）
         
-        参数:
-            task_type: 任务类型 ('text2img', 'img2video', 'digital_human', 'text2video')
-        
-        规则：
-        - 图片生成：每个账号每天可生成50次
-        - 视频生成：每个账号每天可生成1次
-        - 数字人生成：每个账号每天可生成1次
-        - 文生视频：每个账号每天可生成1次
-        - 优先选择使用次数最少的账号
+        执行任务时使用 account_lease_service.reserve()，由账号租用服务保证并发选号不会超出每日上限
         """
-        try:
-            import random
-            from datetime import date
-            today = date.today()
-            
-            # 查询所有账号
-            accounts = list(JimengAccount.select())
-            if not accounts:
-                logger.error("没有配置的即梦账号")
-                return None
-            
-            # 根据任务类型设置每日限制
-            daily_limits = {
-                'text2img': 10,      # 图片生成每天10次
-                'img2video': 2,      # 视频生成每天2次
-                'digital_human': 1,   # 数字人生成每天1次
-                'text2video': 2      # 文生视频每天2次
-            }
-            
-            daily_limit = daily_limits.get(task_type, 1)
-            
-            # 查找今日使用次数最少且未达上限的账号，在相同使用次数中随机选择
-            available_accounts = []
-            min_usage = float('inf')
-            
-            for account in accounts:
-                # 统计今日该账号的指定类型任务使用次数（查询账号记录表）
-                task_type_map = {
-                    'text2img': 1,      # 文生图
-                    'img2video': 2,     # 图生视频
-                    'digital_human': 3,  # 数字人
-                    'text2video': 5     # 文生视频
-                }
-                
-                task_type_id = task_type_map.get(task_type, 5)
-                
-                # 查询今日该账号的视频类别任务记录数量（图生视频+文生视频）
-                today_usage = JimengTaskRecord.select().where(
-                    (JimengTaskRecord.account_id == account.id) &
-                    (JimengTaskRecord.task_type.in_([2, 5])) &  # 2=图生视频, 5=文生视频
-                    (JimengTaskRecord.created_at >= today)
-                ).count()
-
-                logger.info(f"账号 {account.account} 今日视频生成已使用: {today_usage}/{daily_limit} 次")
-                
-                # 检查是否还有可用次数
-                if today_usage < daily_limit:
-                    if today_usage < min_usage:
-                        # 发现更少使用次数的账号，重置列表
-                        min_usage = today_usage
-                        available_accounts = [account]
-                    elif today_usage == min_usage:
-                        # 使用次数相同，加入候选列表
-                        available_accounts.append(account)
-            
-            if available_accounts:
-                # 在使用次数最少的账号中随机选择
-                selected_account = random.choice(available_accounts)
-                logger.info(f"随机选择账号: {selected_account.account} (今日视频生成已使用: {min_usage}/{daily_limit})")
-                return selected_account
-            else:
-                logger.error("所有账号今日视频生成次数已达上限")
-                return None
-                
-        except Exception as e:
-            logger.error(f"获取可用账号失败: {str(e)}")
-            return None
+        return account_lease_service.pick(task_type)
     
     def get_summary(self) -> Dict:
         """获取即梦文生视频任务汇总"""
         try:
-            # 统计文生视频任务状态
-            base_query = JimengText2VideoTask.select()
-            
-            pending_count = base_query.where(
-                JimengText2VideoTask.status == 0  # 排队中
-            ).count()
-            
-            processing_count = base_query.where(
-                JimengText2VideoTask.status == 1  # 生成中
-            ).count()
-            
-            completed_count = base_query.where(
-                JimengText2VideoTask.status == 2  # 已完成
-            ).count()
-            
-            failed_count = base_query.where(
-                JimengText2VideoTask.status == 3  # 失败
-            ).count()
-            
-            return {
-                'platform': self.platform_name,
-                'pending': pending_count,
-                'processing': processing_count,
-                'completed': completed_count,
-                'failed': failed_count,
-                'total': pending_count + processing_count + completed_count + failed_count
-            }
+            # 读取内存中的状态计数缓存，由任务状态变化增量维护
+            summary = task_status_counter.get_summary(JimengText2VideoTask)
+            return {'platform': self.platform_name, **summary}
         except Exception as e:
             logger.error(f"获取{self.platform_name}汇总失败: {str(e)}")
             return {
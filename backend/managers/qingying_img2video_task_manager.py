@@ -10,44 +10,17 @@ from datetime import datetime
 from backend.utils.config_util import get_hide_window
 from backend.models.models import QingyingImage2VideoTask, QingyingAccount
 from backend.utils.qingying_image2video import QingyingImage2VideoExecutor
-
-def run_async_safe(coro):
-    """安全地运行异步协程，处理事件循环冲突"""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # 如果事件循环正在运行，在新线程中创建新的事件循环
-            import threading
-            result = None
-            exception = None
-            
-            def run_in_thread():
-                nonlocal result, exception
-                try:
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    result = new_loop.run_until_complete(coro)
-                    new_loop.close()
-                except Exception as e:
-                    exception = e
-            
-            thread = threading.Thread(target=run_in_thread)
-            thread.start()
-            thread.join()
-            
-            if exception:
-                raise exception
-            return result
-        else:
-            return asyncio.run(coro)
-    except RuntimeError:
-        # 如果没有事件循环，直接使用 asyncio.run
-        return asyncio.run(coro)
+from backend.config.settings import TASK_RECONCILE_INTERVAL
+from backend.core.task_dispatcher import task_dispatcher
+from backend.core.async_engine import run_blocking
+from backend.core.task_lease import task_lease
+from backend.core.task_stats import task_status_counter
 
 class QingyingImg2VideoTaskManager:
     """清影图生视频任务管理器"""
     
     def __init__(self):
+        self.platform_name = "清影图生视频"
         self.running = False
         self.worker_thread = None
         self.global_executor = None
@@ -55,6 +28,10 @@ class QingyingImg2VideoTaskManager:
         self.processing_tasks = set()
         # 账号并发控制：账号ID -> 当前处理任务数
         self.account_task_count = {}
+        # 选号在线程池中执行，计数的读改写需加锁
+        self._account_lock = threading.Lock()
+        # 没有可用账号时暂停分发到该时间点，避免任务反复出队入队空转
+        self.account_wait_until = 0
         
     def start(self):
         """启动任务管理器"""
@@ -77,6 +54,7 @@ class QingyingImg2VideoTaskManager:
             return False
             
         self.running = False
+        task_dispatcher.wake(QingyingImage2VideoTask)
         if self.worker_thread and self.worker_thread.is_alive():
             self.worker_thread.join()
         print("清影图生视频任务管理器已停止")
@@ -91,6 +69,7 @@ class QingyingImg2VideoTaskManager:
         if task_id not in self.task_queue and task_id not in self.processing_tasks:
             self.task_queue.append(task_id)
             print(f"清影图生视频任务 {task_id} 已加入队列")
+            task_dispatcher.notify_task_enqueued(QingyingImage2VideoTask, task_id)
     
     def _task_processor_loop(self):
         """任务处理循环"""
@@ -102,16 +81,31 @@ class QingyingImg2VideoTaskManager:
                 # 扫描待处理任务
                 self._scan_pending_tasks()
                 
-                # 处理队列中的任务
+                # 将队列中的任务全部送入全局统一调度器的就绪队列，由调度器控制并发
                 if self.task_queue and self.global_executor:
-                    task_id = self.task_queue.pop(0)
-                    if task_id not in self.processing_tasks:
+                    from backend.core.global_task_manager import global_task_manager
+                    while self.task_queue and time.time() >= self.account_wait_until:
+                        task_id = self.task_queue.pop(0)
+                        if task_id in self.processing_tasks:
+                            continue
+                        try:
+                            priority = QingyingImage2VideoTask.get_by_id(task_id).priority
+                        except QingyingImage2VideoTask.DoesNotExist:
+                            continue
                         self.processing_tasks.add(task_id)
-                        # 使用全局线程池处理任务
-                        future = self.global_executor.submit(self._process_task, task_id)
-                        future.add_done_callback(lambda f: self._on_task_complete(task_id, f))
+                        future = global_task_manager.submit_task(
+                            self.platform_name,
+                            self._process_task,
+                            task_id,
+                            task_id=task_id,
+                            task_type='图生视频',
+                            priority=priority
+                        )
+                        future.add_done_callback(lambda f, tid=task_id: self._on_task_complete(tid, f))
                 
-                time.sleep(2)  # 每2秒检查一次
+                # 队列中仍有任务时快速继续，否则等待任务入队事件，超时则执行兜底对账扫描
+                wait_timeout = 2 if self.task_queue else TASK_RECONCILE_INTERVAL
+                task_dispatcher.wait_for_tasks(QingyingImage2VideoTask, wait_timeout)
                 
             except Exception as e:
                 print(f"清影图生视频任务处理循环出错: {str(e)}")
@@ -123,7 +117,7 @@ class QingyingImg2VideoTaskManager:
             # 查找状态为0（排队中）的任务
             pending_tasks = QingyingImage2VideoTask.select().where(
                 QingyingImage2VideoTask.status == 0
-            )
+            ).order_by(QingyingImage2VideoTask.priority.desc(), QingyingImage2VideoTask.create_at)
             
             for task in pending_tasks:
                 if task.id not in self.task_queue and task.id not in self.processing_tasks:
@@ -132,27 +126,27 @@ class QingyingImg2VideoTaskManager:
         except Exception as e:
             print(f"扫描清影图生视频待处理任务失败: {str(e)}")
     
-    def _process_task(self, task_id):
+    async def _process_task(self, task_id):
         """处理单个任务"""
         account_id = None
         try:
             # 获取任务信息
-            task = QingyingImage2VideoTask.get_by_id(task_id)
+            task = await run_blocking(QingyingImage2VideoTask.get_by_id, task_id)
             
             print(f"开始处理清影图生视频任务: {task_id}")
             
-            # 更新任务状态为处理中
-            task.status = 1
+            # 更新任务状态为处理中（与租约在同一次保存中写入）
             task.update_at = datetime.now()
-            task.save()
+            await run_blocking(task_lease.acquire, task)
             
             # 获取可用的清影账号
-            account = self._get_available_account()
+            account = await run_blocking(self._get_available_account)
             if not account:
                 print(f"清影图生视频任务 {task_id}: 没有可用的账号")
+                self.account_wait_until = time.time() + 10
                 task.status = 0  # 排队中
                 task.update_at = datetime.now()
-                task.save()
+                await run_blocking(task.save)
                 return
             
             # 记录使用的账号ID，用于后续清理
@@ -160,7 +154,7 @@ class QingyingImg2VideoTaskManager:
             
             # 关联账号
             task.account_id = account.id
-            task.save()
+            await run_blocking(task.save)
             
             print(f"清影图生视频任务 {task_id}: 使用账号 {account.nickname}")
             headless = get_hide_window()
@@ -170,7 +164,7 @@ class QingyingImg2VideoTaskManager:
                 executor = QingyingImage2VideoExecutor(headless=headless)
                 
                 # 执行任务
-                result = run_async_safe(executor.execute(
+                result = await executor.execute(
                     image_path=task.image_path,
                     prompt=task.prompt,
                     cookies=account.cookies,
@@ -179,7 +173,7 @@ class QingyingImg2VideoTaskManager:
                     resolution=task.resolution,
                     duration=task.duration,
                     ai_audio=task.ai_audio
-                ))
+                )
                 
                 # 处理结果
                 if result.code == 200:
@@ -196,12 +190,12 @@ class QingyingImg2VideoTaskManager:
                     
                     if error_code in [600, 900]:
                         # 设置失败状态和原因
-                        task.set_failure(error_code, error_message)
+                        await run_blocking(task.set_failure, error_code, error_message)
                         
                         # 检查是否可以重试
                         if task.can_retry():
                             # 重试任务，重新进入排队状态
-                            if task.retry_task():
+                            if await run_blocking(task.retry_task):
                                 print(f"清影图生视频任务 {task_id}: 重试，重试次数: {task.retry_count}/{task.max_retry}")
                                 # 任务重新排队，不需要更新状态
                             else:
@@ -214,23 +208,23 @@ class QingyingImg2VideoTaskManager:
                         # 非600/900错误，直接设置失败
                         task.status = 3  # 失败
                         task.update_at = datetime.now()
-                        task.save()
+                        await run_blocking(task.save)
                         print(f"清影图生视频任务 {task_id}: 生成失败 - {error_message}")
                 
                 # 只有非重试情况才需要手动更新时间
                 if task.status != 0:  # 如果不是重新排队状态
                     task.update_at = datetime.now()
-                    task.save()
+                    await run_blocking(task.save)
                 
             except Exception as process_error:
                 print(f"清影图生视频任务 {task_id} 处理过程出错: {str(process_error)}")
                 # 异常情况通常是网络或系统错误，可以考虑重试
-                task.set_failure(900, f'处理异常: {str(process_error)}')
+                await run_blocking(task.set_failure, 900, f'处理异常: {str(process_error)}')
                 
                 # 检查是否可以重试
                 if task.can_retry():
                     # 重试任务，重新进入排队状态
-                    if task.retry_task():
+                    if await run_blocking(task.retry_task):
                         print(f"清影图生视频任务 {task_id}: 异常后重试，重试次数: {task.retry_count}/{task.max_retry}")
                     else:
                         print(f"清影图生视频任务 {task_id}: 异常后重试失败，已达最大重试次数")
@@ -244,51 +238,52 @@ class QingyingImg2VideoTaskManager:
         except Exception as e:
             print(f"处理清影图生视频任务 {task_id} 时出错: {str(e)}")
             try:
-                task = QingyingImage2VideoTask.get_by_id(task_id)
+                task = await run_blocking(QingyingImage2VideoTask.get_by_id, task_id)
                 task.status = 3  # 失败
                 task.update_at = datetime.now()
-                task.save()
+                await run_blocking(task.save)
             except:
                 pass
         finally:
             # 确保无论任务成功还是失败，都减少账号任务计数
             if account_id:
-                current_count = self.account_task_count.get(account_id, 0)
-                if current_count > 0:
-                    self.account_task_count[account_id] = current_count - 1
-                    print(f"任务 {task_id} 完成，减少账号 {account_id} 任务计数，当前: {self.account_task_count[account_id]}")
-                else:
-                    print(f"警告: 账号 {account_id} 任务计数已为0，无法减少")
+                with self._account_lock:
+                    current_count = self.account_task_count.get(account_id, 0)
+                    if current_count > 0:
+                        self.account_task_count[account_id] = current_count - 1
+                        print(f"任务 {task_id} 完成，减少账号 {account_id} 任务计数，当前: {self.account_task_count[account_id]}")
+                    else:
+                        print(f"警告: 账号 {account_id} 任务计数已为0，无法减少")
     
     def _get_available_account(self):
         """获取可用的清影账号（支持并发，每个账号最多同时处理4个任务）"""
         try:
             # 查找有cookies的清影账号
-            accounts = QingyingAccount.select().where(
+            accounts = list(QingyingAccount.select().where(
                 QingyingAccount.cookies.is_null(False),
                 QingyingAccount.cookies != ''
-            )
+            ))
             
-            if accounts.count() > 0:
-                # 查找并发数未满的账号
-                available_accounts = []
-                for account in accounts:
-                    current_count = self.account_task_count.get(account.id, 0)
-                    if current_count < 4:  # 每个账号最多同时处理4个任务
-                        available_accounts.append(account)
-                
-                if available_accounts:
-                    # 选择并发数最少的账号
-                    selected_account = min(available_accounts, 
-                                         key=lambda acc: self.account_task_count.get(acc.id, 0))
+            if accounts:
+                with self._account_lock:
+                    # 查找并发数未满的账号
+                    available_accounts = []
+                    for account in accounts:
+                        current_count = self.account_task_count.get(account.id, 0)
+                        if current_count < 4:  # 每个账号最多同时处理4个任务
+                            available_accounts.append(account)
                     
-                    # 增加该账号的任务计数
-                    self.account_task_count[selected_account.id] = self.account_task_count.get(selected_account.id, 0) + 1
-                    
-                    print(f"选择账号 {selected_account.nickname}，当前并发数: {self.account_task_count[selected_account.id]}")
-                    return selected_account
-                else:
-                    print("所有清影账号都已达到最大并发数（4个任务）")
+                    if available_accounts:
+                        # 选择并发数最少的账号
+                        selected_account = min(available_accounts, 
+                                             key=lambda acc: self.account_task_count.get(acc.id, 0))
+                        
+                        # 增加该账号的任务计数
+                        self.account_task_count[selected_account.id] = self.account_task_count.get(selected_account.id, 0) + 1
+                        
+                        print(f"选择账号 {selected_account.nickname}，当前并发数: {self.account_task_count[selected_account.id]}")
+                        return selected_account
+                print("所有清影账号都已达到最大并发数（4个任务）")
             
             return None
             
@@ -299,11 +294,15 @@ class QingyingImg2VideoTaskManager:
     def _on_task_complete(self, task_id, future):
         """任务完成回调"""
         self.processing_tasks.discard(task_id)
+        # 全局线程池释放了槽位，唤醒各平台管理器继续分发排队任务
+        task_dispatcher.notify_all()
         
         # 注意：账号任务计数的减少已经在_process_task的finally块中处理了
         # 这里不再重复减少，避免计数错误
         
-        if future.exception():
+        if future.cancelled():
+            print(f"清影图生视频任务 {task_id} 已从就绪队列移除")
+        elif future.exception():
             print(f"清影图生视频任务 {task_id} 执行出错: {future.exception()}")
             try:
                 task = QingyingImage2VideoTask.get_by_id(task_id)
@@ -338,6 +337,18 @@ class QingyingImg2VideoTaskManager:
         except Exception as e:
             print(f"重置账号任务计数器失败: {str(e)}")
     
+    def get_summary(self):
+        """获取清影图生视频任务汇总"""
+        try:
+            summary = task_status_counter.get_summary(QingyingImage2VideoTask)
+            return {'platform': self.platform_name, **summary}
+        except Exception as e:
+            print(f"获取{self.platform_name}汇总失败: {str(e)}")
+            return {
+                'platform': self.platform_name,
+                'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0, 'total': 0
+            }
+    
     def get_status(self):
         """获取管理器状态"""
         return {
@@ -124,7 +124,8 @@ class RunwayTaskManager:
                 'max_concurrent': self.max_concurrent_tasks
             }
     
-    def get_detailed_tasks(self, status: int = None, page: int = 1, page_size: int = 1000) -> Dict:
+    def get_detailed_tasks(self, status: int = None, page: int = 1, page_size: int = 1000,
+                           cursor: str = None, fields: str = None) -> Dict:
         """获取详细任务列表 - 示例实现"""
         # TODO: 实现真实的Runway任务查询
         try:
@@ -135,7 +136,9 @@ class RunwayTaskManager:
                     'total': 0,
                     'page': page,
                     'page_size': page_size,
-                    'total_pages': 0
+                    'total_pages': 0,
+                    'next_cursor': None,
+                    'has_more': False
                 }
             }
         except Exception as e:
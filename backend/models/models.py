@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import threading
 from datetime import datetime
 from peewee import *
+from peewee import ModelDelete, ModelUpdate
 
 from backend.config.settings import DATABASE_PATH
+from backend.core.event_bus import event_bus
+from backend.core.task_stats import task_status_counter
 
 # 初始化数据库连接
 db = SqliteDatabase(DATABASE_PATH)
@@ -12,6 +16,84 @@ class BaseModel(Model):
     class Meta:
         database = db
 
+# 单个任务 save 时由 save 自己发布带任务ID的事件，内部的 UPDATE 不再发布批量事件
+_saving = threading.local()
+
+class _TaskUpdate(ModelUpdate):
+    """批量更新影响到任务时标记计数失效并发布 task.changed 事件（无法得知具体行，订阅方按表刷新）"""
+
+    def _execute(self, database):
+        result = super()._execute(database)
+        if result and not getattr(_saving, 'active', False):
+            # 批量更新无法得知每行的原状态，标记计数失效
+            task_status_counter.invalidate(self.model)
+            event_bus.publish('task.changed', {'table': self.model._meta.table_name, 'action': 'update'})
+        return result
+
+class _TaskDelete(ModelDelete):
+    """删除到任务时标记计数失效并发布 task.changed 事件"""
+
+    def _execute(self, database):
+        result = super()._execute(database)
+        if result:
+            # delete_instance 也经由此处，删除后下次读取重新加载计数
+            task_status_counter.invalidate(self.model)
+            event_bus.publish('task.changed', {'table': self.model._meta.table_name, 'action': 'delete'})
+        return result
+
+class BaseTaskModel(BaseModel):
+    """任务模型基类，保存/删除时同步更新内存中的任务状态计数、维护 update_at，并发布任务事件"""
+
+    # 生成中任务的租约（见 core/task_lease.py）：执行进程定期续约，过期说明进程已退出
+    leased_by = CharField(max_length=100, null=True)  # 持有租约的执行进程
+    lease_expires_at = DateTimeField(null=True)  # 租约到期时间
+    heartbeat_at = DateTimeField(null=True)  # 最近一次续约时间
+
+    def save(self, force_insert=False, only=None):
+        model = type(self)
+        pk = self.get_id()
+        is_insert = force_insert or pk is None
+        old_status = None
+        if not is_insert and 'status' in self._dirty:
+            old = model.select(model.status).where(model._meta.primary_key == pk).first()
+            old_status = old.status if old else None
+        if not is_insert and 'update_at' not in self._dirty:
+            # 任何修改都刷新 update_at，任务列表增量同步依赖该字段
+            self.update_at = datetime.now()
+            if only is not None:
+                only = list(only) + [model.update_at]
+        _saving.active = True
+        try:
+            rows = super().save(force_insert=force_insert, only=only)
+        finally:
+            _saving.active = False
+        table = model._meta.table_name
+        if is_insert:
+            task_status_counter.transition(model, None, self.status)
+            event_bus.publish('task.created', {'table': table, 'task_id': self.get_id(), 'status': self.status})
+        else:
+            if old_status is not None:
+                task_status_counter.transition(model, old_status, self.status)
+            if old_status is not None and old_status != self.status:
+                event_bus.publish('task.status', {
+                    'table': table, 'task_id': pk, 'old_status': old_status, 'status': self.status
+                })
+            else:
+                event_bus.publish('task.updated', {'table': table, 'task_id': pk, 'status': self.status})
+        return rows
+
+    @classmethod
+    def update(cls, __data=None, **update):
+        # 批量更新同样刷新 update_at
+        updated = set(update) | {getattr(field, 'name', field) for field in (__data or {})}
+        if 'update_at' not in updated:
+            update['update_at'] = datetime.now()
+        return _TaskUpdate(cls, cls._normalize_data(__data, update))
+
+    @classmethod
+    def delete(cls):
+        return _TaskDelete(cls)
+
 class Config(BaseModel):
     """系统配置表"""
     key = CharField(max_length=100, unique=True)  # 配置键
@@ -45,7 +127,7 @@ class QingyingAccount(BaseModel):
     class Meta:
         table_name = 'qingying_accounts'
 
-class JimengText2ImgTask(BaseModel):
+class JimengText2ImgTask(BaseTaskModel):
     """即梦文生图任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -56,9 +138,13 @@ class JimengText2ImgTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)  
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
     
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
+
+    # 上传的参考图片（上传文件存储中的路径），任务完成后清空
+    input_image = CharField(max_length=500, null=True)
     
     # 生成的图片
     images_json = TextField(null=True)
@@ -68,6 +154,9 @@ class JimengText2ImgTask(BaseModel):
     image3 = CharField(max_length=500, null=True)
     image4 = CharField(max_length=500, null=True)
     
+    # 生成的视频（JSON数组，列由迁移 text2img_videos_json 添加）
+    videos_json = TextField(null=True)
+    
     task_id = CharField(max_length=100, null=True)  # 任务ID
 
     # 重试相关字段
@@ -82,6 +171,11 @@ class JimengText2ImgTask(BaseModel):
     
     class Meta:
         table_name = 'jimeng_text2img_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -216,7 +310,7 @@ class JimengText2ImgTask(BaseModel):
             return True
         return False
 
-class JimengImg2ImgTask(BaseModel):
+class JimengImg2ImgTask(BaseTaskModel):
     """即梦图生图任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -227,6 +321,7 @@ class JimengImg2ImgTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
 
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
@@ -259,6 +354,11 @@ class JimengImg2ImgTask(BaseModel):
     
     class Meta:
         table_name = 'jimeng_image2image_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -369,7 +469,7 @@ class JimengImg2ImgTask(BaseModel):
         return False
 
 
-class JimengText2VideoTask(BaseModel):
+class JimengText2VideoTask(BaseTaskModel):
     """即梦文生视频任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -381,6 +481,7 @@ class JimengText2VideoTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
     
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
@@ -402,6 +503,11 @@ class JimengText2VideoTask(BaseModel):
     
     class Meta:
         table_name = 'jimeng_text2video_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -457,7 +563,7 @@ class JimengText2VideoTask(BaseModel):
         return False
 
 
-class JimengImg2VideoTask(BaseModel):
+class JimengImg2VideoTask(BaseTaskModel):
     """即梦图生视频任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -468,6 +574,7 @@ class JimengImg2VideoTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
     
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
@@ -490,6 +597,11 @@ class JimengImg2VideoTask(BaseModel):
     
     class Meta:
         table_name = 'jimeng_img2video_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -544,7 +656,7 @@ class JimengImg2VideoTask(BaseModel):
             return True
         return False
 
-class JimengFirstLastFrameImg2VideoTask(BaseModel):
+class JimengFirstLastFrameImg2VideoTask(BaseTaskModel):
     """即梦首尾帧图生视频任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -555,6 +667,7 @@ class JimengFirstLastFrameImg2VideoTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
 
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
@@ -578,6 +691,11 @@ class JimengFirstLastFrameImg2VideoTask(BaseModel):
 
     class Meta:
         table_name = 'jimeng_first_last_frame_img2video_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
 
     def get_status_text(self):
         """获取状态文字描述"""
@@ -632,7 +750,7 @@ class JimengFirstLastFrameImg2VideoTask(BaseModel):
             return True
         return False
 
-class JimengDigitalHumanTask(BaseModel):
+class JimengDigitalHumanTask(BaseTaskModel):
     """即梦数字人任务"""
     # 基本字段
     image_path = CharField(max_length=500)  # 图片路径
@@ -642,12 +760,14 @@ class JimengDigitalHumanTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
 
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
 
     # 时间字段
     create_at = DateTimeField(default=datetime.now)  # 创建时间
+    update_at = DateTimeField(default=datetime.now)  # 更新时间
     start_time = DateTimeField(null=True)  # 开始处理时间
 
     # 结果字段
@@ -663,6 +783,11 @@ class JimengDigitalHumanTask(BaseModel):
 
     class Meta:
         table_name = 'jimeng_digital_human_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
     
     def can_retry(self):
         """判断任务是否可以重试"""
@@ -716,8 +841,11 @@ class JimengTaskRecord(BaseModel):
     
     class Meta:
         table_name = 'jimeng_task_records'
+        indexes = (
+            (('account_id', 'task_type', 'created_at'), False),  # 按账号、任务类型统计每日用量
+        )
 
-class QingyingImage2VideoTask(BaseModel):
+class QingyingImage2VideoTask(BaseTaskModel):
     """清影图生视频任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -730,6 +858,7 @@ class QingyingImage2VideoTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    priority = IntegerField(default=0)  # 调度优先级，数值越大越优先
     
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
@@ -750,6 +879,11 @@ class QingyingImage2VideoTask(BaseModel):
     
     class Meta:
         table_name = 'qingying_image2video_tasks'
+        indexes = (
+            (('status', 'create_at'), False),  # 任务扫描按状态过滤、按创建时间排序
+            (('create_at',), False),  # 列表接口按创建时间倒序分页
+            (('update_at',), False),  # 列表接口按 updated_since 增量同步
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -805,3 +939,94 @@ class QingyingImage2VideoTask(BaseModel):
         return False
     # 生成的视频（JSON数组，存放视频URL）
     videos_json = TextField(null=True)
+
+
+class DownloadJob(BaseModel):
+    """下载任务（批量导出等由全局下载管理器执行）"""
+    batch_id = CharField(max_length=64)  # 同一次批量下载共用的批次ID
+    source = CharField(max_length=50, default='')  # 来源，如 img2video、digital_human
+    url = TextField()  # 下载地址
+    file_path = TextField()  # 保存路径
+    filename = CharField(max_length=500, default='')  # 显示用文件名
+
+    # 状态字段 - 使用数字状态码
+    # 0: 排队中, 1: 下载中, 2: 已完成, 3: 失败, 4: 已取消
+    status = IntegerField(default=0)
+    bytes_total = BigIntegerField(null=True)  # 文件总大小（服务端未返回时为空）
+    bytes_done = BigIntegerField(default=0)  # 已下载字节数
+    attempts = IntegerField(default=0)  # 已尝试次数
+    max_retries = IntegerField(default=5)  # 单次执行内的最大重试次数
+    timeout = IntegerField(default=60)  # 请求超时时间（秒）
+    error_message = TextField(null=True)  # 失败原因
+
+    # 时间戳
+    create_at = DateTimeField(default=datetime.now)
+    update_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        table_name = 'download_jobs'
+        indexes = (
+            (('batch_id',), False),  # 按批次查询进度
+            (('status', 'create_at'), False),  # 启动时恢复排队中的下载
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'batch_id': self.batch_id,
+            'source': self.source,
+            'url': self.url,
+            'file_path': self.file_path,
+            'filename': self.filename,
+            'status': self.status,
+            'bytes_total': self.bytes_total,
+            'bytes_done': self.bytes_done,
+            'attempts': self.attempts,
+            'error_message': self.error_message,
+            'create_at': self.create_at.strftime('%Y-%m-%d %H:%M:%S') if self.create_at else None,
+            'update_at': self.update_at.strftime('%Y-%m-%d %H:%M:%S') if self.update_at else None
+        }
+
+class TaskTombstone(BaseModel):
+    """已删除任务的记录，供任务列表增量同步返回删除项（由任务表上的删除触发器写入）"""
+    task_table = CharField(max_length=100)  # 任务表名
+    task_id = IntegerField()  # 被删除的任务ID
+    deleted_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        table_name = 'task_tombstones'
+        indexes = (
+            (('task_table', 'deleted_at'), False),
+        )
+
+
+class Blob(BaseModel):
+    """上传文件存储中的文件及其被任务引用的次数（引用计数由任务表上的触发器维护）"""
+    path = CharField(max_length=500, unique=True)  # 文件路径（与任务表中保存的路径完全一致）
+    sha256 = CharField(max_length=64, null=True)  # 内容哈希（升级前已存在、原地登记的文件为空）
+    size = BigIntegerField(default=0)  # 文件大小（字节）
+    refcount = IntegerField(default=0)  # 引用该文件的任务数
+    create_at = DateTimeField(default=datetime.now)
+    unref_at = DateTimeField(null=True)  # 引用归零的时间，超过保留时间后回收
+
+    class Meta:
+        table_name = 'blobs'
+        indexes = (
+            (('refcount', 'unref_at'), False),  # 回收时按归零时间取未引用的文件
+        )
+
+
+# 所有任务模型（状态汇总等按表遍历的场景使用）
+TASK_MODELS = [
+    JimengText2ImgTask,
+    JimengImg2ImgTask,
+    JimengText2VideoTask,
+    JimengImg2VideoTask,
+    JimengFirstLastFrameImg2VideoTask,
+    JimengDigitalHumanTask,
+    QingyingImage2VideoTask,
+]
+
+# 待处理任务扫描按状态过滤、按优先级降序与创建时间出队（Meta.indexes 无法声明降序列）
+for _task_model in TASK_MODELS:
+    _task_model.add_index(_task_model.status, _task_model.priority.desc(), _task_model.create_at)
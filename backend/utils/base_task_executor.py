@@ -3,15 +3,18 @@
 """
 
 import asyncio
+import functools
 import time
 import traceback
 from abc import ABC, abstractmethod
 from enum import Enum
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Union
 from playwright.async_api import async_playwright
 from colorama import Fore, Style, init
 
+from backend.utils.browser_pool import get_browser_pool
+
 # 初始化colorama
 init()
 
@@ -64,6 +67,19 @@ class TaskLogger:
         extra_info = f" | {kwargs}" if kwargs else ""
         print(f"{Fore.CYAN}[DEBUG] {message}{extra_info}{Style.RESET_ALL}")
 
+def timed_step(name: str):
+    """步骤计时装饰器：记录执行器各步骤耗时，任务结束时汇总输出，用于评估等待是否还能压缩"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(self, *args, **kwargs)
+            finally:
+                self.step_timings.append((name, time.perf_counter() - started))
+        return wrapper
+    return decorator
+
 class BaseTaskExecutor(ABC):
     """任务执行基类"""
     
@@ -73,6 +89,10 @@ class BaseTaskExecutor(ABC):
         self.browser = None
         self.context = None
         self.page = None
+        self.browser_lease = None  # 从浏览器池租用的上下文，为None时表示独立启动的浏览器
+        self.step_timings = []  # [(步骤名, 耗时秒)]
+        self._signals: Dict[str, asyncio.Future] = {}  # 响应监听器发出的完成信号
+        self.on_task_id: Optional[Callable[[Any], None]] = None  # 拿到平台任务ID时的回调（在线程池中执行）
         self.logger = TaskLogger()
     
     def get_browser_config(self) -> Dict[str, Any]:
@@ -89,15 +109,23 @@ class BaseTaskExecutor(ABC):
         self.logger.info("浏览器配置已设置")
         return config
     
-    async def init_browser(self, cookies: Optional[str] = None) -> TaskResult:
-        """初始化浏览器"""
+    async def init_browser(self, cookies: Optional[str] = None, account: Optional[str] = None) -> TaskResult:
+        """初始化浏览器，account 为执行任务的账号标识，浏览器池按它划分上下文"""
         try:
             self.logger.info("正在启动浏览器")
             config = self.get_browser_config()
             
-            self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(headless=self.headless)
-            self.context = await self.browser.new_context(**config)
+            pool = get_browser_pool()
+            if pool is not None:
+                # 在异步执行引擎的常驻事件循环中运行时，从浏览器池租用该账号的上下文
+                self.browser_lease = await pool.lease(cookies, self.headless, config, account=account)
+                self.browser = self.browser_lease.browser
+                self.context = self.browser_lease.context
+                self.logger.info("已从浏览器池获取上下文", uses=self.browser_lease.uses)
+            else:
+                self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+                self.context = await self.browser.new_context(**config)
             
             # 如果提供了cookies，则添加到浏览器上下文中
             if cookies:
@@ -157,9 +185,160 @@ class BaseTaskExecutor(ABC):
         except Exception as e:
             self.logger.error("获取cookies时出错", error=str(e))
             return None
+    
+    async def wait_for_visible(self, selector: str, timeout: float = 5000):
+        """等待元素可见，超时返回None而不抛出异常"""
+        try:
+            return await self.page.wait_for_selector(selector, state='visible', timeout=timeout)
+        except Exception:
+            return None
+    
+    async def wait_for_any_visible(self, selectors: List[str], timeout: float = 5000):
+        """等待多个候选选择器中任意一个可见，返回(选择器, 元素)，超时返回(None, None)"""
+        try:
+            element = await self.page.wait_for_selector(', '.join(selectors), state='visible', timeout=timeout)
+        except Exception:
+            return None, None
+        for selector in selectors:
+            try:
+                if await element.evaluate('(el, s) => el.matches(s)', selector):
+                    return selector, element
+            except Exception:
+                continue
+        return selectors[0], element
+    
+    async def wait_for_state(self, selector: str, state: str = 'hidden', timeout: float = 5000) -> bool:
+        """等待元素进入指定状态（attached/detached/visible/hidden），返回是否在超时前达到"""
+        try:
+            await self.page.wait_for_selector(selector, state=state, timeout=timeout)
+            return True
+        except Exception:
+            return False
+    
+    async def wait_for_network_idle(self, timeout: float = 5000) -> bool:
+        """等待当前文档到达网络空闲，超时返回False（仅在跳转/刷新后有意义，长轮询页面可能永远不会空闲）"""
+        try:
+            await self.page.wait_for_load_state('networkidle', timeout=timeout)
+            return True
+        except Exception:
+            return False
+    
+    async def wait_for_network_quiet(self, quiet: float = 500, timeout: float = 5000) -> bool:
+        """等待页面连续quiet毫秒没有进行中的请求（适用于点击、上传等操作之后），最长等待timeout毫秒"""
+        inflight = set()
+        on_request = lambda request: inflight.add(request)
+        on_done = lambda request: inflight.discard(request)
+        self.page.on('request', on_request)
+        self.page.on('requestfinished', on_done)
+        self.page.on('requestfailed', on_done)
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout / 1000
+            quiet_since = loop.time()
+            while loop.time() < deadline:
+                await asyncio.sleep(0.1)
+                if inflight:
+                    quiet_since = loop.time()
+                elif loop.time() - quiet_since >= quiet / 1000:
+                    return True
+            return False
+        finally:
+            self.page.remove_listener('request', on_request)
+            self.page.remove_listener('requestfinished', on_done)
+            self.page.remove_listener('requestfailed', on_done)
+    
+    async def wait_for_response(self, url_or_predicate: Union[str, Callable[[Any], bool]], timeout: float = 10000):
+        """等待URL包含指定片段（或满足断言）的响应，超时返回None"""
+        if isinstance(url_or_predicate, str):
+            fragment = url_or_predicate
+            predicate = lambda response: fragment in response.url
+        else:
+            predicate = url_or_predicate
+        try:
+            return await self.page.wait_for_event('response', predicate=predicate, timeout=timeout)
+        except Exception:
+            return None
+    
+    async def settle(self, timeout: float = 1000):
+        """界面操作后的短暂稳定等待：等到浏览器完成两次渲染帧即返回，最长不超过timeout毫秒"""
+        try:
+            await asyncio.wait_for(
+                self.page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))"),
+                timeout / 1000
+            )
+        except Exception:
+            pass
+    
+    def _signal_future(self, name: str) -> asyncio.Future:
+        future = self._signals.get(name)
+        if future is None:
+            future = self._signals[name] = asyncio.get_running_loop().create_future()
+        return future
+    
+    def resolve_signal(self, name: str, value: Any = True):
+        """响应监听器拿到结果时调用，立即唤醒等待该信号的步骤（重复调用保留第一次的值）"""
+        future = self._signal_future(name)
+        if not future.done():
+            future.set_result(value)
+            if name == 'task_id' and value and self.on_task_id is not None:
+                # 回调会写数据库，放到线程池执行，不阻塞事件循环
+                future.get_loop().run_in_executor(None, self.on_task_id, value)
+    
+    def signal_resolved(self, name: str) -> bool:
+        future = self._signals.get(name)
+        return future is not None and future.done()
+    
+    async def wait_signal(self, name: str, timeout: float,
+                          poll: Optional[Callable[[], Awaitable[Any]]] = None, poll_interval: float = 5.0):
+        """
+        等待响应监听器发出的信号，信号到达即返回其值，超时返回None
+        
+        参数:
+            name: 信号名称（如 task_id、completed）
+            timeout: 最长等待秒数
+            poll: 兜底检查（刷新页面触发状态接口、DOM检测等），每隔poll_interval秒执行一次，
+                  返回非None值时视为信号到达
+        """
+        future = self._signal_future(name)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not future.done():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            if poll is not None:
+                value = await poll()
+                if value is not None:
+                    self.resolve_signal(name, value)
+                    break
+                remaining = min(deadline - loop.time(), poll_interval)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), max(remaining, 0))
+            except asyncio.TimeoutError:
+                pass
+        return future.result()
+    
+    def log_step_timings(self):
+        """输出本次任务各步骤耗时"""
+        if not self.step_timings:
+            return
+        total = sum(cost for _, cost in self.step_timings)
+        detail = ', '.join(f"{name}={cost:.2f}s" for name, cost in self.step_timings)
+        self.logger.info("步骤耗时统计", total=f"{total:.2f}s", steps=detail)
+        self.step_timings = []
+    
     async def close_browser(self):
-        """关闭浏览器"""
+        """关闭浏览器（池化的上下文归还浏览器池而不关闭）"""
+        self.log_step_timings()
         try:
+            if self.browser_lease is not None:
+                lease, self.browser_lease = self.browser_lease, None
+                self.page = None
+                self.context = None
+                self.browser = None
+                await lease.pool.release(lease)
+                self.logger.info("浏览器上下文已归还浏览器池")
+                return
             if self.browser:
                 await self.browser.close()
                 self.logger.info("浏览器已关闭")
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+浏览器池 - 复用常驻的 Chromium 实例与按账号划分的浏览器上下文
+
+异步执行引擎的每个常驻事件循环持有一个浏览器池：
+- 每个事件循环只启动一次 playwright 与 Chromium（按有头/无头区分）
+- 每个账号保留一个已加载 cookies 的 BrowserContext，执行器独占租用，用完归还；
+  按执行器传入的账号标识划分，无法识别账号（没有账号标识也没有 cookies）的上下文用完即关闭，不复用
+- 租用前做健康检查，上下文使用次数达到上限后回收重建，长时间空闲的上下文自动淘汰
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import async_playwright
+
+from backend.config.settings import (BROWSER_POOL_ENABLED, BROWSER_POOL_MAX_CONTEXT_USES,
+                                     BROWSER_POOL_MAX_BROWSER_USES, BROWSER_POOL_IDLE_TIMEOUT,
+                                     BROWSER_POOL_HEALTH_CHECK_TIMEOUT)
+
+# 用于识别账号的 cookie 名称（即梦/清影），都不存在时退化为整串 cookies 的摘要
+ACCOUNT_COOKIE_NAMES = ('sessionid', 'sessionid_ss', 'sid_tt', 'chatglm_token', 'chatglm_refresh_token')
+
+
+def account_key_from_cookies(cookies: Optional[str]) -> str:
+    """根据 cookies 字符串计算账号标识"""
+    if not cookies:
+        return ''
+    pairs = {}
+    for pair in cookies.split(';'):
+        if '=' in pair:
+            name, value = pair.split('=', 1)
+            pairs[name.strip()] = value.strip()
+    for name in ACCOUNT_COOKIE_NAMES:
+        if pairs.get(name):
+            return hashlib.sha1(f"{name}={pairs[name]}".encode('utf-8')).hexdigest()
+    return hashlib.sha1(cookies.encode('utf-8')).hexdigest()
+
+
+class PooledContext:
+    """浏览器池中的一个上下文"""
+
+    __slots__ = ('pool', 'browser', 'context', 'account_key', 'headless', 'uses', 'created_at', 'last_used')
+
+    def __init__(self, pool, browser, context, account_key: str, headless: bool):
+        self.pool = pool
+        self.browser = browser
+        self.context = context
+        self.account_key = account_key
+        self.headless = headless
+        self.uses = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+
+class BrowserPool:
+    """绑定到单个事件循环的浏览器池"""
+
+    def __init__(self, max_context_uses: int = BROWSER_POOL_MAX_CONTEXT_USES,
+                 max_browser_uses: int = BROWSER_POOL_MAX_BROWSER_USES,
+                 idle_timeout: float = BROWSER_POOL_IDLE_TIMEOUT):
+        self.max_context_uses = max_context_uses
+        self.max_browser_uses = max_browser_uses
+        self.idle_timeout = idle_timeout
+        self._playwright = None
+        self._browsers: Dict[bool, Any] = {}  # headless -> Browser
+        self._browser_uses: Dict[bool, int] = {}
+        self._idle: Dict[Tuple[bool, str], List[PooledContext]] = {}
+        self._leased: Dict[bool, int] = {}
+        self._browser_lock = None  # 首次使用时在所属事件循环中创建
+        self.stats = {
+            'contexts_created': 0,
+            'contexts_reused': 0,
+            'contexts_recycled': 0,
+            'contexts_evicted': 0,
+            'unhealthy': 0,
+            'browsers_launched': 0
+        }
+
+    async def _get_browser(self, headless: bool):
+        """获取（必要时启动或重启）指定模式的 Chromium"""
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+        async with self._browser_lock:
+            return await self._get_browser_locked(headless)
+
+    async def _get_browser_locked(self, headless: bool):
+        browser = self._browsers.get(headless)
+        if browser is not None:
+            recycle = self._browser_uses.get(headless, 0) >= self.max_browser_uses
+            if not browser.is_connected() or (recycle and not self._leased.get(headless)):
+                await self._close_browser(headless)
+                browser = None
+        if browser is None:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            browser = await self._playwright.chromium.launch(headless=headless)
+            self._browsers[headless] = browser
+            self._browser_uses[headless] = 0
+            self.stats['browsers_launched'] += 1
+            print(f"浏览器池: 已启动 Chromium (headless={headless})")
+        return browser
+
+    async def _close_browser(self, headless: bool):
+        """关闭指定模式的 Chromium 及其全部空闲上下文"""
+        stale = []
+        for key in [k for k in self._idle if k[0] == headless]:
+            stale.extend(self._idle.pop(key))
+        for pooled in stale:
+            await self._close_context(pooled)
+        browser = self._browsers.pop(headless, None)
+        self._browser_uses.pop(headless, None)
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"浏览器池: 关闭 Chromium 出错: {e}")
+
+    @staticmethod
+    async def _close_context(pooled: PooledContext):
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+
+    async def _is_healthy(self, pooled: PooledContext) -> bool:
+        """健康检查：浏览器仍连接且上下文可以正常往返通信"""
+        if not pooled.browser.is_connected():
+            return False
+        try:
+            await asyncio.wait_for(pooled.context.cookies(), BROWSER_POOL_HEALTH_CHECK_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _evict_idle(self):
+        """淘汰空闲超时的上下文"""
+        now = time.time()
+        expired = []
+        for key in list(self._idle):
+            kept = []
+            for pooled in self._idle[key]:
+                (expired if now - pooled.last_used > self.idle_timeout else kept).append(pooled)
+            if kept:
+                self._idle[key] = kept
+            else:
+                del self._idle[key]
+        # 先同步摘除再逐个关闭，避免关闭期间其他协程归还的上下文被覆盖
+        for pooled in expired:
+            await self._close_context(pooled)
+            self.stats['contexts_evicted'] += 1
+
+    async def lease(self, cookies: Optional[str], headless: bool, context_options: Dict[str, Any],
+                    account: Optional[str] = None) -> PooledContext:
+        """
+        租用账号对应的浏览器上下文，没有可用的空闲上下文时新建
+
+        account 为账号标识（账号名），为空时按 cookies 识别账号；两者都为空时不复用空闲上下文，
+        避免用账号密码登录的不同账号拿到仍登录着其他账号的上下文
+        """
+        await self._evict_idle()
+        account_key = f"account:{account}" if account else account_key_from_cookies(cookies)
+        idle = self._idle.get((headless, account_key), []) if account_key else []
+        while idle:
+            pooled = idle.pop()
+            if await self._is_healthy(pooled):
+                self.stats['contexts_reused'] += 1
+                break
+            self.stats['unhealthy'] += 1
+            await self._close_context(pooled)
+        else:
+            browser = await self._get_browser(headless)
+            context = await browser.new_context(**context_options)
+            pooled = PooledContext(self, browser, context, account_key, headless)
+            self.stats['contexts_created'] += 1
+        pooled.uses += 1
+        self._browser_uses[headless] = self._browser_uses.get(headless, 0) + 1
+        self._leased[headless] = self._leased.get(headless, 0) + 1
+        return pooled
+
+    async def release(self, pooled: PooledContext):
+        """归还上下文：关闭残留页面，超过使用次数、账号已有空闲上下文或无法识别账号时直接关闭"""
+        self._leased[pooled.headless] = max(self._leased.get(pooled.headless, 1) - 1, 0)
+        pooled.last_used = time.time()
+        for page in list(pooled.context.pages):
+            try:
+                await page.close()
+            except Exception:
+                pass
+        key = (pooled.headless, pooled.account_key)
+        if (not pooled.account_key or pooled.uses >= self.max_context_uses or self._idle.get(key)
+                or self._browsers.get(pooled.headless) is not pooled.browser
+                or not pooled.browser.is_connected()):
+            await self._close_context(pooled)
+            self.stats['contexts_recycled'] += 1
+        else:
+            self._idle.setdefault(key, []).append(pooled)
+        await self._evict_idle()
+
+    async def close(self):
+        """关闭池中所有浏览器与 playwright"""
+        for headless in list(self._browsers):
+            await self._close_browser(headless)
+        self._idle.clear()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                print(f"浏览器池: 停止 playwright 出错: {e}")
+            self._playwright = None
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'browsers': len(self._browsers),
+            'idle_contexts': sum(len(v) for v in list(self._idle.values())),
+            'leased_contexts': sum(list(self._leased.values()))
+        }
+
+
+# 事件循环 -> 浏览器池
+_pools: Dict[asyncio.AbstractEventLoop, BrowserPool] = {}
+_pools_lock = threading.Lock()
+
+
+def register_browser_pool(loop: asyncio.AbstractEventLoop) -> BrowserPool:
+    """为常驻事件循环创建浏览器池"""
+    with _pools_lock:
+        pool = _pools.get(loop)
+        if pool is None:
+            pool = _pools[loop] = BrowserPool()
+        return pool
+
+
+def unregister_browser_pool(loop: asyncio.AbstractEventLoop):
+    with _pools_lock:
+        _pools.pop(loop, None)
+
+
+def get_browser_pool() -> Optional[BrowserPool]:
+    """获取当前事件循环的浏览器池，不在常驻事件循环中运行时返回None（退化为每任务启动浏览器）"""
+    if not BROWSER_POOL_ENABLED:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    return _pools.get(loop)
+
+
+def get_browser_pool_stats() -> Dict:
+    """汇总所有浏览器池的统计"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {'pools': len(pools), 'items': [pool.get_stats() for pool in pools]}
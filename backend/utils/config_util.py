@@ -22,6 +22,14 @@ class ConfigUtil:
         'auto_retry_enabled': {
             'value': 'false',
             'description': '是否启用自动重试功能，只会重试因为网络问题导致的失败任务'
+        },
+        'scheduler_platform_policies': {
+            'value': '{}',
+            'description': '统一调度器的平台策略(JSON)，如 {"jimeng_img2video": {"weight": 2, "quota": 2}}，weight为同优先级下的调度权重，quota为平台最大并发(0为不限)'
+        },
+        'async_engine_loops': {
+            'value': '1',
+            'description': '异步执行引擎的事件循环线程数，每个循环可并发运行多个浏览器任务并拥有独立的浏览器池'
         }
     }
     
@@ -149,4 +157,18 @@ def get_auto_retry_enabled():
 
 def set_auto_retry_enabled(value):
     """设置是否启用自动重试"""
-    return ConfigUtil.set_config('auto_retry_enabled', value)
\ No newline at end of file
+    return ConfigUtil.set_config('auto_retry_enabled', value)
+
+def get_scheduler_platform_policies():
+    """获取统一调度器的平台策略 {平台键: {'weight': 权重, 'quota': 并发配额}}"""
+    value = ConfigUtil.get_config('scheduler_platform_policies', '{}')
+    try:
+        policies = json.loads(value or '{}')
+        return policies if isinstance(policies, dict) else {}
+    except (ValueError, TypeError):
+        print("调度策略配置解析失败: {}, 使用默认策略".format(value))
+        return {}
+
+def get_async_engine_loops():
+    """获取异步执行引擎的事件循环线程数"""
+    return max(ConfigUtil.get_config_int('async_engine_loops', 1), 1)
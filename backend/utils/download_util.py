@@ -1,11 +1,22 @@
 import requests
+import base64
+import concurrent.futures
+import hashlib
+import json
+import threading
 import time
 import os
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any
 import ssl
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter as RequestsHTTPAdapter
 
+from backend.config.settings import DOWNLOAD_SEGMENT_THRESHOLD, DOWNLOAD_SEGMENTS
+
+CHUNK_SIZE = 64 * 1024
+# 分段下载每写入这么多字节刷新一次文件并保存分段进度
+STATE_SAVE_BYTES = 4 * 1024 * 1024
+
 
 class RetryHTTPAdapter(RequestsHTTPAdapter):
     """支持SSL错误重试的HTTP适配器"""
@@ -20,17 +31,251 @@ class RetryHTTPAdapter(RequestsHTTPAdapter):
         return super().init_poolmanager(*args, **kwargs)
 
 
+# 所有下载共用的连接池会话（按主机复用连接），首次使用时创建
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """获取共享的下载会话"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                session = requests.Session()
+                # 连接级重试交给适配器，文件级重试由 download_file_with_retry 的循环处理
+                retry_strategy = Retry(
+                    total=2,
+                    backoff_factor=1,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["HEAD", "GET", "OPTIONS"]
+                )
+                # 使用自定义适配器处理SSL错误
+                adapter = RetryHTTPAdapter(max_retries=retry_strategy, pool_connections=16, pool_maxsize=32)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
+                })
+                _shared_session = session
+    return _shared_session
+
+
+class DownloadCancelled(Exception):
+    """进度回调要求取消下载"""
+
+
+class DownloadVerificationError(Exception):
+    """下载完成后大小或校验和不一致"""
+
+
+def _content_range_total(response) -> Optional[int]:
+    """从 Content-Range: bytes a-b/total 中解析文件总大小"""
+    content_range = response.headers.get('content-range', '')
+    total = content_range.rsplit('/', 1)[-1] if '/' in content_range else ''
+    return int(total) if total.isdigit() else None
+
+
+def _probe_size(session: requests.Session, url: str, timeout: int) -> Optional[int]:
+    """
+    请求第一个字节探测文件大小，服务端不支持 Range 时返回 None
+    （签名URL通常只对GET有效，因此不用HEAD）
+    """
+    with session.get(url, stream=True, timeout=timeout, headers={'Range': 'bytes=0-0'}) as response:
+        if response.status_code != 206:
+            return None
+        return _content_range_total(response)
+
+
+def _read_state(part_path: str) -> Optional[Dict[str, Any]]:
+    """读取 <part>.json 下载状态，不存在或损坏时返回 None"""
+    try:
+        with open(part_path + '.json', 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(part_path: str, state: Dict[str, Any]):
+    """先写临时文件再原子替换，进程中途退出时不会留下写了一半的状态文件"""
+    state_path = part_path + '.json'
+    with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(state_path + '.tmp', state_path)
+
+
+class _ProgressReporter:
+    """汇总（多个分段的）已下载字节数并调用进度回调"""
+
+    def __init__(self, callback, total: Optional[int], done: int = 0):
+        self.callback = callback
+        self.total = total
+        self.done = done
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def add(self, size: int):
+        with self._lock:
+            # 任一分段收到取消后，其余分段在下一个数据块时也中止
+            if not self.cancelled:
+                self.done += size
+                self.cancelled = bool(self.callback) and self.callback(self.done, self.total) is False
+            if self.cancelled:
+                raise DownloadCancelled()
+
+
+def _download_stream(session: requests.Session, url: str, part_path: str, timeout: int,
+                     progress_callback) -> Dict[str, Any]:
+    """
+    单连接下载，.part 文件已存在时通过 Range 从断点续传
+
+    .part 文件按顺序追加写入，状态文件记为 stream，续传时其大小即已下载的字节数
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    with session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+        if offset and response.status_code == 416:
+            # 请求范围超出文件大小：已下载完整时直接完成，否则丢弃临时文件从头下载
+            total = _content_range_total(response)
+            if total == offset:
+                return {'size': total, 'md5': None}
+            os.remove(part_path)
+            raise DownloadVerificationError(f"续传位置 {offset} 超出文件大小 {total}")
+        response.raise_for_status()
+
+        if offset and response.status_code == 206:
+            total = _content_range_total(response)
+            mode = 'ab'
+            print(f"从 {offset} 字节处续传")
+        else:
+            # 服务端忽略了 Range，只能从头下载
+            length = response.headers.get('content-length')
+            total = int(length) if length and length.isdigit() else None
+            offset = 0
+            mode = 'wb'
+            _write_state(part_path, {'mode': 'stream'})
+
+        reporter = _ProgressReporter(progress_callback, total, offset)
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    reporter.add(len(chunk))
+        # Content-MD5 只对完整响应体有效
+        md5 = response.headers.get('content-md5') if mode == 'wb' else None
+        return {'size': total, 'md5': md5}
+
+
+def _download_segmented(session: requests.Session, url: str, part_path: str, size: int, timeout: int,
+                        segment_count: int, progress_callback) -> Dict[str, Any]:
+    """
+    按字节范围并行下载
+
+    .part 文件预先扩展到完整大小，未下载的部分是零字节，因此各分段的进度保存在 <part>.json 中：
+    扩展文件之前写入，下载过程中每个分段刷新文件后更新（只记录已刷新到文件的字节数），
+    失败或进程退出后再次调用时只补齐未完成的部分
+    """
+    segments = None
+    state = _read_state(part_path)
+    if state is not None and os.path.exists(part_path):
+        try:
+            if state.get('size') == size and os.path.getsize(part_path) == size:
+                segments = state['segments']
+        except (OSError, KeyError):
+            segments = None
+    if segments is None:
+        step = -(-size // segment_count)
+        # [起始位置, 结束位置(含), 已下载字节数]
+        segments = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        _write_state(part_path, {'mode': 'segmented', 'size': size, 'segments': segments})
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+
+    state_lock = threading.Lock()
+
+    def save_state():
+        with state_lock:
+            _write_state(part_path, {'mode': 'segmented', 'size': size, 'segments': segments})
+
+    reporter = _ProgressReporter(progress_callback, size, sum(segment[2] for segment in segments))
+
+    def fetch_segment(segment):
+        position = segment[0] + segment[2]
+        if position > segment[1]:
+            return
+        headers = {'Range': f'bytes={position}-{segment[1]}'}
+        with session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise DownloadVerificationError("服务端未按范围返回分段数据")
+            try:
+                with open(part_path, 'r+b') as f:
+                    f.seek(position)
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            chunk = chunk[:segment[1] + 1 - position]
+                            f.write(chunk)
+                            position += len(chunk)
+                            if position - segment[0] - segment[2] >= STATE_SAVE_BYTES:
+                                f.flush()
+                                segment[2] = position - segment[0]
+                                save_state()
+                            reporter.add(len(chunk))
+                            if position > segment[1]:
+                                break
+            finally:
+                # 文件关闭时已写入的数据都已刷新
+                segment[2] = position - segment[0]
+                save_state()
+        if position <= segment[1]:
+            raise DownloadVerificationError(f"分段 {segment[0]}-{segment[1]} 数据不完整")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        futures = [executor.submit(fetch_segment, segment) for segment in segments]
+        for future in futures:
+            future.result()
+    # 状态文件在校验通过、重命名之后才删除
+    return {'size': size, 'md5': None}
+
+
+def _verify(part_path: str, expected_size: Optional[int], expected_md5: Optional[str]):
+    """校验文件大小与MD5（expected_md5 可为十六进制或 Content-MD5 的 base64 形式）"""
+    actual_size = os.path.getsize(part_path)
+    if expected_size is not None and actual_size != expected_size:
+        raise DownloadVerificationError(f"文件大小不一致: 期望 {expected_size}，实际 {actual_size}")
+    if expected_md5:
+        digest = hashlib.md5()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        if expected_md5.lower() not in (digest.hexdigest(), base64.b64encode(digest.digest()).decode('ascii').lower()):
+            raise DownloadVerificationError("文件MD5校验失败")
+
+
+def _discard_part(part_path: str):
+    for path in (part_path, part_path + '.json', part_path + '.json.tmp'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
 def download_file_with_retry(
     url: str, 
     file_path: str, 
     max_retries: int = 5, 
     delay_between_downloads: float = 1.0,
     timeout: int = 60,
-    filename: Optional[str] = None
+    filename: Optional[str] = None,
+    progress_callback: Optional[Callable[[int, Optional[int]], bool]] = None,
+    expected_size: Optional[int] = None,
+    expected_md5: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     带重试机制的文件下载函数
     
+    数据先写入 <file_path>.part，校验通过后原子重命名为目标文件；重试时通过 HTTP Range 从断点续传，
+    不支持 Range 的服务端才从头下载。大于 DOWNLOAD_SEGMENT_THRESHOLD 的文件按字节范围分段并行下载。
+    
     Args:
         url: 下载链接
         file_path: 保存路径
@@ -38,51 +283,59 @@ def download_file_with_retry(
         delay_between_downloads: 下载间隔时间（秒）
         timeout: 请求超时时间（秒）
         filename: 文件名（用于日志显示）
+        progress_callback: 进度回调 (已下载字节数, 总字节数)，返回 False 时取消下载
+        expected_size: 期望的文件大小（字节），不传时使用服务端返回的大小
+        expected_md5: 期望的MD5，不传时使用服务端返回的 Content-MD5（如有）
     
     Returns:
-        dict: 包含成功状态、错误信息等的结果字典
+        dict: 包含成功状态、错误信息等的结果字典（取消时 cancelled 为 True）
     """
     display_name = filename or os.path.basename(file_path)
-    
-    # 创建session并配置重试策略
-    session = requests.Session()
-    
-    # 配置重试策略
-    retry_strategy = Retry(
-        total=max_retries,
-        backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["HEAD", "GET", "OPTIONS"]
-    )
-    
-    # 使用自定义适配器处理SSL错误
-    adapter = RetryHTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    
-    # 设置请求头
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36'
-    })
+    session = get_shared_session()
+    part_path = file_path + '.part'
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
     
     last_error = None
+    probed = False
+    probed_size = None
     
     for attempt in range(max_retries):
         try:
             print(f"正在下载 {display_name} (尝试 {attempt + 1}/{max_retries})")
             
-            # 发起请求
-            response = session.get(url, stream=True, timeout=timeout)
-            response.raise_for_status()
+            state = _read_state(part_path)
+            if state is None and os.path.exists(part_path):
+                # 没有状态文件的临时文件无法确认由哪种方式写入（分段下载预先扩展的文件大小
+                # 与完整文件相同但内容可能是零字节），不能续传，丢弃后从头下载
+                print(f"临时文件缺少下载状态，丢弃后重新下载: {part_path}")
+                _discard_part(part_path)
+            
+            # 没有可续传的临时文件时，探测大小决定是否分段下载
+            if not probed and not os.path.exists(part_path):
+                probed = True
+                probed_size = _probe_size(session, url, timeout)
             
-            # 确保目录存在
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            # 旧版本写入的分段状态没有 mode 字段
+            segmented_state = state is not None and state.get('mode', 'segmented') == 'segmented'
+            if segmented_state or (
+                not os.path.exists(part_path) and probed_size and probed_size >= DOWNLOAD_SEGMENT_THRESHOLD
+            ):
+                size = probed_size or expected_size
+                if size is None and segmented_state:
+                    # 分段状态存在但大小未知（进程重启），使用状态文件中的大小
+                    size = state.get('size')
+                info = _download_segmented(session, url, part_path, size, timeout, DOWNLOAD_SEGMENTS, progress_callback)
+            else:
+                info = _download_stream(session, url, part_path, timeout, progress_callback)
             
-            # 下载文件
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            try:
+                _verify(part_path, expected_size or info['size'], expected_md5 or info['md5'])
+            except DownloadVerificationError:
+                # 数据已损坏，下次从头下载
+                _discard_part(part_path)
+                raise
+            os.replace(part_path, file_path)
+            _discard_part(part_path)  # 删除下载状态文件
             
             print(f"下载成功: {display_name}")
             
@@ -94,9 +347,25 @@ def download_file_with_retry(
                 'success': True,
                 'file_path': file_path,
                 'filename': display_name,
+                'bytes': os.path.getsize(file_path),
+                'attempts': attempt + 1
+            }
+        
+        except DownloadCancelled:
+            _discard_part(part_path)
+            print(f"下载已取消: {display_name}")
+            return {
+                'success': False,
+                'cancelled': True,
+                'filename': display_name,
+                'error': '下载已取消',
                 'attempts': attempt + 1
             }
             
+        except DownloadVerificationError as e:
+            last_error = f"校验失败: {str(e)}"
+            print(f"下载失败 {display_name} (尝试 {attempt + 1}/{max_retries}): {last_error}")
+            
         except requests.exceptions.SSLError as e:
             last_error = f"SSL错误: {str(e)}"
             print(f"下载失败 {display_name} (尝试 {attempt + 1}/{max_retries}): {last_error}")
@@ -123,7 +392,7 @@ def download_file_with_retry(
             print(f"等待 {wait_time} 秒后重试...")
             time.sleep(wait_time)
     
-    # 所有重试都失败了
+    # 所有重试都失败了（保留 .part 文件，下次下载时续传）
     print(f"下载最终失败 {display_name}: {last_error}")
     return {
         'success': False,
@@ -138,63 +407,55 @@ def batch_download_files(
     max_retries: int = 5,
     delay_between_downloads: float = 0,  # 并行下载不需要间隔
     timeout: int = 60,
-    max_workers: int = 5  # 最大并行下载数
+    max_workers: int = 5,  # 已由全局下载管理器统一控制，保留参数兼容旧调用
+    source: str = ''
 ) -> Dict[str, Any]:
     """
-    批量下载文件（支持并行下载）
+    批量下载文件（提交到全局下载管理器并等待完成）
     
     Args:
         file_infos: 文件信息列表，每个元素包含 url, file_path, filename
         max_retries: 最大重试次数
         delay_between_downloads: 下载间隔时间（并行下载时忽略此参数）
         timeout: 请求超时时间
-        max_workers: 最大并行下载数（默认5个）
+        max_workers: 忽略，并发数由 DOWNLOAD_MAX_WORKERS / DOWNLOAD_PER_HOST_LIMIT 控制
+        source: 来源标识（下载列表中显示）
     
     Returns:
-        dict: 包含成功和失败统计的结果字典
+        dict: 包含成功和失败统计的结果字典（batch_id 可用于 /api/downloads 查询进度、取消、重试）
     """
-    import concurrent.futures
-    
-    success_count = 0
-    failed_files = []
-    successful_files = []
+    from backend.core.download_manager import download_manager, STATUS_COMPLETED
     
     total_files = len(file_infos)
-    print(f"开始批量下载，共 {total_files} 个文件，最大并行数: {max_workers}")
+    print(f"开始批量下载，共 {total_files} 个文件")
     
-    # 使用线程池并发下载
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有下载任务
-        future_to_file_info = {
-            executor.submit(
-                download_file_with_retry,
-                url=file_info['url'],
-                file_path=file_info['file_path'],
-                max_retries=max_retries,
-                delay_between_downloads=0,  # 并行下载内部不需要延迟
-                timeout=timeout,
-                filename=file_info.get('filename')
-            ): file_info for file_info in file_infos
-        }
-        
-        # 等待所有任务完成
-        completed = 0
-        for future in concurrent.futures.as_completed(future_to_file_info):
-            completed += 1
-            result = future.result()
-            
-            print(f"下载进度: {completed}/{total_files}")
-            
-            if result['success']:
-                success_count += 1
-                successful_files.append(result)
-            else:
-                failed_files.append(result)
+    batch_id = download_manager.submit_batch(file_infos, source=source, max_retries=max_retries, timeout=timeout)
+    download_manager.wait_batch(batch_id)
+    batch = download_manager.get_batch(batch_id) or {'jobs': []}
     
-    print(f"\n批量下载完成: 成功 {success_count} 个，失败 {len(failed_files)} 个")
+    successful_files = []
+    failed_files = []
+    for job in batch['jobs']:
+        if job['status'] == STATUS_COMPLETED:
+            successful_files.append({
+                'success': True,
+                'file_path': job['file_path'],
+                'filename': job['filename'],
+                'attempts': job['attempts']
+            })
+        else:
+            failed_files.append({
+                'success': False,
+                'filename': job['filename'],
+                'error': job['error_message'],
+                'attempts': job['attempts']
+            })
+    
+    print(f"\n批量下载完成: 成功 {len(successful_files)} 个，失败 {len(failed_files)} 个")
     
     return {
-        'success_count': success_count,
+        'batch_id': batch_id,
+        'success_count': len(successful_files),
         'failed_count': len(failed_files),
         'total_count': total_files,
         'successful_files': successful_files,
@@ -206,7 +467,8 @@ def download_single_file(
     url: str,
     file_path: str,
     max_retries: int = 3,
-    timeout: int = 60
+    timeout: int = 60,
+    source: str = ''
 ) -> Dict[str, Any]:
     """
     单个文件下载函数（简化版本，用于单个视频下载）
@@ -216,15 +478,17 @@ def download_single_file(
         file_path: 保存路径
         max_retries: 最大重试次数（默认3次）
         timeout: 请求超时时间（秒）
+        source: 来源标识（下载列表中显示）
 
     Returns:
         dict: 包含成功状态、错误信息等的结果字典
     """
-    return download_file_with_retry(
-        url=url,
-        file_path=file_path,
+    result = batch_download_files(
+        file_infos=[{'url': url, 'file_path': file_path, 'filename': os.path.basename(file_path)}],
         max_retries=max_retries,
-        delay_between_downloads=0,  # 单个文件下载不需要间隔
         timeout=timeout,
-        filename=os.path.basename(file_path)
-    ) 
\ No newline at end of file
+        source=source
+    )
+    if result['successful_files']:
+        return {**result['successful_files'][0], 'batch_id': result['batch_id']}
+    return {**result['failed_files'][0], 'batch_id': result['batch_id']}
@@ -6,7 +6,7 @@ based on BaseTaskExecutor refactoring version
 import asyncio
 import time
 from typing import Optional, List, Dict, Any
-from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger, timed_step
 
 class JimengText2ImageExecutor(BaseTaskExecutor):
     """即梦文本生成图片执行器"""
@@ -39,6 +39,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         except Exception as e:
             self.logger.error("设置即梦平台cookies时出错", error=str(e))
     
+    @timed_step("检查登录状态")
     async def check_login_status(self) -> TaskResult:
         """检查登录状态，如果有登录按钮说明cookies过期"""
         try:
@@ -47,7 +48,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             # 跳转到主页面
             await self.page.goto('https://dreamina.capcut.com/ai-tool/home/en-us', timeout=60000)
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(3)
+            await self.settle(3000)
             
             # 检查是否存在登录按钮
             login_button = await self.page.query_selector('div[class*="login-button"]:has-text("Sign in")')
@@ -72,23 +73,23 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
             
+    @timed_step("账号登录")
     async def perform_login(self, username: str, password: str) -> TaskResult:
         """执行登录流程"""
         try:
             self.logger.info("开始登录即梦平台", username=username)
             
             await self.page.goto('https://dreamina.capcut.com/en-us', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 点击语言切换按钮
             self.logger.info("点击语言切换按钮")
             await self.page.click('button.dreamina-header-secondary-button')
-            await asyncio.sleep(1)
             
             # 点击切换为英文
             self.logger.info("切换为英文")
             await self.page.click('div.language-item:has-text("English")')
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 检查并关闭可能出现的弹窗
             try:
@@ -97,49 +98,48 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 if close_button:
                     self.logger.info("关闭弹窗")
                     await close_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_state('img.close-icon', 'hidden', 1000)
             except Exception as e:
                 self.logger.debug("没有发现需要关闭的弹窗", error=str(e))
             
             # 点击登录按钮
             self.logger.info("点击登录按钮")
             await self.page.click('#loginButton')
-            await asyncio.sleep(2)
             
             # 等待登录页面加载
             await self.page.wait_for_selector('.lv-checkbox-mask', timeout=60000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 勾选同意条款复选框
             self.logger.info("勾选同意条款")
             await self.page.click('.lv-checkbox-mask')
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录按钮
             await self.page.click('div[class^="login-button-"]:has-text("Sign in")')
-            await asyncio.sleep(2)
             
             # 点击使用邮箱登录
             self.logger.info("选择邮箱登录方式")
             await self.page.click('span.lv_new_third_part_sign_in_expand-label:has-text("Continue with Email")')
-            await asyncio.sleep(2)
             
             # 输入账号密码
             self.logger.info("输入账号密码")
             await self.page.fill('input[placeholder="Enter email"]', username)
-            await asyncio.sleep(2)
             await self.page.fill('input[type="password"]', password)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录
             self.logger.info("点击登录按钮")
             await self.page.click('.lv_new_sign_in_panel_wide-sign-in-button')
-            await asyncio.sleep(2)
             
             # 等待登录完成
             self.logger.info("等待登录完成")
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(2)
+            # 等待页面离开登录页（跳转完成即返回）
+            try:
+                await self.page.wait_for_url(lambda url: "login" not in url, timeout=2000)
+            except Exception:
+                pass
             
             # 检查是否有确认按钮，如果有则点击
             self.logger.info("检查是否需要确认")
@@ -148,7 +148,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 if confirm_button:
                     self.logger.info("检测到确认按钮，点击确认")
                     await confirm_button.click()
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('button:has-text("Confirm")', 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("没有确认按钮，跳过", error=str(e))
             
@@ -163,6 +163,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("登录验证")
     async def validate_login_success(self) -> TaskResult:
         """验证登录是否成功"""
         try:
@@ -186,13 +187,14 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("跳转生成页")
     async def navigate_to_generation_page(self) -> TaskResult:
         """跳转到AI工具生成页面"""
         try:
             self.logger.info("正在跳转到AI工具生成页面")
             await self.page.goto('https://dreamina.capcut.com/ai-tool/generate?type=image')
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_visible('textarea.lv-textarea', 2000)
             self.logger.info("已跳转到AI工具页面")
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="页面跳转成功")
         except Exception as e:
@@ -204,6 +206,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("输入提示词")
     async def input_prompt(self, prompt: str) -> TaskResult:
         """输入提示词"""
         try:
@@ -212,7 +215,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             textarea_selector = 'textarea.lv-textarea'
             await self.page.wait_for_selector(textarea_selector, timeout=10000)
             await self.page.fill(textarea_selector, prompt)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="提示词输入成功")
         except Exception as e:
             self.logger.error("提示词输入失败", error=str(e))
@@ -223,16 +226,16 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("选择模型")
     async def select_model(self, model: str) -> TaskResult:
         """选择模型"""
         try:
             self.logger.info("选择模型", model=model)
             await self.page.click('div.lv-select[role="combobox"]:not([class*="type-select-"])')
-            await asyncio.sleep(1)
             
             # 等待下拉菜单完全加载
             await self.page.wait_for_selector('div.lv-select-popup-inner[role="listbox"]', timeout=5000)
-            await asyncio.sleep(1)
+            await self.wait_for_visible('li[role="option"]', timeout=1000)
             
             # 查找并点击对应的模型选项
             try:
@@ -254,7 +257,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 self.logger.warning("未找到指定模型，尝试通用选择方式", model=model, error=str(e))
                 await self.page.click(f'span[class*="select-option-label-content"]:has-text("{model}")')
             
-            await asyncio.sleep(1)
+            await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 1000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="模型选择成功")
             
         except Exception as e:
@@ -266,6 +269,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("选择比例")
     async def select_aspect_ratio(self, aspect_ratio: str) -> TaskResult:
         """选择比例"""
         try:
@@ -281,7 +285,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     
                     # 点击比例选择按钮
                     await self.page.click('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible('div.lv-radio-group.radio-group-ME1Gqz', 1000)
                     
                     # 定义比例选项的映射（从比例值到索引位置）
                     ratio_index_map = {
@@ -300,14 +304,14 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         ratio_index = ratio_index_map[aspect_ratio]
                         # 在弹出的比例选择框中选择对应位置的比例选项
                         await self.page.click(f'div.lv-radio-group.radio-group-ME1Gqz label.lv-radio:nth-child({ratio_index + 1})')
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                     else:
                         # 如果找不到对应的比例，抛出异常
                         raise Exception(f"不支持的比例: {aspect_ratio}")
 
-                    # 关闭选择
+                    # 关闭选择，等待按钮文字更新为目标比例
                     await self.page.click('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible(f'button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"]):has-text("{aspect_ratio}")', 1000)
                     
                     # 检查是否选择成功 - 查找按钮中是否包含目标比例
                     button_element = await self.page.query_selector('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
@@ -356,6 +360,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                        self.resolve_signal('task_id', self.task_id)
                         self.logger.info("获取到任务ID", task_id=self.task_id)
                 except:
                     pass
@@ -382,12 +387,15 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                                             for i, url in enumerate(self.image_urls):
                                                 self.logger.info(f"图片{i+1} URL", url=url)
                                             self.generation_completed = True
+                                            self.resolve_signal('completed')
                                         else:
                                             self.logger.warning("图片已完成但无法获取任何URL")
                                             self.generation_completed = True  # 标记为完成，即使没有URL
+                                            self.resolve_signal('completed')
                                     except (KeyError, IndexError):
                                         self.logger.warning("图片已完成但无法获取URL")
                                         self.generation_completed = True  # 标记为完成，即使没有URL
+                                        self.resolve_signal('completed')
                                 else:
                                     self.logger.debug("图片生成尚未完成，继续等待")
                 except:
@@ -396,6 +404,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         # 注册响应监听器
         self.page.on("response", handle_response)
     
+    @timed_step("开始生成")
     async def start_generation(self) -> TaskResult:
         """点击生成按钮开始生成"""
         try:
@@ -416,7 +425,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             ''')
             
             self.logger.info("已点击生成按钮，开始生成图片")
-            await asyncio.sleep(2)
+            await self.wait_signal('task_id', 2)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="开始生成")
         except Exception as e:
             self.logger.error("点击生成按钮失败", error=str(e))
@@ -427,18 +436,15 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("等待生成完成")
     async def wait_for_generation_complete(self, max_wait_time: int = 3600) -> TaskResult:
         """等待生成完成"""
         try:
             # 等待获取到任务ID
             self.logger.info("等待获取任务ID")
             wait_task_id_time = 120
-            task_id_start_time = time.time()
             
-            while not self.task_id and time.time() - task_id_start_time < wait_task_id_time:
-                elapsed = time.time() - task_id_start_time
-                self.logger.debug(f"等待任务ID中，已等待 {elapsed:.1f} 秒")
-                await asyncio.sleep(1)
+            await self.wait_signal('task_id', wait_task_id_time)
             
             if not self.task_id:
                 self.logger.error("未能获取到任务ID，生成可能失败")
@@ -452,12 +458,14 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             self.logger.info("已获取任务ID，等待图片生成完成", task_id=self.task_id)
             start_time = time.time()
             
-            while not self.generation_completed and time.time() - start_time < max_wait_time:
-                elapsed = time.time() - start_time
-                self.logger.debug(f"等待图片生成中，已等待 {elapsed:.1f} 秒")
+            async def refresh_status():
+                """刷新页面触发资源列表接口，生成结果由响应监听器回填"""
+                self.logger.debug(f"等待图片生成中，已等待 {time.time() - start_time:.1f} 秒")
                 await self.page.reload()
                 self.logger.debug("刷新页面，检查图片生成状态")
-                await asyncio.sleep(5)
+            
+            # 响应监听器拿到结果即返回，不再等满刷新间隔
+            await self.wait_signal('completed', max_wait_time, poll=refresh_status, poll_interval=5)
             
             if self.generation_completed and self.image_urls:
                 self.logger.info("图片生成成功", total_time=f"{time.time() - start_time:.1f}秒", count=len(self.image_urls))
@@ -511,7 +519,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         
         try:
             # 初始化浏览器
-            init_result = await self.init_browser(cookies)
+            init_result = await self.init_browser(cookies, account=username)
             if init_result.code != ErrorCode.SUCCESS.value:
                 return init_result
             
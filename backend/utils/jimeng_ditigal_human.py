@@ -6,7 +6,7 @@ based on BaseTaskExecutor refactoring version
 import asyncio
 import time
 from typing import Optional, List, Dict, Any
-from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger, timed_step
 
 class JimengDigitalHumanExecutor(BaseTaskExecutor):
     """即梦数字人生成执行器"""
@@ -39,23 +39,23 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
         except Exception as e:
             self.logger.error("设置即梦平台cookies时出错", error=str(e))
             
+    @timed_step("账号登录")
     async def perform_login(self, username: str, password: str) -> TaskResult:
         """执行登录流程"""
         try:
             self.logger.info("开始登录即梦平台", username=username)
             
             await self.page.goto('https://dreamina.capcut.com/en-us', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 点击语言切换按钮
             self.logger.info("点击语言切换按钮")
             await self.page.click('button.dreamina-header-secondary-button')
-            await asyncio.sleep(1)
             
             # 点击切换为英文
             self.logger.info("切换为英文")
             await self.page.click('div.language-item:has-text("English")')
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 检查并关闭可能出现的弹窗
             try:
@@ -64,44 +64,39 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 if close_button:
                     self.logger.info("关闭弹窗")
                     await close_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_state('img.close-icon', 'hidden', 1000)
             except Exception as e:
                 self.logger.debug("没有发现需要关闭的弹窗", error=str(e))
             
             # 点击登录按钮
             self.logger.info("点击登录按钮")
             await self.page.click('#loginButton')
-            await asyncio.sleep(2)
             
             # 等待登录页面加载
             await self.page.wait_for_selector('.lv-checkbox-mask', timeout=60000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 勾选同意条款复选框
             self.logger.info("勾选同意条款")
             await self.page.click('.lv-checkbox-mask')
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录按钮
             await self.page.click('div[class^="login-button-"]:has-text("Sign in")')
-            await asyncio.sleep(2)
             
             # 点击使用邮箱登录
             self.logger.info("选择邮箱登录方式")
             await self.page.click('span.lv_new_third_part_sign_in_expand-label:has-text("Continue with Email")')
-            await asyncio.sleep(2)
             
             # 输入账号密码
             self.logger.info("输入账号密码")
             await self.page.fill('input[placeholder="Enter email"]', username)
-            await asyncio.sleep(2)
             await self.page.fill('input[type="password"]', password)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录
             self.logger.info("点击登录按钮")
             await self.page.click('.lv_new_sign_in_panel_wide-sign-in-button')
-            await asyncio.sleep(2)
             
             # 等待登录完成
             self.logger.info("等待登录完成")
@@ -127,7 +122,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 except:
                     self.logger.info("等待登录超时，刷新页面")
                     await self.page.reload()
-                    await asyncio.sleep(2)
+                    await self.wait_for_network_idle(2000)
                     
                     # 检查URL是否已经跳转为主页面，表示登录完成
                     current_url = self.page.url
@@ -143,7 +138,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 if confirm_button:
                     self.logger.info("检测到确认按钮，点击确认")
                     await confirm_button.click()
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('button:has-text("Confirm")', 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("没有确认按钮，跳过", error=str(e))
             
@@ -158,11 +153,15 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("登录验证")
     async def validate_login_success(self) -> TaskResult:
         """验证登录是否成功"""
         try:
-            # 增加等待时间，让页面有足够时间完成跳转
-            await asyncio.sleep(2)
+            # 等待页面完成跳转（离开登录页即返回）
+            try:
+                await self.page.wait_for_url(lambda url: "login" not in url, timeout=2000)
+            except Exception:
+                pass
             current_url = self.page.url
             if "dreamina.capcut.com" in current_url and "login" not in current_url:
                 self.logger.info("登录验证成功")
@@ -184,6 +183,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             )
 
 
+    @timed_step("检查登录状态")
     async def check_login_status(self) -> TaskResult:
         """检查登录状态，如果有登录按钮说明cookies过期"""
         try:
@@ -191,11 +191,11 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             
             # 跳转到主页面
             await self.page.goto('https://dreamina.capcut.com/ai-tool/home/en-us', timeout=60000)
-            await asyncio.sleep(3)
-            self.logger.info("等待3秒后刷新页面")
+            await self.wait_for_network_idle(3000)
+            self.logger.info("页面加载完成后刷新页面")
             await self.page.reload(timeout=60000)
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(3)
+            await self.settle(3000)
             
             # 检查是否存在登录按钮
             login_button = await self.page.query_selector('div[class*="login-button"]:has-text("Sign in")')
@@ -221,13 +221,13 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             )
 
 
+    @timed_step("跳转数字人页")
     async def navigate_to_digital_human_page(self) -> TaskResult:
         """跳转到数字人生成页面"""
         try:
             self.logger.info("正在跳转到数字人生成页面")
             await self.page.goto('https://dreamina.capcut.com/ai-tool/generate')
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(2)
             
             # 检测并处理弹窗 - 检测可能存在的多种弹窗类型，不区分先后顺序
             self.logger.info("页面已跳转，检测是否有弹窗")
@@ -237,7 +237,11 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             
             # 检测第一种弹窗 - 应用下载弹窗
             popup_selector = 'div.app-download-container-rH5mzB'
-            
+
+            # 弹窗或类型切换控件任一出现即说明页面已渲染
+            await self.wait_for_any_visible([survey_popup_selector, popup_selector, 'button[class*="tab-"]',
+                                             'div.lv-select[role="combobox"]'], timeout=2000)
+
             # 检查并处理第二种弹窗
             survey_popup_element = await self.page.query_selector(survey_popup_selector)
             if survey_popup_element:
@@ -247,7 +251,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                     if survey_close_button:
                         await survey_close_button.click()
                         self.logger.info("已点击第二种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                     else:
                         # 检查是否有"Continue to Dreamina"按钮，可以选择一个选项然后继续
                         continue_button = await self.page.query_selector('button.submit-NVxHv4')
@@ -256,11 +260,10 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                             first_option = await self.page.query_selector('div.question-option-D0gxAX')
                             if first_option:
                                 await first_option.click()
-                                await asyncio.sleep(1)
-                                # 再次点击继续按钮
+                                # 再次点击继续按钮（点击会等待按钮变为可用）
                                 await continue_button.click()
                                 self.logger.info("已通过选择选项并点击继续按钮关闭第二种弹窗")
-                                await asyncio.sleep(2)
+                                await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -274,14 +277,14 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                     if close_button:
                         await close_button.click()
                         self.logger.info("已点击第一种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(popup_selector, 'hidden', 2000)
                     else:
                         # 如果没有关闭按钮，点击Copy link按钮
                         copy_link_button = await self.page.query_selector('button.lv-btn.lv-btn-primary.lv-btn-size-default.lv-btn-shape-square.app-download-button-gIF_OD')
                         if copy_link_button:
                             await copy_link_button.click()
                             self.logger.info("已点击Copy link按钮")
-                            await asyncio.sleep(2)
+                            await self.wait_for_state(popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -296,17 +299,16 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 if ai_avatar_tab:
                     self.logger.info("发现标签页模式，点击AI Avatar标签")
                     await ai_avatar_tab.click()
-                    await asyncio.sleep(2)
+                    await self.wait_for_visible('div[class^="reference-upload-"]', 2000)
                 else:
                     # 如果没有标签页模式，使用下拉框模式
                     self.logger.info("使用下拉框模式，点击类型选择下拉框")
                     await self.page.click('div.lv-select[role="combobox"]')
-                    await asyncio.sleep(1)
                     
                     # 选择AI Avatar选项
                     self.logger.info("选择AI Avatar选项")
                     await self.page.click('span[class^="select-option-label-content"]:has-text("AI Avatar")')
-                    await asyncio.sleep(2)
+                    await self.wait_for_visible('div[class^="reference-upload-"]', 2000)
             except Exception as e:
                 self.logger.error("选择AI Avatar失败", error=str(e))
                 return TaskResult(
@@ -327,6 +329,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("上传形象图片")
     async def upload_avatar_image(self, image_path: str) -> TaskResult:
         """上传头像图片"""
         try:
@@ -352,7 +355,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 )
             
             await avatar_upload.set_input_files(image_path)
-            await asyncio.sleep(2)
+            await self.wait_for_network_quiet(quiet=1000, timeout=2000)
             self.logger.info("头像图片上传成功")
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="头像图片上传成功")
         except Exception as e:
@@ -364,6 +367,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("上传音频")
     async def upload_speech_audio(self, audio_path: str) -> TaskResult:
         """上传语音文件"""
         try:
@@ -389,7 +393,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 )
 
             await speech_upload.set_input_files(audio_path)
-            await asyncio.sleep(2)
+            await self.wait_for_network_quiet(quiet=1000, timeout=2000)
             self.logger.info("语音文件上传成功")
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="语音文件上传成功")
         except Exception as e:
@@ -401,6 +405,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("输入动作描述")
     async def input_action_description(self, action_description: str) -> TaskResult:
         """输入动作描述（可选）"""
         try:
@@ -422,10 +427,9 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
 
                         # 使用fill方法输入动作描述
                         await editor.click()  # 先点击聚焦
-                        await asyncio.sleep(0.5)
                         await editor.fill("")  # 清空
                         await editor.fill(action_description.strip())
-                        await asyncio.sleep(2)
+                        await self.settle(2000)
 
                         # 验证输入是否成功
                         current_text = await editor.inner_text()
@@ -460,6 +464,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                        self.resolve_signal('task_id', self.task_id)
                         self.logger.info("获取到任务ID", task_id=self.task_id)
                 except:
                     pass
@@ -476,9 +481,11 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                                         self.video_url = asset["video"]["item_list"][0]["video"]["transcoded_video"]["origin"]["video_url"]
                                         self.logger.info("数字人视频生成完成", video_url=self.video_url)
                                         self.generation_completed = True
+                                        self.resolve_signal('completed')
                                     except (KeyError, IndexError):
                                         self.logger.warning("数字人视频已完成但无法获取URL")
                                         self.generation_completed = True  # 标记为完成，即使没有URL
+                                        self.resolve_signal('completed')
                                 else:
                                     self.logger.debug("数字人视频生成尚未完成，继续等待")
                 except:
@@ -487,6 +494,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
         # 注册响应监听器
         self.page.on("response", handle_response)
     
+    @timed_step("开始生成")
     async def start_generation(self) -> TaskResult:
         """点击生成按钮开始生成"""
         try:
@@ -544,7 +552,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                         
                         if clicked:
                             self.logger.info("已点击生成按钮，开始生成数字人视频")
-                            await asyncio.sleep(2)
+                            await self.wait_for_response("aigc_draft/generate", timeout=2000)
                             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="开始生成")
                         else:
                             self.logger.warning(f"第{attempt + 1}次尝试点击生成按钮失败，重试...")
@@ -552,7 +560,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                             continue
                     else:
                         self.logger.warning(f"第{attempt + 1}次尝试未找到可用的生成按钮，重试...")
-                        await asyncio.sleep(2)
+                        await self.wait_for_visible('button[class*="submit-button-"]:not(.lv-btn-disabled)', 2000)
                         
                 except Exception as click_error:
                     self.logger.warning(f"第{attempt + 1}次尝试点击生成按钮时出错: {str(click_error)}")
@@ -575,18 +583,15 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("等待生成完成")
     async def wait_for_generation_complete(self, max_wait_time: int = 3600) -> TaskResult:
         """等待生成完成"""
         try:
             # 等待获取到任务ID
             self.logger.info("等待获取任务ID")
             wait_task_id_time = 120
-            task_id_start_time = time.time()
             
-            while not self.task_id and time.time() - task_id_start_time < wait_task_id_time:
-                elapsed = time.time() - task_id_start_time
-                self.logger.debug(f"等待任务ID中，已等待 {elapsed:.1f} 秒")
-                await asyncio.sleep(1)
+            await self.wait_signal('task_id', wait_task_id_time)
             
             if not self.task_id:
                 self.logger.error("未能获取到任务ID，生成可能失败")
@@ -600,12 +605,14 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             self.logger.info("已获取任务ID，等待数字人视频生成完成", task_id=self.task_id)
             start_time = time.time()
             
-            while not self.generation_completed and time.time() - start_time < max_wait_time:
-                elapsed = time.time() - start_time
-                self.logger.debug(f"等待数字人视频生成中，已等待 {elapsed:.1f} 秒")
+            async def refresh_status():
+                """刷新页面触发资源列表接口，生成结果由响应监听器回填"""
+                self.logger.debug(f"等待数字人视频生成中，已等待 {time.time() - start_time:.1f} 秒")
                 await self.page.reload()
                 self.logger.debug("刷新页面，检查数字人视频生成状态")
-                await asyncio.sleep(5)
+            
+            # 响应监听器拿到结果即返回，不再等满刷新间隔
+            await self.wait_signal('completed', max_wait_time, poll=refresh_status, poll_interval=5)
             
             if self.generation_completed and self.video_url:
                 self.logger.info("数字人视频生成成功", total_time=f"{time.time() - start_time:.1f}秒", video_url=self.video_url)
@@ -675,7 +682,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
         
         try:
             # 初始化浏览器
-            init_result = await self.init_browser(cookies)
+            init_result = await self.init_browser(cookies, account=username)
             if init_result.code != ErrorCode.SUCCESS.value:
                 return init_result
 
@@ -6,7 +6,7 @@ based on BaseTaskExecutor refactoring version
 import asyncio
 import time
 from typing import Optional, List, Dict, Any
-from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger, timed_step
 
 class JimengImage2VideoExecutor(BaseTaskExecutor):
     """即梦图片生成视频执行器"""
@@ -39,6 +39,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
         except Exception as e:
             self.logger.error("设置即梦平台cookies时出错", error=str(e))
 
+    @timed_step("检查登录状态")
     async def check_login_status(self) -> TaskResult:
         """检查登录状态，如果有登录按钮说明cookies过期"""
         try:
@@ -46,11 +47,11 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             
             # 跳转到主页面
             await self.page.goto('https://dreamina.capcut.com/ai-tool/home/en-us', timeout=60000)
-            await asyncio.sleep(3)
-            self.logger.info("等待3秒后刷新页面")
+            await self.wait_for_network_idle(3000)
+            self.logger.info("页面加载完成后刷新页面")
             await self.page.reload(timeout=60000)
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(3)
+            await self.settle(3000)
             
             # 检查是否存在登录按钮
             login_button = await self.page.query_selector('div[class*="login-button"]:has-text("Sign in")')
@@ -75,23 +76,23 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("账号登录")
     async def perform_login(self, username: str, password: str) -> TaskResult:
         """执行登录流程"""
         try:
             self.logger.info("开始登录即梦平台", username=username)
             
             await self.page.goto('https://dreamina.capcut.com/en-us', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 点击语言切换按钮
             self.logger.info("点击语言切换按钮")
             await self.page.click('button.dreamina-header-secondary-button')
-            await asyncio.sleep(1)
             
             # 点击切换为英文
             self.logger.info("切换为英文")
             await self.page.click('div.language-item:has-text("English")')
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 检查并关闭可能出现的弹窗
             try:
@@ -100,44 +101,39 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 if close_button:
                     self.logger.info("关闭弹窗")
                     await close_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_state('img.close-icon', 'hidden', 1000)
             except Exception as e:
                 self.logger.debug("没有发现需要关闭的弹窗", error=str(e))
             
             # 点击登录按钮
             self.logger.info("点击登录按钮")
             await self.page.click('#loginButton')
-            await asyncio.sleep(2)
             
             # 等待登录页面加载
             await self.page.wait_for_selector('.lv-checkbox-mask', timeout=60000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 勾选同意条款复选框
             self.logger.info("勾选同意条款")
             await self.page.click('.lv-checkbox-mask')
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录按钮
             await self.page.click('div[class^="login-button-"]:has-text("Sign in")')
-            await asyncio.sleep(2)
             
             # 点击使用邮箱登录
             self.logger.info("选择邮箱登录方式")
             await self.page.click('span.lv_new_third_part_sign_in_expand-label:has-text("Continue with Email")')
-            await asyncio.sleep(2)
             
             # 输入账号密码
             self.logger.info("输入账号密码")
             await self.page.fill('input[placeholder="Enter email"]', username)
-            await asyncio.sleep(2)
             await self.page.fill('input[type="password"]', password)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录
             self.logger.info("点击登录按钮")
             await self.page.click('.lv_new_sign_in_panel_wide-sign-in-button')
-            await asyncio.sleep(2)
             
             # 等待登录完成
             self.logger.info("等待登录完成")
@@ -163,7 +159,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 except:
                     self.logger.info("等待登录超时，刷新页面")
                     await self.page.reload()
-                    await asyncio.sleep(2)
+                    await self.wait_for_network_idle(2000)
                     
                     # 检查URL是否已经跳转为主页面，表示登录完成
                     current_url = self.page.url
@@ -179,7 +175,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 if confirm_button:
                     self.logger.info("检测到确认按钮，点击确认")
                     await confirm_button.click()
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('button:has-text("Confirm")', 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("没有确认按钮，跳过", error=str(e))
             
@@ -194,11 +190,15 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("登录验证")
     async def validate_login_success(self) -> TaskResult:
         """验证登录是否成功"""
         try:
-            # 增加等待时间，让页面有足够时间完成跳转
-            await asyncio.sleep(2)
+            # 等待页面完成跳转（离开登录页即返回）
+            try:
+                await self.page.wait_for_url(lambda url: "login" not in url, timeout=2000)
+            except Exception:
+                pass
             current_url = self.page.url
             if "dreamina.capcut.com" in current_url and "login" not in current_url:
                 self.logger.info("登录验证成功")
@@ -219,13 +219,13 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("跳转生成页")
     async def navigate_to_image2video_page(self) -> TaskResult:
         """跳转到图片生成视频页面"""
         try:
             self.logger.info("正在跳转到AI工具生成页面")
             await self.page.goto('https://dreamina.capcut.com/ai-tool/generate')
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(2)
             
             # 检测并处理弹窗 - 检测可能存在的多种弹窗类型，不区分先后顺序
             self.logger.info("页面已跳转，检测是否有弹窗")
@@ -236,6 +236,10 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             # 检测第一种弹窗 - 应用下载弹窗
             popup_selector = 'div.app-download-container-rH5mzB'
             
+            # 弹窗或类型切换控件任一出现即说明页面已渲染
+            await self.wait_for_any_visible([survey_popup_selector, popup_selector, 'div.tabs-dTWN8k',
+                                             'div.lv-select[role="combobox"]'], timeout=2000)
+            
             # 检查并处理第二种弹窗
             survey_popup_element = await self.page.query_selector(survey_popup_selector)
             if survey_popup_element:
@@ -245,7 +249,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                     if survey_close_button:
                         await survey_close_button.click()
                         self.logger.info("已点击第二种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                     else:
                         # 检查是否有"Continue to Dreamina"按钮，可以选择一个选项然后继续
                         continue_button = await self.page.query_selector('button.submit-NVxHv4')
@@ -254,11 +258,10 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                             first_option = await self.page.query_selector('div.question-option-D0gxAX')
                             if first_option:
                                 await first_option.click()
-                                await asyncio.sleep(1)
-                                # 再次点击继续按钮
+                                # 再次点击继续按钮（点击会等待按钮变为可用）
                                 await continue_button.click()
                                 self.logger.info("已通过选择选项并点击继续按钮关闭第二种弹窗")
-                                await asyncio.sleep(2)
+                                await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -272,14 +275,14 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                     if close_button:
                         await close_button.click()
                         self.logger.info("已点击第一种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(popup_selector, 'hidden', 2000)
                     else:
                         # 如果没有关闭按钮，点击Copy link按钮
                         copy_link_button = await self.page.query_selector('button.lv-btn.lv-btn-primary.lv-btn-size-default.lv-btn-shape-square.app-download-button-gIF_OD')
                         if copy_link_button:
                             await copy_link_button.click()
                             self.logger.info("已点击Copy link按钮")
-                            await asyncio.sleep(2)
+                            await self.wait_for_state(popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -297,25 +300,23 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                     self.logger.info("发现新的tabs界面，使用新方式选择AI Video")
                     # 使用新的tabs方式选择AI Video
                     await self.page.click('button.tab-YSwCEn:has-text("AI Video")')
-                    await asyncio.sleep(2)
+                    await self.settle(2000)
                 else:
                     self.logger.info("未发现新tabs界面，使用传统下拉框方式")
                     # 点击类型选择下拉框
                     await self.page.click('div.lv-select[role="combobox"][class*="type-select-"]')
-                    await asyncio.sleep(1)
                     
                     # 选择AI Video选项
                     await self.page.click('span[class*="select-option-label-content"]:has-text("AI Video")')
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 2000)
                     
             except Exception as e:
                 self.logger.warning("选择AI Video时出错，尝试备用方法", error=str(e))
                 # 备用方法：直接尝试传统下拉框方式
                 try:
                     await self.page.click('div.lv-select[role="combobox"][class*="type-select-"]')
-                    await asyncio.sleep(1)
                     await self.page.click('span[class*="select-option-label-content"]:has-text("AI Video")')
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 2000)
                 except Exception as backup_e:
                     self.logger.error("无法选择AI Video选项", error=str(backup_e))
                     return TaskResult(
@@ -336,6 +337,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("选择视频模型")
     async def select_video_model(self, model: str = "Video 3.0") -> TaskResult:
         """选择视频模型"""
         try:
@@ -345,11 +347,10 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             video_model_selectors = await self.page.query_selector_all('div.lv-select[role="combobox"]:not([class*="type-select-"])')
             if len(video_model_selectors) >= 1:
                 await video_model_selectors[0].click()
-                await asyncio.sleep(1)
                 
                 # 等待下拉菜单出现
                 await self.page.wait_for_selector('div.lv-select-popup-inner[role="listbox"]', timeout=5000)
-                await asyncio.sleep(1)
+                await self.wait_for_visible('li[role="option"]', timeout=1000)
                 
                 # 获取所有可选的模型选项
                 options = await self.page.query_selector_all('li[role="option"]')
@@ -426,7 +427,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                         selected = True
                 
                 if selected:
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 2000)
                     return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="视频模型选择成功")
                 else:
                     self.logger.error("无法选择视频模型")
@@ -454,6 +455,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("选择视频时长")
     async def select_video_duration(self, second: int = 5) -> TaskResult:
         """选择视频时长"""
         try:
@@ -514,7 +516,6 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 try:
                     # 滚动到元素可见位置
                     await target_selector.scroll_into_view_if_needed(timeout=3000)
-                    await asyncio.sleep(0.5)  # 等待滚动完成
                     # 确保元素可见和可点击
                     await target_selector.wait_for_element_state("visible", timeout=3000)
                     await target_selector.wait_for_element_state("enabled", timeout=3000)
@@ -525,15 +526,9 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                     self.logger.warning(f"直接点击失败: {str(e)}, 尝试JavaScript点击")
                     # 如果直接点击失败，尝试使用JavaScript点击
                     await self.page.evaluate("(element) => { element.scrollIntoView({behavior: 'smooth', block: 'center'}); setTimeout(() => { element.click(); }, 100); }", target_selector)
-                    await asyncio.sleep(1)
                     self.logger.info(f"通过JavaScript点击第{target_index+1}个下拉框作为时长选择器")
             
             if duration_selector_found:
-                await asyncio.sleep(2)  # 增加等待时间，确保页面元素完全渲染
-                
-                # 等待一段时间确保下拉框状态稳定
-                await asyncio.sleep(1)
-                
                 # 先检查下拉框是否已展开（aria-expanded="true"）
                 try:
                     # 等待时长选择弹窗出现
@@ -546,13 +541,12 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                             if 's' in value_text and 'frame' not in value_text.lower():
                                 await selector.click()
                                 self.logger.info(f"重新点击第{i+1}个下拉框以打开选项")
-                                await asyncio.sleep(1)  # 点击后等待弹窗出现
                                 break
                         except:
                             continue
                     await self.page.wait_for_selector('div.lv-select-popup-inner[role="listbox"]', timeout=5000)
                 
-                await asyncio.sleep(1)
+                await self.wait_for_visible('li[role="option"]', timeout=1000)
                 
                 # 根据second参数选择对应的时长
                 try:
@@ -578,7 +572,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                         await self.page.click('li[role="option"]:has-text("5s")')
                         self.logger.info("通过模糊匹配选择时长: 5s")
                 
-                await asyncio.sleep(2)
+                await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 2000)
                 return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="视频时长选择成功")
                 
             else:
@@ -599,6 +593,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("上传图片")
     async def upload_image(self, image_path: str) -> TaskResult:
         """上传图片"""
         try:
@@ -611,7 +606,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             # 上传图片文件
             await self.page.set_input_files(upload_selector, image_path)
             self.logger.info("图片上传成功")
-            await asyncio.sleep(3)
+            await self.wait_for_network_quiet(quiet=1000, timeout=3000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="图片上传成功")
         except Exception as e:
             self.logger.error("图片上传失败", error=str(e))
@@ -622,6 +617,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("上传尾帧图片")
     async def upload_last_frame_image(self, image_path: str) -> TaskResult:
         """上传尾帧图片（Last frame）"""
         try:
@@ -636,7 +632,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             self.logger.info("尾帧图片上传成功")
 
             # 等待文件上传完成（和第一张图片相同的等待时间）
-            await asyncio.sleep(3)
+            await self.wait_for_network_quiet(quiet=1000, timeout=3000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="尾帧图片上传成功")
         except Exception as e:
             self.logger.error("尾帧图片上传失败", error=str(e))
@@ -647,6 +643,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("选择分辨率")
     async def select_video_resolution(self, resolution: str = "1080p") -> TaskResult:
         """选择视频分辨率（使用正确的HTML结构来定位单选按钮）"""
         try:
@@ -662,7 +659,6 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             # 点击分辨率/比例选择按钮
             await self.page.click(resolution_button_selector)
             self.logger.info("已点击分辨率/比例选择按钮")
-            await asyncio.sleep(2)
             
             # 查找分辨率单选组
             try:
@@ -716,7 +712,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                     ''')
                     self.logger.info("使用默认分辨率: 1080P")
                 
-                await asyncio.sleep(2)
+                await self.settle(2000)
                 return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="视频分辨率选择成功")
                 
             except Exception as e:
@@ -768,7 +764,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 except Exception as backup_error:
                     self.logger.warning("备用选择器也失败", error=str(backup_error))
                 
-                await asyncio.sleep(2)
+                await self.settle(2000)
                 return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="视频分辨率选择成功")
                 
         except Exception as e:
@@ -776,6 +772,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             # 不是致命错误，继续执行
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="视频分辨率选择完成（忽略错误）")
 
+    @timed_step("输入提示词")
     async def input_prompt(self, prompt: str) -> TaskResult:
         """输入提示词"""
         try:
@@ -784,7 +781,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             textarea_selector = 'textarea.lv-textarea'
             await self.page.wait_for_selector(textarea_selector, timeout=10000)
             await self.page.fill(textarea_selector, prompt)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="提示词输入成功")
         except Exception as e:
             self.logger.error("提示词输入失败", error=str(e))
@@ -804,6 +801,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                        self.resolve_signal('task_id', self.task_id)
                         self.logger.info("获取到任务ID", task_id=self.task_id)
                 except:
                     pass
@@ -829,12 +827,15 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                                         if self.video_url:
                                             self.logger.info("视频生成完成", video_url=self.video_url)
                                             self.generation_completed = True
+                                            self.resolve_signal('completed')
                                         else:
                                             self.logger.warning("视频已完成但无法获取URL")
                                             self.generation_completed = True  # 标记为完成，即使没有URL
+                                            self.resolve_signal('completed')
                                     except (KeyError, IndexError):
                                         self.logger.warning("视频已完成但无法获取URL")
                                         self.generation_completed = True  # 标记为完成，即使没有URL
+                                        self.resolve_signal('completed')
                                 else:
                                     self.logger.debug("视频生成尚未完成，继续等待")
                 except:
@@ -843,6 +844,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
         # 注册响应监听器
         self.page.on("response", handle_response)
 
+    @timed_step("开始生成")
     async def start_generation(self) -> TaskResult:
         """点击生成按钮开始生成"""
         try:
@@ -900,7 +902,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                         
                         if clicked:
                             self.logger.info("已点击生成按钮，开始生成视频")
-                            await asyncio.sleep(2)
+                            await self.wait_for_response("aigc_draft/generate", timeout=2000)
                             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="开始生成")
                         else:
                             self.logger.warning(f"第{attempt + 1}次尝试点击生成按钮失败，重试...")
@@ -908,7 +910,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                             continue
                     else:
                         self.logger.warning(f"第{attempt + 1}次尝试未找到可用的生成按钮，重试...")
-                        await asyncio.sleep(2)
+                        await self.wait_for_visible('button[class*="submit-button-"]:not(.lv-btn-disabled)', 2000)
                         
                 except Exception as click_error:
                     self.logger.warning(f"第{attempt + 1}次尝试点击生成按钮时出错: {str(click_error)}")
@@ -931,18 +933,15 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("等待生成完成")
     async def wait_for_generation_complete(self, max_wait_time: int = 3600) -> TaskResult:
         """等待生成完成"""
         try:
             # 等待获取到任务ID
             self.logger.info("等待获取任务ID")
             wait_task_id_time = 120
-            task_id_start_time = time.time()
             
-            while not self.task_id and time.time() - task_id_start_time < wait_task_id_time:
-                elapsed = time.time() - task_id_start_time
-                self.logger.debug(f"等待任务ID中，已等待 {elapsed:.1f} 秒")
-                await asyncio.sleep(1)
+            await self.wait_signal('task_id', wait_task_id_time)
             
             if not self.task_id:
                 self.logger.error("未能获取到任务ID，生成可能失败")
@@ -956,12 +955,14 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
             self.logger.info("已获取任务ID，等待视频生成完成", task_id=self.task_id)
             start_time = time.time()
             
-            while not self.generation_completed and time.time() - start_time < max_wait_time:
-                elapsed = time.time() - start_time
-                self.logger.debug(f"等待视频生成中，已等待 {elapsed:.1f} 秒")
+            async def refresh_status():
+                """刷新页面触发资源列表接口，生成结果由响应监听器回填"""
+                self.logger.debug(f"等待视频生成中，已等待 {time.time() - start_time:.1f} 秒")
                 await self.page.reload()
                 self.logger.debug("刷新页面，检查视频生成状态")
-                await asyncio.sleep(5)
+            
+            # 响应监听器拿到结果即返回，不再等满刷新间隔
+            await self.wait_signal('completed', max_wait_time, poll=refresh_status, poll_interval=5)
             
             if self.generation_completed and self.video_url:
                 self.logger.info("视频生成成功", total_time=f"{time.time() - start_time:.1f}秒", video_url=self.video_url)
@@ -1015,7 +1016,7 @@ class JimengImage2VideoExecutor(BaseTaskExecutor):
         
         try:
             # 初始化浏览器
-            init_result = await self.init_browser(cookies)
+            init_result = await self.init_browser(cookies, account=username)
             if init_result.code != ErrorCode.SUCCESS.value:
                 return init_result
             
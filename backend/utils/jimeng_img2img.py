@@ -6,7 +6,7 @@ based on BaseTaskExecutor refactoring version
 import asyncio
 import time
 from typing import Optional, List, Dict, Any
-from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger, timed_step
 
 class JimengImg2ImgExecutor(BaseTaskExecutor):
     """即梦图生图执行器"""
@@ -39,6 +39,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         except Exception as e:
             self.logger.error("设置即梦平台cookies时出错", error=str(e))
     
+    @timed_step("检查登录状态")
     async def check_login_status(self) -> TaskResult:
         """检查登录状态，如果有登录按钮说明cookies过期"""
         try:
@@ -46,11 +47,11 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             
             # 跳转到主页面
             await self.page.goto('https://dreamina.capcut.com/ai-tool/home/en-us', timeout=60000)
-            await asyncio.sleep(3)
-            self.logger.info("等待3秒后刷新页面")
+            await self.wait_for_network_idle(3000)
+            self.logger.info("页面加载完成后刷新页面")
             await self.page.reload(timeout=60000)
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(3)
+            await self.settle(3000)
             
             # 检查是否存在登录按钮
             login_button = await self.page.query_selector('div[class*="login-button"]:has-text("Sign in")')
@@ -75,23 +76,23 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
             
+    @timed_step("账号登录")
     async def perform_login(self, username: str, password: str) -> TaskResult:
         """执行登录流程"""
         try:
             self.logger.info("开始登录即梦平台", username=username)
             
             await self.page.goto('https://dreamina.capcut.com/en-us', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 点击语言切换按钮
             self.logger.info("点击语言切换按钮")
             await self.page.click('button.dreamina-header-secondary-button')
-            await asyncio.sleep(1)
             
             # 点击切换为英文
             self.logger.info("切换为英文")
             await self.page.click('div.language-item:has-text("English")')
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 检查并关闭可能出现的弹窗
             try:
@@ -100,44 +101,39 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 if close_button:
                     self.logger.info("关闭弹窗")
                     await close_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_state('img.close-icon', 'hidden', 1000)
             except Exception as e:
                 self.logger.debug("没有发现需要关闭的弹窗", error=str(e))
             
             # 点击登录按钮
             self.logger.info("点击登录按钮")
             await self.page.click('#loginButton')
-            await asyncio.sleep(2)
             
             # 等待登录页面加载
             await self.page.wait_for_selector('.lv-checkbox-mask', timeout=60000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 勾选同意条款复选框
             self.logger.info("勾选同意条款")
             await self.page.click('.lv-checkbox-mask')
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录按钮
             await self.page.click('div[class^="login-button-"]:has-text("Sign in")')
-            await asyncio.sleep(2)
             
             # 点击使用邮箱登录
             self.logger.info("选择邮箱登录方式")
             await self.page.click('span.lv_new_third_part_sign_in_expand-label:has-text("Continue with Email")')
-            await asyncio.sleep(2)
             
             # 输入账号密码
             self.logger.info("输入账号密码")
             await self.page.fill('input[placeholder="Enter email"]', username)
-            await asyncio.sleep(2)
             await self.page.fill('input[type="password"]', password)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录
             self.logger.info("点击登录按钮")
             await self.page.click('.lv_new_sign_in_panel_wide-sign-in-button')
-            await asyncio.sleep(2)
             
             # 等待登录完成
             self.logger.info("等待登录完成")
@@ -163,7 +159,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 except:
                     self.logger.info("等待登录超时，刷新页面")
                     await self.page.reload()
-                    await asyncio.sleep(2)
+                    await self.wait_for_network_idle(2000)
                     
                     # 检查URL是否已经跳转为主页面，表示登录完成
                     current_url = self.page.url
@@ -179,7 +175,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 if confirm_button:
                     self.logger.info("检测到确认按钮，点击确认")
                     await confirm_button.click()
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('button:has-text("Confirm")', 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("没有确认按钮，跳过", error=str(e))
             
@@ -194,11 +190,15 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("登录验证")
     async def validate_login_success(self) -> TaskResult:
         """验证登录是否成功"""
         try:
-            # 增加等待时间，让页面有足够时间完成跳转
-            await asyncio.sleep(2)
+            # 等待页面完成跳转（离开登录页即返回）
+            try:
+                await self.page.wait_for_url(lambda url: "login" not in url, timeout=2000)
+            except Exception:
+                pass
             current_url = self.page.url
             if "dreamina.capcut.com" in current_url and "login" not in current_url:
                 self.logger.info("登录验证成功")
@@ -219,13 +219,13 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("跳转生成页")
     async def navigate_to_generation_page(self) -> TaskResult:
         """跳转到AI工具生成页面"""
         try:
             self.logger.info("正在跳转到AI工具生成页面")
             await self.page.goto('https://dreamina.capcut.com/ai-tool/generate')
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(2)
             
             # 检测并处理弹窗 - 检测可能存在的多种弹窗类型，不区分先后顺序
             self.logger.info("页面已跳转，检测是否有弹窗")
@@ -235,6 +235,9 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             
             # 检测第一种弹窗 - 应用下载弹窗
             popup_selector = 'div.app-download-container-rH5mzB'
+
+            # 弹窗或提示词输入框任一出现即说明页面已渲染
+            await self.wait_for_any_visible([survey_popup_selector, popup_selector, 'textarea.lv-textarea'], timeout=2000)
             
             # 检查并处理第二种弹窗
             survey_popup_element = await self.page.query_selector(survey_popup_selector)
@@ -245,7 +248,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     if survey_close_button:
                         await survey_close_button.click()
                         self.logger.info("已点击第二种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                     else:
                         # 检查是否有"Continue to Dreamina"按钮，可以选择一个选项然后继续
                         continue_button = await self.page.query_selector('button.submit-NVxHv4')
@@ -254,11 +257,10 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                             first_option = await self.page.query_selector('div.question-option-D0gxAX')
                             if first_option:
                                 await first_option.click()
-                                await asyncio.sleep(1)
-                                # 再次点击继续按钮
+                                # 再次点击继续按钮（点击会等待按钮变为可用）
                                 await continue_button.click()
                                 self.logger.info("已通过选择选项并点击继续按钮关闭第二种弹窗")
-                                await asyncio.sleep(2)
+                                await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -272,14 +274,14 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     if close_button:
                         await close_button.click()
                         self.logger.info("已点击第一种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(popup_selector, 'hidden', 2000)
                     else:
                         # 如果没有关闭按钮，点击Copy link按钮
                         copy_link_button = await self.page.query_selector('button.lv-btn.lv-btn-primary.lv-btn-size-default.lv-btn-shape-square.app-download-button-gIF_OD')
                         if copy_link_button:
                             await copy_link_button.click()
                             self.logger.info("已点击Copy link按钮")
-                            await asyncio.sleep(2)
+                            await self.wait_for_state(popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -297,25 +299,20 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     self.logger.info("发现新的tabs界面，使用新方式选择AI Image")
                     # 使用新的tabs方式选择AI Image
                     await self.page.click('button.tab-YSwCEn:has-text("AI Image")')
-                    await asyncio.sleep(2)
                 else:
                     self.logger.info("未发现新tabs界面，使用传统下拉框方式")
                     # 点击类型选择下拉框
                     await self.page.click('div.lv-select[role="combobox"][class*="type-select-"]')
-                    await asyncio.sleep(1)
                     
                     # 选择AI Image选项
                     await self.page.click('span[class*="select-option-label-content"]:has-text("AI Image")')
-                    await asyncio.sleep(2)
                     
             except Exception as e:
                 self.logger.warning("选择AI Image时出错，尝试备用方法", error=str(e))
                 # 备用方法：直接尝试传统下拉框方式
                 try:
                     await self.page.click('div.lv-select[role="combobox"][class*="type-select-"]')
-                    await asyncio.sleep(1)
                     await self.page.click('span[class*="select-option-label-content"]:has-text("AI Image")')
-                    await asyncio.sleep(2)
                 except Exception as backup_e:
                     self.logger.error("无法选择AI Image选项", error=str(backup_e))
                     return TaskResult(
@@ -328,7 +325,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             # 等待页面中的关键元素加载完成 - 提示词输入框
             textarea_selector = 'textarea.lv-textarea'
             await self.page.wait_for_selector(textarea_selector, timeout=30000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             self.logger.info("已跳转到AI工具页面")
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="页面跳转成功")
@@ -341,6 +338,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("输入提示词")
     async def input_prompt(self, prompt: str) -> TaskResult:
         """输入提示词"""
         try:
@@ -349,7 +347,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             textarea_selector = 'textarea.lv-textarea'
             await self.page.wait_for_selector(textarea_selector, timeout=10000)
             await self.page.fill(textarea_selector, prompt)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="提示词输入成功")
         except Exception as e:
             self.logger.error("提示词输入失败", error=str(e))
@@ -360,16 +358,16 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("选择模型")
     async def select_model(self, model: str) -> TaskResult:
         """选择模型"""
         try:
             self.logger.info("选择模型", model=model)
             await self.page.click('div.lv-select[role="combobox"]:not([class*="type-select-"])')
-            await asyncio.sleep(1)
             
             # 等待下拉菜单完全加载
             await self.page.wait_for_selector('div.lv-select-popup-inner[role="listbox"]', timeout=5000)
-            await asyncio.sleep(1)
+            await self.wait_for_visible('li[role="option"]', timeout=1000)
             
             # 查找并点击对应的模型选项
             try:
@@ -391,7 +389,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 self.logger.warning("未找到指定模型，尝试通用选择方式", model=model, error=str(e))
                 await self.page.click(f'span[class*="select-option-label-content"]:has-text("{model}")')
             
-            await asyncio.sleep(1)
+            await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 1000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="模型选择成功")
             
         except Exception as e:
@@ -403,6 +401,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("选择比例")
     async def select_aspect_ratio(self, aspect_ratio: str, model: str = None) -> TaskResult:
         """选择比例"""
         try:
@@ -418,7 +417,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     
                     # 点击比例选择按钮
                     await self.page.click('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible(f'label.lv-radio:has(input[value="{aspect_ratio}"])', 1000)
                     
                     # 定义比例选项的映射（从比例值到索引位置）
                     ratio_index_map = {
@@ -448,14 +447,14 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                         # 在弹出的比例选择框中选择对应位置的比例选项
                         # 根据新的HTML结构，点击包含对应value的label元素
                         await self.page.click(f'label.lv-radio:has(input[value="{aspect_ratio}"])')
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                     else:
                         # 如果找不到对应的比例，抛出异常
                         raise Exception(f"不支持的比例: {aspect_ratio}")
 
-                    # 关闭选择
+                    # 关闭选择，等待按钮文字更新为目标比例
                     await self.page.click('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible(f'button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"]):has-text("{aspect_ratio}")', 1000)
                     
                     # 检查是否选择成功 - 查找按钮中是否包含目标比例
                     button_element = await self.page.query_selector('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
@@ -495,14 +494,12 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("选择质量")
     async def select_quality(self, quality: str) -> TaskResult:
         """选择质量/分辨率"""
         try:
             self.logger.info("选择质量/分辨率", quality=quality)
 
-            # 等待页面完全加载
-            await asyncio.sleep(2)
-            
             # 可能存在一个通用的下拉按钮来切换质量选项
             # 通常会有一个显示当前质量的按钮，点击后可以切换
             quality_toggle_selectors = [
@@ -529,6 +526,9 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 'button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has-text("Ultra (4K)")',
                 'button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square.button-AsRw13'  # 特定类名
             ]
+
+            # 等待质量按钮渲染（任一候选出现即继续）
+            await self.wait_for_any_visible(quality_button_selectors, timeout=2000)
             
             quality_button = None
             for selector in quality_button_selectors:
@@ -542,15 +542,14 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             if quality_button:
                 # 点击质量按钮展开选项
                 await quality_button.click()
-                await asyncio.sleep(1)
                 
                 # 现在查找并点击目标质量选项
                 # 质量值应该是 "1k", "2k", "4k"
                 quality_map = {"1K": "1k", "2K": "2k", "4K": "4k"}
                 target_quality_value = quality_map.get(quality, "1k")  # 默认为 "1k"
                 
-                # 在展开的选项中查找目标质量
-                target_option = await self.page.query_selector(f'label.lv-radio:has(input[value="{target_quality_value}"])')
+                # 在展开的选项中查找目标质量（选项面板展开即返回）
+                target_option = await self.wait_for_visible(f'label.lv-radio:has(input[value="{target_quality_value}"])', timeout=1000)
                 
                 if target_option:
                     # 检查是否已经是选中状态
@@ -564,7 +563,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                         # 点击目标选项
                         await target_option.click()
                         self.logger.info(f"已选择 {quality} 质量")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
                         # 关闭选项面板
                         await quality_button.click()
@@ -574,7 +573,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     
                     # 重新点击按钮再次尝试
                     await quality_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible('div[class^="resolution-radio-group-"]', timeout=1000)
                     
                     # 尝试使用更具体的选择器，确保在正确的区域内查找
                     # 根据您提供的HTML结构，质量选项在resolution-radio-group-WD9rqn中
@@ -589,7 +588,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                         else:
                             await target_option_in_group.click()
                             self.logger.info(f"已选择 {quality} 质量")
-                            await asyncio.sleep(1)
+                            await self.settle(1000)
                             quality_selected = True
                             await quality_button.click()  # 关闭
                     else:
@@ -605,13 +604,12 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                             else:
                                 await general_target_option.click()
                                 self.logger.info(f"已选择 {quality} 质量")
-                                await asyncio.sleep(1)
+                                await self.settle(1000)
                                 quality_selected = True
                                 await quality_button.click()  # 关闭
                         else:
                             # 如果仍然找不到，说明面板可能还没完全加载，等待更多时间
-                            await asyncio.sleep(2)
-                            final_target_option = await self.page.query_selector(f'label.lv-radio:has(input[value="{target_quality_value}"])')
+                            final_target_option = await self.wait_for_visible(f'label.lv-radio:has(input[value="{target_quality_value}"])', timeout=2000)
                             if final_target_option:
                                 is_checked = await final_target_option.get_attribute('class')
                                 if is_checked and 'lv-radio-checked' in is_checked:
@@ -621,7 +619,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                                 else:
                                     await final_target_option.click()
                                     self.logger.info(f"已选择 {quality} 质量")
-                                    await asyncio.sleep(1)
+                                    await self.settle(1000)
                                     quality_selected = True
                                     await quality_button.click()  # 关闭
             else:
@@ -653,7 +651,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     if standard_option:
                         await standard_option.click()
                         self.logger.info("已选择 Standard (1K) 质量选项")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
                 
                 elif quality == "2K":
@@ -661,7 +659,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     if high_option:
                         await high_option.click()
                         self.logger.info("已选择 High (2K) 质量选项")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
                 
                 elif quality == "4K":
@@ -669,7 +667,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     if ultra_option:
                         await ultra_option.click()
                         self.logger.info("已选择 Ultra (4K) 质量选项")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
 
             if quality_selected:
@@ -700,6 +698,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                        self.resolve_signal('task_id', self.task_id)
                         self.logger.info("获取到任务ID", task_id=self.task_id)
                 except:
                     pass
@@ -726,12 +725,15 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                                             for i, url in enumerate(self.image_urls):
                                                 self.logger.info(f"图片{i+1} URL", url=url)
                                             self.generation_completed = True
+                                            self.resolve_signal('completed')
                                         else:
                                             self.logger.warning("图片已完成但无法获取任何URL")
                                             self.generation_completed = True  # 标记为完成，即使没有URL
+                                            self.resolve_signal('completed')
                                     except (KeyError, IndexError):
                                         self.logger.warning("图片已完成但无法获取URL")
                                         self.generation_completed = True  # 标记为完成，即使没有URL
+                                        self.resolve_signal('completed')
                                 else:
                                     self.logger.debug("图片生成尚未完成，继续等待")
                 except:
@@ -740,6 +742,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         # 注册响应监听器
         self.page.on("response", handle_response)
     
+    @timed_step("开始生成")
     async def start_generation(self) -> TaskResult:
         """点击生成按钮开始生成"""
         try:
@@ -760,7 +763,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             ''')
             
             self.logger.info("已点击生成按钮，开始生成图片")
-            await asyncio.sleep(2)
+            await self.wait_signal('task_id', 2)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="开始生成")
         except Exception as e:
             self.logger.error("点击生成按钮失败", error=str(e))
@@ -771,18 +774,15 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("等待生成完成")
     async def wait_for_generation_complete(self, max_wait_time: int = 3600) -> TaskResult:
         """等待生成完成"""
         try:
             # 等待获取到任务ID
             self.logger.info("等待获取任务ID")
             wait_task_id_time = 120
-            task_id_start_time = time.time()
             
-            while not self.task_id and time.time() - task_id_start_time < wait_task_id_time:
-                elapsed = time.time() - task_id_start_time
-                self.logger.debug(f"等待任务ID中，已等待 {elapsed:.1f} 秒")
-                await asyncio.sleep(1)
+            await self.wait_signal('task_id', wait_task_id_time)
             
             if not self.task_id:
                 self.logger.error("未能获取到任务ID，生成可能失败")
@@ -796,12 +796,14 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             self.logger.info("已获取任务ID，等待图片生成完成", task_id=self.task_id)
             start_time = time.time()
             
-            while not self.generation_completed and time.time() - start_time < max_wait_time:
-                elapsed = time.time() - start_time
-                self.logger.debug(f"等待图片生成中，已等待 {elapsed:.1f} 秒")
+            async def refresh_status():
+                """刷新页面触发资源列表接口，生成结果由响应监听器回填"""
+                self.logger.debug(f"等待图片生成中，已等待 {time.time() - start_time:.1f} 秒")
                 await self.page.reload()
                 self.logger.debug("刷新页面，检查图片生成状态")
-                await asyncio.sleep(5)
+            
+            # 响应监听器拿到结果即返回，不再等满刷新间隔
+            await self.wait_signal('completed', max_wait_time, poll=refresh_status, poll_interval=5)
             
             if self.generation_completed and self.image_urls:
                 self.logger.info("图片生成成功", total_time=f"{time.time() - start_time:.1f}秒", count=len(self.image_urls))
@@ -836,6 +838,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("上传图片")
     async def upload_input_images(self, input_images: List[str]) -> TaskResult:
         """上传输入图片"""
         try:
@@ -855,8 +858,8 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 await self.page.set_input_files(upload_selector, input_image)
                 self.logger.info(f"第{i+1}张图片上传成功")
                 
-                # 等待上传完成
-                await asyncio.sleep(2)
+                # 等待上传请求结束
+                await self.wait_for_network_quiet(500, 2000)
                 
             self.logger.info("所有输入图片上传完成", total_count=len(input_images))
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="输入图片上传成功")
@@ -880,7 +883,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             if done_button:
                 self.logger.info("检测到参考图像界面，点击Done按钮")
                 await done_button.click()
-                await asyncio.sleep(2)  # 等待界面切换
+                await self.wait_for_state('div.save-YNJf9P', 'hidden', 2000)  # 等待界面切换
                 return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="参考图像界面处理完成")
             else:
                 self.logger.info("未检测到参考图像界面，继续执行")
@@ -921,7 +924,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         
         try:
             # 初始化浏览器
-            init_result = await self.init_browser(cookies)
+            init_result = await self.init_browser(cookies, account=username)
             if init_result.code != ErrorCode.SUCCESS.value:
                 return init_result
             
@@ -8,7 +8,7 @@ import asyncio
 import time
 import json
 from typing import Optional, List, Dict, Any
-from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger, timed_step
 from html.parser import HTMLParser
 
 class JimengText2ImageExecutor(BaseTaskExecutor):
@@ -44,7 +44,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     close_icon = self.page.locator('span.lv-modal-close-icon')
                     if await close_icon.count() > 0 and await close_icon.first.is_visible():
                         await close_icon.first.click()
-                        await asyncio.sleep(0.2)
+                        await self.settle(200)
                         closed += 1
                         did = True
                 except Exception:
@@ -53,7 +53,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     alt_close = self.page.locator('div[class*="close-button-"]')
                     if await alt_close.count() > 0 and await alt_close.first.is_visible():
                         await alt_close.first.click()
-                        await asyncio.sleep(0.2)
+                        await self.settle(200)
                         closed += 1
                         did = True
                 except Exception:
@@ -62,7 +62,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     got_it_btn = self.page.locator('button:has-text("Got it")')
                     if await got_it_btn.count() > 0 and await got_it_btn.first.is_visible():
                         await got_it_btn.first.click()
-                        await asyncio.sleep(0.2)
+                        await self.settle(200)
                         closed += 1
                         did = True
                 except Exception:
@@ -71,7 +71,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     ok_btn = self.page.locator('button:has-text("OK"), button:has-text("Close"), button:has-text("关闭"), button:has-text("确定")')
                     if await ok_btn.count() > 0 and await ok_btn.first.is_visible():
                         await ok_btn.first.click()
-                        await asyncio.sleep(0.2)
+                        await self.settle(200)
                         closed += 1
                         did = True
                 except Exception:
@@ -81,7 +81,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         modal_root = self.page.locator('[class*="lv-modal"], [class*="modal"], [role="dialog"], [class*="overlay"]')
                         if await modal_root.count() > 0:
                             await self.page.keyboard.press('Escape')
-                            await asyncio.sleep(0.2)
+                            await self.settle(200)
                             closed += 1
                             did = True
                     except Exception:
@@ -115,6 +115,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         except Exception as e:
             self.logger.error("设置即梦平台cookies时出错", error=str(e))
     
+    @timed_step("检查登录状态")
     async def check_login_status(self) -> TaskResult:
         """检查登录状态，如果有登录按钮说明cookies过期"""
         try:
@@ -122,11 +123,11 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             
             # 跳转到主页面
             await self.page.goto('https://dreamina.capcut.com/ai-tool/home/en-us', timeout=60000)
-            await asyncio.sleep(3)
-            self.logger.info("等待3秒后刷新页面")
+            await self.wait_for_network_idle(3000)
+            self.logger.info("页面加载完成后刷新页面")
             await self.page.reload(timeout=60000)
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(3)
+            await self.settle(3000)
             
             # 检查是否存在登录按钮
             login_button = await self.page.query_selector('div[class*="login-button"]:has-text("Sign in")')
@@ -151,23 +152,23 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
             
+    @timed_step("账号登录")
     async def perform_login(self, username: str, password: str) -> TaskResult:
         """执行登录流程"""
         try:
             self.logger.info("开始登录即梦平台", username=username)
             
             await self.page.goto('https://dreamina.capcut.com/en-us', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 点击语言切换按钮
             self.logger.info("点击语言切换按钮")
             await self.page.click('button.dreamina-header-secondary-button')
-            await asyncio.sleep(1)
             
             # 点击切换为英文
             self.logger.info("切换为英文")
             await self.page.click('div.language-item:has-text("English")')
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             # 检查并关闭可能出现的弹窗
             try:
@@ -176,44 +177,39 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 if close_button:
                     self.logger.info("关闭弹窗")
                     await close_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_state('img.close-icon', 'hidden', 1000)
             except Exception as e:
                 self.logger.debug("没有发现需要关闭的弹窗", error=str(e))
             
             # 点击登录按钮
             self.logger.info("点击登录按钮")
             await self.page.click('#loginButton')
-            await asyncio.sleep(2)
             
             # 等待登录页面加载
             await self.page.wait_for_selector('.lv-checkbox-mask', timeout=60000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 勾选同意条款复选框
             self.logger.info("勾选同意条款")
             await self.page.click('.lv-checkbox-mask')
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
-            # 点击登录按钮
+            # 点击登录按钮（后续点击会自动等待目标元素可操作，无需固定等待）
             await self.page.click('div[class^="login-button-"]:has-text("Sign in")')
-            await asyncio.sleep(2)
             
             # 点击使用邮箱登录
             self.logger.info("选择邮箱登录方式")
             await self.page.click('span.lv_new_third_part_sign_in_expand-label:has-text("Continue with Email")')
-            await asyncio.sleep(2)
             
             # 输入账号密码
             self.logger.info("输入账号密码")
             await self.page.fill('input[placeholder="Enter email"]', username)
-            await asyncio.sleep(2)
             await self.page.fill('input[type="password"]', password)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 点击登录
             self.logger.info("点击登录按钮")
             await self.page.click('.lv_new_sign_in_panel_wide-sign-in-button')
-            await asyncio.sleep(2)
             
             # 等待登录完成
             self.logger.info("等待登录完成")
@@ -239,7 +235,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 except:
                     self.logger.info("等待登录超时，刷新页面")
                     await self.page.reload()
-                    await asyncio.sleep(2)
+                    await self.wait_for_network_idle(2000)
                     
                     # 检查URL是否已经跳转为主页面，表示登录完成
                     current_url = self.page.url
@@ -255,7 +251,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 if confirm_button:
                     self.logger.info("检测到确认按钮，点击确认")
                     await confirm_button.click()
-                    await asyncio.sleep(2)
+                    await self.wait_for_state('button:has-text("Confirm")', 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("没有确认按钮，跳过", error=str(e))
             
@@ -270,11 +266,15 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("登录验证")
     async def validate_login_success(self) -> TaskResult:
         """验证登录是否成功"""
         try:
-            # 增加等待时间，让页面有足够时间完成跳转
-            await asyncio.sleep(2)
+            # 等待页面完成跳转（离开登录页即返回）
+            try:
+                await self.page.wait_for_url(lambda url: "login" not in url, timeout=2000)
+            except Exception:
+                pass
             current_url = self.page.url
             if "dreamina.capcut.com" in current_url and "login" not in current_url:
                 self.logger.info("登录验证成功")
@@ -295,6 +295,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("跳转生成页")
     async def navigate_to_generation_page(self) -> TaskResult:
         """跳转到AI工具生成页面"""
         try:
@@ -306,13 +307,13 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         got = await self.page.query_selector('button.lv-btn.lv-btn-primary.lv-btn-size-default.lv-btn-shape-square:has-text("Got it")')
                         if got:
                             await got.click()
-                            await asyncio.sleep(0.2)
+                            await self.settle(200)
                             self.logger.info("已处理Light Mode提示弹窗")
                         else:
                             got2 = await self.page.query_selector('button:has-text("Got it")')
                             if got2:
                                 await got2.click()
-                                await asyncio.sleep(0.2)
+                                await self.settle(200)
                                 self.logger.info("已处理Light Mode提示弹窗(备用)")
                     except Exception:
                         pass
@@ -321,7 +322,6 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             self.logger.info("正在跳转到AI工具生成页面")
             await self.page.goto('https://dreamina.capcut.com/ai-tool/generate')
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(2)
             
             # 检测并处理弹窗 - 检测可能存在的多种弹窗类型，不区分先后顺序
             self.logger.info("页面已跳转，检测是否有弹窗")
@@ -332,6 +332,9 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             # 检测第一种弹窗 - 应用下载弹窗
             popup_selector = 'div.app-download-container-rH5mzB'
             
+            # 弹窗或提示词输入框任一出现即说明页面已渲染
+            await self.wait_for_any_visible([survey_popup_selector, popup_selector, 'textarea.lv-textarea'], timeout=2000)
+            
             # 检查并处理第二种弹窗
             survey_popup_element = await self.page.query_selector(survey_popup_selector)
             if survey_popup_element:
@@ -341,7 +344,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     if survey_close_button:
                         await survey_close_button.click()
                         self.logger.info("已点击第二种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                     else:
                         # 检查是否有"Continue to Dreamina"按钮，可以选择一个选项然后继续
                         continue_button = await self.page.query_selector('button.submit-NVxHv4')
@@ -350,11 +353,10 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                             first_option = await self.page.query_selector('div.question-option-D0gxAX')
                             if first_option:
                                 await first_option.click()
-                                await asyncio.sleep(1)
-                                # 再次点击继续按钮
+                                # 再次点击继续按钮（点击会等待按钮变为可用）
                                 await continue_button.click()
                                 self.logger.info("已通过选择选项并点击继续按钮关闭第二种弹窗")
-                                await asyncio.sleep(2)
+                                await self.wait_for_state(survey_popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -368,14 +370,14 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     if close_button:
                         await close_button.click()
                         self.logger.info("已点击第一种弹窗关闭按钮")
-                        await asyncio.sleep(2)
+                        await self.wait_for_state(popup_selector, 'hidden', 2000)
                     else:
                         # 如果没有关闭按钮，点击Copy link按钮
                         copy_link_button = await self.page.query_selector('button.lv-btn.lv-btn-primary.lv-btn-size-default.lv-btn-shape-square.app-download-button-gIF_OD')
                         if copy_link_button:
                             await copy_link_button.click()
                             self.logger.info("已点击Copy link按钮")
-                            await asyncio.sleep(2)
+                            await self.wait_for_state(popup_selector, 'hidden', 2000)
                 except Exception as e:
                     # 静默处理异常，不输出警告
                     pass
@@ -394,26 +396,21 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     self.logger.info("发现新的tabs界面，点击 AI Agent")
                     await self.page.click('button.tab-YSwCEn:has-text("AI Agent")')
                     self.logger.info("已选择AI Agent")
-                    await asyncio.sleep(2)
                 else:
                     self.logger.info("未发现新tabs界面，使用下拉框方式选择 AI Agent")
                     # 点击类型选择下拉框
                     await self.page.click('div.lv-select[role="combobox"][class*="type-select-"]')
-                    await asyncio.sleep(1)
                     
                     await self.page.click('span[class*="select-option-label-content"]:has-text("AI Agent")')
                     self.logger.info("已选择AI Agent")
-                    await asyncio.sleep(2)
                 
             except Exception as e:
                 self.logger.warning("选择 AI Agent 时出错，尝试备用方法", error=str(e))
                 # 备用方法：直接尝试传统下拉框方式
                 try:
                     await self.page.click('div.lv-select[role="combobox"][class*="type-select-"]')
-                    await asyncio.sleep(1)
                     await self.page.click('span[class*="select-option-label-content"]:has-text("AI Agent")')
                     self.logger.info("已选择AI Agent")
-                    await asyncio.sleep(2)
                 except Exception as backup_e:
                     self.logger.error("无法选择 AI Agent", error=str(backup_e))
                     return TaskResult(
@@ -426,7 +423,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             # 等待页面中的关键元素加载完成 - 提示词输入框
             textarea_selector = 'textarea.lv-textarea'
             await self.page.wait_for_selector(textarea_selector, timeout=30000)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             # 跳转后尝试滚动到底部，确保最新生成区域可见
             try:
@@ -445,6 +442,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("输入提示词")
     async def input_prompt(self, prompt: str) -> TaskResult:
         """输入提示词"""
         try:
@@ -460,7 +458,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             textarea_selector = 'textarea.lv-textarea'
             await self.page.wait_for_selector(textarea_selector, timeout=10000)
             await self.page.fill(textarea_selector, prompt)
-            await asyncio.sleep(2)
+            await self.settle(2000)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="提示词输入成功")
         except Exception as e:
             self.logger.error("提示词输入失败", error=str(e))
@@ -471,6 +469,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("上传图片")
     async def upload_image(self, image_path: str) -> TaskResult:
         """上传图片（AI Agent模式下可选）"""
         try:
@@ -483,7 +482,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     try:
                         if await btn.is_visible():
                             await btn.click()
-                            await asyncio.sleep(0.5)
+                            await self.settle(500)
                     except Exception:
                         pass
             except Exception as e:
@@ -511,7 +510,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         loc = self.page.locator(t)
                         if await loc.count() > 0 and await loc.first.is_visible():
                             await loc.first.click()
-                            await asyncio.sleep(0.2)
+                            await self.settle(200)
                     except Exception:
                         pass
             except Exception:
@@ -541,8 +540,8 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             if not set_ok:
                 raise Exception("未找到可用的文件上传控件或设置文件失败")
             
-            # 等待上传完成（解决问题1：等待上传处理完成，避免按钮状态异常）
-            await asyncio.sleep(3)
+            # 等待上传请求结束（解决问题1：等待上传处理完成，避免按钮状态异常）
+            await self.wait_for_network_quiet(500, 3000)
             
             # 等待上传进度消失，确保上传完全完成
             try:
@@ -556,7 +555,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             except Exception as e:
                 self.logger.debug(f"等待上传进度消失超时: {e}")
             
-            await asyncio.sleep(1)  # 额外等待确保UI状态更新
+            await self.settle(1000)  # 等待UI状态更新
             
             # 验证预览是否已附加到当前输入
             try:
@@ -583,7 +582,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                             loc = self.page.locator(t)
                             if await loc.count() > 0 and await loc.first.is_visible():
                                 await loc.first.click()
-                                await asyncio.sleep(0.3)
+                                await self.settle(300)
                         except Exception:
                             pass
                     # 再次尝试设置文件
@@ -594,7 +593,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         try:
                             await self.page.wait_for_selector(sel, state='attached', timeout=3000)
                             await self.page.set_input_files(sel, image_path)
-                            await asyncio.sleep(1)
+                            await self.wait_for_network_quiet(500, 1000)
                             break
                         except Exception:
                             pass
@@ -632,16 +631,16 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("选择模型")
     async def select_model(self, model: str) -> TaskResult:
         """选择模型"""
         try:
             self.logger.info("选择模型", model=model)
             await self.page.click('div.lv-select[role="combobox"]:not([class*="type-select-"])')
-            await asyncio.sleep(1)
             
             # 等待下拉菜单完全加载
             await self.page.wait_for_selector('div.lv-select-popup-inner[role="listbox"]', timeout=5000)
-            await asyncio.sleep(1)
+            await self.wait_for_visible('li[role="option"]', timeout=1000)
             
             # 查找并点击对应的模型选项
             try:
@@ -677,7 +676,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     model_option_found = True
             
             if model_option_found:
-                await asyncio.sleep(1)
+                await self.wait_for_state('div.lv-select-popup-inner[role="listbox"]', 'hidden', 1000)
                 # 6分钟尚未获取到图片，执行一次刷新后继续等待
                 try:
                     if self.generation_started_at and (time.time() - self.generation_started_at) >= 360 and not self.did_soft_refresh:
@@ -711,6 +710,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    @timed_step("选择比例")
     async def select_aspect_ratio(self, aspect_ratio: str, model: Optional[str] = None) -> TaskResult:
         """选择比例"""
         try:
@@ -726,7 +726,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     
                     # 点击比例选择按钮
                     await self.page.click('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible(f'label.lv-radio:has(input[value="{aspect_ratio}"])', 1000)
                     
                     # 定义比例选项的映射（从比例值到索引位置）
                     ratio_index_map = {
@@ -756,14 +756,12 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         # 在弹出的比例选择框中选择对应位置的比例选项
                         # 根据新的HTML结构，点击包含对应value的label元素
                         await self.page.click(f'label.lv-radio:has(input[value="{aspect_ratio}"])')
-                        await asyncio.sleep(1)
                     else:
                         # 如果找不到对应的比例，抛出异常
                         raise Exception(f"不支持的比例: {aspect_ratio}")
 
-                    # 关闭选择 - 检查是否需要关闭选择框
-                    # 在新版本中，点击选项后可能不需要手动关闭
-                    await asyncio.sleep(1)
+                    # 等待按钮文字更新为目标比例（点击选项后选择框自动关闭）
+                    await self.wait_for_visible(f'button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"]):has-text("{aspect_ratio}")', 2000)
                     
                     # 检查是否选择成功 - 查找按钮中是否包含目标比例
                     button_element = await self.page.query_selector('button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square:has([class*="button-text-"])')
@@ -803,14 +801,12 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
 
+    @timed_step("选择质量")
     async def select_quality(self, quality: str) -> TaskResult:
         """选择质量/分辨率"""
         try:
             self.logger.info("选择质量/分辨率", quality=quality)
 
-            # 等待页面完全加载
-            await asyncio.sleep(2)
-            
             # 可能存在一个通用的下拉按钮来切换质量选项
             # 通常会有一个显示当前质量的按钮，点击后可以切换
             quality_toggle_selectors = [
@@ -838,6 +834,9 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 'button.lv-btn.lv-btn-secondary.lv-btn-size-default.lv-btn-shape-square.button-AsRw13'  # 特定类名
             ]
             
+            # 等待质量按钮渲染（任一候选出现即继续）
+            await self.wait_for_any_visible(quality_button_selectors, timeout=2000)
+            
             quality_button = None
             for selector in quality_button_selectors:
                 try:
@@ -850,15 +849,14 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             if quality_button:
                 # 点击质量按钮展开选项
                 await quality_button.click()
-                await asyncio.sleep(1)
                 
                 # 现在查找并点击目标质量选项
                 # 质量值应该是 "1k", "2k", "4k"
                 quality_map = {"1K": "1k", "2K": "2k", "4K": "4k"}
                 target_quality_value = quality_map.get(quality, "1k")  # 默认为 "1k"
                 
-                # 在展开的选项中查找目标质量
-                target_option = await self.page.query_selector(f'label.lv-radio:has(input[value="{target_quality_value}"])')
+                # 在展开的选项中查找目标质量（选项面板展开即返回）
+                target_option = await self.wait_for_visible(f'label.lv-radio:has(input[value="{target_quality_value}"])', timeout=1000)
                 
                 if target_option:
                     # 检查是否已经是选中状态
@@ -872,7 +870,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         # 点击目标选项
                         await target_option.click()
                         self.logger.info(f"已选择 {quality} 质量")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
                         # 关闭选项面板
                         await quality_button.click()
@@ -882,7 +880,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     
                     # 重新点击按钮再次尝试
                     await quality_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible('div[class^="resolution-radio-group-"]', timeout=1000)
                     
                     # 尝试使用更具体的选择器，确保在正确的区域内查找
                     # 根据您提供的HTML结构，质量选项在resolution-radio-group-WD9rqn中
@@ -897,7 +895,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         else:
                             await target_option_in_group.click()
                             self.logger.info(f"已选择 {quality} 质量")
-                            await asyncio.sleep(1)
+                            await self.settle(1000)
                             quality_selected = True
                             await quality_button.click()  # 关闭
                     else:
@@ -913,13 +911,12 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                             else:
                                 await general_target_option.click()
                                 self.logger.info(f"已选择 {quality} 质量")
-                                await asyncio.sleep(1)
+                                await self.settle(1000)
                                 quality_selected = True
                                 await quality_button.click()  # 关闭
                         else:
                             # 如果仍然找不到，说明面板可能还没完全加载，等待更多时间
-                            await asyncio.sleep(2)
-                            final_target_option = await self.page.query_selector(f'label.lv-radio:has(input[value="{target_quality_value}"])')
+                            final_target_option = await self.wait_for_visible(f'label.lv-radio:has(input[value="{target_quality_value}"])', timeout=2000)
                             if final_target_option:
                                 is_checked = await final_target_option.get_attribute('class')
                                 if is_checked and 'lv-radio-checked' in is_checked:
@@ -929,7 +926,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                                 else:
                                     await final_target_option.click()
                                     self.logger.info(f"已选择 {quality} 质量")
-                                    await asyncio.sleep(1)
+                                    await self.settle(1000)
                                     quality_selected = True
                                     await quality_button.click()  # 关闭
             else:
@@ -983,7 +980,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         # 如果元素包含当前质量，点击它可能会展开选项
                         if "Standard" in (element_text or "") or "High" in (element_text or "") or "Ultra" in (element_text or ""):
                             await quality_element.click()
-                            await asyncio.sleep(1)
+                            await self.wait_for_visible(f'label.lv-radio:has(input[value="{quality.lower()}"])', timeout=1000)
                             
                             # 现在查找并点击所需的选项
                             if quality == "1K":
@@ -992,7 +989,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                                 if standard_option:
                                     await standard_option.click()
                                     self.logger.info("已选择 Standard (1K) 质量选项")
-                                    await asyncio.sleep(1)
+                                    await self.settle(1000)
                                     quality_selected = True
                                     break
                             elif quality == "2K":
@@ -1001,7 +998,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                                 if high_option:
                                     await high_option.click()
                                     self.logger.info("已选择 High (2K) 质量选项")
-                                    await asyncio.sleep(1)
+                                    await self.settle(1000)
                                     quality_selected = True
                                     break
                             elif quality == "4K":
@@ -1010,7 +1007,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                                 if ultra_option:
                                     await ultra_option.click()
                                     self.logger.info("已选择 Ultra (4K) 质量选项")
-                                    await asyncio.sleep(1)
+                                    await self.settle(1000)
                                     quality_selected = True
                                     break
                 except Exception as e:
@@ -1025,7 +1022,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     if standard_option:
                         await standard_option.click()
                         self.logger.info("已选择 Standard (1K) 质量选项")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
                 
                 elif quality == "2K":
@@ -1033,7 +1030,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     if high_option:
                         await high_option.click()
                         self.logger.info("已选择 High (2K) 质量选项")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
                 
                 elif quality == "4K":
@@ -1041,7 +1038,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     if ultra_option:
                         await ultra_option.click()
                         self.logger.info("已选择 Ultra (4K) 质量选项")
-                        await asyncio.sleep(1)
+                        await self.settle(1000)
                         quality_selected = True
 
             if quality_selected:
@@ -1130,6 +1127,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     self.logger.debug("生成响应JSON预览", preview=preview)
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                        self.resolve_signal('task_id', self.task_id)
                         self.logger.info("获取到任务ID", task_id=self.task_id)
                         self.last_generate_response_preview = preview
                     else:
@@ -1162,14 +1160,17 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     if data.get("ret") == "0" and "data" in data:
                         if "task_id" in data["data"]:
                             self.task_id = data["data"]["task_id"]
+                            self.resolve_signal('task_id', self.task_id)
                             self.logger.info("获取到AI Agent任务ID", task_id=self.task_id)
                             self.last_generate_response_preview = preview
                         elif "aigc_data" in data["data"] and "task" in data["data"]["aigc_data"]:
                             self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                            self.resolve_signal('task_id', self.task_id)
                             self.logger.info("获取到AI Agent任务ID", task_id=self.task_id)
                             self.last_generate_response_preview = preview
                         elif "task" in data and "task_id" in data["task"]:
                             self.task_id = data["task"]["task_id"]
+                            self.resolve_signal('task_id', self.task_id)
                             self.logger.info("获取到任务ID", task_id=self.task_id)
                             self.last_generate_response_preview = preview
                         else:
@@ -1242,6 +1243,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                                     for i, url in enumerate(self.image_urls):
                                         self.logger.info(f"图片{i+1} URL", url=url)
                                     self.generation_completed = True
+                                    self.resolve_signal('completed')
                                 else:
                                     self.logger.warning("图片已完成但无法获取任何URL")
                                     self.generation_completed = True
@@ -1283,6 +1285,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         candidate = _deep_find_task_id(data_any)
                         if candidate and not self.task_id:
                             self.task_id = candidate
+                            self.resolve_signal('task_id', self.task_id)
                             self.logger.info("泛化解析获取到任务ID", task_id=self.task_id, url=response.url)
                     except Exception:
                         pass
@@ -1303,6 +1306,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 candidate = _deep_find_task_id(data)
                 if candidate and not self.task_id:
                     self.task_id = candidate
+                    self.resolve_signal('task_id', self.task_id)
                     self.logger.info("WebSocket获取到任务ID", task_id=self.task_id)
             except Exception:
                 pass
@@ -1314,6 +1318,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 pass
         self.page.on("websocket", _ws_handler)
     
+    @timed_step("开始生成")
     async def start_generation(self) -> TaskResult:
         """点击生成按钮开始生成"""
         try:
@@ -1357,7 +1362,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         self.logger.debug("记录生成前页面图片快照", count=len(self.pre_gen_image_urls))
                     except Exception as e:
                         self.logger.debug(f"生成前快照记录失败: {e}")
-                    await asyncio.sleep(2)
+                    await self.wait_signal('task_id', 2)
                     return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="开始生成")
                 except Exception as e:
                     self.logger.debug(f"回车发送失败，回退为按钮点击: {e}")
@@ -1390,7 +1395,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 self.logger.debug("记录生成前页面图片快照", count=len(self.pre_gen_image_urls))
             except Exception as e:
                 self.logger.debug(f"生成前快照记录失败: {e}")
-            await asyncio.sleep(2)
+            await self.wait_signal('task_id', 2)
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="开始生成")
         except Exception as e:
             self.logger.error("点击生成按钮失败", error=str(e))
@@ -2236,10 +2241,9 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 # 若进度达到100或加载容器消失，最后再尝试一次
                 if p is not None and p >= 100:
                     if grace_seconds and grace_seconds > 0:
-                        try:
-                            await asyncio.sleep(grace_seconds)
-                        except Exception:
-                            pass
+                        # 等待视频元素出现，最多 grace_seconds 秒
+                        await self.wait_for_visible('div[id^="dreamina-video-player-"] video, div[class*="video-element-"] video, video',
+                                                    grace_seconds * 1000)
                     vids = await self.extract_latest_generated_videos()
                     if vids:
                         return vids
@@ -2251,12 +2255,10 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
 
     async def click_first_video_and_capture_url(self, pre_wait: int = 0, timeout_ms: int = 15000) -> List[str]:
         try:
-            if pre_wait and pre_wait > 0:
-                try:
-                    await asyncio.sleep(pre_wait)
-                except Exception:
-                    pass
             sel = 'div[id^="dreamina-video-player-"] video, div[class*="video-element-"] video, video'
+            if pre_wait and pre_wait > 0:
+                # 等待视频元素出现，最多 pre_wait 秒
+                await self.wait_for_visible(sel, pre_wait * 1000)
             try:
                 count = await self.page.locator(sel).count()
             except Exception:
@@ -2632,18 +2634,18 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             # ================================
             try:
                 await self.page.keyboard.press("Escape")
-                await asyncio.sleep(0.2)
+                await self.settle(200)
                 self.logger.info(f"❌ 已关闭第 {index} 张的大图")
             except:
                 pass
             
-            # 7）等待 2 秒（避免卡顿）
-            await asyncio.sleep(2)
+            # 7）等待大图关闭引起的请求结束（避免卡顿），最多 2 秒
+            await self.wait_for_network_quiet(500, 2000)
             
             # 8）关闭中图
             try:
                 await self.page.keyboard.press("Escape")
-                await asyncio.sleep(0.2)
+                await self.settle(200)
                 self.logger.info(f"❌ 已关闭第 {index} 张的中图")
             except:
                 pass
@@ -2766,7 +2768,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             self.logger.info("执行一次页面刷新用于补齐UI")
             await self.page.reload(timeout=60000)
             await self.page.wait_for_load_state('networkidle', timeout=60000)
-            await asyncio.sleep(1)
+            await self.settle(1000)
             self.did_soft_refresh = True
         except Exception as e:
             self.logger.debug(f"页面刷新失败: {e}")
@@ -2774,7 +2776,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
     async def scroll_to_bottom_safe(self):
         try:
             await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await asyncio.sleep(0.3)
+            await self.settle(300)
             self.logger.debug("已执行窗口滚动到底部")
         except Exception as e:
             self.logger.debug(f"滚动到底部失败: {e}")
@@ -2824,7 +2826,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     await btn.first.click()
                 except Exception:
                     await btn.first.dispatch_event('click')
-                await asyncio.sleep(0.3)
+                await self.settle(300)
                 self.logger.debug("已点击 Go to bottom 按钮")
                 return
             clicked = await self.page.evaluate(r'''() => {
@@ -2838,11 +2840,11 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 return false;
             }''')
             if clicked:
-                await asyncio.sleep(0.3)
+                await self.settle(300)
                 self.logger.debug("已通过文本匹配点击 Go to bottom")
                 return
             await self.page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-            await asyncio.sleep(0.3)
+            await self.settle(300)
             self.logger.debug("已执行窗口滚动到底部")
         except Exception as e:
             self.logger.debug(f"滚动到底部失败: {e}")
@@ -3000,7 +3002,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     pass
                 try:
                     await self.page.keyboard.press('Escape')
-                    await asyncio.sleep(0.3)
+                    await self.settle(300)
                 except Exception:
                     pass
             return results
@@ -3135,7 +3137,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 
                 try:
                     await self.page.keyboard.press('Escape')
-                    await asyncio.sleep(0.2)
+                    await self.settle(200)
                 except Exception:
                     pass
             return results
@@ -3216,7 +3218,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     pass
                     try:
                         await self.page.keyboard.press('Escape')
-                        await asyncio.sleep(0.2)
+                        await self.settle(200)
                     except Exception:
                         pass
             return results
@@ -3279,13 +3281,10 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         except Exception:
             return []
 
-    async def wait_and_extract_highres_from_player(self, min_wait: float = 3.0, max_wait: float = 5.0) -> List[str]:
+    async def wait_and_extract_highres_from_player(self, max_wait: float = 5.0) -> List[str]:
         try:
+            # 大图地址按 is_highres_url 过滤，出现即返回，不必先固定等待
             start = time.time()
-            try:
-                await asyncio.sleep(min_wait)
-            except Exception:
-                pass
             urls = await self.extract_highres_from_player()
             if urls:
                 return urls
@@ -3506,20 +3505,12 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         except Exception:
             return False
 
-    async def zoom_and_wait_extract_highres_from_player(self, min_wait: float = 3.0, max_wait: float = 5.0) -> List[str]:
+    async def zoom_and_wait_extract_highres_from_player(self, max_wait: float = 5.0) -> List[str]:
         try:
+            # 播放器中的图片相对放大前发生变化即提取，不必先固定等待
             baseline = await self.get_player_best_info()
-            try:
-                await asyncio.sleep(min_wait)
-            except Exception:
-                pass
-            current = await self.get_player_best_info()
-            if current and (current.get('src') and (current.get('src') != baseline.get('src') or current.get('area', 0) > baseline.get('area', 0))):
-                urls = await self.extract_highres_from_player()
-                if urls:
-                    return urls
             start = time.time()
-            while (time.time() - start) < (max_wait - min_wait):
+            while (time.time() - start) < max_wait:
                 try:
                     await asyncio.sleep(0.5)
                 except Exception:
@@ -3586,10 +3577,8 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     return img.complete && (img.naturalWidth||0)>0 && /^https?:/.test(s);
                 }''', timeout=int(wait_seconds*1000))
             except Exception:
-                try:
-                    await asyncio.sleep(wait_seconds)
-                except Exception:
-                    pass
+                # 已等满 wait_seconds，不再额外等待，直接按当前页面提取
+                pass
             urls = await self.extract_detail_card_from_player()
             return urls or []
         except Exception:
@@ -3677,6 +3666,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             self.logger.debug(f"按钮状态检测失败: {e}")
             return False
     
+    @timed_step("等待生成完成")
     async def wait_for_generation_complete(self, max_wait_time: int = 3600, highres_timeout: int = 60) -> TaskResult:
         """等待任务生成完成并获取结果（优先依赖API响应监听器）"""
         start_time = time.time()
@@ -3691,13 +3681,9 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             except Exception as e:
                 self.logger.warning(f"记录快照失败: {e}")
             
-            # 步骤2: 等待API响应监听器获取到task_id（不必须）
-            task_id_wait_start = time.time()
-            while (time.time() - task_id_wait_start) < 60:  # 最多等待60秒
-                if self.task_id:
-                    self.logger.info(f"✅ 已获取到task_id: {self.task_id}")
-                    break
-                await asyncio.sleep(0.5)
+            # 步骤2: 等待API响应监听器获取到task_id（不必须，最多等待60秒）
+            if await self.wait_signal('task_id', 60):
+                self.logger.info(f"✅ 已获取到task_id: {self.task_id}")
             
             if not self.task_id:
                 self.logger.warning("⚠️ 10秒内未获取到task_id,将使用降级方案")
@@ -3749,9 +3735,12 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                         message=f"获取结果成功"
                     )
                 
-                # 方法2: 每2秒通过按钮状态检测生成是否完成
+                # 方法2: 通过按钮状态检测生成是否完成（DOM检测开销大，仅作为API监听器的兜底）
                 elapsed = time.time() - generation_wait_start
                 check_interval = 2 if quick_check_mode else 5  # 快速模式每2秒检查，慢速模式每5秒检查
+                if self.task_id:
+                    # 已拿到task_id时资源列表响应可精准匹配本次任务，DOM检测降频
+                    check_interval = 10
                 
                 # 如果等待超过30秒，切换到慢速检测模式
                 if elapsed > 30:
@@ -3984,7 +3973,11 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                     except Exception as e:
                         self.logger.debug(f"按钮状态检测失败: {e}")
                 
-                await asyncio.sleep(1)
+                # API响应监听器拿到结果时立即唤醒，否则等到下一次检测
+                if self.signal_resolved('completed'):
+                    await asyncio.sleep(1)
+                else:
+                    await self.wait_signal('completed', 1)
             
             # 超时后的降级方案
             self.logger.warning(f"⚠️ API监听器超时,尝试DOM提取...")
@@ -4070,7 +4063,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         
         try:
             # 初始化浏览器
-            init_result = await self.init_browser(cookies)
+            init_result = await self.init_browser(cookies, account=username)
             if init_result.code != ErrorCode.SUCCESS.value:
                 return init_result
             
@@ -4127,7 +4120,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 if prompt_result.code != ErrorCode.SUCCESS.value:
                     return prompt_result
                 try:
-                    await asyncio.sleep(5)
+                    await self.wait_for_network_quiet(500, 5000)
                     await self.scroll_to_bottom_safe()
                     self.did_scroll_bottom = True
                 except Exception as e:
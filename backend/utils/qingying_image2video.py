@@ -7,7 +7,7 @@ import asyncio
 import time
 import json
 from typing import Optional, Dict, Any
-from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger, timed_step
 
 class QingyingImage2VideoExecutor(BaseTaskExecutor):
     """清影图生视频执行器"""
@@ -39,12 +39,13 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
         except Exception as e:
             self.logger.error("设置清影平台cookies时出错", error=str(e))
     
+    @timed_step("访问平台")
     async def navigate_to_platform(self) -> TaskResult:
         """导航到清影平台"""
         try:
             self.logger.info("开始访问清影图生视频页面")
             await self.page.goto('https://chatglm.cn/video?lang=zh', timeout=60000)
-            await asyncio.sleep(2)
+            await self.wait_for_network_idle(2000)
             
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
@@ -59,13 +60,14 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"访问清影平台失败: {str(e)}"
             )
     
+    @timed_step("处理弹窗")
     async def handle_popups(self) -> TaskResult:
         """处理弹窗"""
         try:
             self.logger.info("正在检查并关闭弹窗")
             
             # 等待页面加载完成
-            await asyncio.sleep(3)
+            await self.wait_for_network_idle(3000)
             
             # 检查并关闭第一个弹窗
             try:
@@ -74,7 +76,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 if popup_element1:
                     await popup_element1.click()
                     self.logger.info("第一个弹窗已关闭")
-                    await asyncio.sleep(2)
+                    await self.wait_for_state(popup_selector1, 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("第一个弹窗未出现或已关闭", error=str(e))
             
@@ -85,7 +87,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 if popup_element2:
                     await popup_element2.click()
                     self.logger.info("第二个弹窗已关闭")
-                    await asyncio.sleep(2)
+                    await self.wait_for_state(popup_selector2, 'hidden', 2000)
             except Exception as e:
                 self.logger.debug("第二个弹窗未出现或已关闭", error=str(e))
             
@@ -102,14 +104,12 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"处理弹窗失败: {str(e)}"
             )
     
+    @timed_step("上传图片")
     async def upload_image(self, image_path: str) -> TaskResult:
         """上传图片"""
         try:
             self.logger.info("正在上传图片", image_path=image_path)
             
-            # 等待页面加载完成
-            await asyncio.sleep(3)
-            
             # 查找文件上传输入框
             upload_selector = 'input[type="file"][accept="image/*"]'
             await self.page.wait_for_selector(upload_selector, timeout=10000, state='attached')
@@ -117,7 +117,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             # 上传图片文件
             await self.page.set_input_files(upload_selector, image_path)
             self.logger.info("图片上传成功", image_path=image_path)
-            await asyncio.sleep(3)
+            await self.wait_for_network_quiet(quiet=500, timeout=3000)
             
             # 点击上传按钮
             self.logger.info("正在点击上传按钮")
@@ -125,7 +125,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             upload_btn = await self.page.wait_for_selector(upload_btn_selector, timeout=10000, state='visible')
             await upload_btn.click()
             self.logger.info("已点击上传按钮")
-            await asyncio.sleep(3)
+            await self.wait_for_state(upload_btn_selector, 'hidden', 3000)
             
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
@@ -140,6 +140,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"上传图片失败: {str(e)}"
             )
     
+    @timed_step("基础参数")
     async def configure_basic_params(self) -> TaskResult:
         """配置基础参数"""
         try:
@@ -149,7 +150,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             basic_params = await self.page.wait_for_selector(basic_params_selector, timeout=10000, state='visible')
             await basic_params.click()
             self.logger.info("已点击基础参数")
-            await asyncio.sleep(2)
+            await self.settle(2000)
             
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
@@ -164,6 +165,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"配置基础参数失败: {str(e)}"
             )
     
+    @timed_step("生成模式")
     async def set_generation_mode(self, generation_mode: str) -> TaskResult:
         """设置生成模式"""
         try:
@@ -196,7 +198,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                         else:
                             # 尝试点击目标选项
                             await target_item.click()
-                            await asyncio.sleep(2)
+                            await self.settle(2000)
                             
                             # 验证是否成功选中
                             updated_class = await target_item.get_attribute('class')
@@ -212,8 +214,6 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             else:
                 self.logger.info("使用默认的速度更快模式")
             
-            await asyncio.sleep(1)
-            
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
                 data=None,
@@ -227,6 +227,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"设置生成模式失败: {str(e)}"
             )
     
+    @timed_step("设置帧率")
     async def set_frame_rate(self, frame_rate: str) -> TaskResult:
         """设置帧率"""
         try:
@@ -242,7 +243,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 if frame_rate_element:
                     # 如果页面上仍然存在帧率设置选项，则继续设置
                     await frame_rate_element.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible('div.duration-item', timeout=1000)
                     
                     # 模拟点击选择相应帧率
                     frame_rate_items = await self.page.query_selector_all('div.duration-item')
@@ -263,8 +264,6 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             except Exception as e:
                 self.logger.warning(f"查找或设置帧率时出错，使用默认设置: {str(e)}")
             
-            await asyncio.sleep(1)
-            
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
                 data=None,
@@ -278,6 +277,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"设置帧率失败: {str(e)}"
             )
     
+    @timed_step("设置分辨率")
     async def set_resolution(self, resolution: str) -> TaskResult:
         """设置分辨率"""
         try:
@@ -293,7 +293,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 if resolution_element:
                     # 如果页面上仍然存在分辨率设置选项，则继续设置
                     await resolution_element.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible('div.duration-item', timeout=1000)
                     
                     # 模拟点击选择相应分辨率
                     resolution_items = await self.page.query_selector_all('div.duration-item')
@@ -315,8 +315,6 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             except Exception as e:
                 self.logger.warning(f"查找或设置分辨率时出错，使用默认设置: {str(e)}")
             
-            await asyncio.sleep(1)
-            
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
                 data=None,
@@ -330,6 +328,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"设置分辨率失败: {str(e)}"
             )
     
+    @timed_step("设置时长")
     async def set_duration(self, duration: str) -> TaskResult:
         """设置视频时长"""
         try:
@@ -349,7 +348,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                     duration_button_selector = 'div.prompt-item:has-text("5s")'
                     duration_button = await self.page.wait_for_selector(duration_button_selector, timeout=10000, state='visible')
                     await duration_button.click()
-                    await asyncio.sleep(1)
+                    await self.wait_for_visible('div.duration-item', timeout=1000)
                     
                     # 等待弹窗出现并获取所有时长选项
                     self.logger.debug("正在定位时长选项")
@@ -367,7 +366,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                         else:
                             # 尝试点击目标选项
                             await target_item.click()
-                            await asyncio.sleep(2)
+                            await self.settle(2000)
                             
                             # 验证是否成功选中
                             updated_class = await target_item.get_attribute('class')
@@ -383,8 +382,6 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             else:
                 self.logger.info("使用默认的5秒时长")
             
-            await asyncio.sleep(1)
-            
             return TaskResult(
                 code=ErrorCode.SUCCESS.value,
                 data=None,
@@ -398,6 +395,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"设置时长失败: {str(e)}"
             )
     
+    @timed_step("AI音效")
     async def set_ai_audio(self, ai_audio: bool) -> TaskResult:
         """设置AI音效"""
         try:
@@ -409,7 +407,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 ai_audio_button = await self.page.wait_for_selector(ai_audio_button_selector, timeout=10000, state='visible')
                 await ai_audio_button.click()
                 self.logger.debug("已点击AI音效按钮，等待选项弹窗")
-                await asyncio.sleep(2)
+                await self.wait_for_visible('div.options_popover .duration-item', timeout=2000)
                 
                 # 查找选项，根据新的HTML结构，寻找AI音效的开启/关闭选项
                 if ai_audio:
@@ -450,7 +448,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                         except:
                             self.logger.warning("无法设置AI音效为关闭")
                     
-                await asyncio.sleep(2)
+                await self.wait_for_state('div.options_popover', 'hidden', 2000)
                 
             except Exception as e:
                 self.logger.error("设置AI音效时出错", error=str(e))
@@ -468,6 +466,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"设置AI音效失败: {str(e)}"
             )
     
+    @timed_step("输入提示词")
     async def input_prompt(self, prompt: str) -> TaskResult:
         """输入提示词"""
         try:
@@ -487,7 +486,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                     await prompt_textarea.type(prompt, delay=50)
                     
                     self.logger.info("已成功输入提示词", prompt=prompt)
-                    await asyncio.sleep(1)
+                    await self.settle(1000)
                 else:
                     self.logger.warning("未找到提示词输入框")
             else:
@@ -524,6 +523,8 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                     if response_data.get('status') == 0 and 'result' in response_data:
                         self.chat_id = response_data['result'].get('chat_id')
                         self.logger.info("获取到chat_id", chat_id=self.chat_id)
+                        if self.chat_id:
+                            self.resolve_signal('chat_id', self.chat_id)
                 
                 # 监听状态更新请求
                 if self.chat_id and f'video-api/v1/chat/status/{self.chat_id}' in response.url:
@@ -569,14 +570,18 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                                 data=None,
                                 message="当前任务生成失败，请手动生成"
                             )
+                        
+                        if self.video_result is not None:
+                            self.resolve_signal('completed', self.video_result)
                             
             except Exception as e:
                 self.logger.error("解析响应时出错", error=str(e))
         
-        # 在浏览器上下文级别设置监听器
-        self.context.on('request', handle_request)
-        self.context.on('response', handle_response)
+        # 在页面级别设置监听器，页面随上下文归还浏览器池时关闭，监听器不会残留到下一个任务
+        self.page.on('request', handle_request)
+        self.page.on('response', handle_response)
     
+    @timed_step("开始生成")
     async def start_generation(self) -> TaskResult:
         """开始生成视频"""
         try:
@@ -591,15 +596,10 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 'div[data-v-2f067989].btn-group'  # 包含data-v属性的btn-group
             ]
             
-            generate_button = None
-            for selector in generate_button_selectors:
-                try:
-                    generate_button = await self.page.wait_for_selector(selector, timeout=5000, state='visible')
-                    if generate_button:
-                        self.logger.info("找到生成按钮", selector=selector)
-                        break
-                except:
-                    continue
+            # 所有候选选择器同时等待，任一可见即返回，不再逐个等待超时
+            selector, generate_button = await self.wait_for_any_visible(generate_button_selectors, timeout=5000)
+            if generate_button:
+                self.logger.info("找到生成按钮", selector=selector)
             
             if not generate_button:
                 self.logger.debug("使用通用方法查找生成按钮")
@@ -611,17 +611,13 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             if generate_button:
                 # 确保按钮可点击
                 await generate_button.scroll_into_view_if_needed()
-                await asyncio.sleep(1)
                 
                 # 点击生成按钮
                 await generate_button.click()
                 self.logger.info("已点击生成按钮，开始视频生成")
                 
-                # 等待获取chat_id
-                timeout_count = 0
-                while self.chat_id is None and timeout_count < 30:  # 等待30秒
-                    await asyncio.sleep(1)
-                    timeout_count += 1
+                # 等待获取chat_id（最多30秒）
+                await self.wait_signal('chat_id', 30)
                 
                 if self.chat_id is None:
                     self.logger.error("未能获取到chat_id")
@@ -654,16 +650,14 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"点击生成按钮失败: {str(e)}"
             )
     
+    @timed_step("等待生成完成")
     async def wait_for_completion(self, max_wait_time: int = 3600) -> TaskResult:
         """等待生成完成"""
         try:
-            start_time = time.time()
-            
-            while time.time() - start_time < max_wait_time:
-                if self.video_result is not None:
-                    return self.video_result
-                
-                await asyncio.sleep(1)
+            # 页面自行轮询状态接口，响应监听器拿到最终结果时立即返回
+            result = await self.wait_signal('completed', max_wait_time)
+            if result is not None:
+                return result
             
             # 超时
             self.logger.error("视频生成超时", max_wait_time=max_wait_time)
@@ -0,0 +1,33 @@
+// 文件夹导入进度：导入接口返回 job_id 后轮询 /api/imports/<job_id>，直到导入结束
+
+import api from './api'
+
+export const waitImportJob = (jobId, { interval = 1000, onProgress } = {}) =>
+  new Promise((resolve, reject) => {
+    const poll = async () => {
+      try {
+        const response = await api.get(`/imports/${jobId}`)
+        const job = response.data.data
+        onProgress && onProgress(job)
+        if (job.finished) {
+          resolve(job)
+        } else {
+          setTimeout(poll, interval)
+        }
+      } catch (error) {
+        reject(error)
+      }
+    }
+    poll()
+  })
+
+// 导入结束后的提示
+export const notifyImportResult = (job, ElMessage) => {
+  if (job.status === 'completed') {
+    ElMessage.success(job.message)
+  } else if (job.status === 'cancelled') {
+    ElMessage.info(job.message)
+  } else {
+    ElMessage.error(job.message || '导入文件夹失败')
+  }
+}
@@ -0,0 +1,30 @@
+// 任务事件流（/api/events，Server-Sent Events）
+// 浏览器断线后自动重连并带上 Last-Event-ID，服务端补发期间的事件；收到 reset 时调用方应全量刷新
+
+import api from './api'
+
+// types 为要监听的事件类型（同时作为服务端过滤条件），reset 总会监听
+export const createEventStream = ({ types, onEvent, onOpen, onError }) => {
+  const query = `?types=${encodeURIComponent(types.join(','))}`
+  const source = new EventSource(`${api.defaults.baseURL}/events${query}`)
+
+  source.onopen = () => onOpen && onOpen()
+  source.onerror = (error) => onError && onError(error)
+
+  const handle = (message) => {
+    try {
+      const event = JSON.parse(message.data)
+      onEvent && onEvent(event)
+    } catch (error) {
+      console.error('解析事件失败:', error)
+    }
+  }
+  // 服务端按事件类型发送 event 字段，需要逐个监听
+  ;[...types, 'reset'].forEach(type => source.addEventListener(type, handle))
+
+  return {
+    close() {
+      source.close()
+    }
+  }
+}
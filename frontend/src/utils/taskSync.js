@@ -0,0 +1,55 @@
+// 任务列表增量同步
+// 全量加载后记录接口返回的 watermark，轮询时带 updated_since 只拉取之后变更的任务，
+// 在当前列表中原地替换；出现新增/删除（分页会整体移动）或服务端要求 reset 时回退为全量加载
+
+const changedTasksOf = (data) => (Array.isArray(data) ? data : (data?.tasks || []))
+
+export const createTaskSync = () => {
+  let watermark = null
+
+  return {
+    // 是否已有水位（首次加载前需要全量加载）
+    get ready() {
+      return watermark !== null
+    },
+
+    // 增量请求参数
+    params(extra = {}) {
+      return { ...extra, updated_since: watermark }
+    },
+
+    // 全量加载成功后记录水位
+    remember(response) {
+      watermark = response?.data?.sync?.watermark || null
+    },
+
+    reset() {
+      watermark = null
+    },
+
+    // 合并增量结果到 tasksRef，返回 false 表示需要全量刷新
+    apply(tasksRef, response) {
+      const sync = response?.data?.sync
+      if (!sync || sync.reset) {
+        watermark = null
+        return false
+      }
+      const changed = changedTasksOf(response.data.data)
+      const current = tasksRef.value || []
+      const positions = new Map(current.map((task, index) => [task.id, index]))
+      const hasAdded = changed.some(task => !positions.has(task.id))
+      if (hasAdded || (sync.deleted || []).length > 0) {
+        return false
+      }
+      watermark = sync.watermark
+      if (changed.length > 0) {
+        const next = current.slice()
+        changed.forEach(task => {
+          next[positions.get(task.id)] = task
+        })
+        tasksRef.value = next
+      }
+      return true
+    }
+  }
+}